@@ -0,0 +1,70 @@
+# Python standard.
+import os
+from typing import Dict, List
+
+# Third-party.
+import numpy as np
+import pandas as pd
+
+# Local.
+from pagetpalace.src.oanda.instrument import OandaInstrumentData
+
+RECORDED_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tests', 'test_data')
+_GRANULARITY_TO_FREQ = {
+    'W': '7D',
+    'D': '1D',
+    'H4': '240min',
+    'H1': '60min',
+    'M30': '30min',
+    'M15': '15min',
+    'M5': '5min',
+}
+_MIN_RECORDED_ROWS = 5  # Enough for the longest default look back in indicators.py.
+_PRICE_COLUMNS = [col for price_type in 'ABM' for col in OandaInstrumentData.PRICE_HEADERS[price_type]]
+
+
+def make_synthetic_candles(rows: int,
+                           granularity: str = 'H1',
+                           start_price: float = 1.3,
+                           spread: float = 0.0002,
+                           seed: int = 0) -> pd.DataFrame:
+    """ Seeded random walk laid out like OandaInstrumentData.convert_to_df output, so runs are reproducible. """
+    rng = np.random.default_rng(seed)
+    closes = start_price * np.exp(np.cumsum(rng.normal(0., 0.002, rows)))
+    opens = np.concatenate([[start_price], closes[:-1]])
+    wicks = np.abs(rng.normal(0., 0.0015, (2, rows))) * closes
+    highs = np.maximum(opens, closes) + wicks[0]
+    lows = np.minimum(opens, closes) - wicks[1]
+    mid = {'Open': opens, 'High': highs, 'Low': lows, 'Close': closes}
+    data = {
+        'datetime': pd.date_range('2015-01-05', periods=rows, freq=_GRANULARITY_TO_FREQ[granularity])
+                      .strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    for prefix, offset in [('ask', spread / 2), ('bid', -spread / 2), ('mid', 0.)]:
+        for name, values in mid.items():
+            data[f'{prefix}{name}'] = np.round(values + offset, 5)
+    data['volume'] = rng.integers(100, 50000, rows)
+
+    return pd.DataFrame(data)[['datetime'] + _PRICE_COLUMNS + ['volume']]
+
+
+def load_recorded_candle_sets(data_dir: str = RECORDED_DATA_DIR) -> Dict[str, pd.DataFrame]:
+    recorded = {}
+    for file_name in sorted(os.listdir(data_dir)):
+        if file_name.endswith('.csv'):
+            df = pd.read_csv(os.path.join(data_dir, file_name))
+            if len(df) >= _MIN_RECORDED_ROWS and set(_PRICE_COLUMNS + ['datetime', 'volume']).issubset(df.columns):
+                recorded[file_name[:-4]] = df[['datetime'] + _PRICE_COLUMNS + ['volume']]
+
+    return recorded
+
+
+def get_candle_sets(sizes: List[int], include_recorded: bool = True) -> Dict[str, pd.DataFrame]:
+    """ Recorded sets are truncated to the requested sizes, they are never padded out. """
+    candle_sets = {f'synthetic_{size}': make_synthetic_candles(size) for size in sizes}
+    if include_recorded:
+        for name, df in load_recorded_candle_sets().items():
+            for size in sorted({min(size, len(df)) for size in sizes}):
+                candle_sets[f'recorded_{name}_{size}'] = df.tail(size).reset_index(drop=True)
+
+    return candle_sets
@@ -0,0 +1,191 @@
+""" S5 bars replayed per minute with a trade monitor polling every bar and a trade open for it to check.
+
+    Run from the repository root:
+        python -m benchmarks.replay_throughput                        # exits non-zero if monitor or scheduler is slower
+        python -m benchmarks.replay_throughput --bars 2000000 --only execute
+
+    monitor polls a PaperTradeMonitor directly after each S5 bar. scheduler registers the poll as an interval job on
+    a CandleCloseScheduler with the default workers. Both are held to the target. execute runs SSLInvestment, which
+    polls its monitor between its H1 candle closes, through ReplayEngine.run and so Strategy.execute(), with the
+    LiveTradeMonitor it's given replaced by ReplayEngine.attach. It isn't held to the target, which it's well under:
+    every poll the strategy also syncs its pending orders, and its data fetch and indicators at each close take about
+    as long as the polls between.
+"""
+# Python standard.
+import argparse
+import datetime
+import logging
+import sys
+import time
+from typing import Callable, Dict, List
+
+# Third-party.
+import numpy as np
+import pandas as pd
+import pytz
+
+# Local.
+from pagetpalace.src.backtesting.candles import CandleArrays
+from pagetpalace.src.backtesting.replay import ReplayEngine
+from pagetpalace.src.dependent_orders.trade_adjustment_params import PartialClosureParams, StopLossMoveParams
+from pagetpalace.src.oanda.instruments.instruments import CurrencyPairs
+from pagetpalace.src.oanda.live_trade_monitor import LiveTradeMonitor
+from pagetpalace.src.oanda.orders import Orders
+from pagetpalace.src.oanda.paper_account import PaperTradeMonitor
+from pagetpalace.src.oanda.strategies.strategy_implementations.ssl_investment import SSLInvestment
+from pagetpalace.src.scheduling.candle_close_scheduler import CandleCloseScheduler
+from pagetpalace.src.scheduling.clock import SimulationFinished, set_clock
+from pagetpalace.tools.logger import logger
+
+DEFAULT_BARS = 1000000
+TARGET_BARS_PER_MINUTE = 3000000
+TARGET_PATHS = ('monitor', 'scheduler')
+START = datetime.datetime(2021, 1, 4, tzinfo=pytz.utc)
+_FREQUENCIES = {'S5': '5s', 'H1': 'h', 'D': 'D'}
+_STOP_LOSS_MOVES = {1: {'check': 0.6, 'move': 0.1}, 2: {'check': 0.8, 'move': 0.4}}
+_PARTIAL_CLOSURES = {1: {'check': 0.7, 'close': 0.5}}
+_SSL_TRADE_MULTIPLIERS = {'1': {'long': {'sl': 2, 'tp': 2}}}
+_SSL_BOUNDARIES = {
+    'continuation': {tf: {'long': {'above': 2, 'below': 2}} for tf in ['D', 'H1']},
+    'reverse': {tf: {'long': {'above': 0.5, 'below': 0.5}} for tf in ['H1']},
+}
+
+
+def make_candles(granularity: str, start: datetime.datetime, count: int, seed: int, volatility: float) -> CandleArrays:
+    """ Seeded random walk around 1.3 with a pip of spread. """
+    rng = np.random.default_rng(seed)
+    times = pd.date_range(start.replace(tzinfo=None), periods=count, freq=_FREQUENCIES[granularity]).to_numpy()
+    close = 1.3 + np.cumsum(rng.normal(0, volatility, count))
+    open_ = np.concatenate(([1.3], close[:-1]))
+    wicks = np.abs(rng.normal(0, volatility / 2, (2, count)))
+    mid = {
+        'Open': open_,
+        'High': np.maximum(open_, close) + wicks[0],
+        'Low': np.minimum(open_, close) - wicks[1],
+        'Close': close,
+    }
+    prices = {}
+    for side, offset in (('bid', -0.00005), ('ask', 0.00005), ('mid', 0.)):
+        for data_point, values in mid.items():
+            prices[f'{side}{data_point}'] = np.round(values + offset, 5)
+
+    return CandleArrays(granularity, times, prices)
+
+
+def make_engine(bars: int) -> ReplayEngine:
+    """ A replay of bars S5 candles from START, with D and H1 candles from well before it for the strategy. """
+    end = START + datetime.timedelta(seconds=5 * bars)
+    days = (end - START).days + 2
+    history = {
+        'GBP_USD': {
+            'D': make_candles('D', START - datetime.timedelta(days=100), days + 100, seed=1, volatility=0.004),
+            'H1': make_candles('H1', START - datetime.timedelta(hours=100), days * 24 + 100, seed=2, volatility=0.001),
+        },
+    }
+    ticks = make_candles('S5', START, bars, seed=3, volatility=0.00003)
+
+    return ReplayEngine(history, START, end, ticks={'GBP_USD': ticks})
+
+
+def make_monitor(engine: ReplayEngine, monitor_class: type = PaperTradeMonitor) -> LiveTradeMonitor:
+    """ A monitor of engine's account with a long trade open whose take profit and stop loss are out of reach. """
+    quote = engine.pricing.get_quote('GBP_USD')
+    engine.account.create_order(
+        Orders.create_market_order(round(quote.ask - 0.5, 5), round(quote.ask + 0.5, 5), 'GBP_USD', 1000),
+    )
+
+    return monitor_class(
+        engine.account,
+        stop_loss_move_params=[StopLossMoveParams('GBP_USD', _STOP_LOSS_MOVES)],
+        partial_closure_params=[PartialClosureParams('GBP_USD', _PARTIAL_CLOSURES)],
+    )
+
+
+def run_monitor(engine: ReplayEngine):
+    monitor = make_monitor(engine)
+    try:
+        while True:
+            engine.clock.sleep(5)
+            monitor.monitor_and_adjust_current_trades()
+    except SimulationFinished:
+        pass
+
+
+def run_scheduler(engine: ReplayEngine):
+    monitor = make_monitor(engine)
+    scheduler = CandleCloseScheduler(engine.clock)
+    scheduler.register_interval(lambda tick_time: monitor.monitor_and_adjust_current_trades(), 5)
+    previous = set_clock(engine.clock)
+    try:
+        scheduler.run()
+    except SimulationFinished:
+        pass
+    finally:
+        set_clock(previous)
+
+
+def run_execute(engine: ReplayEngine):
+    strategy = SSLInvestment(
+        account=engine.account,
+        instrument=CurrencyPairs.GBP_USD,
+        trade_multipliers=_SSL_TRADE_MULTIPLIERS,
+        boundary_multipliers=_SSL_BOUNDARIES,
+        live_trade_monitor=make_monitor(engine, LiveTradeMonitor),
+    )
+    engine.run(strategy)
+
+
+PATHS: Dict[str, Callable[[ReplayEngine], None]] = {
+    'monitor': run_monitor,
+    'scheduler': run_scheduler,
+    'execute': run_execute,
+}
+
+
+def measure(path: str, bars: int, repeat: int = 3) -> Dict[str, float]:
+    """ The engine is built outside the timing, the replay and the monitor polls inside it. The fastest of the
+        repeats is kept, as the least disturbed by other work, see run_benchmarks.compare_to_baseline.
+    """
+    results = []
+    for _ in range(repeat):
+        engine = make_engine(bars)
+        start = time.perf_counter()
+        PATHS[path](engine)
+        seconds = time.perf_counter() - start
+        replayed = int((engine.clock.now() - START).total_seconds() // 5)
+        results.append({
+            'bars': replayed,
+            'seconds': seconds,
+            'bars_per_minute': replayed / seconds * 60,
+            'open_trades': len(engine.account.get_open_trades()['trades']),
+        })
+
+    return max(results, key=lambda result: result['bars_per_minute'])
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bars', type=int, default=DEFAULT_BARS)
+    parser.add_argument('--only', nargs='+', choices=list(PATHS), default=list(PATHS))
+    parser.add_argument('--target', type=float, default=TARGET_BARS_PER_MINUTE, help='S5 bars per minute.')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    # Every candle close and order is logged, that's not what's being measured.
+    logger.setLevel(logging.WARNING)
+    below_target = []
+    print(f'{"path":<12} {"S5 bars":>10} {"seconds":>10} {"bars/min":>14} {"open trades":>12}')
+    for path in args.only:
+        result = measure(path, args.bars, args.repeat)
+        print(f'{path:<12} {result["bars"]:>10} {result["seconds"]:>10.2f} {result["bars_per_minute"]:>14,.0f} '
+              f'{result["open_trades"]:>12}')
+        if path in TARGET_PATHS and result['bars_per_minute'] < args.target:
+            below_target.append(path)
+    for path in below_target:
+        print(f'BELOW TARGET {path}: under {args.target:,.0f} S5 bars/min')
+
+    return 1 if below_target else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
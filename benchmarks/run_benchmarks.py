@@ -0,0 +1,355 @@
+""" Benchmarks every indicator in indicators.py and every strategy's indicator and signal update.
+
+    Run from the repository root:
+        python -m benchmarks.run_benchmarks --save-baseline      # record a baseline on this machine
+        python -m benchmarks.run_benchmarks                      # compare against it
+        python -m benchmarks.run_benchmarks --sizes 50 5000 --only ssl average_true_range
+"""
+# Python standard.
+import argparse
+import inspect
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+# Third-party.
+import numpy as np
+import pandas as pd
+
+# Local.
+from benchmarks.candle_sets import get_candle_sets
+from pagetpalace.src.indicators import indicators
+from pagetpalace.src.indicators.indicator_cache import INDICATOR_CACHE
+from pagetpalace.src.oanda.account import OandaAccount
+from pagetpalace.src.oanda.instruments.instruments import CurrencyPairs, Indices
+from pagetpalace.src.oanda.live_trade_monitor import LiveTradeMonitor
+from pagetpalace.src.oanda.settings import DEMO_ACCESS_TOKEN, DEMO_ACCOUNT_NUMBER
+from pagetpalace.src.oanda.strategies.strategy import Strategy
+from pagetpalace.src.oanda.strategies.strategy_implementations.heikin_ashi_ewm_1 import HeikinAshiEwm1
+from pagetpalace.src.oanda.strategies.strategy_implementations.heikin_ashi_ewm_2 import HeikinAshiEwm2
+from pagetpalace.src.oanda.strategies.strategy_implementations.hpdaily import HPDaily
+from pagetpalace.src.oanda.strategies.strategy_implementations.price_breaks import PriceBreaks
+from pagetpalace.src.oanda.strategies.strategy_implementations.ssl_currency import SSLCurrency
+from pagetpalace.src.oanda.strategies.strategy_implementations.ssl_hammer_pin import SSLHammerPin
+from pagetpalace.src.oanda.strategies.strategy_implementations.ssl_investment import SSLInvestment
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULT_SIZES = [50, 5000, 500000]
+_HP_COEFFS = {'body': 2.25, 'shadow': 5.5}
+_SSL_BOUNDARIES = {
+    'continuation': {tf: {'long': {'above': 2, 'below': 2}, 'short': {'above': 2, 'below': 2}} for tf in ['H1', 'M30']},
+    'reverse': {tf: {'long': {'above': 0.5, 'below': 0.5}, 'short': {'above': 0.5, 'below': 0.5}} for tf in ['H1']},
+}
+_SSL_TRADE_MULTIPLIERS = {'1': {'long': {'sl': 2, 'tp': 2}, 'short': {'sl': 2, 'tp': 2}}}
+_REFERENCE_PRICES = pd.Series(np.random.default_rng(0).normal(size=10000))
+
+
+def _last_mid_prices(df: pd.DataFrame) -> Dict[str, float]:
+    candle = df.iloc[-1]
+
+    return {'o': candle['midOpen'], 'h': candle['midHigh'], 'l': candle['midLow'], 'c': candle['midClose']}
+
+
+INDICATOR_RUNNERS = {
+    'ssl_channel': lambda df: indicators.ssl_channel(df),
+    'append_ssl_channel': lambda df: indicators.append_ssl_channel(df),
+    'get_average_true_range_value': lambda df: indicators.get_average_true_range_value(df),
+    'average_true_range': lambda df: indicators.average_true_range(df),
+    'append_ssma': lambda df: indicators.append_ssma(df),
+    'is_long_green_hammer': lambda df: indicators.is_long_green_hammer(_last_mid_prices(df), 2., 2.),
+    'is_long_red_hammer': lambda df: indicators.is_long_red_hammer(_last_mid_prices(df), 2., 2.),
+    'is_short_green_pin': lambda df: indicators.is_short_green_pin(_last_mid_prices(df), 2., 2.),
+    'is_short_red_pin': lambda df: indicators.is_short_red_pin(_last_mid_prices(df), 2., 2.),
+    'get_hammer_pin_signal': lambda df: indicators.get_hammer_pin_signal(df.iloc[-1], 2., 2.),
+    'is_candle_range_greater_than_x': lambda df: indicators.is_candle_range_greater_than_x(df.iloc[-1], 0.001),
+    'was_price_ascending': lambda df: indicators.was_price_ascending(df, len(df) - 1),
+    'was_price_descending': lambda df: indicators.was_price_descending(df, len(df) - 1),
+    'get_hammer_pin_signal_v2': lambda df: indicators.get_hammer_pin_signal_v2(df, len(df) - 1, _HP_COEFFS),
+    'was_previous_green_streak': lambda df: indicators.was_previous_green_streak(df, len(df) - 1),
+    'was_previous_red_streak': lambda df: indicators.was_previous_red_streak(df, len(df) - 1),
+    'append_heikin_ashi': lambda df: indicators.append_heikin_ashi(df),
+    'append_exponentially_weighted_moving_average':
+        lambda df: indicators.append_exponentially_weighted_moving_average(df),
+    'get_chaikin_money_flow_value': lambda df: indicators.get_chaikin_money_flow_value(df),
+    'chaikin_money_flow': lambda df: indicators.chaikin_money_flow(df),
+    'calculate_local_high_and_low': lambda df: indicators.calculate_local_high_and_low(df, len(df) - 1, 24),
+}
+
+
+def _demo_account() -> OandaAccount:
+    return OandaAccount(DEMO_ACCESS_TOKEN, DEMO_ACCOUNT_NUMBER, 'DEMO_API')
+
+
+STRATEGY_FACTORIES = {
+    'HPDaily': lambda: HPDaily(
+        account=_demo_account(),
+        instrument=CurrencyPairs.GBP_USD,
+        boundary_multipliers={'D': {'long': {'below': 1}, 'short': {'above': 2}}},
+        trade_multipliers={'1': {'long': {'tp': 3, 'sl': 1.5}, 'short': {'tp': 1.5, 'sl': 1.5}}},
+        coefficients={
+            'hp_coeffs': {'long': {'body': 3, 'shadow': 1.5}, 'short': {'body': 1.25, 'shadow': 2}},
+            'streak_look_back': {'long': 1, 'short': 2},
+            'price_movement_lb': {'long': 1, 'short': 2},
+            'x_atr': {'long': 1, 'short': 1},
+        },
+    ),
+    'HeikinAshiEwm1': lambda: HeikinAshiEwm1(
+        account=_demo_account(),
+        instrument=Indices.NAS100_USD,
+        ssma_period=10,
+        ewm_period=5,
+        boundary_multipliers={'D': {'long': {'below': 1000, 'above': 1}}},
+        trade_multipliers={'1': {'long': {'sl': 2.5, 'tp': 6}}},
+    ),
+    'HeikinAshiEwm2': lambda: HeikinAshiEwm2(
+        account=_demo_account(),
+        instrument=Indices.IN50_USD,
+        ewm_period=18,
+        boundary_multipliers={
+            'D': {
+                'continuation': {'long': {'below': 1000, 'above': 2}},
+                'reverse': {'long': {'below': 0.5, 'above': 0.001}},
+            },
+        },
+        trade_multipliers={'1': {'long': {'sl': 2, 'tp': 3}}},
+    ),
+    'PriceBreaks': lambda: PriceBreaks(
+        account=_demo_account(),
+        equity_split=2,
+        instrument=CurrencyPairs.GBP_USD,
+        tp_multipliers={'long': 2., 'short': 2.},
+        sl_multipliers={'long': 1., 'short': 1.},
+        session_reset_look_backs={'long': 4, 'short': 4},
+        entry_offset_factors={'long': 10., 'short': 10.},
+        max_candle_factors={'long': 2., 'short': 2.},
+    ),
+    'SSLCurrency': lambda: SSLCurrency(
+        account=_demo_account(),
+        instrument=CurrencyPairs.GBP_USD,
+        trade_multipliers=_SSL_TRADE_MULTIPLIERS,
+        boundary_multipliers=_SSL_BOUNDARIES,
+        live_trade_monitor=LiveTradeMonitor(_demo_account()),
+    ),
+    'SSLHammerPin': lambda: SSLHammerPin(
+        account=_demo_account(),
+        instrument=CurrencyPairs.GBP_USD,
+        boundary_multipliers=_SSL_BOUNDARIES,
+        trade_multipliers=_SSL_TRADE_MULTIPLIERS,
+        hammer_pin_coefficients={'long': {'body': 2, 'head_tail': 2}, 'short': {'body': 2, 'head_tail': 2}},
+        trading_restriction='trading_hours',
+    ),
+    'SSLInvestment': lambda: SSLInvestment(
+        account=_demo_account(),
+        instrument=CurrencyPairs.GBP_USD,
+        trade_multipliers=_SSL_TRADE_MULTIPLIERS,
+        boundary_multipliers=_SSL_BOUNDARIES,
+        live_trade_monitor=LiveTradeMonitor(_demo_account()),
+    ),
+}
+
+
+class BenchmarkCase:
+    def __init__(self, name: str, setup: Callable[[], object], run: Callable[[object], object]):
+        """ setup is excluded from the measurements and is called again before every repeat. """
+        self.name = name
+        self.setup = setup
+        self.run = run
+
+
+def _make_indicator_case(name: str, candle_set: str, df: pd.DataFrame) -> BenchmarkCase:
+    return BenchmarkCase(f'indicator/{name}/{candle_set}', lambda: df.copy(), INDICATOR_RUNNERS[name])
+
+
+def _make_strategy_case(name: str, candle_set: str, df: pd.DataFrame) -> BenchmarkCase:
+    def setup() -> Strategy:
+        INDICATOR_CACHE.clear()
+        strategy = STRATEGY_FACTORIES[name]()
+        strategy._latest_data = {tf: df.copy() for tf in strategy.time_frames}
+        strategy._latest_candle = df.iloc[-1]
+
+        return strategy
+
+    def run(strategy: Strategy):
+        return strategy._evaluate_signals()
+
+    return BenchmarkCase(f'strategy/{name}/{candle_set}', setup, run)
+
+
+def get_unbenchmarked_indicators() -> List[str]:
+    return [
+        name for name, func in inspect.getmembers(indicators, inspect.isfunction)
+        if func.__module__ == indicators.__name__ and not name.startswith('_') and name not in INDICATOR_RUNNERS
+    ]
+
+
+def build_cases(sizes: List[int], include_recorded: bool = True, only: List[str] = None) -> List[BenchmarkCase]:
+    cases = []
+    for candle_set, df in get_candle_sets(sizes, include_recorded).items():
+        cases.extend(_make_indicator_case(name, candle_set, df) for name in INDICATOR_RUNNERS)
+        cases.extend(_make_strategy_case(name, candle_set, df) for name in STRATEGY_FACTORIES)
+    if only:
+        cases = [case for case in cases if any(pattern in case.name for pattern in only)]
+
+    return cases
+
+
+def _run_reference():
+    """ Fixed interpreter, numpy and pandas work, none of it this repository's, timed alongside every repeat. A machine
+        running slower for a while slows both, so wall times are compared relative to it, see compare_to_baseline.
+    """
+    _REFERENCE_PRICES.rolling(14).mean().ewm(span=14).mean().diff().abs().sum()
+    sum(i * i for i in range(20000))
+
+
+def measure(case: BenchmarkCase, repeat: int = 10) -> Dict[str, float]:
+    wall_times, reference_times = [], []
+    for _ in range(repeat):
+        state = case.setup()
+        start = time.perf_counter()
+        _run_reference()
+        reference_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        case.run(state)
+        wall_times.append(time.perf_counter() - start)
+    state = case.setup()
+    blocks_before = sys.getallocatedblocks()
+    tracemalloc.start()
+    try:
+        case.run(state)
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'wall_time_s': statistics.median(wall_times),
+        'min_wall_time_s': min(wall_times),
+        'min_reference_time_s': min(reference_times),
+        'retained_bytes': retained,
+        'peak_bytes': peak,
+        'allocated_blocks': sys.getallocatedblocks() - blocks_before,
+    }
+
+
+def get_machine() -> Dict[str, str]:
+    """ What a baseline was recorded on, wall times only compare on the same machine and library versions. """
+    return {
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': str(os.cpu_count()),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+    }
+
+
+def compare_to_baseline(results: Dict[str, Dict[str, float]],
+                        baseline: Dict[str, Dict[str, float]],
+                        time_tolerance: float = 0.5,
+                        memory_tolerance: float = 0.1,
+                        min_time_delta: float = 0.001,
+                        min_memory_delta: int = 64 * 1024) -> Dict[str, List[str]]:
+    """ Results more than time_tolerance slower or memory_tolerance bigger than the baseline are regressions, by the
+        name of the benchmark. Time differences below min_time_delta seconds and peak memory differences below
+        min_memory_delta bytes are treated as noise.
+
+        The minimum of the repeats is compared, as the least disturbed by other work, scaled by how much faster or
+        slower the reference work timed alongside it ran than when the baseline was recorded. That evens out a machine
+        slowing down for a while, as shared and virtual ones do, but not a different CPU, Python or library versions,
+        see get_machine. Peak memory varies far less between machines, but does change with numpy and pandas versions.
+    """
+    regressions = {}
+    for name, metrics in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        speed = metrics['min_reference_time_s'] / previous['min_reference_time_s']
+        previous_time, wall_time = previous['min_wall_time_s'] * speed, metrics['min_wall_time_s']
+        if wall_time - previous_time > min_time_delta and wall_time > previous_time * (1 + time_tolerance):
+            regressions.setdefault(name, []).append(f'{name}: wall time {previous_time:.6f}s -> {wall_time:.6f}s')
+        previous_peak, peak = previous['peak_bytes'], metrics['peak_bytes']
+        if peak - previous_peak > min_memory_delta and peak > previous_peak * (1 + memory_tolerance):
+            regressions.setdefault(name, []).append(f'{name}: peak memory {previous_peak} -> {peak} bytes')
+
+    return regressions
+
+
+def remeasure(cases: List[BenchmarkCase], results: Dict[str, Dict[str, float]], repeat: int = 10):
+    """ Measures the cases again, keeping whichever measurement ran fastest relative to its reference work. Other
+        work on the machine can slow a benchmark but not its reference, so a regression is only reported once it's
+        been measured at another time too.
+    """
+    for case in cases:
+        previous, result = results[case.name], measure(case, repeat)
+        if previous['min_wall_time_s'] / previous['min_reference_time_s'] < \
+                result['min_wall_time_s'] / result['min_reference_time_s']:
+            result.update({key: previous[key] for key in ['min_wall_time_s', 'min_reference_time_s']})
+        result['peak_bytes'] = min(result['peak_bytes'], previous['peak_bytes'])
+        results[case.name] = result
+
+
+def _print_results(results: Dict[str, Dict[str, float]]):
+    print(f'{"benchmark":<90} {"median s":>12} {"min s":>12} {"peak KiB":>12} {"retained KiB":>13} {"blocks":>10}')
+    for name, m in results.items():
+        print(f'{name:<90} {m["wall_time_s"]:>12.6f} {m["min_wall_time_s"]:>12.6f} {m["peak_bytes"] / 1024:>12.1f} '
+              f'{m["retained_bytes"] / 1024:>13.1f} {m["allocated_blocks"]:>10}')
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument(
+        '--retries', type=int, default=2, help='Times a regression is measured again before it is reported.'
+    )
+    parser.add_argument('--only', nargs='+', help='Only run benchmarks whose name contains one of these strings.')
+    parser.add_argument('--no-recorded', action='store_true', help='Skip the recorded candle sets.')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--time-tolerance', type=float, default=0.5)
+    parser.add_argument('--memory-tolerance', type=float, default=0.1)
+    parser.add_argument('--min-time-delta', type=float, default=0.001, help='Seconds of wall time treated as noise.')
+    parser.add_argument(
+        '--min-memory-delta', type=int, default=64 * 1024, help='Bytes of peak memory treated as noise.'
+    )
+    args = parser.parse_args(argv)
+
+    unbenchmarked = get_unbenchmarked_indicators()
+    if unbenchmarked:
+        print(f'WARNING: indicators without a benchmark: {", ".join(unbenchmarked)}')
+    cases = build_cases(args.sizes, not args.no_recorded, args.only)
+    results = {case.name: measure(case, args.repeat) for case in cases}
+    _print_results(results)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({'machine': get_machine(), 'results': results}, f, indent=2, sort_keys=True)
+        print(f'Baseline written to {args.baseline}')
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f'ERROR no baseline at {args.baseline}, run with --save-baseline to create one.')
+        return 2
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline['machine'] != get_machine():
+        print(f'WARNING: the baseline was recorded on {baseline["machine"]}, wall times may not compare.')
+    tolerances = (args.time_tolerance, args.memory_tolerance, args.min_time_delta, args.min_memory_delta)
+    regressions = compare_to_baseline(results, baseline['results'], *tolerances)
+    for _ in range(args.retries):
+        if not regressions:
+            break
+        remeasure([case for case in cases if case.name in regressions], results, args.repeat)
+        regressions = compare_to_baseline(results, baseline['results'], *tolerances)
+    for messages in regressions.values():
+        for regression in messages:
+            print(f'REGRESSION {regression}')
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,217 @@
+# Python standard.
+from typing import Dict, List, Sequence, Tuple, Union
+
+# Third-party.
+import numpy as np
+import pandas as pd
+
+# Local.
+from pagetpalace.src.backtesting.candles import CandleArrays
+from pagetpalace.src.oanda.account import OandaAccount
+
+By = Union[str, Sequence[str], None]
+SUMMARY_COLUMNS = [
+    'trades',
+    'wins',
+    'win_rate',
+    'total_pnl',
+    'expectancy',
+    'expectancy_r',
+    'average_win',
+    'average_loss',
+    'profit_factor',
+    'max_drawdown',
+    'exposure',
+    'average_holding_time',
+]
+
+
+def _get_keys(by: By) -> List[str]:
+    if by is None:
+        return []
+
+    return [by] if isinstance(by, str) else list(by)
+
+
+def _get_filled(trades: pd.DataFrame) -> pd.DataFrame:
+    return trades[trades['status'] == 'FILLED'] if 'status' in trades.columns else trades
+
+
+class ConversionRates:
+    """ Account currency per unit of each currency over time, looked up as of each moment.
+
+        rates maps a currency to (times, rates) sorted by time. A moment gets the last rate at or before it, or the
+        first rate if it's earlier than all of them.
+    """
+
+    def __init__(self,
+                 rates: Dict[str, Tuple[np.ndarray, np.ndarray]] = None,
+                 account_currency: str = OandaAccount.ACCOUNT_CURRENCY):
+        self.account_currency = account_currency
+        self._rates = {
+            currency: (np.asarray(times, dtype='datetime64[ns]'), np.asarray(values, dtype=np.float64))
+            for currency, (times, values) in (rates or {}).items()
+        }
+
+    def __repr__(self):
+        return f'ConversionRates(account_currency={self.account_currency}, currencies={sorted(self._rates)})'
+
+    @classmethod
+    def from_candles(cls,
+                     candles: Dict[str, CandleArrays],
+                     account_currency: str = OandaAccount.ACCOUNT_CURRENCY) -> 'ConversionRates':
+        """ candles maps symbols quoted against the account currency, e.g. GBP_USD or EUR_GBP, to their candles.
+
+            Each rate is the mid close, known from the candle's close.
+        """
+        rates = {}
+        for symbol, arrays in candles.items():
+            base, quote = symbol.split('_')
+            if base == account_currency:
+                rates[quote] = (arrays.close_times, 1. / arrays['midClose'])
+            elif quote == account_currency:
+                rates[base] = (arrays.close_times, arrays['midClose'])
+            else:
+                raise ValueError(f'{symbol} isn\'t quoted against {account_currency}.')
+
+        return cls(rates, account_currency)
+
+    def get(self, currency: str, times: np.ndarray) -> np.ndarray:
+        times = np.asarray(times, dtype='datetime64[ns]')
+        if currency == self.account_currency:
+            return np.ones(len(times))
+        if currency not in self._rates:
+            raise ValueError(f'No {self.account_currency} conversion for {currency}.')
+        rate_times, rates = self._rates[currency]
+
+        return rates[np.maximum(np.searchsorted(rate_times, times, side='right') - 1, 0)]
+
+
+def add_account_pnl(trades: pd.DataFrame, rates: ConversionRates, instrument: str = None) -> pd.DataFrame:
+    """ trades with account_pnl, the pnl of their units in the account currency at the exit time.
+
+        pnl is in the quote currency per unit. The instrument and units columns are used where there are any, instrument
+        and a unit otherwise.
+    """
+    trades = trades.copy()
+    symbols = trades['instrument'].to_numpy() if 'instrument' in trades.columns else np.full(len(trades), instrument)
+    if any(symbol is None for symbol in symbols):
+        raise ValueError('Trades need an instrument column or an instrument.')
+    units = np.abs(trades['units'].to_numpy(dtype=np.float64)) if 'units' in trades.columns else 1.
+    currencies = np.array([symbol.split('_')[-1] for symbol in symbols])
+    exit_times = trades['exit_time'].to_numpy(dtype='datetime64[ns]')
+    conversion = np.full(len(trades), np.nan)
+    for currency in np.unique(currencies):
+        is_currency = currencies == currency
+        conversion[is_currency] = rates.get(currency, exit_times[is_currency])
+    trades['account_pnl'] = trades['pnl'].to_numpy(dtype=np.float64) * units * conversion
+
+    return trades
+
+
+def get_equity_curve(trades: pd.DataFrame,
+                     balance: float = 0.,
+                     by: By = None,
+                     pnl_column: str = 'account_pnl') -> pd.DataFrame:
+    """ Equity after each filled trade closes, per group of by, with the drawdown from the highest equity before it.
+
+        drawdown_pct is of that peak, so only means something with a balance.
+    """
+    keys = _get_keys(by)
+    filled = _get_filled(trades).sort_values(keys + ['exit_time'], kind='stable')
+    curve = filled[keys].reset_index(drop=True)
+    curve['time'] = filled['exit_time'].to_numpy()
+    curve['pnl'] = filled[pnl_column].to_numpy(dtype=np.float64)
+    if keys:
+        grouped = curve.groupby(keys, sort=False)
+        curve['equity'] = balance + grouped['pnl'].cumsum()
+        curve['peak'] = np.maximum(curve.groupby(keys, sort=False)['equity'].cummax(), balance)
+    else:
+        curve['equity'] = balance + np.cumsum(curve['pnl'].to_numpy())
+        curve['peak'] = np.maximum(np.maximum.accumulate(curve['equity'].to_numpy()), balance)
+    curve['drawdown'] = curve['peak'] - curve['equity']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        curve['drawdown_pct'] = curve['drawdown'] / curve['peak']
+
+    return curve
+
+
+def get_exposure(trades: pd.DataFrame, by: By = None) -> Union[pd.Series, float]:
+    """ Fraction of the time from the first entry to the last exit with at least one trade open, per group of by.
+
+        A float without by.
+    """
+    keys = _get_keys(by)
+    filled = _get_filled(trades)
+    events = pd.concat([
+        filled[keys].assign(time=filled['entry_time'].to_numpy(), change=1),
+        filled[keys].assign(time=filled['exit_time'].to_numpy(), change=-1),
+    ], ignore_index=True)
+
+    # Exits sort before entries at the same time, so back to back trades don't count as overlapping.
+    events = events.sort_values(keys + ['time', 'change'], kind='stable').reset_index(drop=True)
+    if not keys:
+        events['_all'] = 0
+    group = events.groupby(keys or ['_all'], sort=False)
+    is_open = group['change'].cumsum() > 0
+    duration = (group['time'].shift(-1) - events['time']).where(is_open, pd.Timedelta(0)).fillna(pd.Timedelta(0))
+    exposure = duration.groupby([events[key] for key in keys or ['_all']]).sum() \
+        / (group['time'].max() - group['time'].min())
+
+    if keys:
+        return exposure.rename('exposure')
+
+    return float(exposure.iloc[0]) if len(exposure) else np.nan
+
+
+def summarise(trades: pd.DataFrame, by: By = None, balance: float = 0., pnl_column: str = 'account_pnl'):
+    """ Headline metrics of the filled trades, a row per group of by, e.g. 'instrument', 'sub_strategy' or the 'run'
+        of a parameter sweep. A dict without by.
+
+        Everything is worked out for all groups at once, so it's quick for the millions of trades of a sweep.
+    """
+    keys = _get_keys(by)
+    filled = _get_filled(trades)
+    if not keys and not len(filled):
+        return {'trades': 0, 'wins': 0, **{name: np.nan for name in SUMMARY_COLUMNS[2:]}}
+    pnl = filled[pnl_column].to_numpy(dtype=np.float64)
+    frame = pd.DataFrame({
+        'pnl': pnl,
+        'is_win': pnl > 0,
+        'win': np.where(pnl > 0, pnl, np.nan),
+        'loss': np.where(pnl < 0, pnl, np.nan),
+        'gross_profit': np.where(pnl > 0, pnl, 0.),
+        'gross_loss': np.where(pnl < 0, -pnl, 0.),
+        'r_multiple': filled['r_multiple'].to_numpy(dtype=np.float64) if 'r_multiple' in filled else np.nan,
+        'holding_time': filled['exit_time'].to_numpy() - filled['entry_time'].to_numpy(),
+    })
+    for key in keys:
+        frame[key] = filled[key].to_numpy()
+    if not keys:
+        frame['_all'] = 0
+    group_keys = keys or ['_all']
+    aggregated = frame.groupby(group_keys).agg(
+        trades=('pnl', 'size'),
+        wins=('is_win', 'sum'),
+        total_pnl=('pnl', 'sum'),
+        expectancy=('pnl', 'mean'),
+        expectancy_r=('r_multiple', 'mean'),
+        average_win=('win', 'mean'),
+        average_loss=('loss', 'mean'),
+        gross_profit=('gross_profit', 'sum'),
+        gross_loss=('gross_loss', 'sum'),
+        average_holding_time=('holding_time', 'mean'),
+    )
+    aggregated['win_rate'] = aggregated['wins'] / aggregated['trades']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        aggregated['profit_factor'] = aggregated['gross_profit'] / aggregated['gross_loss']
+    curve = get_equity_curve(filled, balance, keys or None, pnl_column)
+    if keys:
+        aggregated['max_drawdown'] = curve.groupby(keys)['drawdown'].max()
+        aggregated['exposure'] = get_exposure(filled, keys)
+    else:
+        aggregated['max_drawdown'] = curve['drawdown'].max()
+        aggregated['exposure'] = get_exposure(filled)
+    summary = aggregated[SUMMARY_COLUMNS]
+
+    return summary if keys else summary.iloc[0].to_dict()
@@ -0,0 +1,158 @@
+# Python standard.
+import datetime
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Iterable, Iterator, Union
+
+# Third-party.
+import numpy as np
+import pandas as pd
+import pytz
+
+# Local.
+from pagetpalace.src.oanda.instrument import OandaInstrumentData
+from pagetpalace.src.scheduling.candle_close_scheduler import GRANULARITY_SECONDS, next_candle_close
+from pagetpalace.tools.file_operations import read_oanda_data
+
+PRICE_COLUMNS = tuple(header for price in 'ABM' for header in OandaInstrumentData.PRICE_HEADERS[price])
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Indicator arrays kept per history, enough for the indicators of every parameter set in a sweep.
+MAX_CACHED_INDICATORS = 64
+
+# Candles read at a time from a history too long to hold, about a week of S5 candles.
+DEFAULT_CHUNK_SIZE = 100000
+
+
+def get_close_times(granularity: str, open_times: np.ndarray) -> np.ndarray:
+    """ Close time of each candle, candles of a day or longer close on the next daily alignment.
+
+        Weekly candles are aligned on Friday's, as get_complete_candlesticks requests them, and close a week on.
+    """
+    if granularity == 'W':
+        # Six and a half days on is inside the candle's last day, whichever way the clocks changed that week.
+        return get_close_times('D', open_times + np.timedelta64(156, 'h'))
+    step = GRANULARITY_SECONDS[granularity]
+    if step < GRANULARITY_SECONDS['D']:
+        return open_times + np.timedelta64(step, 's')
+    closes = [
+        next_candle_close(granularity, pytz.utc.localize(t), skip_market_closed=False).replace(tzinfo=None)
+        for t in pd.DatetimeIndex(open_times).to_pydatetime()
+    ]
+
+    return np.array(closes, dtype='datetime64[ns]')
+
+
+class CandleArrays:
+    """ A candle history as typed columns, open and close times as UTC datetime64[ns] and prices as float64.
+
+        Histories are loaded once and sliced by index, so a backtest never goes back through DataFrame rows. Indicators
+        computed over the whole history are cached on it, the windows of a walk forward and the parameter sets of a
+        sweep that need the same indicator share one array.
+    """
+
+    def __init__(self, granularity: str, times: np.ndarray, prices: Dict[str, np.ndarray]):
+        self.granularity = granularity
+        self.times = np.asarray(times, dtype='datetime64[ns]')
+        self.prices = {name: np.asarray(values, dtype=np.float64) for name, values in prices.items()}
+        if any(len(values) != len(self.times) for values in self.prices.values()):
+            raise ValueError('Every price column needs one value per candle.')
+        self._close_times = None
+        self._indicators = OrderedDict()
+        self._indicators_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return f'CandleArrays(granularity={self.granularity}, candles={len(self)})'
+
+    def __len__(self):
+        return len(self.times)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.prices[name]
+
+    @property
+    def close_times(self) -> np.ndarray:
+        if self._close_times is None:
+            self._close_times = get_close_times(self.granularity, self.times)
+
+        return self._close_times
+
+    def get_or_compute(self, indicator: str, func: Callable[..., np.ndarray], **params: Hashable) -> np.ndarray:
+        """ func(**params) the first time indicator is asked for with params, the cached array after that.
+
+            Returned arrays are shared between callers and are therefore read-only.
+        """
+        key = (indicator, tuple(sorted(params.items())))
+        with self._indicators_lock:
+            if key in self._indicators:
+                self._indicators.move_to_end(key)
+                self.hits += 1
+
+                return self._indicators[key]
+        values = np.asarray(func(**params))
+        values.flags.writeable = False
+        with self._indicators_lock:
+            self.misses += 1
+            self._indicators[key] = values
+            while len(self._indicators) > MAX_CACHED_INDICATORS:
+                self._indicators.popitem(last=False)
+
+        return values
+
+    @classmethod
+    def from_dataframe(cls, granularity: str, df: pd.DataFrame, columns: Iterable[str] = PRICE_COLUMNS):
+        """ df as returned by convert_to_df or read_oanda_data, datetime as a column or the index. """
+        times = df['datetime'] if 'datetime' in df.columns else df.index.to_series()
+        times = pd.to_datetime(times, utc=True).dt.tz_localize(None).to_numpy(dtype='datetime64[ns]')
+        prices = {name: pd.to_numeric(df[name]).to_numpy(dtype=np.float64) for name in columns if name in df.columns}
+
+        return cls(granularity, times, prices)
+
+    @classmethod
+    def from_csv(cls, granularity: str, file_path: str) -> 'CandleArrays':
+        return cls.from_dataframe(granularity, read_oanda_data(file_path))
+
+    def slice(self, start: int, stop: int) -> 'CandleArrays':
+        return CandleArrays(
+            self.granularity,
+            self.times[start:stop],
+            {name: values[start:stop] for name, values in self.prices.items()},
+        )
+
+    def search(self, moment: datetime.datetime) -> int:
+        """ Number of candles closed by moment. """
+        if moment.tzinfo is not None:
+            moment = moment.astimezone(pytz.utc).replace(tzinfo=None)
+
+        return int(np.searchsorted(self.close_times, np.datetime64(moment, 'ns'), side='right'))
+
+    def to_dataframe(self, start: int = 0, stop: int = None) -> pd.DataFrame:
+        """ The candles in the layout convert_to_df returns, as a live strategy would receive them. """
+        stop = len(self) if stop is None else stop
+        df = pd.DataFrame({'datetime': pd.DatetimeIndex(self.times[start:stop]).strftime(DATETIME_FORMAT)})
+        for name, values in self.prices.items():
+            df[name] = values[start:stop]
+
+        return df
+
+
+def iter_candle_chunks(source: Union[str, CandleArrays, Iterable[CandleArrays]],
+                       granularity: str = 'S5',
+                       chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[CandleArrays]:
+    """ source as consecutive CandleArrays in time order, so a history never has to be held at once.
+
+        source is the path of a CSV in the layout read_oanda_data reads, read chunk_size rows at a time, a
+        CandleArrays, sliced into chunks of chunk_size, or CandleArrays chunks already, which are passed through.
+    """
+    if chunk_size <= 0:
+        raise ValueError('chunk_size must be positive.')
+    if isinstance(source, str):
+        for df in pd.read_csv(source, sep=',', engine='c', chunksize=chunk_size):
+            yield CandleArrays.from_dataframe(granularity, df)
+    elif isinstance(source, CandleArrays):
+        for start in range(0, len(source), chunk_size):
+            yield source.slice(start, start + chunk_size)
+    else:
+        yield from source
@@ -0,0 +1,252 @@
+# Python standard.
+from typing import Callable
+
+# Third-party.
+import numpy as np
+import pandas as pd
+
+# Local.
+from pagetpalace.src.backtesting.candles import CandleArrays
+
+# Bars looked at per pass for the orders that haven't resolved yet, bounds the size of the bar matrices.
+DEFAULT_BLOCK_SIZE = 256
+
+
+def scan_bars(start: np.ndarray, limit: np.ndarray, is_hit: Callable, block_size: int) -> np.ndarray:
+    """ First bar in [start, limit) of each row where is_hit(rows, bars) is True, -1 if there's none.
+
+        All unresolved rows are checked block_size bars at a time, so the Python loop runs once per block.
+    """
+    first = np.full(len(start), -1)
+    pending = np.flatnonzero(start < limit)
+    offset = 0
+    while pending.size:
+        bars = start[pending, None] + offset + np.arange(block_size)
+        in_range = bars < limit[pending, None]
+        hits = is_hit(pending, np.minimum(bars, limit[pending, None] - 1)) & in_range
+        found = hits.any(axis=1)
+        first[pending[found]] = bars[found, hits[found].argmax(axis=1)]
+        offset += block_size
+        pending = pending[~found & (start[pending] + offset < limit[pending])]
+
+    return first
+
+
+def _get_sub_bar_ranges(candles: CandleArrays, sub_candles: CandleArrays):
+    """ [start, stop) of the sub bars within each candle, empty where the sub bars have a gap. """
+    return (
+        np.searchsorted(sub_candles.times, candles.times, side='left'),
+        np.searchsorted(sub_candles.times, candles.close_times, side='left'),
+    )
+
+
+def _get_trigger_test(candles: CandleArrays, is_long: np.ndarray, entry: np.ndarray) -> Callable:
+    def is_triggered(rows, bars):
+        return np.where(
+            is_long[rows, None],
+            candles['askHigh'][bars] >= entry[rows, None],
+            candles['bidLow'][bars] <= entry[rows, None],
+        )
+
+    return is_triggered
+
+
+def _get_exit_tests(candles: CandleArrays, is_long: np.ndarray, stop_loss: np.ndarray, take_profit: np.ndarray):
+    def is_stopped(rows, bars):
+        return np.where(
+            is_long[rows, None],
+            candles['bidLow'][bars] <= stop_loss[rows, None],
+            candles['askHigh'][bars] >= stop_loss[rows, None],
+        )
+
+    def is_taken(rows, bars):
+        return np.where(
+            is_long[rows, None],
+            candles['bidHigh'][bars] >= take_profit[rows, None],
+            candles['askLow'][bars] <= take_profit[rows, None],
+        )
+
+    return is_stopped, is_taken
+
+
+def _find_entries(orders: pd.DataFrame, candles: CandleArrays, block_size: int, sub_candles: CandleArrays = None):
+    """ Bar, sub bar and price of each fill and whether priceBound cancelled it.
+
+        Market orders fill at the next open. Stop orders fill when touched within valid_bars bars, NaN valid_bars are
+        good till cancelled. With sub candles the sub bar a stop triggered in is found too, -1 when there isn't one,
+        and a gap is only assumed at that sub bar's open.
+    """
+    n = len(candles)
+    is_long = orders['direction'].to_numpy() == 1
+    is_market = orders['order_type'].to_numpy() == 'MARKET'
+    entry = orders['entry'].to_numpy(dtype=np.float64)
+    price_bound = orders['price_bound'].to_numpy(dtype=np.float64)
+    valid_bars = np.nan_to_num(orders['valid_bars'].to_numpy(dtype=np.float64), nan=n, posinf=n).astype(np.int64)
+    start = orders['signal_bar'].to_numpy() + 1
+    limit = np.minimum(start + valid_bars, n)
+    is_triggered = _get_trigger_test(candles, is_long, entry)
+
+    bar = np.where(is_market, np.where(start < n, start, -1), scan_bars(start, limit, is_triggered, block_size))
+    filled = bar >= 0
+    safe_bar = np.where(filled, bar, 0)
+    ask_open = candles['askOpen'][safe_bar]
+    bid_open = candles['bidOpen'][safe_bar]
+    sub_bar = np.full(len(bar), -1)
+    if sub_candles is not None:
+        sub_start, sub_stop = _get_sub_bar_ranges(candles, sub_candles)
+        is_stop = filled & ~is_market
+        sub_bar = scan_bars(
+            np.where(is_stop, sub_start[safe_bar], 0),
+            np.where(is_stop, sub_stop[safe_bar], 0),
+            _get_trigger_test(sub_candles, is_long, entry),
+            block_size,
+        )
+        has_sub_bars = filled & is_market & (sub_start[safe_bar] < sub_stop[safe_bar])
+        sub_bar = np.where(has_sub_bars, sub_start[safe_bar], sub_bar)
+        safe_sub_bar = np.maximum(sub_bar, 0)
+        ask_open = np.where(sub_bar >= 0, sub_candles['askOpen'][safe_sub_bar], ask_open)
+        bid_open = np.where(sub_bar >= 0, sub_candles['bidOpen'][safe_sub_bar], bid_open)
+    market_price = np.where(is_long, ask_open, bid_open)
+
+    # A stop that gaps through its entry fills at the open, unless that's beyond its priceBound.
+    stop_price = np.where(is_long, np.maximum(entry, ask_open), np.minimum(entry, bid_open))
+    price = np.where(is_market, market_price, stop_price)
+    is_out_of_bounds = filled & ~is_market & np.where(is_long, price > price_bound, price < price_bound)
+
+    return bar, sub_bar, np.where(filled, price, np.nan), is_out_of_bounds
+
+
+def _find_exits(orders: pd.DataFrame,
+                entry_bar: np.ndarray,
+                entry_sub_bar: np.ndarray,
+                candles: CandleArrays,
+                block_size: int,
+                sub_candles: CandleArrays = None):
+    """ Bar, sub bar, price and reason each filled trade closed, longs close on the bid and shorts on the ask.
+
+        If a bar reaches both the stop loss and the take profit the stop loss is assumed to have been hit first. With
+        sub candles the first sub bar to reach either decides instead, and levels reached in the entry bar before the
+        fill are ignored. Bars with no sub bars fall back to the candle.
+    """
+    n = len(candles)
+    is_long = orders['direction'].to_numpy() == 1
+    is_market = orders['order_type'].to_numpy() == 'MARKET'
+    stop_loss = orders['stop_loss'].to_numpy(dtype=np.float64)
+    take_profit = orders['take_profit'].to_numpy(dtype=np.float64)
+    start = np.where(entry_bar >= 0, entry_bar, n)
+    limit = np.full(len(start), n)
+    is_stopped, is_taken = _get_exit_tests(candles, is_long, stop_loss, take_profit)
+
+    def is_closed(rows, bars):
+        return is_stopped(rows, bars) | is_taken(rows, bars)
+
+    bar = scan_bars(start, limit, is_closed, block_size)
+    sub_bar = np.full(len(bar), -1)
+    if sub_candles is not None:
+        sub_start, sub_stop = _get_sub_bar_ranges(candles, sub_candles)
+        is_sub_stopped, is_sub_taken = _get_exit_tests(sub_candles, is_long, stop_loss, take_profit)
+        pending = bar >= 0
+        while pending.any():
+            safe_bar = np.where(pending, bar, 0)
+            is_entry_bar = pending & (bar == entry_bar) & (entry_sub_bar >= 0)
+            found = scan_bars(
+                np.where(pending, np.where(is_entry_bar, entry_sub_bar, sub_start[safe_bar]), 0),
+                np.where(pending, sub_stop[safe_bar], 0),
+                lambda rows, bars: is_sub_stopped(rows, bars) | is_sub_taken(rows, bars),
+                block_size,
+            )
+            sub_bar = np.where(found >= 0, found, sub_bar)
+
+            # Only reached before the fill, carry on from the next bar.
+            pending = is_entry_bar & (found < 0)
+            rescanned = scan_bars(np.where(pending, entry_bar + 1, n), limit, is_closed, block_size)
+            bar = np.where(pending, rescanned, bar)
+            pending &= bar >= 0
+
+    closed = bar >= 0
+    safe_bar = np.where(closed, bar, n - 1)
+    rows = np.arange(len(start))
+    hit_stop = is_stopped(rows, safe_bar[:, None])[:, 0]
+    close_open = np.where(is_long, candles['bidOpen'][safe_bar], candles['askOpen'][safe_bar])
+
+    # Past the bar a stop order filled in, the trade was open at the bar's open so can gap through either level.
+    can_gap = is_market | (safe_bar > entry_bar)
+    if sub_candles is not None:
+        has_sub_bar = sub_bar >= 0
+        safe_sub_bar = np.maximum(sub_bar, 0)
+        hit_stop = np.where(has_sub_bar, is_sub_stopped(rows, safe_sub_bar[:, None])[:, 0], hit_stop)
+        sub_open = np.where(is_long, sub_candles['bidOpen'][safe_sub_bar], sub_candles['askOpen'][safe_sub_bar])
+        close_open = np.where(has_sub_bar, sub_open, close_open)
+        can_gap = np.where(has_sub_bar, is_market | (sub_bar > entry_sub_bar), can_gap)
+    sl_price = np.where(
+        can_gap,
+        np.where(is_long, np.minimum(stop_loss, close_open), np.maximum(stop_loss, close_open)),
+        stop_loss,
+    )
+    tp_price = np.where(
+        can_gap,
+        np.where(is_long, np.maximum(take_profit, close_open), np.minimum(take_profit, close_open)),
+        take_profit,
+    )
+    last_close = np.where(is_long, candles['bidClose'][n - 1], candles['askClose'][n - 1])
+    price = np.where(closed, np.where(hit_stop, sl_price, tp_price), last_close)
+    reason = np.where(closed, np.where(hit_stop, 'STOP_LOSS_ORDER', 'TAKE_PROFIT_ORDER'), 'END_OF_DATA')
+
+    return safe_bar, sub_bar, price, reason
+
+
+def _get_times(candles: CandleArrays, bar: np.ndarray, sub_candles: CandleArrays, sub_bar: np.ndarray) -> np.ndarray:
+    times = candles.times[np.maximum(bar, 0)]
+    if sub_candles is None:
+        return times
+
+    return np.where(sub_bar >= 0, sub_candles.times[np.maximum(sub_bar, 0)], times)
+
+
+def simulate_orders(orders: pd.DataFrame,
+                    candles: CandleArrays,
+                    block_size: int = DEFAULT_BLOCK_SIZE,
+                    sub_candles: CandleArrays = None) -> pd.DataFrame:
+    """ Fill orders against the bid/ask candles of the time frame they were placed on.
+
+        sub_candles, e.g. S5 candles over the same period, place stop triggers and exits within a candle. Returns
+        orders with a status, FILLED, EXPIRED or CANCELLED when the fill would have been beyond priceBound, and for
+        filled orders the bars and prices of the entry and exit, their times from the sub candles where there are
+        any, the exit reason, pnl per unit in price terms and pnl as a multiple of the initial risk.
+    """
+    trades = orders.reset_index(drop=True).copy()
+    entry_bar, entry_sub_bar, entry_price, is_out_of_bounds = _find_entries(trades, candles, block_size, sub_candles)
+    entry_bar = np.where(is_out_of_bounds, -1, entry_bar)
+    exit_bar, exit_sub_bar, exit_price, exit_reason = _find_exits(
+        trades,
+        entry_bar,
+        entry_sub_bar,
+        candles,
+        block_size,
+        sub_candles,
+    )
+    filled = entry_bar >= 0
+    direction = trades['direction'].to_numpy()
+    pnl = direction * (exit_price - entry_price)
+    risk = np.abs(entry_price - trades['stop_loss'].to_numpy(dtype=np.float64))
+    trades['status'] = np.where(filled, 'FILLED', np.where(is_out_of_bounds, 'CANCELLED', 'EXPIRED'))
+    trades['entry_bar'] = entry_bar
+    trades['entry_time'] = np.where(
+        filled,
+        _get_times(candles, entry_bar, sub_candles, entry_sub_bar),
+        np.datetime64('NaT'),
+    )
+    trades['entry_price'] = np.where(filled, entry_price, np.nan)
+    trades['exit_bar'] = np.where(filled, exit_bar, -1)
+    trades['exit_time'] = np.where(
+        filled,
+        _get_times(candles, exit_bar, sub_candles, exit_sub_bar),
+        np.datetime64('NaT'),
+    )
+    trades['exit_price'] = np.where(filled, exit_price, np.nan)
+    trades['exit_reason'] = np.where(filled, exit_reason, None)
+    trades['pnl'] = np.where(filled, pnl, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        trades['r_multiple'] = np.where(filled, pnl / risk, np.nan)
+
+    return trades
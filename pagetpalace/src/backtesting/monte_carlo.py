@@ -0,0 +1,217 @@
+# Python standard.
+import heapq
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Sequence
+
+# Third-party.
+import numpy as np
+import pandas as pd
+
+# Local.
+from pagetpalace.src.currency_calculations.risk_manager import RiskManager
+from pagetpalace.src.currency_calculations.unit_conversions import MINIMUM_MARGIN, UNRESTRICTED_MARGIN_CAP
+from pagetpalace.src.oanda.instruments.instruments import Instrument
+
+RESAMPLING_METHODS = ('bootstrap', 'shuffle')
+PATH_COLUMNS = ['final_return', 'max_drawdown_pct', 'lowest_equity', 'is_ruined']
+
+
+def _get_available_margin(base_margin: float, available: float, minimum: float) -> float:
+    """ UnitConversions._adjust_according_to_restricted_margin with margins as fractions of the balance. """
+    if base_margin <= available:
+        return base_margin
+
+    return available if available >= minimum and available > 0 else 0.
+
+
+def get_risk_fractions(trades: pd.DataFrame,
+                       instrument: Instrument,
+                       equity_split: float,
+                       max_risk_pct: float = 0.05,
+                       balance: float = None,
+                       include_open_margin: bool = True) -> np.ndarray:
+    """ Fraction of the balance each trade risks when sized as Strategy sizes live trades.
+
+        The margin is the balance's unrestricted share divided by equity_split, levered into units, so the loss at the
+        stop loss is a fixed fraction of the balance, capped at the RiskManager's max risk for the instrument.
+
+        With include_open_margin, trades are taken in order of entry_time and the margin held by trades that haven't
+        reached their exit_time comes off the margin available, as it does in the account. A trade that wants more
+        than the unrestricted margin left gets what's left, or nothing when that's under MINIMUM_MARGIN of the account
+        currency. That minimum needs balance, it's not applied without one. Trades exiting at a trade's entry time
+        have freed their margin. Margins are fractions of the balance at entry, changes in the balance while trades
+        overlap aren't followed. Without include_open_margin every trade is sized as if no other trade were open.
+    """
+    max_risk_pct = RiskManager(instrument, max_risk_pct).max_risk_pct
+    entry = trades['entry_price'].to_numpy(dtype=np.float64)
+    stop_loss = trades['stop_loss'].to_numpy(dtype=np.float64)
+    base_margin = UNRESTRICTED_MARGIN_CAP / equity_split
+    risk_per_margin = instrument.leverage * np.abs(entry - stop_loss) / entry
+    if not include_open_margin:
+        return np.minimum(base_margin * risk_per_margin, max_risk_pct)
+
+    entry_times = trades['entry_time'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    exit_times = trades['exit_time'].to_numpy(dtype='datetime64[ns]').view(np.int64).copy()
+    exit_times[exit_times == np.iinfo(np.int64).min] = np.iinfo(np.int64).max
+    minimum = MINIMUM_MARGIN / balance if balance else 0.
+    risk = np.zeros(len(trades))
+    open_trades = []
+    held = 0.
+    for i in np.argsort(entry_times, kind='stable'):
+        while open_trades and open_trades[0][0] <= entry_times[i]:
+            held -= heapq.heappop(open_trades)[1]
+        margin = _get_available_margin(base_margin, UNRESTRICTED_MARGIN_CAP - held, minimum)
+        risk[i] = margin * risk_per_margin[i]
+        if risk[i] > max_risk_pct:
+            margin *= max_risk_pct / risk[i]
+            risk[i] = max_risk_pct
+        if margin > 0:
+            heapq.heappush(open_trades, (exit_times[i], margin))
+            held += margin
+
+    return risk
+
+
+def simulate_paths(returns: np.ndarray,
+                   seed: np.random.SeedSequence,
+                   paths: int,
+                   trades_per_path: int,
+                   method: str = 'bootstrap',
+                   ruin_level: float = 0.5) -> Dict[str, np.ndarray]:
+    """ Equity paths of returns resampled with a generator seeded from seed, summarised per path.
+
+        returns are each trade's change in the balance as a fraction of it, and compound. bootstrap draws
+        trades_per_path of them with replacement, shuffle reorders the first trades_per_path of them. A path is
+        ruined once its equity falls to ruin_level of the starting balance or below.
+    """
+    rng = np.random.default_rng(seed)
+    if method == 'bootstrap':
+        sampled = returns[rng.integers(0, len(returns), (paths, trades_per_path))]
+    elif method == 'shuffle':
+        sampled = rng.permuted(np.tile(returns[:trades_per_path], (paths, 1)), axis=1)
+    else:
+        raise ValueError(f'method must be one of {RESAMPLING_METHODS}, not {method}.')
+    equity = np.cumprod(np.maximum(1. + sampled, 0.), axis=1)
+    peak = np.maximum(np.maximum.accumulate(equity, axis=1), 1.)
+    lowest = np.minimum(equity.min(axis=1), 1.)
+
+    return {
+        'final_return': equity[:, -1] - 1.,
+        'max_drawdown_pct': (1. - equity / peak).max(axis=1),
+        'lowest_equity': lowest,
+        'is_ruined': lowest <= ruin_level,
+    }
+
+
+# Set in each worker process by _init_worker.
+_worker = {}
+
+
+def _init_worker(returns: np.ndarray):
+    _worker['returns'] = returns
+
+
+def _simulate_in_worker(seed: np.random.SeedSequence, paths: int, trades_per_path: int, method: str, ruin_level: float):
+    return simulate_paths(_worker['returns'], seed, paths, trades_per_path, method, ruin_level)
+
+
+class MonteCarlo:
+    """ Resamples a backtest's trade returns into many equity paths, to get distributions of drawdown and ruin.
+
+        returns are each trade's change in the balance as a fraction of it, see from_trades to size them the way
+        Strategy sizes live trades. Paths are simulated in batches of batch_size as arrays, across a process pool.
+        Each batch's generator is spawned from seed in order, so results are the same for the same seed whatever the
+        number of workers. max_workers=0 runs the batches in this process.
+    """
+
+    def __init__(self,
+                 returns: Sequence[float],
+                 paths: int = 10000,
+                 trades_per_path: int = None,
+                 method: str = 'bootstrap',
+                 ruin_level: float = 0.5,
+                 seed: int = None,
+                 batch_size: int = 1000,
+                 max_workers: int = None):
+        returns = np.asarray(returns, dtype=np.float64)
+        returns = returns[~np.isnan(returns)]
+        if not len(returns):
+            raise ValueError('There are no returns to resample.')
+        if method not in RESAMPLING_METHODS:
+            raise ValueError(f'method must be one of {RESAMPLING_METHODS}, not {method}.')
+        trades_per_path = len(returns) if trades_per_path is None else trades_per_path
+        if method == 'shuffle' and trades_per_path > len(returns):
+            raise ValueError('A shuffle can\'t have more trades per path than there are returns.')
+        if paths <= 0 or trades_per_path <= 0 or batch_size <= 0:
+            raise ValueError('paths, trades_per_path and batch_size must be positive.')
+        if max_workers is not None and max_workers < 0:
+            raise ValueError('max_workers must not be negative.')
+        self.returns = returns
+        self.paths = paths
+        self.trades_per_path = trades_per_path
+        self.method = method
+        self.ruin_level = ruin_level
+        self.seed_sequence = np.random.SeedSequence(seed)
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+
+    def __repr__(self):
+        return (
+            f'MonteCarlo(trades={len(self.returns)}, paths={self.paths}, trades_per_path={self.trades_per_path}, '
+            f'method={self.method}, seed={self.seed_sequence.entropy})'
+        )
+
+    @classmethod
+    def from_trades(cls,
+                    trades: pd.DataFrame,
+                    instrument: Instrument,
+                    equity_split: float,
+                    max_risk_pct: float = 0.05,
+                    balance: float = None,
+                    include_open_margin: bool = True,
+                    **kwargs) -> 'MonteCarlo':
+        """ The filled trades of a backtest, each returning its r multiple of the balance it risks.
+
+            See get_risk_fractions for balance and include_open_margin.
+        """
+        filled = trades[trades['status'] == 'FILLED'] if 'status' in trades.columns else trades
+        risk = get_risk_fractions(filled, instrument, equity_split, max_risk_pct, balance, include_open_margin)
+
+        return cls(filled['r_multiple'].to_numpy(dtype=np.float64) * risk, **kwargs)
+
+    def _get_batches(self):
+        sizes = [min(self.batch_size, self.paths - start) for start in range(0, self.paths, self.batch_size)]
+
+        return list(zip(self.seed_sequence.spawn(len(sizes)), sizes))
+
+    def run(self) -> pd.DataFrame:
+        """ A row per path with its final return, max drawdown from peak, lowest equity and whether it was ruined.
+
+            Equity is a fraction of the starting balance.
+        """
+        batches = self._get_batches()
+        args = (self.trades_per_path, self.method, self.ruin_level)
+        if self.max_workers == 0:
+            results = [simulate_paths(self.returns, seed, size, *args) for seed, size in batches]
+        else:
+            with ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    initializer=_init_worker,
+                    initargs=(self.returns,),
+            ) as executor:
+                futures = [executor.submit(_simulate_in_worker, seed, size, *args) for seed, size in batches]
+                results = [future.result() for future in futures]
+
+        return pd.DataFrame({
+            column: np.concatenate([result[column] for result in results]) for column in PATH_COLUMNS
+        })
+
+    @staticmethod
+    def summarise(results: pd.DataFrame, percentiles: Sequence[float] = (5, 50, 95)) -> dict:
+        """ Risk of ruin and percentiles of the final return and max drawdown over the paths. """
+        summary = {'paths': len(results), 'risk_of_ruin': float(results['is_ruined'].mean())}
+        for column in ('final_return', 'max_drawdown_pct'):
+            for percentile, value in zip(percentiles, np.percentile(results[column], percentiles)):
+                summary[f'{column}_p{percentile:g}'] = float(value)
+
+        return summary
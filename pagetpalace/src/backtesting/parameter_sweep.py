@@ -0,0 +1,230 @@
+# Python standard.
+import csv
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple, Type
+
+# Third-party.
+import numpy as np
+import pandas as pd
+
+# Local.
+from pagetpalace.src.backtesting.candles import CandleArrays
+from pagetpalace.src.backtesting.shared_candles import SharedCandles, attach_candles
+from pagetpalace.src.backtesting.vectorized_backtester import VectorizedBacktester
+from pagetpalace.src.oanda.account import OandaAccount
+from pagetpalace.src.oanda.strategies.strategy import Strategy
+from pagetpalace.tools.logger import *
+
+METRIC_COLUMNS = ['trades', 'wins', 'win_rate', 'total_r', 'expectancy_r', 'max_drawdown_r', 'total_pnl']
+
+
+class Uniform:
+    """ A continuous range for a parameter in a random sample, lists are a set of choices in grids and samples. """
+
+    def __init__(self, low: float, high: float):
+        if low > high:
+            raise ValueError('low must not be above high.')
+        self.low = low
+        self.high = high
+
+    def __repr__(self):
+        return f'Uniform(low={self.low}, high={self.high})'
+
+    def sample(self, rng: np.random.Generator) -> float:
+        return float(rng.uniform(self.low, self.high))
+
+
+def _get_swept_leaves(space: dict, path: Tuple = ()) -> List[Tuple[Tuple, object]]:
+    """ Path and value of every list or Uniform in the nested dicts of space. """
+    leaves = []
+    for key, value in space.items():
+        if isinstance(value, dict):
+            leaves.extend(_get_swept_leaves(value, path + (key,)))
+        elif isinstance(value, (list, Uniform)):
+            leaves.append((path + (key,), value))
+
+    return leaves
+
+
+def _set_leaves(space: dict, values: Dict[Tuple, object], path: Tuple = ()) -> dict:
+    return {
+        key: _set_leaves(value, values, path + (key,)) if isinstance(value, dict) else values.get(path + (key,), value)
+        for key, value in space.items()
+    }
+
+
+def get_parameter_name(path: Tuple) -> str:
+    return '.'.join(str(key) for key in path)
+
+
+def expand_grid(space: dict) -> Iterator[dict]:
+    """ Every combination of the lists in space, e.g. {'trade_multipliers': {'1': {'long': {'tp': [2, 3]}}}}.
+
+        Anything else, including dicts with no lists in them, is passed through unchanged.
+    """
+    leaves = _get_swept_leaves(space)
+    if any(isinstance(value, Uniform) for _, value in leaves):
+        raise ValueError('A grid can only sweep lists, sample Uniform ranges with sample_space.')
+    paths = [path for path, _ in leaves]
+    for combination in itertools.product(*(values for _, values in leaves)):
+        yield _set_leaves(space, dict(zip(paths, combination)))
+
+
+def sample_space(space: dict, count: int, seed: int = None) -> Iterator[dict]:
+    """ count random picks, each list is a uniform choice and each Uniform a uniform draw. """
+    rng = np.random.default_rng(seed)
+    leaves = _get_swept_leaves(space)
+    for _ in range(count):
+        values = {
+            path: value.sample(rng) if isinstance(value, Uniform) else value[rng.integers(len(value))]
+            for path, value in leaves
+        }
+        yield _set_leaves(space, values)
+
+
+def summarise_trades(trades: pd.DataFrame) -> dict:
+    """ Headline numbers of a backtest, in multiples of the initial risk so instruments compare. """
+    filled = trades[trades['status'] == 'FILLED'].sort_values('exit_time', kind='stable')
+    r = filled['r_multiple'].to_numpy(dtype=np.float64)
+    equity = np.concatenate(([0.], np.cumsum(r)))
+    wins = int((r > 0).sum())
+
+    return {
+        'trades': len(r),
+        'wins': wins,
+        'win_rate': wins / len(r) if len(r) else np.nan,
+        'total_r': float(r.sum()),
+        'expectancy_r': float(r.mean()) if len(r) else np.nan,
+        'max_drawdown_r': float((np.maximum.accumulate(equity) - equity).max()),
+        'total_pnl': float(filled['pnl'].sum()),
+    }
+
+
+# Set in each worker process by _init_worker.
+_worker = {}
+
+
+def _init_worker(spec: dict, strategy_class: Type[Strategy]):
+    candles, blocks = attach_candles(spec)
+    _worker.update(candles=candles, blocks=blocks, strategy_class=strategy_class)
+
+
+def build_strategy(strategy_class: Type[Strategy], parameters: dict) -> Strategy:
+    """ strategy_class with an account that is never connected, backtests only need its rules. """
+    return strategy_class(account=OandaAccount('', 'backtest', 'DEMO_API'), **parameters)
+
+
+def get_trades(strategy_class: Type[Strategy], candles: Dict[str, CandleArrays], parameters: dict) -> pd.DataFrame:
+    return VectorizedBacktester(build_strategy(strategy_class, parameters), candles).run()
+
+
+def get_summary(strategy_class: Type[Strategy], candles: Dict[str, CandleArrays], parameters: dict) -> dict:
+    return summarise_trades(get_trades(strategy_class, candles, parameters))
+
+
+def _run_in_worker(task: Callable, parameters: dict):
+    return task(_worker['strategy_class'], _worker['candles'], parameters)
+
+
+class ParameterSweep:
+    """ Backtests a strategy once per set of parameters from a grid or random sample, across a process pool.
+
+        space holds the strategy's keyword arguments other than account, with lists or Uniform ranges for the values
+        to sweep, see expand_grid and sample_space. The candles are put in shared memory once and attached by every
+        worker. max_workers=0 runs the backtests in this process.
+    """
+
+    def __init__(self,
+                 strategy_class: Type[Strategy],
+                 candles: Dict[str, CandleArrays],
+                 space: dict,
+                 max_workers: int = None):
+        if max_workers is not None and max_workers < 0:
+            raise ValueError('max_workers must not be negative.')
+        self.strategy_class = strategy_class
+        self.candles = candles
+        self.space = space
+        self.max_workers = max_workers
+        self.parameter_names = [get_parameter_name(path) for path, _ in _get_swept_leaves(space)]
+
+    def __repr__(self):
+        return f'ParameterSweep(strategy={self.strategy_class.__name__}, parameters={self.parameter_names})'
+
+    @property
+    def columns(self) -> List[str]:
+        return ['run'] + self.parameter_names + METRIC_COLUMNS + ['error']
+
+    def get_row(self, run: int, parameters: dict, metrics: dict = None, error: str = None) -> dict:
+        """ The swept parameters under their dotted names followed by metrics, which are missing for failed runs. """
+        row = {'run': run}
+        for path, _ in _get_swept_leaves(self.space):
+            value = parameters
+            for key in path:
+                value = value[key]
+            row[get_parameter_name(path)] = value
+        row.update(metrics or {name: np.nan for name in METRIC_COLUMNS})
+        row['error'] = error
+
+        return row
+
+    def iter_runs(self, parameter_sets: Iterable[dict], task: Callable = get_summary) -> Iterator[Tuple]:
+        """ Yield (run, parameters, result, error) per set of parameters as each finishes, in completion order.
+
+            task is called with the strategy class, the candles and the parameters, it must be a module level
+            function so it can be sent to the workers.
+        """
+        parameter_sets = list(parameter_sets)
+        if self.max_workers == 0:
+            for run, parameters in enumerate(parameter_sets):
+                try:
+                    result = task(self.strategy_class, self.candles, parameters)
+                except Exception as exc:
+                    logger.error(f'Run {run} failed with {parameters}. {exc}', exc_info=True)
+                    yield run, parameters, None, str(exc)
+                else:
+                    yield run, parameters, result, None
+            return
+        with SharedCandles(self.candles) as shared, ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(shared.spec, self.strategy_class),
+        ) as executor:
+            future_to_run = {
+                executor.submit(_run_in_worker, task, parameters): run for run, parameters in enumerate(parameter_sets)
+            }
+            for future in as_completed(future_to_run):
+                run = future_to_run[future]
+                try:
+                    result = future.result()
+                except Exception as exc:
+                    logger.error(f'Run {run} failed with {parameter_sets[run]}. {exc}')
+                    yield run, parameter_sets[run], None, str(exc)
+                else:
+                    yield run, parameter_sets[run], result, None
+
+    def iter_results(self, parameter_sets: Iterable[dict]) -> Iterator[dict]:
+        """ Yield a results row per set of parameters as each backtest finishes, in completion order. """
+        for run, parameters, metrics, error in self.iter_runs(parameter_sets):
+            yield self.get_row(run, parameters, metrics, error)
+
+    def run(self, parameter_sets: Iterable[dict] = None, results_path: str = None) -> pd.DataFrame:
+        """ Backtest every set of parameters, the full grid of space by default, returns a row per run.
+
+            With results_path each row is appended to a CSV as it finishes, so a long sweep can be watched or
+            recovered part way through.
+        """
+        parameter_sets = expand_grid(self.space) if parameter_sets is None else parameter_sets
+        if results_path is None:
+            rows = list(self.iter_results(parameter_sets))
+        else:
+            rows = []
+            with open(results_path, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=self.columns)
+                writer.writeheader()
+                for row in self.iter_results(parameter_sets):
+                    rows.append(row)
+                    writer.writerow(row)
+                    f.flush()
+
+        return pd.DataFrame(rows, columns=self.columns).sort_values('run').reset_index(drop=True)
@@ -0,0 +1,516 @@
+# Python standard.
+import datetime
+import functools
+import heapq
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+# Third-party.
+import numpy as np
+import pandas as pd
+import pytz
+
+# Local.
+from pagetpalace.src.backtesting.candles import DEFAULT_CHUNK_SIZE, CandleArrays, iter_candle_chunks
+from pagetpalace.src.currency_calculations.exchange_rates import ExchangeRateService, set_exchange_rates
+from pagetpalace.src.oanda.account_snapshot import AccountSnapshot
+from pagetpalace.src.oanda.candle_availability import CandleAvailabilityDetector
+from pagetpalace.src.oanda.instrument import OandaInstrumentData
+from pagetpalace.src.oanda.market_data import SharedCandleData
+from pagetpalace.src.oanda.paper_account import (
+    DATA_POINTS,
+    PRICE_COMPONENTS,
+    PaperAccount,
+    PaperPricing,
+    PaperTradeMonitor,
+    Quote,
+    split_price_header,
+)
+from pagetpalace.src.oanda.strategies.strategy import Strategy
+from pagetpalace.src.scheduling.candle_close_scheduler import GRANULARITY_SECONDS, CandleCloseScheduler, is_market_open
+from pagetpalace.src.scheduling.clock import SimulatedClock, SimulationFinished, set_clock
+from pagetpalace.tools.logger import *
+
+# Prices replayed per candle of an instrument's finest time frame: open, the two extremes and close.
+TICKS_PER_CANDLE = 4
+# Quotes searched ahead for the next that could fill something, a few hours of S5 candles.
+FILL_LOOKAHEAD = 8192
+
+History = Dict[str, Dict[str, CandleArrays]]
+TickSource = Union[str, CandleArrays, Iterable[CandleArrays]]
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=pytz.utc)
+MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+# Converted once per quote replayed, so done with integer microseconds rather than through pandas.
+def _to_datetime64(moment: datetime.datetime) -> np.datetime64:
+    return np.datetime64((moment - EPOCH) // MICROSECOND * 1000, 'ns')
+
+
+def _to_datetime(moment: np.datetime64) -> datetime.datetime:
+    return EPOCH + moment.item() // 1000 * MICROSECOND
+
+
+def _get_side(candles: CandleArrays, side: str, data_point: str, rows=slice(None)) -> np.ndarray:
+    """ A side of the candles' rows, the mid for a missing bid or ask and halfway between them for a missing mid. """
+    name = f'{side}{data_point}'
+    if name in candles.prices:
+        return candles[name][rows]
+    if side == 'mid':
+        return (candles[f'bid{data_point}'][rows] + candles[f'ask{data_point}'][rows]) / 2
+
+    return candles[f'mid{data_point}'][rows]
+
+
+class ReplayInstrumentData:
+    """ Serves the candles of a recorded history that are complete at the clock's time, in place of
+        OandaInstrumentData. Prices are floats rather than the strings Oanda returns.
+    """
+
+    def __init__(self, history: History, clock):
+        self.history = history
+        self.clock = clock
+
+    def __repr__(self):
+        return f'ReplayInstrumentData(instruments={sorted(self.history)})'
+
+    def get_complete_candlesticks(self, symbol: str, prices: str, granularity: str, count: int) -> pd.DataFrame:
+        candles = self.history[symbol][granularity]
+        stop = candles.search(self.clock.now())
+
+        return candles.to_dataframe(max(stop - count, 0), stop)
+
+    def convert_to_df(self, candles: pd.DataFrame, prices: str) -> pd.DataFrame:
+        headers = [h for price in prices for h in OandaInstrumentData.PRICE_HEADERS[price]]
+
+        return candles[['datetime'] + [h for h in headers if h in candles.columns]]
+
+
+def _get_ticks(candles: CandleArrays) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """ Times, bids and asks of TICKS_PER_CANDLE quotes per candle spread evenly over it: the open, the low then the
+        high for a green candle or the high then the low otherwise, and the close.
+    """
+    step = np.timedelta64(GRANULARITY_SECONDS[candles.granularity] * 10 ** 9 // TICKS_PER_CANDLE, 'ns')
+    times = (candles.times[:, None] + step * np.arange(TICKS_PER_CANDLE)).ravel()
+    is_green = _get_side(candles, 'bid', 'Close') > _get_side(candles, 'bid', 'Open')
+    paths = []
+    for side in ('bid', 'ask'):
+        open_, high, low, close = (_get_side(candles, side, p) for p in ('Open', 'High', 'Low', 'Close'))
+        paths.append(np.column_stack([
+            open_,
+            np.where(is_green, low, high),
+            np.where(is_green, high, low),
+            close,
+        ]).ravel())
+    bids, asks = paths
+
+    return times, bids, np.maximum(asks, bids)
+
+
+def _format_candle_time(moment: np.datetime64) -> str:
+    """ _format_time straight from nanoseconds, it's done for every candle served. """
+    nanoseconds = int(moment.view(np.int64))
+
+    return f'{nanoseconds // 10 ** 9}.{nanoseconds % 10 ** 9:09d}'
+
+
+def _get_columns(candles: CandleArrays,
+                 components: Sequence[str] = PRICE_COMPONENTS,
+                 rows=slice(None)) -> Dict[str, Tuple[np.ndarray, ...]]:
+    """ Open, high, low and close of each price component over the candles' rows. """
+    return {component: tuple(_get_side(candles, component, p, rows) for p in DATA_POINTS) for component in components}
+
+
+def _get_latest_candles(chunks: Sequence[Tuple[np.ndarray, Dict[str, Tuple[np.ndarray, ...]], int]],
+                        units: int,
+                        components: Sequence[str] = PRICE_COMPONENTS) -> List[dict]:
+    """ Up to units candles from the end of chunks, the times and _get_columns before stop of each, in the shape
+        Oanda's are.
+
+        Only the price components asked for are built and, as from ReplayInstrumentData, prices are floats rather than
+        strings. LiveTradeMonitor reads the latest S5 candle every time the clock moves, so this is kept lean.
+    """
+    rows = []
+    for times, columns, stop in reversed(chunks):
+        rows[:0] = [(times, columns, i) for i in range(max(stop - units + len(rows), 0), stop)]
+    latest = []
+    for times, columns, i in rows:
+        candle = {'complete': True, 'volume': TICKS_PER_CANDLE, 'time': _format_candle_time(times[i])}
+        for component in components:
+            open_, high, low, close = columns[component]
+            candle[component] = {'o': float(open_[i]), 'h': float(high[i]), 'l': float(low[i]), 'c': float(close[i])}
+        latest.append(candle)
+
+    return latest
+
+
+class TickStream:
+    """ An instrument's candles replayed as quotes, a chunk at a time, see iter_candle_chunks.
+
+        Only the chunk being replayed and the one before it are held, so a stream of S5 candles over years takes the
+        memory of two chunks.
+    """
+
+    def __init__(self, chunks: Iterable[CandleArrays]):
+        self._chunks = iter(chunks)
+        self.previous = None
+        self.candles = None
+        self._columns = self._previous_columns = None
+        self.times = np.empty(0, dtype='datetime64[ns]')
+        self.bids = self.asks = np.empty(0)
+        self.position = 0
+        self._next_fill = self._fill_version = None
+        self._load()
+        if self.candles is None:
+            raise ValueError('A tick stream needs at least one candle.')
+
+    def __repr__(self):
+        return f'TickStream(granularity={self.granularity}, chunk={self.candles}, position={self.position})'
+
+    @property
+    def granularity(self) -> str:
+        return self.candles.granularity
+
+    def _load(self) -> bool:
+        for candles in self._chunks:
+            if len(candles):
+                self.previous, self.candles = self.candles, candles
+                self._previous_columns, self._columns = self._columns, _get_columns(candles)
+                self.times, self.bids, self.asks = _get_ticks(candles)
+                self.position = 0
+                self._next_fill = None
+
+                return True
+
+        return False
+
+    def get_quote(self, moment: np.datetime64) -> Optional[Tuple[np.datetime64, float, float]]:
+        """ The last quote at or before moment of those held. """
+        i = int(np.searchsorted(self.times, moment, side='right')) - 1
+        if i >= 0:
+            return self.times[i], self.bids[i], self.asks[i]
+        if self.previous is not None and self.previous.times[0] <= moment:
+            times, bids, asks = _get_ticks(self.previous.slice(len(self.previous) - 1, len(self.previous)))
+            i = int(np.searchsorted(times, moment, side='right')) - 1
+
+            return times[i], bids[i], asks[i]
+
+        return None
+
+    def iter_quotes(self,
+                    moment: np.datetime64,
+                    find_first_fill: Callable[[np.ndarray, np.ndarray], int] = None,
+                    fill_version: Callable[[], int] = None) -> Iterator[Tuple]:
+        """ Yield (time, bid, ask) of the quotes up to moment not yet replayed, moving on through the chunks.
+
+            With find_first_fill, the quotes it finds could fill something are yielded, and each chunk's last quote
+            to keep the price current. It's asked again after each quote yielded, as a fill changes what can fill.
+            With fill_version too, e.g. PaperAccount.version, it's asked about FILL_LOOKAHEAD quotes at once and
+            only again once the version changes or they're replayed.
+        """
+        while True:
+            stop = int(self.times.searchsorted(moment, 'right'))
+            while self.position < stop:
+                if find_first_fill is None:
+                    i = self.position
+                elif fill_version is None:
+                    offset = find_first_fill(self.bids[self.position:stop], self.asks[self.position:stop])
+                    i = stop - 1 if offset < 0 else self.position + offset
+                else:
+                    i = min(self._find_next_fill(find_first_fill, fill_version(), stop), stop - 1)
+                self.position = i + 1
+                yield self.times[i], self.bids[i], self.asks[i]
+            if stop < len(self.times) or not self._load():
+                return
+
+    def _find_next_fill(self,
+                        find_first_fill: Callable[[np.ndarray, np.ndarray], int],
+                        version: int,
+                        stop: int) -> int:
+        """ Index of the first quote from position that could fill something, or the last searched if none could. """
+        if self._next_fill is None or self._next_fill < self.position or self._fill_version != version:
+            end = self.position + max(FILL_LOOKAHEAD, stop - self.position)
+            offset = find_first_fill(self.bids[self.position:end], self.asks[self.position:end])
+            self._next_fill = min(end, len(self.times)) - 1 if offset < 0 else self.position + offset
+            self._fill_version = version
+
+        return self._next_fill
+
+    def get_latest_candles(self,
+                           moment: np.datetime64,
+                           units: int,
+                           components: Sequence[str] = PRICE_COMPONENTS) -> List[dict]:
+        chunks = []
+        if self.previous is not None:
+            chunks.append((self.previous.times, self._previous_columns, len(self.previous)))
+        chunks.append((self.candles.times, self._columns, int(self.candles.close_times.searchsorted(moment, 'right'))))
+
+        return _get_latest_candles(chunks, units, components)
+
+    def get_latest_prices(self, moment: np.datetime64, headers: Sequence[Tuple[str, int]]) -> Optional[Tuple]:
+        """ Prices of the latest complete candle at moment, headers as price components and indexes of DATA_POINTS. """
+        stop = int(self.candles.close_times.searchsorted(moment, 'right'))
+        if stop:
+            columns, i = self._columns, stop - 1
+        elif self.previous is not None:
+            columns, i = self._previous_columns, len(self.previous) - 1
+        else:
+            return None
+
+        return tuple([float(columns[component][index][i]) for component, index in headers])
+
+    def find_reaching_candle(self, moment: np.datetime64, bid_high: float, ask_low: float) -> Optional[np.datetime64]:
+        """ Close time of the first candle, from the latest complete one at moment, whose bid high reaches bid_high or
+            ask low ask_low, or of the last searched if none do, FILL_LOOKAHEAD candles at a time. None while the
+            latest complete candle is in the previous chunk.
+        """
+        start = int(self.candles.close_times.searchsorted(moment, 'right')) - 1
+        if start < 0:
+            return None
+        end = min(start + FILL_LOOKAHEAD, len(self.candles))
+        is_hit = (self._columns['bid'][1][start:end] >= bid_high) | (self._columns['ask'][2][start:end] <= ask_low)
+        first = int(is_hit.argmax())
+
+        return self.candles.close_times[start + first if is_hit[first] else end - 1]
+
+
+class ReplayPricing(PaperPricing):
+    """ PaperPricing fed from a recorded history as a SimulatedClock moves.
+
+        Each instrument's finest time frame is replayed as TICKS_PER_CANDLE quotes per candle, see _get_ticks, or
+        ticks maps symbols to a finer history, e.g. S5 candles, streamed a chunk at a time. Quotes of every instrument
+        are merged in time order. Set find_first_fill, e.g. to PaperAccount.find_first_fill, to skip the quotes that
+        can't fill anything, and fill_version, e.g. to read PaperAccount.version, so the rest of a chunk is searched
+        once per change to the account rather than every time the clock moves. The other instruments' quotes are
+        brought up to date before each one that can, so margin and conversions are as they would be.
+
+        Latest candles of the recorded time frames come from the history itself. While the market is shut the last
+        quote isn't tradeable, so orders placed at the Friday close are halted as they would be live.
+    """
+
+    def __init__(self,
+                 history: History,
+                 clock: SimulatedClock,
+                 ticks: Dict[str, Iterable[CandleArrays]] = None):
+        super().__init__(clock)
+        self.history = history
+        ticks = dict(ticks or {})
+        for symbol, time_frames in history.items():
+            if symbol not in ticks:
+                ticks[symbol] = [time_frames[min(time_frames, key=GRANULARITY_SECONDS.get)]]
+        if not ticks:
+            raise ValueError('history has no instruments.')
+        self._symbol_names = list(ticks)
+        self._streams = [TickStream(chunks) for chunks in ticks.values()]
+        self._streams_by_symbol = dict(zip(self._symbol_names, self._streams))
+        self._price_sources = {}
+        self.find_first_fill = None
+        self.fill_version = None
+        self._moment = None
+
+        # Only the latest quote before the start is of any use.
+        moment = _to_datetime64(clock.now())
+        for symbol, stream in zip(self._symbol_names, self._streams):
+            last = None
+            for last in stream.iter_quotes(moment, lambda bids, asks: -1):
+                pass
+            if last is not None:
+                self.update_price(symbol, last[1], last[2], _to_datetime(last[0]))
+        clock.add_listener(self._on_clock)
+
+    def __repr__(self):
+        return f'ReplayPricing(instruments={self._symbol_names}, streams={self._streams})'
+
+    @property
+    def granularity_seconds(self) -> int:
+        """ Seconds of the finest candles replayed. """
+        return min(GRANULARITY_SECONDS[stream.granularity] for stream in self._streams)
+
+    def is_tradeable(self, symbol: str) -> bool:
+        return super().is_tradeable(symbol) and is_market_open(self.clock.now())
+
+    def _iter_quotes(self, symbol_index: int, moment: np.datetime64) -> Iterator[Tuple]:
+        symbol = self._symbol_names[symbol_index]
+        if self.find_first_fill is None:
+            find_first_fill = None
+        else:
+            def find_first_fill(bids, asks):
+                return self.find_first_fill(symbol, bids, asks)
+        quotes = self._streams[symbol_index].iter_quotes(moment, find_first_fill, self.fill_version)
+        for time, bid, ask in quotes:
+            yield time, symbol_index, bid, ask
+
+    def _get_moment(self) -> np.datetime64:
+        """ The clock's time as datetime64, kept from when it last moved as it's read for every quote and poll. """
+        now = self.clock.now()
+        if self._moment is None or self._moment[0] != now:
+            self._moment = (now, _to_datetime64(now))
+
+        return self._moment[1]
+
+    def _sync_quotes(self, moment: np.datetime64, symbol_index: int):
+        """ Quotes of the other instruments as of moment, without filling anything against them. """
+        for i, stream in enumerate(self._streams):
+            quote = stream.get_quote(moment) if i != symbol_index else None
+            if quote is not None:
+                time, bid, ask = quote
+                with self._lock:
+                    self._quotes[self._symbol_names[i]] = Quote(float(bid), float(ask), _to_datetime(time))
+
+    def _on_clock(self, previous: datetime.datetime, now: datetime.datetime):
+        moment = _to_datetime64(now)
+        self._moment = (now, moment)
+        if len(self._streams) == 1:
+            symbol = self._symbol_names[0]
+            find_first_fill = None if self.find_first_fill is None else functools.partial(self.find_first_fill, symbol)
+            for time, bid, ask in self._streams[0].iter_quotes(moment, find_first_fill, self.fill_version):
+                self.update_price(symbol, bid, ask, _to_datetime(time))
+            return
+        streams = [self._iter_quotes(i, moment) for i in range(len(self._streams))]
+        for time, symbol_index, bid, ask in heapq.merge(*streams):
+            if self.find_first_fill is not None:
+                self._sync_quotes(time, symbol_index)
+            self.update_price(self._symbol_names[symbol_index], bid, ask, _to_datetime(time))
+
+    def _get_candles(self,
+                     symbol: str,
+                     granularity: str,
+                     units: int,
+                     components: Sequence[str] = PRICE_COMPONENTS) -> List[dict]:
+        candles = self.history.get(symbol, {}).get(granularity)
+        if candles is not None:
+            stop = candles.search(self.clock.now())
+            rows = slice(max(stop - units, 0), stop)
+            chunk = (candles.times[rows], _get_columns(candles, components, rows), stop - rows.start)
+
+            return _get_latest_candles([chunk], units, components)
+        stream = self._streams_by_symbol.get(symbol)
+        if stream is not None and stream.granularity == granularity:
+            return stream.get_latest_candles(self._get_moment(), units, components)
+
+        return super()._get_candles(symbol, granularity, units, components)
+
+    def get_latest_candle_prices(self, symbol: str, granularity: str, headers: Sequence[str]) -> Optional[Tuple]:
+        """ Read from the tick stream's arrays, PaperTradeMonitor asks for the latest S5 prices every poll. """
+        key = (symbol, granularity, tuple(headers))
+        if key not in self._price_sources:
+            stream = self._get_candle_stream(symbol, granularity)
+            if stream is None:
+                self._price_sources[key] = None
+            else:
+                self._price_sources[key] = stream, tuple(
+                    (component, DATA_POINTS.index(data_point))
+                    for component, data_point in map(split_price_header, headers)
+                )
+        source = self._price_sources[key]
+        if source is None:
+            return super().get_latest_candle_prices(symbol, granularity, headers)
+        stream, split = source
+
+        return stream.get_latest_prices(self._get_moment(), split)
+
+    def _get_candle_stream(self, symbol: str, granularity: str) -> Optional[TickStream]:
+        """ The stream symbol's latest granularity candles are read from, None if they come from the history. """
+        stream = self._streams_by_symbol.get(symbol)
+        if stream is None or stream.granularity != granularity or granularity in self.history.get(symbol, {}):
+            return None
+
+        return stream
+
+    def get_time_prices_reach(self,
+                              symbol: str,
+                              granularity: str,
+                              bid_high: float,
+                              ask_low: float) -> Optional[datetime.datetime]:
+        """ Searched ahead through the tick stream's arrays, see TickStream.find_reaching_candle. """
+        stream = self._get_candle_stream(symbol, granularity)
+        if stream is None:
+            return super().get_time_prices_reach(symbol, granularity, bid_high, ask_low)
+        close_time = stream.find_reaching_candle(self._get_moment(), bid_high, ask_low)
+
+        return None if close_time is None else _to_datetime(close_time)
+
+
+class ReplayEngine:
+    """ Runs strategies through their unmodified execute() and register() paths against a recorded history.
+
+        A SimulatedClock is set process wide, so scheduling, waiting for candles and anything else that reads the
+        time or sleeps moves simulated time instead of waiting on it. So is an ExchangeRateService reading the
+        replayed prices, UnitConversions sizes trades at the rates of the time so history must hold the conversion
+        symbols of non GBP instruments. Strategies must trade engine.account, a PaperAccount filling against the
+        replayed prices, and have the engine's market data, candle detector and account snapshot attached in place of
+        the live ones. A strategy's LiveTradeMonitor is replaced with a PaperTradeMonitor taking over its parameters.
+
+        ticks maps symbols to a finer history to fill against, e.g. the S5 candles LiveTradeMonitor reads, as a CSV
+        path, CandleArrays or CandleArrays chunks from a store. They're streamed chunk_size candles at a time, so
+        memory stays bounded however long they are.
+    """
+
+    def __init__(self,
+                 history: History,
+                 start: datetime.datetime,
+                 end: datetime.datetime = None,
+                 balance: float = 10000.,
+                 home_conversions: Dict[str, float] = None,
+                 ticks: Dict[str, TickSource] = None,
+                 tick_granularity: str = 'S5',
+                 chunk_size: int = DEFAULT_CHUNK_SIZE):
+        all_candles = [candles for time_frames in history.values() for candles in time_frames.values()]
+        finest = min(GRANULARITY_SECONDS[candles.granularity] for candles in all_candles)
+        if end is None:
+            end = max(_to_datetime(candles.close_times[-1]) for candles in all_candles if len(candles))
+        self.history = history
+        self.clock = SimulatedClock(start, end, resolution=finest / TICKS_PER_CANDLE)
+        if ticks:
+            ticks = {
+                symbol: iter_candle_chunks(source, tick_granularity, chunk_size) for symbol, source in ticks.items()
+            }
+        self.pricing = ReplayPricing(history, self.clock, ticks)
+        self.account = PaperAccount(self.pricing, balance, home_conversions=home_conversions)
+        if ticks:
+
+            # Only quotes that could fill something are replayed to the account, and LiveTradeMonitor reads complete
+            # candles, so nothing needs the clock to move more often than once a candle of the ticks.
+            self.pricing.find_first_fill = self.account.find_first_fill
+            self.pricing.fill_version = lambda: self.account.version
+            self.clock.resolution = self.pricing.granularity_seconds
+        self.market_data = SharedCandleData(ReplayInstrumentData(history, self.clock), self.clock)
+        self.candle_detector = CandleAvailabilityDetector(self.pricing, self.clock)
+        self.account_snapshot = AccountSnapshot(self.account, clock=self.clock)
+        self.exchange_rates = ExchangeRateService(self.pricing, self.clock)
+
+    def __repr__(self):
+        return f'ReplayEngine(clock={self.clock}, account={self.account!r})'
+
+    def attach(self, strategy: Strategy):
+        if strategy.account is not self.account:
+            raise ValueError(f'{strategy.get_state_key()} must trade the replay account, engine.account.')
+        strategy.market_data = self.market_data
+        strategy.candle_detector = self.candle_detector
+        strategy.account_snapshot = self.account_snapshot
+        strategy.alerts_enabled = False
+        monitor = getattr(strategy, '_live_trade_monitor', None)
+        if monitor is not None and not isinstance(monitor, PaperTradeMonitor):
+            strategy._live_trade_monitor = PaperTradeMonitor.from_monitor(monitor, self.account, self.pricing)
+
+    def run(self, *strategies: Strategy, max_workers: int = 4) -> PaperAccount:
+        """ Replay until the end of the history, returns the account with the orders and trades made. """
+        for strategy in strategies:
+            self.attach(strategy)
+        previous = set_clock(self.clock)
+        previous_rates = set_exchange_rates(self.exchange_rates)
+        try:
+            if len(strategies) == 1:
+                strategies[0].execute()
+            else:
+                scheduler = CandleCloseScheduler(self.clock, max_workers)
+                for strategy in strategies:
+                    strategy.register(scheduler)
+                scheduler.run()
+        except SimulationFinished:
+            logger.info(f'Replay finished at {self.clock.now()}.')
+        finally:
+            set_clock(previous)
+            set_exchange_rates(previous_rates)
+
+        return self.account
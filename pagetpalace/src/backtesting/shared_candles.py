@@ -0,0 +1,169 @@
+# Python standard.
+from multiprocessing import shared_memory
+from typing import Dict, List, Tuple
+
+# Third-party.
+import numpy as np
+
+# Local.
+from pagetpalace.src.backtesting.candles import CandleArrays
+
+
+class SharedCandles:
+    """ Candle arrays copied once into shared memory so worker processes can attach to them instead of each being
+        sent a pickled copy.
+
+        Each time frame gets one block holding the open times followed by the price columns. The creating process owns
+        the blocks and must close() them, which also unlinks them, once the workers are done.
+    """
+
+    def __init__(self, candles: Dict[str, CandleArrays]):
+        self._blocks = []
+        self.spec = {}
+        try:
+            for granularity, arrays in candles.items():
+                columns = list(arrays.prices)
+                n = len(arrays)
+                block = shared_memory.SharedMemory(create=True, size=max(8 * n * (len(columns) + 1), 1))
+                self._blocks.append(block)
+                times, prices = _get_views(block, n, len(columns))
+                times[:] = arrays.times
+                for i, column in enumerate(columns):
+                    prices[i] = arrays[column]
+                self.spec[granularity] = (block.name, n, columns)
+        except Exception:
+            self.close()
+            raise
+
+    def __repr__(self):
+        return f'SharedCandles(time_frames={sorted(self.spec)})'
+
+    def __enter__(self) -> 'SharedCandles':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+
+def _get_views(block: shared_memory.SharedMemory, n: int, column_count: int) -> Tuple[np.ndarray, np.ndarray]:
+    times = np.ndarray((n,), dtype='datetime64[ns]', buffer=block.buf)
+    prices = np.ndarray((column_count, n), dtype=np.float64, buffer=block.buf, offset=8 * n)
+
+    return times, prices
+
+
+def attach_candles(spec: dict) -> Tuple[Dict[str, CandleArrays], List[shared_memory.SharedMemory]]:
+    """ Read only CandleArrays over the blocks described by SharedCandles.spec, nothing is copied.
+
+        The blocks are returned with the candles and must be kept referenced for as long as the candles are used.
+    """
+    candles, blocks = {}, []
+    for granularity, (name, n, columns) in spec.items():
+        block = shared_memory.SharedMemory(name=name)
+        blocks.append(block)
+        times, prices = _get_views(block, n, len(columns))
+        times.flags.writeable = False
+        prices.flags.writeable = False
+        candles[granularity] = CandleArrays(granularity, times, dict(zip(columns, prices)))
+
+    return candles, blocks
+
+
+# Candles attached by this process, by the names of their blocks, kept until detached.
+_attached = {}
+
+
+class MarketDataHandle:
+    """ What a worker process needs to attach to a SharedMarketDataset. It's a few names, so it can go with every
+        task rather than in an initializer.
+    """
+
+    def __init__(self, spec: Dict[str, dict]):
+        self.spec = spec
+
+    def __repr__(self):
+        return f'MarketDataHandle(instruments={sorted(self.spec)})'
+
+    def attach(self, symbols: List[str] = None) -> Dict[str, Dict[str, CandleArrays]]:
+        """ Read only candles of symbols, all of them by default, over the dataset's shared memory.
+
+            Nothing is copied, and attaching again in the same process, e.g. once per task, reuses the first attachment
+            along with any indicators cached on its candles.
+        """
+        history = {}
+        for symbol in self.spec if symbols is None else symbols:
+            spec = self.spec[symbol]
+            key = tuple(name for name, _, _ in spec.values())
+            if key not in _attached:
+                _attached[key] = attach_candles(spec)
+            history[symbol] = _attached[key][0]
+
+        return history
+
+    def detach(self, symbols: List[str] = None):
+        """ Drop this process's attachments to symbols, all of them by default, and close their blocks.
+
+            Blocks of candles still referenced elsewhere can't be closed yet, they are closed once those are released.
+        """
+        for symbol in self.spec if symbols is None else symbols:
+            key = tuple(name for name, _, _ in self.spec[symbol].values())
+            _, blocks = _attached.pop(key, (None, []))
+            for block in blocks:
+                try:
+                    block.close()
+                except BufferError:
+                    pass
+
+
+class SharedMarketDataset:
+    """ Candle histories of a set of instruments and time frames, loaded once and put in shared memory for any number
+        of worker processes to attach to through handle.
+
+        Each worker attaches in place of reading the CSVs or being sent a pickled copy, so 32 workers take the memory
+        of one history and start without loading anything. The creating process owns the blocks and must close() them
+        once the workers are done.
+    """
+
+    def __init__(self, history: Dict[str, Dict[str, CandleArrays]]):
+        self._shared = {}
+        try:
+            for symbol, time_frames in history.items():
+                self._shared[symbol] = SharedCandles(time_frames)
+        except Exception:
+            self.close()
+            raise
+        self.handle = MarketDataHandle({symbol: shared.spec for symbol, shared in self._shared.items()})
+        self.nbytes = sum(
+            candles.times.nbytes + sum(values.nbytes for values in candles.prices.values())
+            for time_frames in history.values() for candles in time_frames.values()
+        )
+
+    def __repr__(self):
+        return f'SharedMarketDataset(instruments={sorted(self._shared)}, nbytes={self.nbytes})'
+
+    def __enter__(self) -> 'SharedMarketDataset':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @classmethod
+    def from_csv(cls, paths: Dict[str, Dict[str, str]]) -> 'SharedMarketDataset':
+        """ paths maps symbols to time frames to CSVs in the layout read_oanda_data reads, each is read once, here. """
+        return cls({
+            symbol: {granularity: CandleArrays.from_csv(granularity, path) for granularity, path in time_frames.items()}
+            for symbol, time_frames in paths.items()
+        })
+
+    def close(self):
+        if hasattr(self, 'handle'):
+            self.handle.detach()
+        for shared in self._shared.values():
+            shared.close()
+        self._shared = {}
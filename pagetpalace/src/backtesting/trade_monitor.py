@@ -0,0 +1,198 @@
+# Python standard.
+from typing import List
+
+# Third-party.
+import numpy as np
+import pandas as pd
+
+# Local.
+from pagetpalace.src.backtesting.candles import CandleArrays
+from pagetpalace.src.backtesting.fills import DEFAULT_BLOCK_SIZE, scan_bars
+from pagetpalace.src.dependent_orders.target_calculations import calculate_pct_prices, round_prices
+from pagetpalace.src.dependent_orders.trade_adjustment_params import (
+    PartialClosureParams,
+    StopLossMoveParams,
+    TradeAdjustmentParameters,
+)
+from pagetpalace.src.oanda.instruments.instruments import Instrument
+
+
+def _get_fill_price(is_long: np.ndarray, can_gap: np.ndarray, level: np.ndarray, open_: np.ndarray) -> np.ndarray:
+    """ level, or the open where the price could have gapped past level in the trade's favour. """
+    return np.where(can_gap, np.where(is_long, np.maximum(level, open_), np.minimum(level, open_)), level)
+
+
+class SimulatedTradeMonitor:
+    """ LiveTradeMonitor's stop loss moves and partial closures, applied to the filled trades of a backtest.
+
+        Takes the same parameters as LiveTradeMonitor. Each trade's path is checked against every "check" target at
+        once, a block of candles at a time, with the bid high of longs and the ask low of shorts, as the live monitor
+        checks the latest S5 candle. Pass S5 candles to match it poll for poll, or the entry candles for a quicker,
+        coarser estimate.
+
+        Within a candle the stop in force at its open is checked first, so:
+            - a stop loss moved in a candle applies from the next one,
+            - partial closures in the candle a trade is stopped out in are ignored, those in the candle it takes profit
+              in are made on the way.
+        Partial closures are made at their target, or at the open if the price gapped through it. With a units column
+        they're rounded to whole units as live: at least 1 unit is closed, trades down to 1 unit are left alone and a
+        closure bigger than what's left is skipped. Without one, the closures are fractions of the position.
+    """
+
+    def __init__(self,
+                 stop_loss_move_params: List[StopLossMoveParams] = None,
+                 partial_closure_params: List[PartialClosureParams] = None):
+        self.stop_loss_move_params = TradeAdjustmentParameters.init_pair_to_params(stop_loss_move_params)
+        self.partial_closure_params = TradeAdjustmentParameters.init_pair_to_params(partial_closure_params)
+
+    def __repr__(self):
+        return (
+            f'SimulatedTradeMonitor(stop_loss_moves={sorted(self.stop_loss_move_params)}, '
+            f'partial_closures={sorted(self.partial_closure_params)})'
+        )
+
+    def run(self,
+            trades: pd.DataFrame,
+            candles: CandleArrays,
+            instrument: Instrument,
+            block_size: int = DEFAULT_BLOCK_SIZE) -> pd.DataFrame:
+        """ trades as simulate_orders returns them, with the exits, pnl and r multiples of the filled trades redone.
+
+            exit_bar is an index into candles. Adds the stop_moves and partial_closures made, the final_stop_loss and
+            the remaining_units, as a fraction of the position without a units column.
+        """
+        moves = list(self.stop_loss_move_params.get(instrument.symbol, {}).values())
+        closures = list(self.partial_closure_params.get(instrument.symbol, {}).values())
+        trades = trades.reset_index(drop=True).copy()
+        filled = np.flatnonzero(trades['status'].to_numpy() == 'FILLED')
+        if not (moves or closures) or not filled.size:
+            return trades
+        n = len(candles)
+        t = trades.iloc[filled]
+        is_long = t['direction'].to_numpy() == 1
+        direction = np.where(is_long, 1, -1)
+        entry = t['entry_price'].to_numpy(dtype=np.float64)
+        stop_loss = t['stop_loss'].to_numpy(dtype=np.float64)
+        take_profit = t['take_profit'].to_numpy(dtype=np.float64)
+        start = np.maximum(np.searchsorted(candles.times, t['entry_time'].to_numpy(), side='right') - 1, 0)
+        can_gap_at_start = t['order_type'].to_numpy() == 'MARKET'
+
+        def reaches(prices):
+            return lambda rows, bars: np.where(
+                is_long[rows, None],
+                candles['bidHigh'][bars] >= prices[rows, None],
+                candles['askLow'][bars] <= prices[rows, None],
+            )
+
+        def is_below_stop(rows, bars, stops):
+            return np.where(
+                is_long[rows, None],
+                candles['bidLow'][bars] <= stops,
+                candles['askHigh'][bars] >= stops,
+            )
+
+        # No stop is ever looser than the loosest of them, which bounds how far each path needs to be scanned.
+        move_prices = [
+            round_prices(calculate_pct_prices(entry, take_profit, m['move']), instrument.price_precision) for m in moves
+        ]
+        loosest = np.stack([stop_loss, *move_prices])
+        loosest = np.where(is_long, loosest.min(axis=0), loosest.max(axis=0))
+        is_taken = reaches(take_profit)
+        bound = scan_bars(
+            start,
+            np.full(len(start), n),
+            lambda rows, bars: is_below_stop(rows, bars, loosest[rows, None]) | is_taken(rows, bars),
+            block_size,
+        )
+        limit = np.where(bound >= 0, bound + 1, n)
+        move_bars = [
+            scan_bars(start, limit, reaches(calculate_pct_prices(entry, take_profit, m['check'])), block_size)
+            for m in moves
+        ]
+
+        def get_stops(rows, bars):
+            stops = np.broadcast_to(stop_loss[rows, None], bars.shape)
+            for move_bar, price in zip(move_bars, move_prices):
+                is_moved = (move_bar[rows, None] >= 0) & (move_bar[rows, None] < bars)
+                stops = np.where(is_moved, price[rows, None], stops)
+
+            return stops
+
+        def is_stopped(rows, bars):
+            return is_below_stop(rows, bars, get_stops(rows, bars))
+
+        exit_bar = scan_bars(start, limit, lambda rows, bars: is_stopped(rows, bars) | is_taken(rows, bars), block_size)
+        closed = exit_bar >= 0
+        safe_bar = np.where(closed, exit_bar, n - 1)
+        rows = np.arange(len(start))
+        hit_stop = closed & is_stopped(rows, safe_bar[:, None])[:, 0]
+        final_stop = get_stops(rows, safe_bar[:, None])[:, 0]
+        can_gap = can_gap_at_start | (safe_bar > start)
+        close_open = np.where(is_long, candles['bidOpen'][safe_bar], candles['askOpen'][safe_bar])
+
+        sl_price = np.where(
+            can_gap,
+            np.where(is_long, np.minimum(final_stop, close_open), np.maximum(final_stop, close_open)),
+            final_stop,
+        )
+        last_close = np.where(is_long, candles['bidClose'][n - 1], candles['askClose'][n - 1])
+        tp_price = _get_fill_price(is_long, can_gap, take_profit, close_open)
+        exit_price = np.where(closed, np.where(hit_stop, sl_price, tp_price), last_close)
+
+        has_units = 'units' in trades.columns
+        initial_units = np.abs(t['units'].to_numpy(dtype=np.float64)) if has_units else np.ones(len(start))
+        remaining = initial_units.copy()
+        units_at_open = remaining.copy()
+        previous_bar = np.full(len(start), -2)
+        closed_pnl = np.zeros(len(start))
+        partial_closures = np.zeros(len(start), dtype=np.int64)
+        for closure in closures:
+            target = calculate_pct_prices(entry, take_profit, closure['check'])
+            bar = scan_bars(start, limit, reaches(target), block_size)
+            is_before_exit = (bar >= 0) & (~closed | (bar < exit_bar) | ((bar == exit_bar) & ~hit_stop))
+
+            # The live monitor sizes every closure in one poll on the units open at the start of it.
+            units_at_open = np.where(bar == previous_bar, units_at_open, remaining)
+            if has_units:
+                to_close = np.maximum(np.round(units_at_open * closure['close']), 1)
+                is_closed = is_before_exit & (units_at_open != 1) & (to_close <= remaining)
+            else:
+                to_close = units_at_open * closure['close']
+                is_closed = is_before_exit
+            safe_closure_bar = np.maximum(bar, 0)
+            closure_open = np.where(
+                is_long,
+                candles['bidOpen'][safe_closure_bar],
+                candles['askOpen'][safe_closure_bar],
+            )
+            price = _get_fill_price(is_long, can_gap_at_start | (bar > start), target, closure_open)
+            closed_pnl += np.where(is_closed, to_close * direction * (price - entry), 0.)
+            remaining = np.where(is_closed, remaining - to_close, remaining)
+            partial_closures += is_closed
+            previous_bar = bar
+
+        pnl = (closed_pnl + remaining * direction * (exit_price - entry)) / initial_units
+        stop_moves = sum(
+            ((move_bar >= 0) & (~closed | (move_bar < exit_bar))).astype(np.int64) for move_bar in move_bars
+        )
+        trades.loc[filled, 'exit_bar'] = safe_bar
+        trades.loc[filled, 'exit_time'] = candles.times[safe_bar]
+        trades.loc[filled, 'exit_price'] = exit_price
+        trades.loc[filled, 'exit_reason'] = np.where(
+            closed,
+            np.where(hit_stop, 'STOP_LOSS_ORDER', 'TAKE_PROFIT_ORDER'),
+            'END_OF_DATA',
+        )
+        trades.loc[filled, 'pnl'] = pnl
+        with np.errstate(divide='ignore', invalid='ignore'):
+            trades.loc[filled, 'r_multiple'] = pnl / np.abs(entry - stop_loss)
+        for column, values in (
+                ('stop_moves', stop_moves),
+                ('partial_closures', partial_closures),
+                ('final_stop_loss', final_stop),
+                ('remaining_units', remaining if has_units else remaining / initial_units),
+        ):
+            trades[column] = np.nan
+            trades.loc[filled, column] = values
+
+        return trades
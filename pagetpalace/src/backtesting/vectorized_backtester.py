@@ -0,0 +1,91 @@
+# Python standard.
+from typing import Dict
+
+# Third-party.
+import numpy as np
+import pandas as pd
+
+# Local.
+from pagetpalace.src.backtesting.candles import CandleArrays
+from pagetpalace.src.backtesting.fills import DEFAULT_BLOCK_SIZE, simulate_orders
+from pagetpalace.src.backtesting.trade_monitor import SimulatedTradeMonitor
+from pagetpalace.src.backtesting.vectorized_signals import get_order_generator
+from pagetpalace.src.oanda.strategies.strategy import Strategy
+
+
+def apply_open_trades_cap(trades: pd.DataFrame, cap: int) -> pd.DataFrame:
+    """ Drop the orders a live strategy wouldn't have placed because cap trades were already open.
+
+        Whether an order is placed depends on the orders placed before it, so this walks the orders in time order.
+        It only keeps the exit bars of the trades still open, which stays small.
+    """
+    trades = trades.sort_values('signal_bar', kind='stable').reset_index(drop=True)
+    keep = np.ones(len(trades), dtype=bool)
+    open_trades = []
+    for i, (signal_bar, status, entry_bar, exit_bar) in enumerate(
+            trades[['signal_bar', 'status', 'entry_bar', 'exit_bar']].itertuples(index=False)):
+        open_trades = [(entry, exit_) for entry, exit_ in open_trades if exit_ > signal_bar]
+        if sum(entry <= signal_bar for entry, _ in open_trades) >= cap:
+            keep[i] = False
+        elif status == 'FILLED':
+            open_trades.append((entry_bar, exit_bar))
+
+    return trades[keep].reset_index(drop=True)
+
+
+class VectorizedBacktester:
+    """ Evaluates a strategy's entry rules on every candle of a history at once and fills the resulting orders.
+
+        Indicators are calculated for every candle over the same trailing window of Strategy.CANDLE_COUNT candles a
+        live strategy sees, with the strategy's own coefficients and multipliers. Only strategies with vectorized
+        signals in vectorized_signals can be run, stateful strategies need to be replayed bar by bar.
+
+        With sub_granularity, e.g. 'S5', the candles of that time frame place stop triggers, stop losses and take
+        profits within each entry candle. A trade_monitor moves stop losses and partially closes trades along their
+        paths, over the sub candles when there are any.
+    """
+
+    def __init__(self,
+                 strategy: Strategy,
+                 candles: Dict[str, CandleArrays],
+                 block_size: int = DEFAULT_BLOCK_SIZE,
+                 sub_granularity: str = None,
+                 trade_monitor: SimulatedTradeMonitor = None):
+        missing = (set(strategy.time_frames) | ({sub_granularity} if sub_granularity else set())) - set(candles)
+        if missing:
+            raise ValueError(f'No candles for time frames: {sorted(missing)}.')
+        self.strategy = strategy
+        self.candles = candles
+        self.block_size = block_size
+        self.sub_granularity = sub_granularity
+        self.trade_monitor = trade_monitor
+        self._get_orders = get_order_generator(strategy)
+
+    def __repr__(self):
+        return f'VectorizedBacktester(strategy={type(self.strategy).__name__}, candles={self.candles})'
+
+    @classmethod
+    def from_csv(cls, strategy: Strategy, file_paths: Dict[str, str], **kwargs) -> 'VectorizedBacktester':
+        """ file_paths maps each of the strategy's time frames to a file read_oanda_data can read. """
+        candles = {granularity: CandleArrays.from_csv(granularity, path) for granularity, path in file_paths.items()}
+
+        return cls(strategy, candles, **kwargs)
+
+    def get_orders(self) -> pd.DataFrame:
+        return self._get_orders(self.strategy, self.candles, self.strategy.CANDLE_COUNT)
+
+    def run(self) -> pd.DataFrame:
+        """ Every order the strategy would have placed, see simulate_orders for the columns. """
+        entry_candles = self.candles[self.strategy.entry_timeframe]
+        sub_candles = self.candles[self.sub_granularity] if self.sub_granularity else None
+        trades = simulate_orders(self.get_orders(), entry_candles, self.block_size, sub_candles)
+        if self.trade_monitor is not None:
+            path = entry_candles if sub_candles is None else sub_candles
+            trades = self.trade_monitor.run(trades, path, self.strategy.instrument, self.block_size)
+            if sub_candles is not None:
+                is_filled = trades['status'] == 'FILLED'
+                exit_bar = np.searchsorted(entry_candles.times, trades['exit_time'].to_numpy(), side='right') - 1
+                trades['exit_bar'] = np.where(is_filled, exit_bar, -1)
+        cap = getattr(self.strategy, 'MAX_OPEN_TRADES', None)
+
+        return apply_open_trades_cap(trades, cap) if cap else trades
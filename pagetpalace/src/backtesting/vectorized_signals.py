@@ -0,0 +1,456 @@
+# Python standard.
+import functools
+from typing import Callable, Dict
+
+# Third-party.
+import numpy as np
+import pandas as pd
+
+# Local.
+from pagetpalace.src.backtesting.candles import CandleArrays
+from pagetpalace.src.backtesting.window_indicators import (
+    LONG,
+    SHORT,
+    hammer_pin_signal,
+    hammer_pin_signal_v2,
+    was_previous_green_streak,
+    was_previous_red_streak,
+    was_price_ascending,
+    was_price_descending,
+    windowed_average_true_range,
+    windowed_ewm,
+    windowed_heikin_ashi_signal,
+    windowed_ssl_channel,
+    windowed_ssma,
+)
+from pagetpalace.src.oanda.strategies.strategy import Strategy
+from pagetpalace.src.oanda.strategies.ssl_multi import SSLMultiTimeFrame
+from pagetpalace.src.oanda.strategies.strategy_implementations.heikin_ashi_ewm_1 import HeikinAshiEwm1
+from pagetpalace.src.oanda.strategies.strategy_implementations.hpdaily import HPDaily
+from pagetpalace.src.oanda.strategies.strategy_implementations.ssl_currency import SSLCurrency
+from pagetpalace.src.oanda.strategies.strategy_implementations.ssl_hammer_pin import SSLHammerPin
+from pagetpalace.src.oanda.strategies.strategy_implementations.ssl_investment import SSLInvestment
+
+BIASES = {'long': LONG, 'short': SHORT}
+ORDER_COLUMNS = [
+    'signal_bar',
+    'signal_time',
+    'sub_strategy',
+    'direction',
+    'order_type',
+    'entry',
+    'price_bound',
+    'stop_loss',
+    'take_profit',
+    'valid_bars',
+]
+
+
+def _has_met_reverse_trade_condition(multipliers: dict,
+                                     price: np.ndarray,
+                                     ssma: np.ndarray,
+                                     atr: np.ndarray) -> np.ndarray:
+    """ _has_met_reverse_trade_condition of every candle, a missing multiplier never trades. """
+    above = multipliers.get('above', np.inf)
+    below = multipliers.get('below', np.inf)
+    boundary = np.where(price >= ssma, above * atr, below * atr)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.abs((price - ssma) / atr) * atr >= boundary
+
+
+def _is_within_valid_boundary(multipliers: dict,
+                              price: np.ndarray,
+                              ssma: np.ndarray,
+                              atr: np.ndarray) -> np.ndarray:
+    """ _is_within_valid_boundary of every candle, a missing multiplier never limits. """
+    above = multipliers.get('above', np.inf)
+    below = multipliers.get('below', np.inf)
+    boundary = np.where(price >= ssma, above * atr, below * atr)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return ~(np.abs((price - ssma) / atr) * atr > boundary)
+
+
+def _has_full_window(length: int, window: int) -> np.ndarray:
+    """ Live strategies always see a full window of candles, the first window - 1 candles can't be evaluated. """
+    return np.arange(length) >= window - 1
+
+
+def _combine_biases(longs: np.ndarray, shorts: np.ndarray) -> np.ndarray:
+    """ Long takes precedence, as in _get_s1_signal. """
+    return np.where(longs, LONG, np.where(shorts, SHORT, 0))
+
+
+def _get_average_true_range(data: CandleArrays, window: int) -> np.ndarray:
+    return data.get_or_compute(
+        'average_true_range',
+        functools.partial(windowed_average_true_range, data['midHigh'], data['midLow'], data['midClose']),
+        window=window,
+    )
+
+
+def _get_ssma(data: CandleArrays, periods: int, window: int) -> np.ndarray:
+    return data.get_or_compute(
+        'ssma',
+        functools.partial(windowed_ssma, data['midClose']),
+        periods=periods,
+        window=window,
+    )
+
+
+def _get_ssl_channel(data: CandleArrays, periods: int, window: int) -> np.ndarray:
+    return data.get_or_compute(
+        'ssl_channel',
+        functools.partial(windowed_ssl_channel, data['midHigh'], data['midLow'], data['midClose']),
+        periods=periods,
+        window=window,
+    )
+
+
+def _get_ewm(data: CandleArrays, span: int, window: int) -> np.ndarray:
+    return data.get_or_compute(
+        'ewm',
+        functools.partial(windowed_ewm, data['midClose'], adjust=False),
+        alpha=2. / (span + 1),
+        window=window,
+    )
+
+
+def _get_heikin_ashi_signal(data: CandleArrays, window: int) -> np.ndarray:
+    return data.get_or_compute(
+        'heikin_ashi_signal',
+        functools.partial(
+            windowed_heikin_ashi_signal, data['midOpen'], data['midHigh'], data['midLow'], data['midClose'],
+        ),
+        window=window,
+    )
+
+
+def _get_streak_and_price_movement(data: CandleArrays, direction: int, streak_look_back: int, price_movement_lb: int):
+    if direction == LONG:
+        streak = functools.partial(was_previous_red_streak, data['midOpen'], data['midClose'])
+        price_movement = functools.partial(was_price_descending, data['midLow'])
+    else:
+        streak = functools.partial(was_previous_green_streak, data['midOpen'], data['midClose'])
+        price_movement = functools.partial(was_price_ascending, data['midHigh'])
+
+    return (
+        data.get_or_compute(f'streak_{direction}', streak, look_back=streak_look_back),
+        data.get_or_compute(f'price_movement_{direction}', price_movement, look_back=price_movement_lb),
+    )
+
+
+def _is_new_entry_signal(values: np.ndarray, is_evaluated: np.ndarray) -> np.ndarray:
+    """ The value changed since the candle before, which was evaluated too, so it isn't the strategy's first run. """
+    is_new = np.zeros(len(values), dtype=bool)
+    is_new[1:] = is_evaluated[1:] & is_evaluated[:-1] & (values[1:] != values[:-1])
+
+    return is_new
+
+
+def _get_bars_until_change(values: np.ndarray, is_evaluated: np.ndarray) -> np.ndarray:
+    """ valid_bars of orders kept until the entry signal changes, they're cleared at the close of that candle. """
+    positions = np.arange(len(values))
+    changes = np.flatnonzero(_is_new_entry_signal(values, is_evaluated))
+    following = np.searchsorted(changes, positions, side='right')
+    has_change = following < len(changes)
+    bars = np.full(len(values), np.nan)
+    bars[has_change] = changes[following[has_change]] - positions[has_change]
+
+    return bars
+
+
+def _get_trade_multiplier(strategy: Strategy, signals: np.ndarray, name: str) -> np.ndarray:
+    """ Sub strategy 1's name multiplier for each signal's direction, NaN for a direction without multipliers. """
+    multipliers = strategy.trade_multipliers['1']
+
+    return np.where(
+        signals == LONG,
+        multipliers.get('long', {}).get(name, np.nan),
+        multipliers.get('short', {}).get(name, np.nan),
+    )
+
+
+def _build_orders(candles: CandleArrays, signals: np.ndarray, order_type: str, **columns) -> pd.DataFrame:
+    bars = np.flatnonzero(signals)
+    orders = pd.DataFrame({
+        'signal_bar': bars,
+        'signal_time': candles.close_times[bars],
+        'sub_strategy': '1',
+        'direction': signals[bars],
+        'order_type': order_type,
+    })
+    for name in ORDER_COLUMNS[5:]:
+        values = columns.get(name, np.nan)
+        orders[name] = values[bars] if isinstance(values, np.ndarray) else values
+
+    return orders
+
+
+def get_hpdaily_signals(strategy: HPDaily, candles: Dict[str, CandleArrays], window: int) -> np.ndarray:
+    data = candles[strategy.entry_timeframe]
+    open_, high, low, close = data['midOpen'], data['midHigh'], data['midLow'], data['midClose']
+    atr = _get_average_true_range(data, window)
+    ssma = np.round(_get_ssma(data, 50, window), 5)
+    biases = {}
+    for bias, direction in BIASES.items():
+        if bias not in strategy.directions:
+            biases[bias] = np.zeros(len(data), dtype=bool)
+            continue
+        coeffs = strategy.coefficients
+        streak, price_movement = _get_streak_and_price_movement(
+            data,
+            direction,
+            coeffs['streak_look_back'][bias],
+            coeffs['price_movement_lb'][bias],
+        )
+        price = low if direction == LONG else high
+        multipliers = strategy.boundary_multipliers.get(strategy.entry_timeframe, {}).get(bias, {})
+        hp_coeffs = coeffs['hp_coeffs'][bias]
+        biases[bias] = (high - low > atr * coeffs['x_atr'][bias]) \
+            & (streak | price_movement) \
+            & _has_met_reverse_trade_condition(multipliers, price, ssma, atr) \
+            & (hammer_pin_signal_v2(open_, high, low, close, hp_coeffs['body'], hp_coeffs['shadow']) == direction)
+
+    return np.where(_has_full_window(len(data), window), _combine_biases(biases['long'], biases['short']), 0)
+
+
+def get_hpdaily_orders(strategy: HPDaily, candles: Dict[str, CandleArrays], window: int) -> pd.DataFrame:
+    """ Market orders from the close, the stop loss leaves room for the signal candle's range. """
+    data = candles[strategy.entry_timeframe]
+    high, low, close = data['midHigh'], data['midLow'], data['midClose']
+    atr = _get_average_true_range(data, window)
+    signals = get_hpdaily_signals(strategy, candles, window)
+    signals[data['askOpen'] - data['bidOpen'] > strategy.spread_cap] = 0
+    multipliers = strategy.trade_multipliers['1']
+    sl_multiplier = np.where(signals == LONG, multipliers['long']['sl'], multipliers['short']['sl'])
+    tp_multiplier = np.where(signals == LONG, multipliers['long']['tp'], multipliers['short']['tp'])
+    last_close = np.where(signals == LONG, data['askClose'], data['bidClose'])
+    sl_pip_amount = np.abs((close - low) + (high - close)) + atr / 10 + atr * sl_multiplier
+    tp_pip_amount = atr * tp_multiplier
+    precision = strategy.instrument.price_precision
+
+    return _build_orders(
+        data,
+        signals,
+        'MARKET',
+        entry=last_close,
+        stop_loss=np.round(last_close - signals * sl_pip_amount, precision),
+        take_profit=np.round(last_close + signals * tp_pip_amount, precision),
+        valid_bars=1,
+    )
+
+
+def _get_time_frame_index(strategy: Strategy, candles: Dict[str, CandleArrays], time_frame: str) -> np.ndarray:
+    """ Index of the latest time_frame candle closed at each entry candle's close, -1 before the first. """
+    close_times = candles[time_frame].close_times
+    entry_close_times = candles[strategy.entry_timeframe].close_times
+
+    return np.searchsorted(close_times, entry_close_times, side='right') - 1
+
+
+def _get_ssl_values(strategy: SSLMultiTimeFrame, candles: Dict[str, CandleArrays], window: int):
+    """ _current_ssl_values of each time frame at every entry candle, and whether every time frame had a full window.
+    """
+    ssl_values = {}
+    is_evaluated = _has_full_window(len(candles[strategy.entry_timeframe]), window)
+    for time_frame in strategy.time_frames:
+        ssl = _get_ssl_channel(candles[time_frame], strategy.ssl_periods[time_frame], window)
+        if time_frame == strategy.entry_timeframe:
+            ssl_values[time_frame] = ssl
+            continue
+        idx = _get_time_frame_index(strategy, candles, time_frame)
+        ssl_values[time_frame] = np.where(idx >= 0, ssl[np.maximum(idx, 0)], 0)
+        is_evaluated &= idx >= window - 1
+
+    return ssl_values, is_evaluated
+
+
+def get_ssl_hammer_pin_signals(strategy: SSLHammerPin, candles: Dict[str, CandleArrays], window: int) -> np.ndarray:
+    data = candles[strategy.entry_timeframe]
+    daily = candles['D']
+    open_, high, low, close = data['midOpen'], data['midHigh'], data['midLow'], data['midClose']
+    atr = np.round(_get_average_true_range(data, window), 5)
+    ssma = np.round(_get_ssma(data, strategy.entry_ssma_period, window), 5)
+    daily_ssl = _get_ssl_channel(daily, strategy.ssl_periods['D'], window)
+    daily_idx = _get_time_frame_index(strategy, candles, 'D')
+    daily_ssl = np.where(daily_idx >= 0, daily_ssl[np.maximum(daily_idx, 0)], 0)
+    biases = {}
+    for bias, direction in BIASES.items():
+        if bias not in strategy.directions:
+            biases[bias] = np.zeros(len(data), dtype=bool)
+            continue
+        coeffs = strategy.hammer_pin_coefficients[bias]
+        multipliers = strategy.boundary_multipliers.get('reverse', {}).get('H1', {}).get(bias, {})
+        price = low if direction == LONG else high
+        biases[bias] = (high - low > atr * strategy.x_atr_coeffs[bias]) \
+            & (hammer_pin_signal(open_, high, low, close, coeffs['body'], coeffs['head_tail']) == direction) \
+            & (daily_ssl == direction) \
+            & _has_met_reverse_trade_condition(multipliers, price, ssma, atr)
+    is_evaluated = _has_full_window(len(data), window) & (daily_idx >= window - 1)
+
+    return np.where(is_evaluated, _combine_biases(biases['long'], biases['short']), 0)
+
+
+def get_ssl_hammer_pin_orders(strategy: SSLHammerPin, candles: Dict[str, CandleArrays], window: int) -> pd.DataFrame:
+    """ Stop orders offset from the signal candle's extreme, cleared at the next close if they haven't filled. """
+    data = candles[strategy.entry_timeframe]
+    atr = np.round(_get_average_true_range(data, window), 5)
+    signals = get_ssl_hammer_pin_signals(strategy, candles, window)
+    if strategy.trading_restriction == 'trading_hours':
+        hours = pd.DatetimeIndex(data.close_times).tz_localize('UTC').tz_convert(strategy.LONDON_TZ).hour
+        signals[~((hours >= 7) & (hours < 22))] = 0
+    elif strategy.trading_restriction == 'spread_cap':
+        signals[data['askOpen'] - data['bidOpen'] > strategy.spread_cap] = 0
+    else:
+        raise ValueError('Trading restriction not recognised.')
+    multipliers = strategy.trade_multipliers['1']
+    sl_multiplier = np.where(signals == LONG, multipliers['long']['sl'], multipliers['short']['sl'])
+    tp_multiplier = np.where(signals == LONG, multipliers['long']['tp'], multipliers['short']['tp'])
+    precision = strategy.instrument.price_precision
+    entry = np.round(np.where(signals == LONG, data['midHigh'], data['midLow']) + signals * atr / 7, precision)
+    sl_pip_amount = atr * sl_multiplier
+
+    return _build_orders(
+        data,
+        signals,
+        'STOP',
+        entry=entry,
+        price_bound=np.round(entry + signals * atr / 2, precision),
+        stop_loss=np.round(entry - signals * sl_pip_amount, precision),
+        take_profit=np.round(entry + signals * sl_pip_amount * tp_multiplier, precision),
+        valid_bars=1,
+    )
+
+
+def _get_ssl_stop_orders(strategy: SSLMultiTimeFrame,
+                         candles: Dict[str, CandleArrays],
+                         window: int,
+                         signals: np.ndarray) -> pd.DataFrame:
+    """ Stop orders offset from the entry candle's close, kept until the entry time frame's SSL value changes.
+
+        signals are only placed where the entry SSL value changed at that candle, and not on the first candle.
+    """
+    data = candles[strategy.entry_timeframe]
+    ssl_values, is_evaluated = _get_ssl_values(strategy, candles, window)
+    entry_ssl = ssl_values[strategy.entry_timeframe]
+    signals = np.where(_is_new_entry_signal(entry_ssl, is_evaluated), signals, 0)
+    atr = np.round(_get_average_true_range(data, window), 5)
+    for bias, direction in BIASES.items():
+        if bias not in strategy.trade_multipliers['1']:
+            signals[signals == direction] = 0
+    precision = strategy.instrument.price_precision
+    entry = np.round(data['midClose'] + signals * atr / 5, precision)
+    sl_pip_amount = atr * _get_trade_multiplier(strategy, signals, 'sl')
+    tp_pip_amount = sl_pip_amount * _get_trade_multiplier(strategy, signals, 'tp')
+
+    return _build_orders(
+        data,
+        signals,
+        'STOP',
+        entry=entry,
+        price_bound=np.round(entry + signals * atr / 2, precision),
+        stop_loss=np.round(entry - signals * sl_pip_amount, precision),
+        take_profit=np.round(entry + signals * tp_pip_amount, precision),
+        valid_bars=_get_bars_until_change(entry_ssl, is_evaluated),
+    )
+
+
+def get_ssl_investment_signals(strategy: SSLInvestment, candles: Dict[str, CandleArrays], window: int) -> np.ndarray:
+    data = candles[strategy.entry_timeframe]
+    ssl_values, is_evaluated = _get_ssl_values(strategy, candles, window)
+    atr = np.round(_get_average_true_range(data, window), 5)
+    ssma = np.round(_get_ssma(data, 50, window), 5)
+    multipliers = strategy.boundary_multipliers.get('continuation', {}).get('H1', {}).get('long', {})
+    longs = (ssl_values['D'] == LONG) & (ssl_values['H1'] == LONG) \
+        & _is_within_valid_boundary(multipliers, data['midClose'], ssma, atr)
+
+    return np.where(is_evaluated & longs, LONG, 0)
+
+
+def get_ssl_investment_orders(strategy: SSLInvestment, candles: Dict[str, CandleArrays], window: int) -> pd.DataFrame:
+    """ Long stop orders from the H1 close, placed as the H1 SSL turns long. """
+    return _get_ssl_stop_orders(strategy, candles, window, get_ssl_investment_signals(strategy, candles, window))
+
+
+def get_ssl_currency_signals(strategy: SSLCurrency, candles: Dict[str, CandleArrays], window: int) -> np.ndarray:
+    ssl_values, is_evaluated = _get_ssl_values(strategy, candles, window)
+    longs = np.logical_and.reduce([ssl_values[time_frame] == LONG for time_frame in strategy.time_frames])
+    shorts = np.logical_and.reduce([ssl_values[time_frame] == SHORT for time_frame in strategy.time_frames])
+
+    return np.where(is_evaluated, np.where(shorts, SHORT, np.where(longs, LONG, 0)), 0)
+
+
+def get_ssl_currency_orders(strategy: SSLCurrency, candles: Dict[str, CandleArrays], window: int) -> pd.DataFrame:
+    """ Stop orders from the M30 close as the M30 SSL turns, while the spread and the distance from the SSMA allow. """
+    data = candles[strategy.entry_timeframe]
+    signals = get_ssl_currency_signals(strategy, candles, window)
+    atr = np.round(_get_average_true_range(data, window), 5)
+    ssma = np.round(_get_ssma(data, 50, window), 5)
+    for bias, direction in BIASES.items():
+        multipliers = strategy.boundary_multipliers.get('continuation', {}).get('M30', {}).get(bias, {})
+        is_within = _is_within_valid_boundary(multipliers, data['midClose'], ssma, atr)
+        signals[(signals == direction) & ~is_within] = 0
+    signals[data['askOpen'] - data['bidOpen'] > 0.0004] = 0
+
+    return _get_ssl_stop_orders(strategy, candles, window, signals)
+
+
+def get_heikin_ashi_ewm_1_signals(strategy: HeikinAshiEwm1,
+                                  candles: Dict[str, CandleArrays],
+                                  window: int) -> np.ndarray:
+    data = candles[strategy.entry_timeframe]
+    close = data['midClose']
+    atr = _get_average_true_range(data, window)
+    ssma = np.round(_get_ssma(data, strategy.ssma_period, window), 5)
+    ewm = np.round(_get_ewm(data, strategy.ewm_period, window), 5)
+    heikin_ashi = _get_heikin_ashi_signal(data, window)
+    biases = {}
+    for bias, direction in BIASES.items():
+        multipliers = strategy.boundary_multipliers.get(strategy.entry_timeframe, {}).get(bias, {})
+        is_trending = ewm > ssma if direction == LONG else ewm < ssma
+        biases[bias] = (bias in strategy.directions) & is_trending & (heikin_ashi == direction) \
+            & _is_within_valid_boundary(multipliers, close, ssma, atr)
+
+    return np.where(_has_full_window(len(data), window), _combine_biases(biases['long'], biases['short']), 0)
+
+
+def get_heikin_ashi_ewm_1_orders(strategy: HeikinAshiEwm1,
+                                 candles: Dict[str, CandleArrays],
+                                 window: int) -> pd.DataFrame:
+    """ Stop orders from the close as the Heikin Ashi candles turn, kept until they turn again. """
+    data = candles[strategy.entry_timeframe]
+    is_evaluated = _has_full_window(len(data), window)
+    heikin_ashi = _get_heikin_ashi_signal(data, window)
+    signals = get_heikin_ashi_ewm_1_signals(strategy, candles, window)
+    signals = np.where(_is_new_entry_signal(heikin_ashi, is_evaluated), signals, 0)
+    atr = _get_average_true_range(data, window)
+    precision = strategy.instrument.price_precision
+    entry = np.round(np.where(signals == LONG, data['askClose'], data['bidClose']) + signals * atr / 15, precision)
+
+    return _build_orders(
+        data,
+        signals,
+        'STOP',
+        entry=entry,
+        stop_loss=np.round(entry - signals * atr * _get_trade_multiplier(strategy, signals, 'sl'), precision),
+        take_profit=np.round(entry + signals * atr * _get_trade_multiplier(strategy, signals, 'tp'), precision),
+        valid_bars=_get_bars_until_change(heikin_ashi, is_evaluated),
+    )
+
+
+ORDER_GENERATORS = {
+    HPDaily: get_hpdaily_orders,
+    SSLHammerPin: get_ssl_hammer_pin_orders,
+    SSLInvestment: get_ssl_investment_orders,
+    SSLCurrency: get_ssl_currency_orders,
+    HeikinAshiEwm1: get_heikin_ashi_ewm_1_orders,
+}
+
+
+def get_order_generator(strategy: Strategy) -> Callable:
+    for cls in type(strategy).__mro__:
+        if cls in ORDER_GENERATORS:
+            return ORDER_GENERATORS[cls]
+    raise TypeError(
+        f'No vectorized signals for {type(strategy).__name__}, its orders depend on its state, replay it instead.'
+    )
@@ -0,0 +1,180 @@
+# Python standard.
+from typing import Dict, Iterable, List, Tuple, Type
+
+# Third-party.
+import numpy as np
+import pandas as pd
+
+# Local.
+from pagetpalace.src.backtesting.candles import CandleArrays
+from pagetpalace.src.backtesting.parameter_sweep import (
+    METRIC_COLUMNS,
+    ParameterSweep,
+    build_strategy,
+    expand_grid,
+    get_trades,
+    summarise_trades,
+)
+from pagetpalace.src.oanda.strategies.strategy import Strategy
+from pagetpalace.tools.logger import *
+
+Window = Tuple[Tuple[int, int], Tuple[int, int]]
+
+
+def get_walk_forward_windows(length: int,
+                             in_sample: int,
+                             out_of_sample: int,
+                             step: int = None,
+                             start: int = 0) -> List[Window]:
+    """ ((in sample start, stop), (out of sample start, stop)) bar ranges, rolling forward by step.
+
+        step is out_of_sample by default, so the out of sample windows follow on from each other. Windows that would
+        run past length are dropped.
+    """
+    if in_sample <= 0 or out_of_sample <= 0:
+        raise ValueError('in_sample and out_of_sample must be positive.')
+    step = out_of_sample if step is None else step
+    if step <= 0:
+        raise ValueError('step must be positive.')
+    windows = []
+    while start + in_sample + out_of_sample <= length:
+        split = start + in_sample
+        windows.append(((start, split), (split, split + out_of_sample)))
+        start += step
+
+    return windows
+
+
+def get_window_trades(trades: pd.DataFrame, bars: Tuple[int, int]) -> pd.DataFrame:
+    """ Trades signalled on a candle in bars, trades must be sorted by signal_bar. """
+    start, stop = np.searchsorted(trades['signal_bar'].to_numpy(), bars, side='left')
+
+    return trades.iloc[start:stop]
+
+
+def get_closed_window_trades(trades: pd.DataFrame, bars: Tuple[int, int]) -> pd.DataFrame:
+    """ Trades signalled on a candle in bars that were closed by the end of it, or never filled.
+
+        Trades still open at the end of bars are left out, their pnl comes from prices after the window.
+    """
+    window_trades = get_window_trades(trades, bars)
+
+    return window_trades[window_trades['exit_bar'] < bars[1]]
+
+
+class WalkForward:
+    """ Optimises a strategy on rolling in sample windows and evaluates the best parameters on the window after each.
+
+        Windows are counted in candles of the strategy's entry time frame. Rather than sweeping each window on its own,
+        every set of parameters is backtested once over the whole history, across a process pool as in ParameterSweep,
+        and its trades are split between the windows by signal candle. Indicators only look back over the trailing
+        Strategy.CANDLE_COUNT candles, so they're the same whichever window a candle is in: they're computed once per
+        history and cached on its CandleArrays for every parameter set that shares them. Trading carries on across
+        windows, trades are held to their exit and the open trades cap applies over the whole history. Parameters are
+        only scored on in sample trades closed before the out of sample window starts, so its prices can't pick them.
+    """
+
+    def __init__(self,
+                 strategy_class: Type[Strategy],
+                 candles: Dict[str, CandleArrays],
+                 space: dict,
+                 in_sample_bars: int,
+                 out_of_sample_bars: int,
+                 step_bars: int = None,
+                 objective: str = 'total_r',
+                 min_trades: int = 1,
+                 max_workers: int = None):
+        if objective not in METRIC_COLUMNS:
+            raise ValueError(f'objective must be one of {METRIC_COLUMNS}.')
+        self.sweep = ParameterSweep(strategy_class, candles, space, max_workers=max_workers)
+        self.in_sample_bars = in_sample_bars
+        self.out_of_sample_bars = out_of_sample_bars
+        self.step_bars = step_bars
+        self.objective = objective
+        self.min_trades = min_trades
+
+    def __repr__(self):
+        return (
+            f'WalkForward(strategy={self.sweep.strategy_class.__name__}, parameters={self.sweep.parameter_names}, '
+            f'in_sample_bars={self.in_sample_bars}, out_of_sample_bars={self.out_of_sample_bars})'
+        )
+
+    @property
+    def columns(self) -> List[str]:
+        return [
+            'fold',
+            'in_sample_start',
+            'in_sample_stop',
+            'out_of_sample_start',
+            'out_of_sample_stop',
+            'run',
+            *self.sweep.parameter_names,
+            f'in_sample_{self.objective}',
+            *(f'oos_{name}' for name in METRIC_COLUMNS),
+        ]
+
+    def get_trades(self, parameter_sets: Iterable[dict]) -> Dict[int, pd.DataFrame]:
+        """ Whole history trades of every run that didn't fail, sorted by signal candle. """
+        trades = {}
+        for run, _, run_trades, error in self.sweep.iter_runs(parameter_sets, task=get_trades):
+            if error is None:
+                trades[run] = run_trades.sort_values('signal_bar', kind='stable').reset_index(drop=True)
+
+        return trades
+
+    def select(self, trades: Dict[int, pd.DataFrame], bars: Tuple[int, int]) -> Tuple[int, dict]:
+        """ The run with the best objective over the trades closed in bars and its summary, ties go to the earliest run.
+
+            Runs with fewer than min_trades closed trades in bars are passed over, (None, None) if every run is.
+        """
+        best_run, best_summary = None, None
+        for run in sorted(trades):
+            summary = summarise_trades(get_closed_window_trades(trades[run], bars))
+            if summary['trades'] < self.min_trades or np.isnan(summary[self.objective]):
+                continue
+            if best_summary is None or summary[self.objective] > best_summary[self.objective]:
+                best_run, best_summary = run, summary
+
+        return best_run, best_summary
+
+    def run(self, parameter_sets: Iterable[dict] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """ A row per fold with the parameters picked in sample and their out of sample metrics, and the out of sample
+            trades of every fold with a fold column. The full grid of space is searched by default.
+        """
+        parameter_sets = list(expand_grid(self.sweep.space) if parameter_sets is None else parameter_sets)
+        if not parameter_sets:
+            raise ValueError('No parameter sets to search.')
+        entry_timeframe = build_strategy(self.sweep.strategy_class, parameter_sets[0]).entry_timeframe
+        windows = get_walk_forward_windows(
+            len(self.sweep.candles[entry_timeframe]),
+            self.in_sample_bars,
+            self.out_of_sample_bars,
+            self.step_bars,
+        )
+        if not windows:
+            raise ValueError('The history is too short for one in sample and one out of sample window.')
+        trades = self.get_trades(parameter_sets)
+        rows, oos_trades = [], []
+        for fold, (in_sample, out_of_sample) in enumerate(windows):
+            run, in_sample_summary = self.select(trades, in_sample)
+            row = {
+                'fold': fold,
+                'in_sample_start': in_sample[0],
+                'in_sample_stop': in_sample[1],
+                'out_of_sample_start': out_of_sample[0],
+                'out_of_sample_stop': out_of_sample[1],
+            }
+            if run is None:
+                logger.warning(f'No parameters made {self.min_trades} trades in sample for fold {fold}.')
+                rows.append(row)
+                continue
+            fold_trades = get_window_trades(trades[run], out_of_sample).assign(fold=fold)
+            oos_trades.append(fold_trades)
+            row.update(self.sweep.get_row(run, parameter_sets[run]))
+            row[f'in_sample_{self.objective}'] = in_sample_summary[self.objective]
+            row.update({f'oos_{name}': value for name, value in summarise_trades(fold_trades).items()})
+            rows.append(row)
+        folds = pd.DataFrame(rows, columns=self.columns)
+        oos_trades = pd.concat(oos_trades, ignore_index=True) if oos_trades else pd.DataFrame(columns=['fold'])
+
+        return folds, oos_trades
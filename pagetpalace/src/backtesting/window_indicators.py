@@ -0,0 +1,174 @@
+# Third-party.
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+LONG = 1
+SHORT = -1
+
+
+def _ewm_weights(alpha: float, window: int, adjust: bool) -> np.ndarray:
+    """ Weight of each value in a window, oldest first, for the last value of an ewm over exactly that window. """
+    decay = (1. - alpha) ** np.arange(window - 1, -1, -1)
+    if adjust:
+        return decay / decay.sum()
+    weights = alpha * decay
+    weights[0] = decay[0]
+
+    return weights
+
+
+def windowed_ewm(values: np.ndarray, alpha: float, window: int, adjust: bool, first: np.ndarray = None) -> np.ndarray:
+    """ Value i is the last value of an ewm over values[i - window + 1:i + 1], the window a live strategy sees.
+
+        first optionally replaces the oldest value of each full window, for series whose first value in a window is
+        calculated differently, e.g. the true range of a candle without a previous close.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    out = pd.Series(values).ewm(alpha=alpha, adjust=adjust).mean().to_numpy(copy=True)
+    if len(values) >= window:
+        weights = _ewm_weights(alpha, window, adjust)
+        out[window - 1:] = sliding_window_view(values, window) @ weights
+        if first is not None:
+            out[window - 1:] += weights[0] * (first[:len(values) - window + 1] - values[:len(values) - window + 1])
+
+    return out
+
+
+def windowed_average_true_range(high: np.ndarray,
+                                low: np.ndarray,
+                                close: np.ndarray,
+                                periods: int = 14,
+                                window: int = 50) -> np.ndarray:
+    """ average_true_range of each window, the first candle in a window has no previous close. """
+    candle_range = high - low
+    true_range = candle_range.copy()
+    if len(true_range) > 1:
+        np.fmax(true_range[1:], np.abs(high[1:] - close[:-1]), out=true_range[1:])
+        np.fmax(true_range[1:], np.abs(low[1:] - close[:-1]), out=true_range[1:])
+
+    return windowed_ewm(true_range, 1 / periods, window, adjust=True, first=candle_range)
+
+
+def windowed_ssma(close: np.ndarray, periods: int = 50, window: int = 50) -> np.ndarray:
+    """ append_ssma of each window. """
+    return windowed_ewm(close, 1. / periods, window, adjust=False)
+
+
+def windowed_ssl_channel(high: np.ndarray,
+                         low: np.ndarray,
+                         close: np.ndarray,
+                         periods: int = 20,
+                         window: int = 50) -> np.ndarray:
+    """ ssl_channel of each window, a break carries forward only while it's inside the window. """
+    high_sma = pd.Series(high).rolling(periods).mean().to_numpy()
+    low_sma = pd.Series(low).rolling(periods).mean().to_numpy()
+    with np.errstate(invalid='ignore'):
+        breaks = np.where(close > high_sma, LONG, np.where(close < low_sma, SHORT, 0))
+    positions = np.arange(len(close))
+    last_break = np.maximum.accumulate(np.where(breaks != 0, positions, -1)) if len(close) else positions
+    # The first periods - 1 candles of a window have no moving average, so can't break.
+    is_visible = last_break >= positions - window + periods
+
+    return np.where(is_visible & (last_break >= 0), breaks[np.maximum(last_break, 0)], 0)
+
+
+def windowed_heikin_ashi_signal(open_: np.ndarray,
+                                high: np.ndarray,
+                                low: np.ndarray,
+                                close: np.ndarray,
+                                window: int = 50) -> np.ndarray:
+    """ LONG where append_heikin_ashi of a window closes its last candle above HA_Open, SHORT where below, else 0.
+
+        append_heikin_ashi downcasts prices to float32 and HA_Open starts again at every window's first candle, so
+        HA_Open is stepped forward in float32 from the start of every window at once. The first window - 1 candles
+        have no full window and are 0.
+    """
+    open_, high, low, close = (pd.to_numeric(pd.Series(prices), downcast='float').to_numpy()
+                               for prices in (open_, high, low, close))
+    ha_close = (open_ + high + low + close) / 4
+    signals = np.zeros(len(close), dtype=np.int64)
+    windows = len(close) - window + 1
+    if windows <= 0:
+        return signals
+    ha_open = (open_[:windows] + close[:windows]) / 2
+    for i in range(window - 1):
+        ha_open = (ha_open + ha_close[i:i + windows]) / 2
+    ha_open = np.round(ha_open, 5)
+    last_close = ha_close[window - 1:]
+    signals[window - 1:] = np.where(ha_open < last_close, LONG, np.where(ha_open > last_close, SHORT, 0))
+
+    return signals
+
+
+def _all_of_previous(flags: np.ndarray, look_back: int, offset: int = 1) -> np.ndarray:
+    """ True at i when flags[i - look_back - offset + 1:i - offset + 1] are all True. """
+    failures = np.concatenate(([0], np.cumsum(~flags)))
+    end = np.arange(len(flags)) - offset + 1
+    start = end - look_back
+    out = np.zeros(len(flags), dtype=bool)
+    valid = start >= 0
+    out[valid] = failures[end[valid]] - failures[start[valid]] == 0
+
+    return out
+
+
+def was_previous_red_streak(open_: np.ndarray, close: np.ndarray, look_back: int = 4) -> np.ndarray:
+    return _all_of_previous(~(open_ < close), look_back)
+
+
+def was_previous_green_streak(open_: np.ndarray, close: np.ndarray, look_back: int = 4) -> np.ndarray:
+    return _all_of_previous(~(open_ > close), look_back)
+
+
+def was_price_descending(low: np.ndarray, look_back: int = 2) -> np.ndarray:
+    steps = np.zeros(len(low), dtype=bool)
+    steps[1:] = ~(low[:-1] < low[1:])
+
+    return _all_of_previous(steps, look_back, offset=0)
+
+
+def was_price_ascending(high: np.ndarray, look_back: int = 2) -> np.ndarray:
+    steps = np.zeros(len(high), dtype=bool)
+    steps[1:] = ~(high[:-1] > high[1:])
+
+    return _all_of_previous(steps, look_back, offset=0)
+
+
+def hammer_pin_signal(open_: np.ndarray,
+                      high: np.ndarray,
+                      low: np.ndarray,
+                      close: np.ndarray,
+                      body_coeff: float,
+                      head_tail_coeff: float) -> np.ndarray:
+    """ get_hammer_pin_signal of every candle, LONG, SHORT or 0. """
+    is_green = close > open_
+    long_green = (open_ - low > body_coeff * (close - open_)) & (head_tail_coeff * (high - close) < open_ - low)
+    short_green = (high - close > body_coeff * (close - open_)) & (head_tail_coeff * (open_ - low) < high - close)
+    long_red = (close - low > body_coeff * (open_ - close)) & (head_tail_coeff * (high - open_) < close - low)
+    short_red = (high - open_ > body_coeff * (open_ - close)) & (head_tail_coeff * (close - low) < high - open_)
+
+    return np.where(
+        is_green,
+        np.where(long_green, LONG, np.where(short_green, SHORT, 0)),
+        np.where(long_red, LONG, np.where(short_red, SHORT, 0)),
+    )
+
+
+def hammer_pin_signal_v2(open_: np.ndarray,
+                         high: np.ndarray,
+                         low: np.ndarray,
+                         close: np.ndarray,
+                         body_coeff: float,
+                         shadow_coeff: float) -> np.ndarray:
+    """ get_hammer_pin_signal_v2 of every candle, LONG, SHORT or 0. """
+    def adjust_if_zero(values: np.ndarray) -> np.ndarray:
+        return np.where(values > 0, values, 0.00001)
+
+    body = adjust_if_zero(np.abs(open_ - close))
+    tail = adjust_if_zero(np.minimum(open_, close) - low)
+    head = adjust_if_zero(high - np.maximum(open_, close))
+    is_hammer = (tail > body_coeff * body) & (head < tail / shadow_coeff)
+    is_pin = (head > body_coeff * body) & (tail < head / shadow_coeff)
+
+    return np.where(open_ == close, 0, np.where(is_hammer, LONG, np.where(is_pin, SHORT, 0)))
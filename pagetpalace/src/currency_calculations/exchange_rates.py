@@ -0,0 +1,126 @@
+# Python standard.
+import datetime
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+
+# Local.
+from pagetpalace.src.oanda.instruments.instruments import get_all_instruments
+from pagetpalace.src.oanda.pricing import OandaPricingData
+from pagetpalace.src.oanda.settings import LIVE_ACCESS_TOKEN, PRIMARY_ACCOUNT_NUMBER
+from pagetpalace.src.scheduling.clock import get_clock
+
+# Seconds a rate is served from memory before it's requested again.
+DEFAULT_MAX_AGE_SECONDS = 5.
+MAX_RETRIES = 5
+
+
+def get_conversion_symbols() -> Set[str]:
+    """ Every symbol an instrument's exchange_rate_data converts with. """
+    return {
+        data['symbol']
+        for instrument in get_all_instruments().values()
+        for data in instrument.exchange_rate_data.values()
+    }
+
+
+class ExchangeRateService:
+    """ Latest rates of the symbols UnitConversions converts with, shared by every strategy in the process.
+
+        Rates are the ask, as UnitConversions has always used, and are served from memory while they're younger than
+        max_age seconds. Stale rates are requested together with every other stale conversion symbol in one pricing
+        request, so sizing an order and checking its risk, or sizing orders on several instruments, makes one
+        request between them. on_price() feeds rates from a pricing stream instead.
+    """
+
+    def __init__(self,
+                 pricing: OandaPricingData = None,
+                 clock=None,
+                 max_age: float = DEFAULT_MAX_AGE_SECONDS,
+                 symbols: Iterable[str] = None):
+        self.pricing = pricing or OandaPricingData(LIVE_ACCESS_TOKEN, PRIMARY_ACCOUNT_NUMBER, 'LIVE_API')
+        self.max_age = max_age
+        self.symbols = set(get_conversion_symbols() if symbols is None else symbols)
+        self.fetches = 0
+        self._clock = clock
+        self._rates = {}
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+
+    def __repr__(self):
+        return f'ExchangeRateService(rates={len(self._rates)}, fetches={self.fetches})'
+
+    def _now(self) -> datetime.datetime:
+        """ The clock passed in, or whichever is in use process wide so a replay's rates age in simulated time. """
+        return (self._clock or get_clock()).now()
+
+    def _get_stale(self, symbols: Iterable[str]) -> List[str]:
+        now = self._now()
+        with self._lock:
+            return sorted(
+                symbol for symbol in symbols
+                if symbol not in self._rates or (now - self._rates[symbol][1]).total_seconds() > self.max_age
+            )
+
+    def update(self, symbol: str, rate: float, time: datetime.datetime = None):
+        with self._lock:
+            self._rates[symbol] = (float(rate), time or self._now())
+
+    def on_price(self, price: dict):
+        """ A PRICE message, from the pricing stream or get_pricing_info, for a symbol converted with. """
+        if price.get('type', 'PRICE') == 'PRICE' and price.get('asks') and price['instrument'] in self.symbols:
+            self.update(price['instrument'], float(price['asks'][0]['price']))
+
+    def refresh(self, symbols: Iterable[str] = None):
+        """ Request the stale rates of symbols and of every other conversion symbol in one request. """
+        symbols = set(self.symbols if symbols is None else symbols)
+        with self._fetch_lock:
+            stale = self._get_stale(symbols | self.symbols)
+            for _ in range(MAX_RETRIES):
+                if not any(symbol in symbols for symbol in stale):
+                    return
+                response = self.pricing.get_pricing_info(stale, include_home_conversions=False)
+                self.fetches += 1
+                for price in response.get('prices', []):
+                    if price.get('asks'):
+                        self.update(price['instrument'], float(price['asks'][0]['price']))
+                stale = self._get_stale(stale)
+        if any(symbol in symbols for symbol in stale):
+            raise Exception(f'Failed to get latest prices of {stale} when calculating conversions.')
+
+    def get_rates(self, symbols: Iterable[str]) -> Dict[str, float]:
+        symbols = list(symbols)
+        if self._get_stale(symbols):
+            self.refresh(symbols)
+        with self._lock:
+            return {symbol: self._rates[symbol][0] for symbol in symbols}
+
+    def get_rate(self, symbol: str) -> float:
+        return self.get_rates([symbol])[symbol]
+
+    def get_updated_at(self, symbol: str) -> Optional[datetime.datetime]:
+        """ When the rate held for symbol was last updated, None if there isn't one. """
+        with self._lock:
+            entry = self._rates.get(symbol)
+
+        return entry[1] if entry else None
+
+    def clear(self):
+        with self._lock:
+            self._rates.clear()
+
+
+EXCHANGE_RATES = ExchangeRateService()
+_exchange_rates = EXCHANGE_RATES
+
+
+def get_exchange_rates() -> ExchangeRateService:
+    """ The service used wherever one isn't passed in, EXCHANGE_RATES unless a replay has set another. """
+    return _exchange_rates
+
+
+def set_exchange_rates(service: ExchangeRateService) -> ExchangeRateService:
+    """ Use service process wide, returns the service it replaces. """
+    global _exchange_rates
+    previous, _exchange_rates = _exchange_rates, service
+
+    return previous
@@ -1,53 +1,42 @@
 # Python standard.
 import math
-from datetime import datetime
 
 # Local.
+from pagetpalace.src.currency_calculations.exchange_rates import ExchangeRateService, get_exchange_rates
 from pagetpalace.src.oanda.instruments.instruments import Instrument
 from pagetpalace.src.oanda.instruments.instrument_attributes import BaseCurrencies, InstrumentTypes
-from pagetpalace.src.oanda.pricing import OandaPricingData
-from pagetpalace.src.oanda.settings import LIVE_ACCESS_TOKEN, PRIMARY_ACCOUNT_NUMBER
+
+# Share of the balance trades can take as margin, the rest stays free.
+UNRESTRICTED_MARGIN_CAP = 0.9
+# Account currency under which what's left of the unrestricted margin isn't worth a trade.
+MINIMUM_MARGIN = 200
 
 
 class UnitConversions:
     _ACCOUNT_CURRENCY = BaseCurrencies.GBP
-    _UNRESTRICTED_MARGIN_CAP = 0.9
 
-    def __init__(self, instrument: Instrument, entry_price: float, exchange_rates: dict = None):
-        self._pricing = OandaPricingData(LIVE_ACCESS_TOKEN, PRIMARY_ACCOUNT_NUMBER, 'LIVE_API')
+    def __init__(self,
+                 instrument: Instrument,
+                 entry_price: float,
+                 exchange_rates: dict = None,
+                 exchange_rate_service: ExchangeRateService = None):
         self.instrument = instrument
         self.entry_price = entry_price
         self._pound_to_units_variable = 0.
         self._pound_to_pip_variable = 0.
         self._exchange_rates = exchange_rates
-        self._last_exchange_rate_update = datetime.now()
+        self._exchange_rate_service = exchange_rate_service or get_exchange_rates()
         self._get_formula_variables()
 
-    def _get_latest_instrument_price(self, symbol: str, retry_count: int = 0) -> float:
-        price = 0.
-        latest_price = self._pricing.get_pricing_info([symbol], include_home_conversions=False)
-        if not len(latest_price['prices']) and retry_count < 5:
-            self._get_latest_instrument_price(symbol, retry_count=retry_count + 1)
-        elif len(latest_price['prices']):
-            price = float(latest_price['prices'][0]['asks'][0]['price'])
-        else:
-            raise Exception('Failed to get latest instrument price when calculating conversions.')
-
-        return price
-
     def _get_required_exchange_rates(self):
-        now = datetime.now()
-        time_since_last_update = now - self._last_exchange_rate_update
-        if not self._exchange_rates or time_since_last_update.seconds > 5:
+        """ Rates passed in are used as they are, otherwise they come from the process wide exchange rate service. """
+        if not self._exchange_rates:
+            symbols = {key: data['symbol'] for key, data in self.instrument.exchange_rate_data.items()}
+            rates = self._exchange_rate_service.get_rates(symbols.values())
             self._exchange_rates = {
-                    'units': self._get_latest_instrument_price(
-                        self.instrument.exchange_rate_data['units']['symbol']
-                    ) if self.instrument.exchange_rate_data.get('units') else None,
-                    'p2p': self._get_latest_instrument_price(
-                        self.instrument.exchange_rate_data['p2p']['symbol']
-                    ) if self.instrument.exchange_rate_data.get('p2p') else None,
-                }
-        self._last_exchange_rate_update = now
+                'units': rates[symbols['units']] if symbols.get('units') else None,
+                'p2p': rates[symbols['p2p']] if symbols.get('p2p') else None,
+            }
 
     def _get_formula_variables(self):
         if self.instrument.exchange_rate_data:
@@ -93,18 +82,18 @@ class UnitConversions:
 
     @classmethod
     def _adjust_according_to_restricted_margin(cls, margin_size: float, available_minus_restricted: float) -> float:
-        if (margin_size > available_minus_restricted) and (available_minus_restricted < 200):
+        if (margin_size > available_minus_restricted) and (available_minus_restricted < MINIMUM_MARGIN):
             margin_size = 0
-        elif (margin_size > available_minus_restricted) and (available_minus_restricted >= 200):
+        elif (margin_size > available_minus_restricted) and (available_minus_restricted >= MINIMUM_MARGIN):
             margin_size = available_minus_restricted
 
         return margin_size
 
     def _get_valid_margin_size(self, account_data: dict, equity_split: float) -> float:
         balance = float(account_data['balance'])
-        margin_size = (balance * self._UNRESTRICTED_MARGIN_CAP) / equity_split
+        margin_size = (balance * UNRESTRICTED_MARGIN_CAP) / equity_split
         available_minus_restricted = self._margin_not_being_used_in_orders(account_data) \
-            - (balance * (1 - self._UNRESTRICTED_MARGIN_CAP))
+            - (balance * (1 - UNRESTRICTED_MARGIN_CAP))
 
         return self._adjust_according_to_restricted_margin(margin_size, available_minus_restricted)
 
@@ -1,6 +1,9 @@
 # Python standard.
 from typing import Dict
 
+# Third-party.
+import numpy as np
+
 
 def check_pct_hit(prices: Dict[str, float], trade: dict, pct: float) -> bool:
     has_hit = False
@@ -13,11 +16,19 @@ def check_pct_hit(prices: Dict[str, float], trade: dict, pct: float) -> bool:
 
 
 def _check_long_pct_hit(price: float, trade: dict, pct: float) -> bool:
-    return price >= round((float(trade['price']) + _get_long_trade_pct_target_pips(trade, pct)), 5)
+    return price >= get_pct_hit_price(trade, pct)
 
 
 def _check_short_pct_hit(price: float, trade: dict, pct: float) -> bool:
-    return price <= round((float(trade['price']) - _get_short_trade_pct_target_pips(trade, pct)), 5)
+    return price <= get_pct_hit_price(trade, pct)
+
+
+def get_pct_hit_price(trade: dict, pct: float) -> float:
+    """ The bid high a long trade's or the ask low a short trade's check_pct_hit is hit at. """
+    if float(trade['currentUnits']) > 0:
+        return round((float(trade['price']) + _get_long_trade_pct_target_pips(trade, pct)), 5)
+
+    return round((float(trade['price']) - _get_short_trade_pct_target_pips(trade, pct)), 5)
 
 
 def calculate_new_sl_price(trade: dict, pct: float) -> float:
@@ -44,3 +55,47 @@ def _get_long_trade_pct_target_pips(trade: dict, pct: float) -> float:
 
 def _get_short_trade_pct_target_pips(trade: dict, pct: float) -> float:
     return (float(trade['price']) - float(trade['takeProfitOrder']['price'])) * pct
+
+
+def calculate_pct_prices(entry: np.ndarray, take_profit: np.ndarray, pct: float) -> np.ndarray:
+    """ Prices pct of the way from entry to take profit for many trades at once, long or short.
+
+        These are the targets check_pct_hit compares against and the stops calculate_new_sl_price returns.
+    """
+    return round_prices(entry + (take_profit - entry) * pct, 5)
+
+
+def round_prices(prices: np.ndarray, precision: int) -> np.ndarray:
+    """ round(price, precision) for every price at once.
+
+        np.round scales by 10 ** precision and rounds the scaled price, so where scaling rounds onto a half it can go
+        the other way from round. There the error of the scaling, worked out exactly, says which side of the half the
+        price was on. Prices too large to have digits at precision are left as they are, as round leaves them.
+    """
+    prices = np.atleast_1d(np.asarray(prices, dtype=np.float64))
+    scale = 10. ** precision
+    scaled = prices * scale
+    rounded = np.rint(scaled)
+    with np.errstate(invalid='ignore'):
+        is_half = scaled - np.floor(scaled) == 0.5
+    if is_half.any():
+        half = scaled[is_half]
+        error = _get_product_error(prices[is_half], scale, half)
+        rounded[is_half] = np.where(error > 0, half + 0.5, np.where(error < 0, half - 0.5, rounded[is_half]))
+
+    return np.where(np.abs(scaled) < 2. ** 52, rounded / scale, prices)
+
+
+def _get_product_error(a: np.ndarray, b: float, product: np.ndarray) -> np.ndarray:
+    """ a * b - product exactly, where product is a * b in floating point (Dekker's two product). """
+    a_high, a_low = _split(a)
+    b_high, b_low = _split(b)
+
+    return ((a_high * b_high - product) + a_high * b_low + a_low * b_high) + a_low * b_low
+
+
+def _split(value):
+    """ Halves of value with at most 26 significant bits each, so their products are exact. """
+    high = value * 134217729. - (value * 134217729. - value)
+
+    return high, value - high
@@ -1,6 +1,9 @@
 # Python standard.
 from typing import Dict, List
 
+# Local.
+from pagetpalace.src.oanda.id_registry import IdRegistry
+
 
 class TradeAdjustmentParameters:
     def __init__(self, instrument_symbol: str, params: Dict[int, Dict[str, float]]):
@@ -41,14 +44,15 @@ class TradeAdjustmentParameters:
         return {p.instrument_symbol: p.params for p in all_params} if all_params else {}
 
     @staticmethod
-    def init_local_history(all_params: List['TradeAdjustmentParameters']) -> Dict[str, Dict[int, list]]:
+    def init_local_history(all_params: List['TradeAdjustmentParameters']) -> IdRegistry:
+        """ Trade IDs already adjusted, keyed by (instrument_symbol, count). """
         TradeAdjustmentParameters._check_valid_input(all_params)
-        init = {}
-        if all_params:
-            for params_obj in all_params:
-                init[params_obj.instrument_symbol] = {i + 1: [] for i in range(len(params_obj.params.keys()))}
 
-        return init
+        return IdRegistry(
+            (params_obj.instrument_symbol, count)
+            for params_obj in all_params or []
+            for count in params_obj.params.keys()
+        )
 
 
 class StopLossMoveParams(TradeAdjustmentParameters):
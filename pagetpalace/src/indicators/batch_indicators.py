@@ -0,0 +1,115 @@
+# Python standard.
+from typing import Dict, List
+
+# Third-party.
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class InstrumentPanel:
+    """ Prices of N instruments stacked into N x T float64 arrays.
+
+        Each history is right aligned on its most recent candle, so the last column holds every instrument's latest
+        candle. Shorter histories are padded with NaN at the start, `mask` marks the real candles.
+    """
+
+    def __init__(self, symbols: List[str], highs: np.ndarray, lows: np.ndarray, closes: np.ndarray):
+        if not (highs.shape == lows.shape == closes.shape) or highs.ndim != 2 or len(symbols) != highs.shape[0]:
+            raise ValueError('highs, lows and closes must be N x T arrays with one row per symbol.')
+        self.symbols = symbols
+        self.highs = highs
+        self.lows = lows
+        self.closes = closes
+        self.mask = ~np.isnan(closes)
+
+    def __repr__(self):
+        return f'InstrumentPanel(instruments={len(self.symbols)}, candles={self.closes.shape[1]})'
+
+    @classmethod
+    def from_dataframes(cls, data: Dict[str, pd.DataFrame], prices: str = 'mid') -> 'InstrumentPanel':
+        symbols = list(data.keys())
+        length = max((len(df) for df in data.values()), default=0)
+        arrays = {dp: np.full((len(symbols), length), np.nan) for dp in ['High', 'Low', 'Close']}
+        for row, df in enumerate(data.values()):
+            if len(df):
+                for dp, array in arrays.items():
+                    array[row, length - len(df):] = pd.to_numeric(df[f'{prices}{dp}']).to_numpy(dtype=np.float64)
+
+        return cls(symbols, arrays['High'], arrays['Low'], arrays['Close'])
+
+
+def _ewm_mean(values: np.ndarray, alpha: float, adjust: bool) -> np.ndarray:
+    """ Row-wise equivalent of pandas' ewm(alpha=alpha, adjust=adjust, ignore_na=False).mean(), vectorised over rows
+        so the loop runs once per candle rather than once per candle per instrument.
+    """
+    out = np.empty(values.shape)
+    weighted = np.full(values.shape[0], np.nan)
+    old_wt = np.ones(values.shape[0])
+    new_wt = 1. if adjust else alpha
+    for t in range(values.shape[1]):
+        current = values[:, t]
+        is_observation = ~np.isnan(current)
+        has_started = ~np.isnan(weighted)
+        old_wt[has_started] *= 1. - alpha
+        update = has_started & is_observation
+        blend = update & (weighted != current)
+        weighted[blend] = (old_wt[blend] * weighted[blend] + new_wt * current[blend]) / (old_wt[blend] + new_wt)
+        old_wt[update] = old_wt[update] + new_wt if adjust else 1.
+        start = ~has_started & is_observation
+        weighted[start] = current[start]
+        out[:, t] = weighted
+
+    return out
+
+
+def _rolling_mean(values: np.ndarray, periods: int) -> np.ndarray:
+    out = np.full(values.shape, np.nan)
+    if values.shape[1] >= periods:
+        out[:, periods - 1:] = sliding_window_view(values, periods, axis=1).mean(axis=-1)
+
+    return out
+
+
+def batch_average_true_range(highs: np.ndarray, lows: np.ndarray, closes: np.ndarray, periods: int = 14) -> np.ndarray:
+    previous_closes = np.full(closes.shape, np.nan)
+    previous_closes[:, 1:] = closes[:, :-1]
+    true_range = np.fmax(np.fmax(highs - lows, np.abs(highs - previous_closes)), np.abs(lows - previous_closes))
+
+    return _ewm_mean(true_range, 1 / periods, adjust=True)
+
+
+def batch_ssma(closes: np.ndarray, periods: int = 50) -> np.ndarray:
+    return _ewm_mean(closes, 1. / periods, adjust=False)
+
+
+def batch_ssl_channel(highs: np.ndarray, lows: np.ndarray, closes: np.ndarray, periods: int = 20) -> np.ndarray:
+    """ 1 above the high SMA, -1 below the low SMA, otherwise the previous value. Padding is 0. """
+    high_sma = _rolling_mean(highs, periods)
+    low_sma = _rolling_mean(lows, periods)
+    with np.errstate(invalid='ignore'):
+        breaks = np.where(closes > high_sma, 1, np.where(closes < low_sma, -1, 0))
+    last_break = np.maximum.accumulate(np.where(breaks != 0, np.arange(closes.shape[1]), -1), axis=1)
+    carried = np.take_along_axis(breaks, np.maximum(last_break, 0), axis=1)
+
+    return np.where(last_break >= 0, carried, 0)
+
+
+def compute_batch_indicators(panel: InstrumentPanel,
+                             atr_periods: int = 14,
+                             ssma_periods: int = 50,
+                             ssl_periods: int = 20) -> Dict[str, np.ndarray]:
+    """ Keys follow the column names the single instrument functions append to a DataFrame. """
+    return {
+        f'ATR_{atr_periods}': batch_average_true_range(panel.highs, panel.lows, panel.closes, atr_periods),
+        f'SSMA_{ssma_periods}': batch_ssma(panel.closes, ssma_periods),
+        f'HighLowValue_{ssl_periods}_period': batch_ssl_channel(panel.highs, panel.lows, panel.closes, ssl_periods),
+    }
+
+
+def get_latest_values(panel: InstrumentPanel, indicators: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """ One row per instrument holding each indicator's value on its most recent candle. """
+    return pd.DataFrame(
+        {name: values[:, -1] if values.shape[1] else np.nan for name, values in indicators.items()},
+        index=pd.Index(panel.symbols, name='symbol'),
+    )
@@ -0,0 +1,95 @@
+# Python standard.
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Tuple
+
+# Third-party.
+import numpy as np
+import pandas as pd
+
+
+class IndicatorCache:
+    """ Least recently used store of indicator arrays, shared by everything running in the process.
+
+        A candle series is identified by its instrument, granularity, last candle time and length, so strategies
+        asking for the same indicator on an unchanged series get back the array that was already computed.
+    """
+
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f'IndicatorCache(max_size={self._max_size}, size={len(self)}, hits={self.hits}, misses={self.misses})'
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def max_size(self) -> int:
+        return self._max_size
+
+    @max_size.setter
+    def max_size(self, value: int):
+        if not isinstance(value, int) or value <= 0:
+            raise ValueError('max_size must be a positive integer.')
+        self._max_size = value
+
+    @classmethod
+    def make_key(cls,
+                 instrument_symbol: str,
+                 granularity: str,
+                 data: pd.DataFrame,
+                 indicator: str,
+                 params: Dict[str, Hashable]) -> Tuple:
+        last_candle_time = data['datetime'].values[-1] if len(data) else None
+
+        return instrument_symbol, granularity, last_candle_time, len(data), indicator, tuple(sorted(params.items()))
+
+    def get_or_compute(self,
+                       instrument_symbol: str,
+                       granularity: str,
+                       data: pd.DataFrame,
+                       indicator: str,
+                       func: Callable[..., np.ndarray],
+                       **params) -> np.ndarray:
+        """ Returned arrays are shared between callers and are therefore read-only. """
+        key = self.make_key(instrument_symbol, granularity, data, indicator, params)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+
+                return self._entries[key]
+        values = np.array(func(data, **params), copy=True)
+        values.flags.writeable = False
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = values
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+        return values
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def get_stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self),
+            'hit_rate': self.hits / lookups if lookups else 0.,
+        }
+
+
+INDICATOR_CACHE = IndicatorCache()
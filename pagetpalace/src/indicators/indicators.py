@@ -32,17 +32,33 @@ def append_ssl_channel(data: pd.DataFrame, periods: int = 20):
     data[f'HighLowValue_{periods}_period'] = hlv
 
 
+def _to_float_array(series: pd.Series) -> np.ndarray:
+    return pd.to_numeric(series, errors='coerce').to_numpy(dtype=np.float64)
+
+
+def _rolling_sum(values: np.ndarray, periods: int) -> np.ndarray:
+    """ Equivalent to rolling(periods, min_periods=0).sum(), NaN is skipped rather than carried into later sums. """
+    sums = np.cumsum(np.where(np.isnan(values), 0., values))
+    sums[periods:] -= sums[:-periods]
+
+    return sums
+
+
+def average_true_range(df: pd.DataFrame, prices: str = 'mid', periods: int = 14) -> np.ndarray:
+    """ Does not modify df, only the returned array is allocated beyond the float conversions of the inputs. """
+    high = _to_float_array(df[f'{prices}High'])
+    low = _to_float_array(df[f'{prices}Low'])
+    close = _to_float_array(df[f'{prices}Close'])
+    true_range = high - low
+    if len(true_range) > 1:
+        np.fmax(true_range[1:], np.abs(high[1:] - close[:-1]), out=true_range[1:])
+        np.fmax(true_range[1:], np.abs(low[1:] - close[:-1]), out=true_range[1:])
+
+    return pd.Series(true_range, copy=False).ewm(alpha=1 / periods).mean().to_numpy()
+
+
 def get_average_true_range_value(df: pd.DataFrame, prices: str = 'mid', periods: int = 14) -> float:
-    data = df.copy()
-    data.reset_index(drop=True)
-    high = data[f'{prices}High'].apply(pd.to_numeric)
-    low = data[f'{prices}Low'].apply(pd.to_numeric)
-    close = data[f'{prices}Close'].apply(pd.to_numeric)
-    data['tr0'] = abs(high - low)
-    data['tr1'] = abs(high - close.shift())
-    data['tr2'] = abs(low - close.shift())
-    data['true_range'] = data[['tr0', 'tr1', 'tr2']].max(axis=1)
-    df[f'ATR_{periods}'] = data['true_range'].ewm(alpha=1 / periods).mean()
+    df[f'ATR_{periods}'] = average_true_range(df, prices=prices, periods=periods)
 
     return df[f'ATR_{periods}'].iloc[-1]
 
@@ -232,19 +248,25 @@ def append_exponentially_weighted_moving_average(df: pd.DataFrame, period: int =
     df[f'EWM_{period}'] = (df[Price.MID_CLOSE].ewm(span=period, adjust=False).mean()).round(5)
 
 
-def get_chaikin_money_flow_value(df: pd.DataFrame, periods=20) -> float:
+def chaikin_money_flow(df: pd.DataFrame, periods: int = 20) -> np.ndarray:
     """
         Chaikin Money Flow (CMF)
-        measures the amount of Money Flow Volume over a specific period.
+        measures the amount of Money Flow Volume over a specific period. Does not modify df.
     """
-    highs = pd.to_numeric(df[Price.MID_HIGH], errors='coerce').astype('Float32')
-    lows = pd.to_numeric(df[Price.MID_LOW], errors='coerce').astype('Float32')
-    closes = pd.to_numeric(df[Price.MID_CLOSE], errors='coerce').astype('Float32')
-    mfv = ((closes - lows) - (highs - closes)) / (highs - lows)
-    mfv = mfv.fillna(0.0)
-    mfv *= df['volume']
-    cmf = (mfv.rolling(periods, min_periods=0).sum() / df['volume'].rolling(periods, min_periods=0).sum())
-    df['CMF'] = cmf
+    highs = _to_float_array(df[Price.MID_HIGH])
+    lows = _to_float_array(df[Price.MID_LOW])
+    closes = _to_float_array(df[Price.MID_CLOSE])
+    volumes = _to_float_array(df['volume'])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mfv = ((closes - lows) - (highs - closes)) / (highs - lows)
+    mfv[np.isnan(mfv)] = 0.
+    mfv *= volumes
+
+    return _rolling_sum(mfv, periods) / _rolling_sum(volumes, periods)
+
+
+def get_chaikin_money_flow_value(df: pd.DataFrame, periods=20) -> float:
+    df['CMF'] = chaikin_money_flow(df, periods=periods)
 
     return df['CMF'].iloc[-1]
 
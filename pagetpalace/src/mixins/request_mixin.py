@@ -1,5 +1,10 @@
+# Python standard.
+import threading
+import time
+
 # Third-party.
 import requests
+from requests.adapters import HTTPAdapter
 from tenacity import (
     retry,
     stop_after_attempt,
@@ -11,17 +16,83 @@ from tenacity import (
 # Local.
 from pagetpalace.tools import *
 
+# Connections kept open per host, enough for every strategy in one process to hit the same Oanda host at once.
+POOL_MAXSIZE = 64
+
+# Oanda allows 100 requests per second, stay under it so bursts of concurrent requests aren't rejected with 429s.
+REQUESTS_PER_SECOND = 90
+REQUEST_BURST = 20
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_shared_session() -> requests.Session:
+    """ One pooled session per process so every client reuses the same keep-alive connections. """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=POOL_MAXSIZE)
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+
+    return _session
+
+
+class RateLimiter:
+    """ Token bucket, refills at `rate` tokens per second up to `burst`. acquire() blocks until a token is free. """
+
+    def __init__(self, rate: float = REQUESTS_PER_SECOND, burst: int = REQUEST_BURST):
+        if rate <= 0:
+            raise ValueError('rate must be positive.')
+        if burst < 1:
+            raise ValueError('burst must be at least 1.')
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f'RateLimiter(rate={self.rate}, burst={self.burst})'
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+RATE_LIMITER = RateLimiter()
+
 
 def check_5xx_or_429_status_code(response: requests.Response) -> bool:
     return response.status_code >= 500 or response.status_code == 429
 
 
 class RequestMixin:
-    def __init__(self, access_token, default_headers, default_params, url):
+    def __init__(self,
+                 access_token,
+                 default_headers,
+                 default_params,
+                 url,
+                 session: requests.Session = None,
+                 rate_limiter: RateLimiter = None):
         self.access_token = access_token
         self.default_headers = default_headers
         self.default_params = default_params
         self.url = url
+        self.session = session if session is not None else get_shared_session()
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RATE_LIMITER
 
     @retry(
         retry=retry_if_result(check_5xx_or_429_status_code),
@@ -36,7 +107,9 @@ class RequestMixin:
                             headers: dict,
                             params: dict,
                             data: dict) -> requests.Response:
-        return requests.request(
+        self.rate_limiter.acquire()
+
+        return self.session.request(
             method=method,
             url=f'{self.url}/{endpoint}',
             headers=headers,
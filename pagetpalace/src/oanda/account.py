@@ -1,5 +1,7 @@
 # Python standard.
 import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable
 
 # Local.
 from pagetpalace.src.oanda.instruments.instrument_attributes import BaseCurrencies
@@ -9,6 +11,7 @@ from pagetpalace.src.oanda.settings import OANDA_DOMAINS, PROTOCOL, OANDA_API_VE
 
 class OandaAccount(RequestMixin):
     ACCOUNT_CURRENCY = BaseCurrencies.GBP
+    MAX_CONCURRENT_CANCELS = 16
     
     def __init__(self, access_token: str, account_id: str, account_type: str):
         self.account_type = account_type
@@ -122,3 +125,24 @@ class OandaAccount(RequestMixin):
     def cancel_order(self, order_specifier: str) -> dict:
         """ Cancel a pending Order in an Account. """
         return self._request(endpoint=f'orders/{order_specifier}/cancel', method='PUT')
+
+    @staticmethod
+    def is_order_cancelled(response: dict) -> bool:
+        return 'orderCancelTransaction' in response
+
+    def cancel_orders(self, order_specifiers: Iterable[str]) -> Dict[str, dict]:
+        """ Cancel pending Orders concurrently, subject to the rate limiter. Returns the response for each order, a
+            request that raised is reported as {'errorMessage': ...}. Use is_order_cancelled to check each result.
+        """
+        order_specifiers = list(dict.fromkeys(order_specifiers))
+        if not order_specifiers:
+            return {}
+
+        def cancel(order_specifier: str) -> dict:
+            try:
+                return self.cancel_order(order_specifier)
+            except Exception as exc:
+                return {'errorMessage': str(exc)}
+
+        with ThreadPoolExecutor(max_workers=min(len(order_specifiers), self.MAX_CONCURRENT_CANCELS)) as executor:
+            return dict(zip(order_specifiers, executor.map(cancel, order_specifiers)))
@@ -0,0 +1,88 @@
+# Python standard.
+import threading
+
+# Local.
+from pagetpalace.src.oanda.account import OandaAccount
+from pagetpalace.src.scheduling.clock import get_clock
+
+DEFAULT_MAX_AGE_SECONDS = 5.
+
+
+class AccountSnapshot:
+    """ Full account details fetched at most once per max_age seconds.
+
+        Sizing, risk checks and order construction in a tick all read the same snapshot instead of making a
+        round trip each. Anything that changes balance, margin or pending orders, e.g. creating or cancelling an
+        order, must call invalidate() so the next read fetches fresh details.
+    """
+
+    def __init__(self, account: OandaAccount, max_age: float = DEFAULT_MAX_AGE_SECONDS, clock=None):
+        if max_age < 0:
+            raise ValueError('max_age must not be negative.')
+        self.account = account
+        self.max_age = max_age
+        self.clock = clock or get_clock()
+        self.fetches = 0
+        self._details = None
+        self._fetched_at = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f'AccountSnapshot(account={self.account}, max_age={self.max_age}, age={self.age})'
+
+    @property
+    def age(self):
+        """ Seconds since the details were fetched, None if there's nothing cached. """
+        if self._fetched_at is None:
+            return None
+
+        return (self.clock.now() - self._fetched_at).total_seconds()
+
+    def is_stale(self) -> bool:
+        age = self.age
+
+        return age is None or age > self.max_age
+
+    def refresh(self) -> dict:
+        with self._lock:
+            return self._refresh()
+
+    def _refresh(self) -> dict:
+        self._details = self.account.get_full_account_details()['account']
+        self._fetched_at = self.clock.now()
+        self.fetches += 1
+
+        return self._details
+
+    def get_details(self) -> dict:
+        """ The 'account' part of the full account details, refreshed first if stale. """
+        with self._lock:
+            if self.is_stale():
+                return self._refresh()
+
+            return self._details
+
+    def get_balance(self) -> float:
+        return float(self.get_details()['balance'])
+
+    def invalidate(self):
+        with self._lock:
+            self._fetched_at = None
+
+
+_snapshots_lock = threading.Lock()
+
+
+def get_account_snapshot(account: OandaAccount) -> AccountSnapshot:
+    """ One snapshot per account object, shared by every strategy trading it.
+
+        The account holds its snapshot, so the snapshot goes when the account does and a new account with the same ID,
+        e.g. another PaperAccount, never reads the details of an earlier one.
+    """
+    with _snapshots_lock:
+        snapshot = getattr(account, '_account_snapshot', None)
+        if snapshot is None:
+            snapshot = AccountSnapshot(account)
+            account._account_snapshot = snapshot
+
+    return snapshot
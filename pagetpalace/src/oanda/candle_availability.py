@@ -0,0 +1,132 @@
+# Python standard.
+import datetime
+import statistics
+import threading
+from collections import defaultdict, deque
+from typing import Dict, Optional
+
+# Third-party.
+import pytz
+
+# Local.
+from pagetpalace.src.oanda.pricing import OandaPricingData
+from pagetpalace.src.oanda.settings import LIVE_ACCESS_TOKEN, PRIMARY_ACCOUNT_NUMBER
+from pagetpalace.src.scheduling.candle_close_scheduler import next_candle_close
+from pagetpalace.src.scheduling.clock import get_clock
+from pagetpalace.tools.logger import *
+
+
+def parse_candle_time(value: str) -> datetime.datetime:
+    """ Candle times come back as unix seconds or RFC3339 depending on the X-Accept-Datetime-Format header. """
+    try:
+        return datetime.datetime.fromtimestamp(float(value), tz=pytz.utc)
+    except ValueError:
+        return pytz.utc.localize(datetime.datetime.strptime(value[:19], '%Y-%m-%dT%H:%M:%S'))
+
+
+class CandleAvailabilityDetector:
+    """ Polls candles/latest after a candle close until Oanda marks the candle complete.
+
+        Polling starts shortly before the delay usually observed for the instrument and backs off from
+        initial_interval to max_interval. Observed delays are kept per instrument and granularity.
+    """
+
+    def __init__(self,
+                 pricing: OandaPricingData = None,
+                 clock=None,
+                 initial_interval: float = 0.2,
+                 max_interval: float = 2.,
+                 timeout: float = 30.,
+                 lead: float = 0.5,
+                 history_size: int = 100):
+        self.pricing = pricing or OandaPricingData(LIVE_ACCESS_TOKEN, PRIMARY_ACCOUNT_NUMBER, 'LIVE_API')
+        self.clock = clock or get_clock()
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.timeout = timeout
+        self.lead = lead
+        self._delays = defaultdict(lambda: deque(maxlen=history_size))
+        self._latest_available = {}
+        self._key_locks = defaultdict(threading.Lock)
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f'CandleAvailabilityDetector(timeout={self.timeout}, instruments={len(self._delays)})'
+
+    def _get_key_lock(self, key) -> threading.Lock:
+        with self._lock:
+            return self._key_locks[key]
+
+    def get_expected_delay(self, symbol: str, granularity: str) -> float:
+        delays = self._delays.get((symbol, granularity))
+
+        return statistics.median(delays) if delays else 0.
+
+    def get_delay_stats(self) -> Dict[str, Dict[str, float]]:
+        return {
+            f'{symbol}:{granularity}': {
+                'count': len(delays),
+                'median': statistics.median(delays),
+                'max': max(delays),
+            }
+            for (symbol, granularity), delays in list(self._delays.items())
+            if delays
+        }
+
+    def is_candle_complete(self, symbol: str, granularity: str, close_time: datetime.datetime) -> bool:
+        response = self.pricing.get_latest_candles(f'{symbol}:{granularity}:M', units=2)
+        for latest in response.get('latestCandles', []):
+            for candle in latest.get('candles', []):
+                if candle.get('complete'):
+                    candle_open = parse_candle_time(candle['time'])
+                    if next_candle_close(granularity, candle_open, skip_market_closed=False) >= close_time:
+                        return True
+
+        return False
+
+    def wait_for_candle(self, symbol: str, granularity: str, close_time: datetime.datetime) -> Optional[float]:
+        """ Block until the candle closing at close_time is complete, returns the observed delay in seconds or None if
+            it didn't become available before the timeout.
+        """
+        key = (symbol, granularity)
+        with self._get_key_lock(key):
+            if self._latest_available.get(key) is not None and self._latest_available[key] >= close_time:
+                return 0.
+            first_poll = close_time + datetime.timedelta(
+                seconds=max(self.get_expected_delay(symbol, granularity) - self.lead, 0.)
+            )
+            deadline = close_time + datetime.timedelta(seconds=self.timeout)
+            self.clock.sleep((first_poll - self.clock.now()).total_seconds())
+            interval = self.initial_interval
+            while True:
+                try:
+                    is_complete = self.is_candle_complete(symbol, granularity, close_time)
+                except Exception as exc:
+                    logger.error(f'Failed to poll latest candle for {symbol}:{granularity}. {exc}', exc_info=True)
+                    is_complete = False
+                now = self.clock.now()
+                if is_complete:
+                    delay = (now - close_time).total_seconds()
+                    self._delays[key].append(delay)
+                    self._latest_available[key] = close_time
+
+                    return delay
+                if now >= deadline:
+                    logger.warning(f'{symbol}:{granularity} candle closing {close_time} not complete in time.')
+                    return None
+                self.clock.sleep(min(interval, (deadline - now).total_seconds()))
+                interval = min(interval * 1.5, self.max_interval)
+
+
+_default_detector = None
+_default_detector_lock = threading.Lock()
+
+
+def get_default_detector() -> CandleAvailabilityDetector:
+    """ Shared by every strategy in the process, so an instrument's candle is only polled for once per close. """
+    global _default_detector
+    with _default_detector_lock:
+        if _default_detector is None:
+            _default_detector = CandleAvailabilityDetector()
+
+    return _default_detector
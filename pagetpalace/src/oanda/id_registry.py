@@ -0,0 +1,90 @@
+# Python standard.
+from collections import defaultdict
+from typing import Dict, Hashable, Iterable, List, Set
+
+
+class IdRegistry:
+    """ Order or trade IDs filed under keys, e.g. a sub-strategy label or an (instrument, target) pair.
+
+        Each key holds a set and a reverse index maps every ID to its keys, so membership checks, removal and
+        reconciliation against the IDs still live in the account are O(1) per ID however many IDs have been seen.
+    """
+
+    def __init__(self, keys: Iterable[Hashable] = ()):
+        self._ids = {key: set() for key in keys}
+        self._keys_by_id = defaultdict(set)
+        self._version = 0
+
+    def __repr__(self):
+        return f'IdRegistry({self.to_dict()})'
+
+    def __len__(self):
+        return len(self._keys_by_id)
+
+    def __contains__(self, id_: str) -> bool:
+        return id_ in self._keys_by_id
+
+    def __iter__(self):
+        return iter(self._keys_by_id)
+
+    @property
+    def version(self) -> int:
+        """ Bumped whenever an ID is added or removed, so callers can spot a change without copying the IDs. """
+        return self._version
+
+    def keys(self) -> List[Hashable]:
+        return list(self._ids.keys())
+
+    def add(self, key: Hashable, id_: str):
+        ids = self._ids.setdefault(key, set())
+        if id_ not in ids:
+            ids.add(id_)
+            self._keys_by_id[id_].add(key)
+            self._version += 1
+
+    def discard(self, key: Hashable, id_: str):
+        keys = self._keys_by_id.get(id_)
+        if keys is not None and key in keys:
+            self._ids[key].discard(id_)
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_id[id_]
+            self._version += 1
+
+    def contains(self, key: Hashable, id_: str) -> bool:
+        return key in self._keys_by_id.get(id_, ())
+
+    def get_ids(self, key: Hashable) -> Set[str]:
+        return set(self._ids.get(key, ()))
+
+    def get_all_ids(self) -> Set[str]:
+        return set(self._keys_by_id)
+
+    def remove_ids(self, ids: Iterable[str]) -> Set[str]:
+        """ Remove the IDs from every key, returns the IDs that were registered. """
+        removed = set()
+        for id_ in ids:
+            keys = self._keys_by_id.pop(id_, None)
+            if keys is None:
+                continue
+            for key in keys:
+                self._ids[key].discard(id_)
+            removed.add(id_)
+        if removed:
+            self._version += 1
+
+        return removed
+
+    def reconcile(self, live_ids: Iterable[str]) -> Set[str]:
+        """ Forget every ID that isn't live in the account any more, returns the IDs removed. """
+        return self.remove_ids(self._keys_by_id.keys() - set(live_ids))
+
+    def clear(self):
+        for ids in self._ids.values():
+            ids.clear()
+        if self._keys_by_id:
+            self._keys_by_id.clear()
+            self._version += 1
+
+    def to_dict(self) -> Dict[Hashable, List[str]]:
+        return {key: sorted(ids) for key, ids in self._ids.items()}
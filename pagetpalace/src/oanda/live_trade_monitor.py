@@ -1,6 +1,5 @@
 # Python standard.
-from collections import defaultdict
-from typing import Dict, List
+from typing import Dict, List, Set
 
 # Local.
 from pagetpalace.src.oanda.instruments.instruments import get_all_instruments
@@ -24,32 +23,29 @@ class LiveTradeMonitor:
             account: OandaAccount,
             stop_loss_move_params: List[StopLossMoveParams] = None,
             partial_closure_params: List[PartialClosureParams] = None,
+            pricing: OandaPricingData = None,
     ):
         self._account = account
-        self._pricing = OandaPricingData(LIVE_ACCESS_TOKEN, PRIMARY_ACCOUNT_NUMBER, 'LIVE_API')
+        self._pricing = pricing or getattr(account, 'pricing', None) \
+            or OandaPricingData(LIVE_ACCESS_TOKEN, PRIMARY_ACCOUNT_NUMBER, 'LIVE_API')
         self.stop_loss_move_params = TradeAdjustmentParameters.init_pair_to_params(stop_loss_move_params)
         self.partial_closure_params = TradeAdjustmentParameters.init_pair_to_params(partial_closure_params)
         self.partially_closed = TradeAdjustmentParameters.init_local_history(partial_closure_params)
         self.sl_adjusted = TradeAdjustmentParameters.init_local_history(stop_loss_move_params)
 
-    def _get_pair_to_open_trade_ids(self) -> Dict[str, List[str]]:
-        pair_to_open_trade_ids = defaultdict(list)
-        for trade in self._account.get_open_trades()['trades']:
-            pair_to_open_trade_ids[trade['instrument']].append(trade['id'])
+    def _get_open_trades(self) -> List[dict]:
+        return self._account.get_open_trades()['trades']
 
-        return pair_to_open_trade_ids
+    def _get_open_trade_ids(self) -> Set[str]:
+        return {trade['id'] for trade in self._get_open_trades()}
 
-    def _clean_local_lists(self, pair_to_open_trade_ids: Dict[str, List[str]]):
-        for adjustment_attribute in [self.sl_adjusted, self.partially_closed]:
-            for pair, local_lists in adjustment_attribute.items():
-                for count, registered_ids in local_lists.items():
-                    for id_ in registered_ids:
-                        if id_ not in pair_to_open_trade_ids[pair]:
-                            local_lists[count].remove(id_)
+    def _clean_local_lists(self, open_trade_ids: Set[str]):
+        for adjustment_registry in [self.sl_adjusted, self.partially_closed]:
+            adjustment_registry.reconcile(open_trade_ids)
 
     def clean_lists(self):
         try:
-            self._clean_local_lists(self._get_pair_to_open_trade_ids())
+            self._clean_local_lists(self._get_open_trade_ids())
         except Exception as exc:
             logger.info(f'Failed to clean lists. {exc}', exc_info=True)
 
@@ -71,7 +67,7 @@ class LiveTradeMonitor:
     def _check_and_adjust_stops(self, prices: Dict[str, float], trade: dict, params: Dict[int, Dict[str, float]]):
         symbol = trade['instrument']
         for count, percentages in params.items():
-            if trade['id'] not in self.sl_adjusted[symbol][count]:
+            if not self.sl_adjusted.contains((symbol, count), trade['id']):
                 has_pct_hit = check_pct_hit(prices, trade, percentages['check'])
                 if has_pct_hit:
                     logger.info(f'Adjusting stop loss for: {trade}')
@@ -80,7 +76,7 @@ class LiveTradeMonitor:
                         trade_specifier=trade['id'],
                         price=round(new_stop_loss_price, self.ALL_INSTRUMENTS[symbol].price_precision),
                     )
-                    self.sl_adjusted[symbol][count].append(trade['id'])
+                    self.sl_adjusted.add((symbol, count), trade['id'])
                     logger.info(f'sl_adjusted: {self.sl_adjusted}')
                 else:
 
@@ -91,7 +87,7 @@ class LiveTradeMonitor:
         if self.stop_loss_move_params:
             for trade in open_trades:
                 symbol = trade['instrument']
-                if symbol in self.sl_adjusted.keys():
+                if symbol in self.stop_loss_move_params:
                     try:
                         self._check_and_adjust_stops(
                             prices_to_check[symbol],
@@ -105,14 +101,14 @@ class LiveTradeMonitor:
         symbol = trade['instrument']
         for count, percentages in params.items():
             current_units = abs(float(trade['currentUnits']))
-            if current_units != 1 and (trade['id'] not in self.partially_closed[symbol][count]):
+            if current_units != 1 and not self.partially_closed.contains((symbol, count), trade['id']):
                 is_pct_hit = check_pct_hit(prices, trade, percentages['check'])
                 if is_pct_hit:
                     logger.info(f'Partially closing for: {trade}')
                     pct_of_units = round(current_units * percentages['close'])
                     to_close = pct_of_units if pct_of_units > 1 else 1
                     self._account.close_trade(trade_specifier=trade['id'], close_amount=str(to_close))
-                    self.partially_closed[symbol][count].append(trade['id'])
+                    self.partially_closed.add((symbol, count), trade['id'])
                     logger.info(f'partially_closed: {self.partially_closed}')
                 else:
 
@@ -123,7 +119,7 @@ class LiveTradeMonitor:
         if self.partial_closure_params:
             for trade in open_trades:
                 symbol = trade['instrument']
-                if symbol in self.partially_closed.keys():
+                if symbol in self.partial_closure_params:
                     try:
                         self._check_and_partially_close(
                             prices_to_check[symbol],
@@ -135,7 +131,7 @@ class LiveTradeMonitor:
 
     def monitor_and_adjust_current_trades(self):
         try:
-            open_trades = self._account.get_open_trades()['trades']
+            open_trades = self._get_open_trades()
             if len(open_trades) > 0:
                 pair_to_prices = self._get_pair_to_prices(open_trades)
                 self._partial_closures(prices_to_check=pair_to_prices, open_trades=open_trades)
@@ -0,0 +1,123 @@
+# Python standard.
+import datetime
+import threading
+from concurrent.futures import Future
+from typing import Tuple
+
+# Third-party.
+import pandas as pd
+import pytz
+
+# Local.
+from pagetpalace.src.oanda.instrument import OandaInstrumentData
+from pagetpalace.src.scheduling.candle_close_scheduler import GRANULARITY_SECONDS, next_candle_close
+from pagetpalace.src.scheduling.clock import get_clock
+
+
+class SharedCandleData:
+    """ Complete candles shared by every strategy in the process.
+
+        Concurrent requests for the same candles wait on a single fetch. A result is reused until a newer candle
+        should have closed, so strategies trading the same instrument at the same candle close make one request
+        between them. After that only the candles that closed since are requested and appended to the window.
+        Callers get their own copy of the frame and are free to append indicator columns to it.
+    """
+
+    def __init__(self, instrument_data: OandaInstrumentData = None, clock=None):
+        self.instrument_data = instrument_data or OandaInstrumentData()
+        self.clock = clock or get_clock()
+        self.fetches = 0
+        self._entries = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f'SharedCandleData(entries={len(self._entries)}, fetches={self.fetches})'
+
+    @staticmethod
+    def _get_last_close(granularity: str, df: pd.DataFrame) -> datetime.datetime:
+        last_open = pytz.utc.localize(datetime.datetime.strptime(df['datetime'].values[-1], '%Y-%m-%d %H:%M:%S'))
+
+        return next_candle_close(granularity, last_open, skip_market_closed=False)
+
+    def _is_current(self, granularity: str, df: pd.DataFrame) -> bool:
+        """ True if no candle after the last one in df should have closed yet, weekly and monthly are never reused. """
+        if granularity not in GRANULARITY_SECONDS or df.empty:
+            return False
+
+        return next_candle_close(granularity, self._get_last_close(granularity, df)) > self.clock.now()
+
+    def _count_missing(self, granularity: str, df: pd.DataFrame, limit: int) -> int:
+        """ Candles that should have closed after the last one in df, counting stops at limit. """
+        if granularity not in GRANULARITY_SECONDS or df.empty:
+            return limit
+        now = self.clock.now()
+        close = self._get_last_close(granularity, df)
+        missing = 0
+        while missing < limit:
+            close = next_candle_close(granularity, close)
+            if close > now:
+                break
+            missing += 1
+
+        return missing
+
+    def _fetch(self, key: Tuple, cached: pd.DataFrame = None) -> pd.DataFrame:
+        symbol, granularity, count, prices = key
+        fetch_count = count
+        if cached is not None:
+            # One candle of overlap with the cached window, in case the last candle was revised.
+            fetch_count = min(self._count_missing(granularity, cached, count) + 1, count)
+        candles = self.instrument_data.get_complete_candlesticks(symbol, prices, granularity, fetch_count)
+        self.fetches += 1
+        df = self.instrument_data.convert_to_df(candles, prices)
+        if fetch_count < count:
+            df = pd.concat([cached, df], ignore_index=True) \
+                .drop_duplicates(subset='datetime', keep='last') \
+                .tail(count) \
+                .reset_index(drop=True)
+
+        return df
+
+    def get_candles(self, symbol: str, granularity: str, count: int = 50, prices: str = 'ABM') -> pd.DataFrame:
+        key = (symbol, granularity, count, prices)
+        with self._lock:
+            df = self._entries.get(key)
+            if df is not None and self._is_current(granularity, df):
+                return df.copy()
+            future = self._in_flight.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._in_flight[key] = future
+        if not is_owner:
+            return future.result().copy()
+        try:
+            df = self._fetch(key, df)
+        except Exception as exc:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(exc)
+            raise
+        with self._lock:
+            del self._in_flight[key]
+            self._entries[key] = df
+        future.set_result(df)
+
+        return df.copy()
+
+    def seed(self, symbol: str, granularity: str, df: pd.DataFrame, count: int = 50, prices: str = 'ABM'):
+        """ Start from a window saved earlier, e.g. on restart, so only the candles missed since are requested. """
+        key = (symbol, granularity, count, prices)
+        headers = ['datetime'] + [h for price in prices for h in OandaInstrumentData.PRICE_HEADERS[price]] + ['volume']
+        columns = [c for c in headers if c in df.columns]
+        with self._lock:
+            if key not in self._entries and not df.empty:
+                self._entries[key] = df[columns].tail(count).reset_index(drop=True)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+CANDLE_DATA = SharedCandleData()
@@ -0,0 +1,840 @@
+# Python standard.
+import datetime
+import itertools
+import json
+import threading
+from collections import defaultdict, deque
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Third-party.
+import numpy as np
+
+# Local.
+from pagetpalace.src.dependent_orders.target_calculations import get_pct_hit_price
+from pagetpalace.src.dependent_orders.trade_adjustment_params import PartialClosureParams, StopLossMoveParams
+from pagetpalace.src.oanda.account import OandaAccount
+from pagetpalace.src.oanda.id_registry import IdRegistry
+from pagetpalace.src.oanda.instruments.instruments import get_all_instruments
+from pagetpalace.src.oanda.live_trade_monitor import LiveTradeMonitor
+from pagetpalace.src.scheduling.candle_close_scheduler import GRANULARITY_SECONDS
+from pagetpalace.src.scheduling.clock import get_clock
+from pagetpalace.tools.logger import *
+
+# Ticks kept per instrument to build latest candles from, enough for an H1 candle and the one before it.
+TICK_HISTORY_SECONDS = 2 * 3600
+_TICK_HISTORY = datetime.timedelta(seconds=TICK_HISTORY_SECONDS)
+DEFAULT_LEVERAGE = 20
+
+# Price components of a candle specification, e.g. the AB of GBP_USD:S5:AB. All of them are built without any.
+PRICE_COMPONENT_LETTERS = {'B': 'bid', 'A': 'ask', 'M': 'mid'}
+PRICE_COMPONENTS = ('bid', 'ask', 'mid')
+DATA_POINTS = ('Open', 'High', 'Low', 'Close')
+
+_paper_account_ids = itertools.count(1)
+
+
+def _format_time(moment: datetime.datetime) -> str:
+    """ Unix seconds, the format OandaAccount asks for with X-Accept-Datetime-Format. """
+    return f'{moment.timestamp():.9f}'
+
+
+def _format_price(price: float) -> str:
+    return f'{round(price, 6)}'
+
+
+def split_price_header(header: str) -> Tuple[str, str]:
+    """ The price component and data point of a header of OandaInstrumentData.PRICE_HEADERS, e.g. ask and Low. """
+    for component in PRICE_COMPONENTS:
+        if header.startswith(component) and header[len(component):] in DATA_POINTS:
+            return component, header[len(component):]
+
+    raise ValueError(f'{header} is not a price header, e.g. askLow.')
+
+
+class Quote:
+    def __init__(self, bid: float, ask: float, time: datetime.datetime):
+        if bid > ask:
+            raise ValueError('bid must not be above ask.')
+        self.bid = bid
+        self.ask = ask
+        self.time = time
+
+    def __repr__(self):
+        return f'Quote(bid={self.bid}, ask={self.ask}, time={self.time})'
+
+    @property
+    def mid(self) -> float:
+        return (self.bid + self.ask) / 2
+
+
+class PaperPricing:
+    """ Prices pushed in by the caller, live or from a recording, served in the shape OandaPricingData returns them.
+
+        Listeners, e.g. a PaperAccount, are called with the symbol after every update so orders fill against the
+        price that triggered them.
+    """
+
+    def __init__(self, clock=None):
+        self.clock = clock or get_clock()
+        self._quotes = {}
+        self._ticks = defaultdict(deque)
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f'PaperPricing(instruments={sorted(self._quotes)})'
+
+    def add_listener(self, listener: Callable[[str], None]):
+        self._listeners.append(listener)
+
+    def update_price(self, symbol: str, bid: float, ask: float, time: datetime.datetime = None):
+        quote = Quote(float(bid), float(ask), time or self.clock.now())
+        with self._lock:
+            self._quotes[symbol] = quote
+            ticks = self._ticks[symbol]
+            ticks.append(quote)
+            while quote.time - ticks[0].time > _TICK_HISTORY:
+                ticks.popleft()
+        for listener in self._listeners:
+            listener(symbol)
+
+    def get_quote(self, symbol: str) -> Optional[Quote]:
+        return self._quotes.get(symbol)
+
+    def is_tradeable(self, symbol: str) -> bool:
+        """ Whether orders can fill at the latest quote, prices pushed in live are always tradeable. """
+        return symbol in self._quotes
+
+    def get_pricing_info(self, instruments: List[str], since: str = '', include_home_conversions: bool = False) -> dict:
+        prices = []
+        for symbol in instruments:
+            quote = self.get_quote(symbol)
+            if quote is not None:
+                prices.append({
+                    'type': 'PRICE',
+                    'instrument': symbol,
+                    'time': _format_time(quote.time),
+                    'tradeable': self.is_tradeable(symbol),
+                    'bids': [{'price': _format_price(quote.bid), 'liquidity': 10000000}],
+                    'asks': [{'price': _format_price(quote.ask), 'liquidity': 10000000}],
+                    'closeoutBid': _format_price(quote.bid),
+                    'closeoutAsk': _format_price(quote.ask),
+                })
+
+        return {'prices': prices, 'time': _format_time(self.clock.now())}
+
+    @staticmethod
+    def _build_candle(ticks: List[Quote],
+                      start: datetime.datetime,
+                      is_complete: bool,
+                      components: Sequence[str] = PRICE_COMPONENTS) -> dict:
+        candle = {'complete': is_complete, 'volume': len(ticks), 'time': _format_time(start)}
+        for component in components:
+            prices = [getattr(q, component) for q in ticks]
+            candle[component] = {
+                'o': _format_price(prices[0]),
+                'h': _format_price(max(prices)),
+                'l': _format_price(min(prices)),
+                'c': _format_price(prices[-1]),
+            }
+
+        return candle
+
+    def _get_candles(self,
+                     symbol: str,
+                     granularity: str,
+                     units: int,
+                     components: Sequence[str] = PRICE_COMPONENTS) -> List[dict]:
+        """ Candles from the ticks received, bucketed on the epoch rather than the daily alignment. """
+        seconds = GRANULARITY_SECONDS[granularity]
+        now = self.clock.now()
+        with self._lock:
+            ticks = list(self._ticks.get(symbol, ()))
+        buckets = defaultdict(list)
+        for tick in ticks:
+            buckets[int(tick.time.timestamp() // seconds)].append(tick)
+        current = int(now.timestamp() // seconds)
+        candles = []
+        for bucket in sorted(buckets)[-units:]:
+            start = datetime.datetime.fromtimestamp(bucket * seconds, tz=datetime.timezone.utc)
+            candles.append(self._build_candle(buckets[bucket], start, bucket < current, components))
+
+        return candles
+
+    def get_latest_candle_prices(self, symbol: str, granularity: str, headers: Sequence[str]) -> Optional[Tuple]:
+        """ Prices of the latest candle get_latest_candles would return as floats, e.g. its askLow and bidHigh, None
+            without a candle.
+        """
+        split = [split_price_header(header) for header in headers]
+        candles = self._get_candles(symbol, granularity, 1, list({component for component, _ in split}))
+        if not candles:
+            return None
+
+        return tuple(float(candles[-1][component][data_point[0].lower()]) for component, data_point in split)
+
+    def get_time_prices_reach(self,
+                              symbol: str,
+                              granularity: str,
+                              bid_high: float,
+                              ask_low: float) -> Optional[datetime.datetime]:
+        """ Time from which the latest candle could have a bid high at or above bid_high or an ask low at or below
+            ask_low, it has neither before then. None when that can't be known ahead, as with prices pushed in live.
+        """
+        return None
+
+    def get_latest_candles(self, candle_specifications: str, units: int = 1, **kwargs) -> dict:
+        latest = []
+        for specification in candle_specifications.split(','):
+            symbol, granularity, *letters = specification.split(':')
+            components = [PRICE_COMPONENT_LETTERS[letter] for letter in letters[0]] if letters else PRICE_COMPONENTS
+            latest.append({
+                'instrument': symbol,
+                'granularity': granularity,
+                'candles': self._get_candles(symbol, granularity, units, components),
+            })
+
+        return {'latestCandles': latest}
+
+
+class PaperAccount(OandaAccount):
+    """ An OandaAccount that fills orders locally against PaperPricing, nothing is sent to Oanda.
+
+        STOP orders trigger when the ask (long) or bid (short) reaches the entry price and fill at that quote, they're
+        cancelled with BOUNDS_VIOLATION if the fill would be worse than priceBound. MARKET orders are IOC and fill at
+        the current quote, or are cancelled with MARKET_HALTED when there's no price and INSUFFICIENT_MARGIN when the
+        margin isn't available. Fills open a trade with its take profit and stop loss, each fill opens its own trade
+        as on a hedging account. Amounts are in the account currency, converted with GBP quotes when the pricing has
+        them and home_conversions otherwise.
+    """
+
+    def __init__(self,
+                 pricing: PaperPricing,
+                 balance: float = 10000.,
+                 account_id: str = None,
+                 home_conversions: Dict[str, float] = None):
+        super().__init__('', account_id or f'paper-{next(_paper_account_ids)}', 'DEMO_API')
+        self.pricing = pricing
+        self.home_conversions = home_conversions or {}
+        self._balance = float(balance)
+        self._realized_pl = 0.
+        self._orders = {}
+        self._trades = {}
+        self._closed_trades = {}
+        self._open_trades_view = None
+        self._orders_view = None
+        self._fill_levels = {}
+        self._version = 0
+        self._transaction_ids = itertools.count(1)
+        self._last_transaction_id = '0'
+        self._instruments = get_all_instruments()
+        self._lock = threading.RLock()
+        pricing.add_listener(self._on_price)
+
+    def __str__(self):
+        return f'{self.account_id} - PAPER'
+
+    def __repr__(self):
+        return f'PaperAccount(balance={self._balance}, trades={len(self._trades)}, orders={len(self._orders)})'
+
+    def _request(self, endpoint: str = '', method: str = 'GET', headers=None, params=None, data=None) -> dict:
+        raise NotImplementedError(f'{method} {endpoint} is not simulated by PaperAccount.')
+
+    def _next_id(self) -> str:
+        self._last_transaction_id = str(next(self._transaction_ids))
+
+        return self._last_transaction_id
+
+    def _get_now(self, symbol: str = None) -> datetime.datetime:
+        quote = self.pricing.get_quote(symbol) if symbol else None
+
+        return quote.time if quote is not None else self.pricing.clock.now()
+
+    def _transaction(self, type_: str, symbol: str = None, **fields) -> dict:
+        return {
+            'id': self._next_id(),
+            'accountID': self.account_id,
+            'time': _format_time(self._get_now(symbol)),
+            'type': type_,
+            **fields,
+        }
+
+    def _get_leverage(self, symbol: str) -> float:
+        instrument = self._instruments.get(symbol)
+
+        return instrument.leverage if instrument is not None else DEFAULT_LEVERAGE
+
+    def _get_home_conversion(self, currency: str) -> float:
+        """ Account currency per unit of currency. """
+        if currency == self.ACCOUNT_CURRENCY:
+            return 1.
+        direct = self.pricing.get_quote(f'{self.ACCOUNT_CURRENCY}_{currency}')
+        if direct is not None:
+            return 1. / direct.mid
+        inverse = self.pricing.get_quote(f'{currency}_{self.ACCOUNT_CURRENCY}')
+        if inverse is not None:
+            return inverse.mid
+        if currency not in self.home_conversions:
+            raise ValueError(f'No {self.ACCOUNT_CURRENCY} conversion for {currency}, add it to home_conversions.')
+
+        return self.home_conversions[currency]
+
+    def _to_home(self, symbol: str, amount: float) -> float:
+        return amount * self._get_home_conversion(symbol.split('_')[-1])
+
+    def _get_margin(self, symbol: str, units: float, price: float) -> float:
+        return self._to_home(symbol, abs(units) * price) / self._get_leverage(symbol)
+
+    def _get_closing_price(self, trade: dict) -> Optional[float]:
+        quote = self.pricing.get_quote(trade['instrument'])
+        if quote is None:
+            return None
+
+        return quote.bid if float(trade['currentUnits']) > 0 else quote.ask
+
+    def _get_unrealized_pl(self, trade: dict) -> float:
+        price = self._get_closing_price(trade)
+        if price is None:
+            return 0.
+
+        return self._to_home(trade['instrument'], float(trade['currentUnits']) * (price - float(trade['price'])))
+
+    def _get_trade_margin(self, trade: dict) -> float:
+        quote = self.pricing.get_quote(trade['instrument'])
+        price = quote.mid if quote is not None else float(trade['price'])
+
+        return self._get_margin(trade['instrument'], float(trade['currentUnits']), price)
+
+    def _get_margin_available(self) -> float:
+        nav = self._balance + sum(self._get_unrealized_pl(t) for t in self._trades.values())
+
+        return max(nav - sum(self._get_trade_margin(t) for t in self._trades.values()), 0.)
+
+    def _get_open_trade(self, trade: dict) -> dict:
+        return {
+            **trade,
+            'unrealizedPL': f'{self._get_unrealized_pl(trade):.4f}',
+            'marginUsed': f'{self._get_trade_margin(trade):.4f}',
+        }
+
+    def _get_all_orders(self) -> List[dict]:
+        if self._orders_view is None:
+            self._orders_view = list(self._orders.values())
+            for trade in self._trades.values():
+                self._orders_view.extend(o for o in [trade.get('takeProfitOrder'), trade.get('stopLossOrder')] if o)
+
+        return list(self._orders_view)
+
+    def _open_trade(self, order: dict, price: float, reason: str) -> dict:
+        symbol = order['instrument']
+        units = float(order['units'])
+        fill = self._transaction(
+            'ORDER_FILL',
+            symbol,
+            orderID=order['id'],
+            instrument=symbol,
+            units=order['units'],
+            price=_format_price(price),
+            reason=reason,
+            pl='0.0000',
+        )
+        trade = {
+            'id': fill['id'],
+            'instrument': symbol,
+            'price': _format_price(price),
+            'openTime': fill['time'],
+            'initialUnits': order['units'],
+            'currentUnits': order['units'],
+            'state': 'OPEN',
+            'realizedPL': '0.0000',
+        }
+        for key, type_ in [('takeProfitOnFill', 'TAKE_PROFIT'), ('stopLossOnFill', 'STOP_LOSS')]:
+            if order.get(key):
+                self._set_dependent_order(trade, type_, float(order[key]['price']))
+        self._trades[trade['id']] = trade
+        self._on_book_changed()
+        fill['tradeOpened'] = {'tradeID': trade['id'], 'units': order['units'], 'price': _format_price(price)}
+        fill['accountBalance'] = f'{self._balance:.4f}'
+        logger.info(f'Paper fill: {symbol} {units} @ {price}')
+
+        return fill
+
+    def _set_dependent_order(self, trade: dict, type_: str, price: float):
+        key = 'takeProfitOrder' if type_ == 'TAKE_PROFIT' else 'stopLossOrder'
+        self._on_book_changed()
+        trade[key] = {
+            'id': self._next_id(),
+            'type': type_,
+            'tradeID': trade['id'],
+            'price': _format_price(price),
+            'timeInForce': 'GTC',
+            'state': 'PENDING',
+        }
+
+    def _close_units(self, trade: dict, units: float, price: float, reason: str) -> dict:
+        """ Close units (signed like the trade) of a trade at price, the whole trade if that's all of it. """
+        symbol = trade['instrument']
+        current = float(trade['currentUnits'])
+        pl = self._to_home(symbol, units * (price - float(trade['price'])))
+        self._on_book_changed()
+        self._balance += pl
+        self._realized_pl += pl
+        trade['realizedPL'] = f'{float(trade["realizedPL"]) + pl:.4f}'
+        remaining = round(current - units, 6)
+        fill = self._transaction(
+            'ORDER_FILL',
+            symbol,
+            instrument=symbol,
+            units=f'{-units:g}',
+            price=_format_price(price),
+            reason=reason,
+            pl=f'{pl:.4f}',
+        )
+        closed = {
+            'tradeID': trade['id'],
+            'units': f'{-units:g}',
+            'price': _format_price(price),
+            'realizedPL': f'{pl:.4f}',
+        }
+        if remaining == 0:
+            trade.update({'currentUnits': '0', 'state': 'CLOSED', 'closeTime': fill['time']})
+            self._closed_trades[trade['id']] = self._trades.pop(trade['id'])
+            fill['tradesClosed'] = [closed]
+        else:
+            trade['currentUnits'] = f'{remaining:g}'
+            fill['tradeReduced'] = closed
+        fill['accountBalance'] = f'{self._balance:.4f}'
+
+        return fill
+
+    def _fill_stop_orders(self, symbol: str, quote: Quote):
+        for order in [o for o in self._orders.values() if o['instrument'] == symbol]:
+            is_long = float(order['units']) > 0
+            price = quote.ask if is_long else quote.bid
+            if (is_long and price < float(order['price'])) or (not is_long and price > float(order['price'])):
+                continue
+            del self._orders[order['id']]
+            self._on_book_changed()
+            bound = order.get('priceBound')
+            if bound is not None and ((is_long and price > float(bound)) or (not is_long and price < float(bound))):
+                self._transaction('ORDER_CANCEL', symbol, orderID=order['id'], reason='BOUNDS_VIOLATION')
+                logger.info(f'Paper stop order {order["id"]} cancelled, {price} is beyond priceBound {bound}.')
+                continue
+            if self._get_margin(symbol, float(order['units']), price) > self._get_margin_available():
+                self._transaction('ORDER_CANCEL', symbol, orderID=order['id'], reason='INSUFFICIENT_MARGIN')
+                continue
+            self._open_trade(order, price, 'STOP_ORDER')
+
+    def _fill_dependent_orders(self, symbol: str, quote: Quote):
+        for trade in [t for t in self._trades.values() if t['instrument'] == symbol]:
+            units = float(trade['currentUnits'])
+            price = quote.bid if units > 0 else quote.ask
+            take_profit, stop_loss = trade.get('takeProfitOrder'), trade.get('stopLossOrder')
+            if take_profit and (price - float(take_profit['price'])) * units >= 0:
+                self._close_units(trade, units, price, 'TAKE_PROFIT_ORDER')
+            elif stop_loss and (float(stop_loss['price']) - price) * units >= 0:
+                self._close_units(trade, units, price, 'STOP_LOSS_ORDER')
+
+    def _on_book_changed(self):
+        """ Drops what's worked out from the orders and trades, called whenever one of them changes. """
+        self._version += 1
+        self._open_trades_view = self._orders_view = None
+        self._fill_levels.clear()
+
+    def _get_fill_levels(self, symbol: str) -> Optional[Tuple[float, float, float, float]]:
+        """ The lowest ask at or above which and the highest ask at or below which a stop order of symbol fills or
+            one of its trades closes, then the same for the bid. None when there's nothing to fill or close.
+        """
+        if symbol in self._fill_levels:
+            return self._fill_levels[symbol]
+        levels = {(prices, sign): [] for prices in ('ask', 'bid') for sign in (1, -1)}
+        for order in self._orders.values():
+            if order['instrument'] == symbol:
+                levels[('ask', 1) if float(order['units']) > 0 else ('bid', -1)].append(float(order['price']))
+        for trade in self._trades.values():
+            if trade['instrument'] == symbol:
+                direction = 1 if float(trade['currentUnits']) > 0 else -1
+                prices = 'bid' if direction > 0 else 'ask'
+                for key, sign in (('takeProfitOrder', 1), ('stopLossOrder', -1)):
+                    if trade.get(key):
+                        levels[(prices, sign * direction)].append(float(trade[key]['price']))
+        fill_levels = None
+        if any(levels.values()):
+            fill_levels = (
+                min(levels[('ask', 1)], default=np.inf),
+                max(levels[('ask', -1)], default=-np.inf),
+                min(levels[('bid', 1)], default=np.inf),
+                max(levels[('bid', -1)], default=-np.inf),
+            )
+        self._fill_levels[symbol] = fill_levels
+
+        return fill_levels
+
+    @property
+    def version(self) -> int:
+        """ Bumped whenever an order or trade changes, what can fill only changes with it. """
+        return self._version
+
+    def find_first_fill(self, symbol: str, bids: np.ndarray, asks: np.ndarray) -> int:
+        """ Index of the first of a run of quotes for symbol that would fill a stop order or close a trade as things
+            stand, -1 if none would. Quotes before it can be skipped without changing what the account does.
+        """
+        with self._lock:
+            levels = self._get_fill_levels(symbol)
+        if levels is None:
+            return -1
+        ask_above, ask_below, bid_above, bid_below = levels
+        is_hit = (asks >= ask_above) | (asks <= ask_below) | (bids >= bid_above) | (bids <= bid_below)
+        first = int(is_hit.argmax())
+
+        return first if is_hit[first] else -1
+
+    def _on_price(self, symbol: str):
+        quote = self.pricing.get_quote(symbol)
+        with self._lock:
+            levels = self._get_fill_levels(symbol)
+            if levels is None:
+                return
+            ask_above, ask_below, bid_above, bid_below = levels
+            if ask_below < quote.ask < ask_above and bid_below < quote.bid < bid_above:
+                return
+            self._fill_stop_orders(symbol, quote)
+            self._fill_dependent_orders(symbol, quote)
+
+    def get_full_account_details(self) -> dict:
+        with self._lock:
+            unrealized_pl = sum(self._get_unrealized_pl(t) for t in self._trades.values())
+            margin_used = sum(self._get_trade_margin(t) for t in self._trades.values())
+            nav = self._balance + unrealized_pl
+
+            return {
+                'account': {
+                    'id': self.account_id,
+                    'currency': self.ACCOUNT_CURRENCY,
+                    'balance': f'{self._balance:.4f}',
+                    'pl': f'{self._realized_pl:.4f}',
+                    'unrealizedPL': f'{unrealized_pl:.4f}',
+                    'NAV': f'{nav:.4f}',
+                    'marginUsed': f'{margin_used:.4f}',
+                    'marginAvailable': f'{max(nav - margin_used, 0.):.4f}',
+                    'openTradeCount': len(self._trades),
+                    'pendingOrderCount': len(self._orders),
+                    'lastTransactionID': self._last_transaction_id,
+                    'trades': [self._get_open_trade(t) for t in self._trades.values()],
+                    'orders': self._get_all_orders(),
+                },
+                'lastTransactionID': self._last_transaction_id,
+            }
+
+    def get_summary(self) -> dict:
+        details = self.get_full_account_details()
+        summary = {k: v for k, v in details['account'].items() if k not in ('trades', 'orders')}
+
+        return {'account': summary, 'lastTransactionID': details['lastTransactionID']}
+
+    def get_trades(self) -> dict:
+        with self._lock:
+            trades = [self._get_open_trade(t) for t in self._trades.values()] + list(self._closed_trades.values())
+
+            return {'trades': trades, 'lastTransactionID': self._last_transaction_id}
+
+    def get_open_trades(self) -> dict:
+        with self._lock:
+            return {
+                'trades': [self._get_open_trade(t) for t in self._trades.values()],
+                'lastTransactionID': self._last_transaction_id,
+            }
+
+    def list_open_trades(self) -> List[dict]:
+        """ The open trades as get_open_trades returns them, without the unrealized P/L and margin it works out for
+            each from the latest prices. They're copied only when a trade changes, so don't modify them.
+        """
+        with self._lock:
+            if self._open_trades_view is None:
+                self._open_trades_view = [dict(trade) for trade in self._trades.values()]
+
+            return self._open_trades_view
+
+    def close_trade(self, trade_specifier: str, close_amount: str = 'ALL') -> dict:
+        with self._lock:
+            trade = self._trades.get(trade_specifier)
+            if trade is None:
+                return {'errorCode': 'NO_SUCH_TRADE', 'errorMessage': 'The Trade specified does not exist'}
+            price = self._get_closing_price(trade)
+            if price is None:
+                return {'errorCode': 'MARKET_HALTED', 'errorMessage': f'No price for {trade["instrument"]}'}
+            current = float(trade['currentUnits'])
+            units = current if close_amount == 'ALL' else min(abs(float(close_amount)), abs(current))
+            units = units if current > 0 else -abs(units)
+            order = self._transaction(
+                'MARKET_ORDER',
+                trade['instrument'],
+                instrument=trade['instrument'],
+                units=f'{-units:g}',
+                timeInForce='FOK',
+                tradeClose={'tradeID': trade['id'], 'units': close_amount},
+                reason='TRADE_CLOSE',
+            )
+            fill = self._close_units(trade, units, price, 'MARKET_ORDER_TRADE_CLOSE')
+            fill['orderID'] = order['id']
+
+            return {
+                'orderCreateTransaction': order,
+                'orderFillTransaction': fill,
+                'relatedTransactionIDs': [order['id'], fill['id']],
+                'lastTransactionID': self._last_transaction_id,
+            }
+
+    def _update_dependent(self, trade_specifier: str, prices: Dict[str, float]) -> dict:
+        with self._lock:
+            trade = self._trades.get(trade_specifier)
+            if trade is None:
+                return {'errorCode': 'NO_SUCH_TRADE', 'errorMessage': 'The Trade specified does not exist'}
+            response = {}
+            for type_, price in prices.items():
+                self._set_dependent_order(trade, type_, price)
+                key = 'takeProfitOrderTransaction' if type_ == 'TAKE_PROFIT' else 'stopLossOrderTransaction'
+                response[key] = self._transaction(
+                    f'{type_}_ORDER',
+                    trade['instrument'],
+                    tradeID=trade['id'],
+                    price=_format_price(price),
+                    reason='REPLACEMENT',
+                )
+            response['lastTransactionID'] = self._last_transaction_id
+
+            return response
+
+    def update_stop_loss(self, trade_specifier: str, price: float):
+        return self._update_dependent(trade_specifier, {'STOP_LOSS': float(price)})
+
+    def update_take_profit(self, trade_specifier: str, price: float):
+        return self._update_dependent(trade_specifier, {'TAKE_PROFIT': float(price)})
+
+    def update_dependent_orders(self, trade_specifier: str, take_profit_price: float, stop_loss_price: float) -> dict:
+        return self._update_dependent(
+            trade_specifier,
+            {'TAKE_PROFIT': float(take_profit_price), 'STOP_LOSS': float(stop_loss_price)},
+        )
+
+    def get_open_positions(self) -> dict:
+        with self._lock:
+            positions = defaultdict(lambda: {'long': 0., 'short': 0., 'unrealizedPL': 0.})
+            for trade in self._trades.values():
+                units = float(trade['currentUnits'])
+                position = positions[trade['instrument']]
+                position['long' if units > 0 else 'short'] += units
+                position['unrealizedPL'] += self._get_unrealized_pl(trade)
+
+            return {
+                'positions': [
+                    {
+                        'instrument': symbol,
+                        'long': {'units': f'{p["long"]:g}'},
+                        'short': {'units': f'{p["short"]:g}'},
+                        'unrealizedPL': f'{p["unrealizedPL"]:.4f}',
+                    }
+                    for symbol, p in positions.items()
+                ],
+                'lastTransactionID': self._last_transaction_id,
+            }
+
+    def _reject(self, order: dict, reason: str) -> dict:
+        cancel = self._transaction('ORDER_CANCEL', order['instrument'], orderID=order['id'], reason=reason)
+
+        return {
+            'orderCreateTransaction': order,
+            'orderCancelTransaction': cancel,
+            'relatedTransactionIDs': [order['id'], cancel['id']],
+            'lastTransactionID': self._last_transaction_id,
+        }
+
+    def create_order(self, order: str) -> dict:
+        request = json.loads(order)['order']
+        symbol = request['instrument']
+        with self._lock:
+            order_type = request['type']
+            if order_type not in ('MARKET', 'STOP'):
+                return {'errorCode': 'INVALID_ORDER_TYPE', 'errorMessage': f'{order_type} orders are not simulated'}
+            transaction = self._transaction(f'{order_type}_ORDER', symbol, reason='CLIENT_ORDER', **request)
+            transaction['type'] = f'{order_type}_ORDER'
+            quote = self.pricing.get_quote(symbol)
+            if order_type == 'STOP':
+                self._orders[transaction['id']] = {**transaction, 'type': 'STOP', 'state': 'PENDING'}
+                self._on_book_changed()
+                response = {
+                    'orderCreateTransaction': transaction,
+                    'relatedTransactionIDs': [transaction['id']],
+                }
+                if quote is not None and self.pricing.is_tradeable(symbol):
+                    self._fill_stop_orders(symbol, quote)
+                response['lastTransactionID'] = self._last_transaction_id
+
+                return response
+            if quote is None or not self.pricing.is_tradeable(symbol):
+                return self._reject(transaction, 'MARKET_HALTED')
+            units = float(request['units'])
+            price = quote.ask if units > 0 else quote.bid
+            if self._get_margin(symbol, units, price) > self._get_margin_available():
+                return self._reject(transaction, 'INSUFFICIENT_MARGIN')
+            fill = self._open_trade(transaction, price, 'MARKET_ORDER')
+
+            return {
+                'orderCreateTransaction': transaction,
+                'orderFillTransaction': fill,
+                'relatedTransactionIDs': [transaction['id'], fill['id']],
+                'lastTransactionID': self._last_transaction_id,
+            }
+
+    def get_orders(self) -> dict:
+        with self._lock:
+            return {'orders': self._get_all_orders(), 'lastTransactionID': self._last_transaction_id}
+
+    def get_pending_orders(self) -> dict:
+        return self.get_orders()
+
+    def get_order(self, order_specifier: str) -> dict:
+        with self._lock:
+            for order in self._get_all_orders():
+                if order['id'] == order_specifier:
+                    return {'order': order, 'lastTransactionID': self._last_transaction_id}
+
+            return {'errorCode': 'ORDER_DOESNT_EXIST', 'errorMessage': 'The order specified does not exist'}
+
+    def cancel_order(self, order_specifier: str) -> dict:
+        with self._lock:
+            order = self._orders.pop(order_specifier, None)
+            if order is None:
+                return {'errorCode': 'ORDER_DOESNT_EXIST', 'errorMessage': 'The order specified does not exist'}
+            self._on_book_changed()
+            cancel = self._transaction(
+                'ORDER_CANCEL',
+                order['instrument'],
+                orderID=order_specifier,
+                reason='CLIENT_REQUEST',
+            )
+
+            return {
+                'orderCancelTransaction': cancel,
+                'relatedTransactionIDs': [cancel['id']],
+                'lastTransactionID': self._last_transaction_id,
+            }
+
+
+class PaperTradeMonitor(LiveTradeMonitor):
+    """ LiveTradeMonitor of a PaperAccount, which a replay polls every S5 candle and which rarely has anything to do.
+
+        Open trades are listed without the P/L and margin of each, and the latest S5 prices read without building
+        Oanda's candles around them. The prices at which each instrument's trades are next checked are kept until the
+        account's trades or what's been applied to them change, and trades are only checked in full once one's reached.
+        Where the pricing can tell when that will be, e.g. replayed from a recording, polls before then return at once.
+    """
+
+    def __init__(
+            self,
+            account: PaperAccount,
+            stop_loss_move_params: List[StopLossMoveParams] = None,
+            partial_closure_params: List[PartialClosureParams] = None,
+            pricing: PaperPricing = None,
+    ):
+        super().__init__(account, stop_loss_move_params, partial_closure_params, pricing or account.pricing)
+        self._hit_prices = (None, None)
+        self._reach_time = (None, None)
+
+    @classmethod
+    def from_monitor(cls,
+                     monitor: LiveTradeMonitor,
+                     account: PaperAccount,
+                     pricing: PaperPricing = None) -> 'PaperTradeMonitor':
+        """ Takes over monitor's parameters and the trades it's adjusted, which strategies persist. """
+        paper_monitor = cls(account, pricing=pricing)
+        paper_monitor.stop_loss_move_params = monitor.stop_loss_move_params
+        paper_monitor.partial_closure_params = monitor.partial_closure_params
+        paper_monitor.partially_closed = monitor.partially_closed
+        paper_monitor.sl_adjusted = monitor.sl_adjusted
+
+        return paper_monitor
+
+    def _get_open_trades(self) -> List[dict]:
+        return self._account.list_open_trades()
+
+    def _get_prices_to_check(self, instrument_symbol: str) -> Dict[str, float]:
+        ask_low, bid_high = self._pricing.get_latest_candle_prices(instrument_symbol, 'S5', ('askLow', 'bidHigh'))
+
+        return {'ask_low': ask_low, 'bid_high': bid_high}
+
+    def _get_next_hit_price(self,
+                            trade: dict,
+                            params: Dict[int, Dict[str, float]],
+                            adjusted: IdRegistry) -> Optional[float]:
+        """ Price the first of params not yet applied to trade is hit at, the next check made of it. """
+        for count, percentages in params.items():
+            if not adjusted.contains((trade['instrument'], count), trade['id']):
+                return get_pct_hit_price(trade, percentages['check'])
+
+        return None
+
+    def _get_hit_prices(self, key: Tuple[int, int, int], open_trades: List[dict]) -> Dict[str, Tuple[float, float]]:
+        """ The lowest bid high and highest ask low of each instrument at which a check of open_trades is hit. """
+        if self._hit_prices[0] == key:
+            return self._hit_prices[1]
+        hit_prices = {}
+        for trade in open_trades:
+            symbol = trade['instrument']
+            checks = [(self.stop_loss_move_params.get(symbol), self.sl_adjusted)]
+            if abs(float(trade['currentUnits'])) != 1:
+                checks.append((self.partial_closure_params.get(symbol), self.partially_closed))
+            prices = [self._get_next_hit_price(trade, params, adjusted) for params, adjusted in checks if params]
+            prices = [price for price in prices if price is not None]
+            bid_high, ask_low = hit_prices.get(symbol, (float('inf'), float('-inf')))
+            if float(trade['currentUnits']) > 0:
+                bid_high = min([bid_high] + prices)
+            else:
+                ask_low = max([ask_low] + prices)
+            hit_prices[symbol] = (bid_high, ask_low)
+        self._hit_prices = (key, hit_prices)
+
+        return hit_prices
+
+    def _get_reach_time(self,
+                        key: Tuple[int, int, int],
+                        hit_prices: Dict[str, Tuple[float, float]],
+                        now: datetime.datetime) -> Optional[datetime.datetime]:
+        """ Time before which no instrument's latest S5 candle reaches its hit prices, None if it can't be told. """
+        reach_key, reach_time = self._reach_time
+        if reach_key == key and reach_time is not None and now < reach_time:
+            return reach_time
+        times = [
+            self._pricing.get_time_prices_reach(symbol, 'S5', bid_high, ask_low)
+            for symbol, (bid_high, ask_low) in hit_prices.items()
+        ]
+        reach_time = None if None in times else min(times)
+        self._reach_time = (key, reach_time)
+
+        return reach_time
+
+    def _is_any_hit(self) -> bool:
+        try:
+            open_trades = self._get_open_trades()
+            if not open_trades:
+                return False
+            key = (self._account.version, self.sl_adjusted.version, self.partially_closed.version)
+            hit_prices = self._get_hit_prices(key, open_trades)
+            now = self._pricing.clock.now()
+            reach_time = self._get_reach_time(key, hit_prices, now)
+            if reach_time is not None and now < reach_time:
+                return False
+            pair_to_prices = self._get_pair_to_prices(open_trades)
+        except Exception:
+
+            # Checking the trades in full logs what's wrong with them.
+            return True
+        for symbol, (bid_high, ask_low) in hit_prices.items():
+            prices = pair_to_prices[symbol]
+            if prices['bid_high'] >= bid_high or prices['ask_low'] <= ask_low:
+                return True
+
+        return False
+
+    def monitor_and_adjust_current_trades(self):
+        if self._is_any_hit():
+            super().monitor_and_adjust_current_trades()
@@ -12,6 +12,7 @@ from pagetpalace.tools.logger import *
 
 
 class SSLMultiTimeFrame(Strategy):
+    PERSISTED_ATTRIBUTES = Strategy.PERSISTED_ATTRIBUTES + ('_previous_ssl_values',)
 
     def __init__(
             self,
@@ -24,6 +25,7 @@ class SSLMultiTimeFrame(Strategy):
             boundary_multipliers: dict,
             trade_multipliers: dict = None,
             ssl_periods: Dict[str, int] = None,
+            state_key: str = None,
     ):
         """
             boundary_multipliers = {
@@ -49,6 +51,7 @@ class SSLMultiTimeFrame(Strategy):
             time_frames,
             entry_timeframe,
             sub_strategies_count,
+            state_key=state_key,
         )
         self.ssl_periods = {tf: 20 for tf in time_frames} if not ssl_periods else ssl_periods
         self.trade_multipliers = trade_multipliers
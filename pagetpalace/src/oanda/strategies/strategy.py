@@ -2,26 +2,60 @@
 import abc
 import concurrent.futures
 import datetime
+import functools
 import math
-from typing import Dict, List, Union
+import threading
+from typing import Callable, Dict, List, Union
+
+# Third-party.
+import numpy as np
+import pytz
 
 # Local.
 from pagetpalace.src.constants.direction import Direction
 from pagetpalace.src.constants.price import Price
 from pagetpalace.src.currency_calculations.unit_conversions import UnitConversions
 from pagetpalace.src.currency_calculations.risk_manager import RiskManager
+from pagetpalace.src.indicators.indicators import average_true_range
+from pagetpalace.src.indicators.indicator_cache import INDICATOR_CACHE
 from pagetpalace.tools.email_sender import EmailSender
 from pagetpalace.src.oanda.instruments.instruments import Instrument
 from pagetpalace.src.oanda.instruments.instrument_attributes import InstrumentTypes
 from pagetpalace.src.oanda.orders import Orders
 from pagetpalace.src.oanda.account import OandaAccount
-from pagetpalace.src.oanda.instrument import OandaInstrumentData
+from pagetpalace.src.oanda.account_snapshot import get_account_snapshot
+from pagetpalace.src.oanda.candle_availability import get_default_detector
+from pagetpalace.src.oanda.id_registry import IdRegistry
+from pagetpalace.src.oanda.market_data import CANDLE_DATA
 from pagetpalace.src.oanda.pricing import OandaPricingData
 from pagetpalace.src.oanda.settings import LIVE_ACCESS_TOKEN, PRIMARY_ACCOUNT_NUMBER
+from pagetpalace.src.scheduling.candle_close_scheduler import CandleCloseScheduler
+from pagetpalace.src.scheduling.clock import get_clock
 from pagetpalace.tools.logger import *
+from pagetpalace.tools.tracer import TRACER, traced
 
 
 class Strategy:
+    LONDON_TZ = pytz.timezone('Europe/London')
+
+    # Complete candles requested per time frame at each candle close, indicators are calculated over this window.
+    CANDLE_COUNT = 50
+
+    # Clients, locks and shared services that stay with the parent process when signals are evaluated elsewhere.
+    TRANSIENT_ATTRIBUTES = (
+        'account',
+        'account_snapshot',
+        '_pricing',
+        '_lock',
+        'market_data',
+        'candle_detector',
+        '_live_trade_monitor',
+        'state_store',
+    )
+
+    # Runtime state written after every tick and restored on restart, a dotted name reaches into an attribute.
+    PERSISTED_ATTRIBUTES = ('_pending_orders', '_latest_data')
+
     def __init__(
             self,
             equity_split: float,
@@ -31,17 +65,31 @@ class Strategy:
             entry_timeframe: str,
             sub_strategies_count: int = 1,
             max_risk_pct: float = 0.05,
+            state_key: str = None,
     ):
         self.equity_split = equity_split
         self.account = account
+        self.account_snapshot = get_account_snapshot(account)
         self.instrument = instrument
         self.time_frames = time_frames
         self.entry_timeframe = entry_timeframe
         self.sub_strategies_count = sub_strategies_count
         self._risk_manager = RiskManager(self.instrument, max_risk_pct)
-        self._pricing = OandaPricingData(LIVE_ACCESS_TOKEN, PRIMARY_ACCOUNT_NUMBER, 'LIVE_API')
-        self._pending_orders = {str(i + 1): [] for i in range(sub_strategies_count)}
+        # Paper accounts bring their own prices.
+        self._pricing = getattr(account, 'pricing', None) \
+            or OandaPricingData(LIVE_ACCESS_TOKEN, PRIMARY_ACCOUNT_NUMBER, 'LIVE_API')
+        self._pending_orders = IdRegistry(str(i + 1) for i in range(sub_strategies_count))
         self._latest_data = {}
+        self._lock = threading.RLock()
+        self.market_data = CANDLE_DATA
+        self.candle_detector = get_default_detector()
+        self.state_store = None
+        self.state_key = state_key
+        self.alerts_enabled = True
+
+    @classmethod
+    def _get_london_time(cls, dt: datetime.datetime) -> datetime.datetime:
+        return dt.astimezone(cls.LONDON_TZ)
 
     @staticmethod
     def _should_run(dt: datetime.datetime):
@@ -57,6 +105,9 @@ class Strategy:
             'ins_trade_cap': 'Max trade cap for single instrument reached, order not placed',
         }
         msg = f'{source_to_msgs[source]} for {self.instrument}'
+        if not self.alerts_enabled:
+            logger.info(f'Alert not sent, alerts are disabled. {msg}. {additional_msg}')
+            return
         try:
             EmailSender().send_mail(subject=msg.upper(), body=f'{msg}. {additional_msg}')
         except Exception as exc:
@@ -71,29 +122,47 @@ class Strategy:
         return count < cap
 
     def _add_id_to_pending_orders(self, order: dict, strategy: str):
-        self._pending_orders[strategy].append(order['orderCreateTransaction']['id'])
+        self._pending_orders.add(strategy, order['orderCreateTransaction']['id'])
 
     def _sync_pending_orders(self, pending_orders_in_account: List[dict]):
-        ids_in_account = [p_o['id'] for p_o in pending_orders_in_account]
-        for local_pending in self._pending_orders.values():
-            for id_ in local_pending:
-                if id_ not in ids_in_account:
-                    local_pending.remove(id_)
+        self._pending_orders.reconcile(p_o['id'] for p_o in pending_orders_in_account)
 
     def _clear_pending_orders(self):
+        """ Cancel every local pending order at once, only the ones that were cancelled are forgotten. """
+        ids = self._pending_orders.get_all_ids()
+        if not ids:
+            return
         try:
-            for orders in list(self._pending_orders.values()):
-                for id_ in orders:
-                    self.account.cancel_order(id_)
-            for key in list(self._pending_orders.keys()):
-                self._pending_orders[key].clear()
+            results = self.account.cancel_orders(ids)
         except Exception as exc:
             logger.error(f'Failed to clear pending orders. {exc}', exc_info=True)
             self._send_mail_alert(source='clear_pending', additional_msg=str(exc))
+            return
+        finally:
+            self.account_snapshot.invalidate()
+        cancelled = {id_ for id_, result in results.items() if self.account.is_order_cancelled(result)}
+        self._pending_orders.remove_ids(cancelled)
+        failed = {id_: result for id_, result in results.items() if id_ not in cancelled}
+        if failed:
+            logger.error(f'Failed to cancel pending orders: {failed}')
+            self._send_mail_alert(source='clear_pending', additional_msg=str(failed))
+
+    def _trace(self, name: str, **tags):
+        return TRACER.span(name, strategy=type(self).__name__, instrument=self.instrument.symbol, **tags)
+
+    def _create_order(self, order_schema: str) -> dict:
+        with self._trace('create_order') as span:
+            order = self.account.create_order(order_schema)
+            span['server_time'] = order.get('orderCreateTransaction', {}).get('time')
+            span['filled'] = 'orderFillTransaction' in order
+        self.account_snapshot.invalidate()
 
+        return order
+
+    @traced()
     def _get_unit_size_of_trade(self, entry_price: float) -> int:
         return UnitConversions(self.instrument, entry_price) \
-            .calculate_unit_size_of_trade(self.account.get_full_account_details()['account'], self.equity_split)
+            .calculate_unit_size_of_trade(self.account_snapshot.get_details(), self.equity_split)
 
     def _validate_and_round_unit_size(self, signal: Direction, units: float):
         if self.instrument.type_ == InstrumentTypes.INDEX:
@@ -108,6 +177,7 @@ class Strategy:
 
         return units
 
+    @traced()
     def _construct_stop_order(self,
                               signal: Direction,
                               last_close_price: float,
@@ -118,7 +188,7 @@ class Strategy:
                               units: int) -> str:
         precision = self.instrument.price_precision
         units = self._risk_manager.calculate_unit_size_within_max_risk(
-            float(self.account.get_full_account_details()['account']['balance']),
+            self.account_snapshot.get_balance(),
             units,
             last_close_price,
             sl_pip_amount
@@ -146,6 +216,7 @@ class Strategy:
             units=self._validate_and_round_unit_size(signal, units),
         )
 
+    @traced()
     def _construct_market_order(self,
                                 signal: str,
                                 units: int,
@@ -154,7 +225,7 @@ class Strategy:
                                 tp_pip_amount: float) -> str:
         precision = self.instrument.price_precision
         units = self._risk_manager.calculate_unit_size_within_max_risk(
-            float(self.account.get_full_account_details()['account']['balance']),
+            self.account_snapshot.get_balance(),
             units,
             last_close_price,
             sl_pip_amount
@@ -191,7 +262,7 @@ class Strategy:
             sl_pip_amount=sl_pip_amount,
             units=units,
         )
-        pending_order = self.account.create_order(order_schema)
+        pending_order = self._create_order(order_schema)
         self._add_id_to_pending_orders(pending_order, strategy)
         msg = f'GTC pending order placed: {pending_order}'
         logger.info(msg)
@@ -244,7 +315,7 @@ class Strategy:
             sl_pip_amount=sl_pip_amount,
             units=units,
         )
-        market_order = self.account.create_order(order_schema)
+        market_order = self._create_order(order_schema)
         msg = f'IOC market order placed: {market_order}'
         logger.info(msg)
         self._send_mail_alert(source='successful_order', additional_msg=msg)
@@ -259,19 +330,25 @@ class Strategy:
         return self._latest_data[self.entry_timeframe][Price.MID_CLOSE].values[-1] \
                < self._latest_data[self.entry_timeframe][Price.MID_OPEN].values[-1]
 
+    @traced('wait_for_candle')
+    def _wait_for_latest_candle(self, close_time: datetime.datetime):
+        """ Returns as soon as Oanda marks the entry candle complete, the data is fetched regardless on a timeout. """
+        delay = self.candle_detector.wait_for_candle(self.instrument.symbol, self.entry_timeframe, close_time)
+        logger.info(f'{self.instrument.symbol} {self.entry_timeframe} candle available after {delay}s.')
+
+    @traced()
     def _update_latest_data(self):
-        od = OandaInstrumentData()
         data = {}
         with concurrent.futures.ThreadPoolExecutor() as executor:
             future_to_tf = {}
             for granularity in self.time_frames:
                 future_to_tf[
-                    executor.submit(od.get_complete_candlesticks, self.instrument.symbol, 'ABM', granularity, 50)
+                    executor.submit(self.market_data.get_candles, self.instrument.symbol, granularity, self.CANDLE_COUNT, 'ABM')
                 ] = granularity
             for future in concurrent.futures.as_completed(future_to_tf):
                 time_frame = future_to_tf[future]
                 try:
-                    data[time_frame] = od.convert_to_df(future.result(), 'ABM')
+                    data[time_frame] = future.result()
                 except ConnectionError as exc:
                     msg = f'Failed to retrieve Oanda candlestick data for time frame: {time_frame}. {exc}'
                     logger.error(msg, exc_info=True)
@@ -280,11 +357,131 @@ class Strategy:
                     return
         self._latest_data = data
 
+    def _get_cached_indicator(self, time_frame: str, indicator: str, func: Callable, **params) -> np.ndarray:
+        return INDICATOR_CACHE.get_or_compute(
+            self.instrument.symbol,
+            time_frame,
+            self._latest_data[time_frame],
+            indicator,
+            func,
+            **params,
+        )
+
+    def _get_atr_value(self, time_frame: str, periods: int = 14) -> float:
+        return float(self._get_cached_indicator(time_frame, 'ATR', average_true_range, periods=periods)[-1])
+
     @abc.abstractmethod
     def _get_signals(self, **kwargs) -> Dict[str, str]:
         raise NotImplementedError('Not implemented in subclass.')
 
     @abc.abstractmethod
-    def execute(self):
-        """ Run the complete strategy. """
+    def _update_current_indicators_and_signals(self):
+        raise NotImplementedError('Not implemented in subclass.')
+
+    @abc.abstractmethod
+    def _prepare_candle(self, close_time: datetime.datetime) -> bool:
+        """ Fetch data and sync with the account after a close, returns whether there's a new candle to evaluate. """
+        raise NotImplementedError('Not implemented in subclass.')
+
+    def _evaluate_signals(self, **kwargs) -> Dict[str, str]:
+        """ Indicators and signals for the latest data. No network access, so it can run in a worker process. """
+        with self._trace('update_indicators'):
+            self._update_current_indicators_and_signals()
+        with self._trace('get_signals'):
+            return self._get_signals(**kwargs)
+
+    @abc.abstractmethod
+    def _act_on_signals(self, close_time: datetime.datetime, signals: Dict[str, str]):
+        """ Clear outdated pending orders and place new ones. """
         raise NotImplementedError('Not implemented in subclass.')
+
+    def _on_candle_close(self, close_time: datetime.datetime):
+        with self._trace('candle_close', close_time=close_time.isoformat()) as span:
+            span['lag_ms'] = (get_clock().now() - close_time).total_seconds() * 1000
+            if self._prepare_candle(close_time):
+                self._act_on_signals(close_time, self._evaluate_signals())
+                self.save_state()
+
+    def get_evaluation_state(self) -> dict:
+        """ Everything _evaluate_signals reads or updates, picklable for a worker process. """
+        return {k: v for k, v in self.__dict__.items() if k not in self.TRANSIENT_ATTRIBUTES}
+
+    def merge_evaluation_state(self, state: dict):
+        self.__dict__.update({k: v for k, v in state.items() if k not in self.TRANSIENT_ATTRIBUTES})
+
+    def get_state_key(self) -> str:
+        """ Names the strategy's saved state, pass state_key to tell apart copies trading the same account. """
+        if self.state_key:
+            return self.state_key
+
+        return f'{type(self).__name__}_{self.account.account_id}_{self.instrument.symbol}_{self.entry_timeframe}'
+
+    def get_persisted_state(self) -> dict:
+        state = {}
+        for name in self.PERSISTED_ATTRIBUTES:
+            try:
+                state[name] = functools.reduce(getattr, name.split('.'), self)
+            except AttributeError:
+                continue
+
+        return state
+
+    def restore_persisted_state(self, state: dict):
+        for name, value in state.items():
+            if name not in self.PERSISTED_ATTRIBUTES:
+                continue
+            *path, attribute = name.split('.')
+            try:
+                setattr(functools.reduce(getattr, path, self), attribute, value)
+            except AttributeError:
+                logger.warning(f'Could not restore {name} on {self.get_state_key()}.')
+        for time_frame, df in self._latest_data.items():
+            self.market_data.seed(self.instrument.symbol, time_frame, df, self.CANDLE_COUNT)
+
+    def use_state_store(self, state_store) -> bool:
+        """ Save state to state_store after every tick, returns True if saved state was restored from it. """
+        self.state_store = state_store
+
+        return state_store.load(self)
+
+    def save_state(self):
+        if self.state_store is not None:
+            try:
+                self.state_store.save(self)
+            except Exception as exc:
+                logger.error(f'Failed to save state of {self.get_state_key()}. {exc}', exc_info=True)
+
+    def _monitor_and_adjust_current_trades(self):
+        """ Run the live trade monitor, saving state straight away if it partially closed a trade or moved a stop so
+            a restart before the next candle close doesn't adjust the trade again.
+        """
+        monitor = self._live_trade_monitor
+        before = (monitor.sl_adjusted.version, monitor.partially_closed.version)
+        monitor.monitor_and_adjust_current_trades()
+        if (monitor.sl_adjusted.version, monitor.partially_closed.version) != before:
+            self.save_state()
+
+    def _get_candle_close_stagger(self) -> float:
+        """ Seconds after the close before the strategy starts, orders strategies that share an account. """
+        return 0.
+
+    def _register_polling_jobs(self, scheduler: CandleCloseScheduler):
+        """ Jobs that run between candle closes, e.g. monitoring open trades. """
+        pass
+
+    def register(self, scheduler: CandleCloseScheduler):
+        scheduler.register_candle_close(
+            self._on_candle_close,
+            self.entry_timeframe,
+            delay=self._get_candle_close_stagger(),
+            lock=self._lock,
+        )
+        self._register_polling_jobs(scheduler)
+
+    def execute(self, state_store=None):
+        """ Run the complete strategy on its own scheduler, to share a process register it with a common one. """
+        if state_store is not None:
+            self.use_state_store(state_store)
+        scheduler = CandleCloseScheduler()
+        self.register(scheduler)
+        scheduler.run()
@@ -1,12 +1,10 @@
 # Python standard.
-import pytz
 import sys
-import time
 from datetime import datetime
+from typing import Dict
 
 # Local.
 from pagetpalace.src.indicators.indicators import (
-    get_average_true_range_value,
     append_heikin_ashi,
     append_exponentially_weighted_moving_average,
     append_ssma,
@@ -18,6 +16,14 @@ from pagetpalace.tools.logger import *
 
 
 class HeikinAshiEwm2(Strategy):
+    PERSISTED_ATTRIBUTES = Strategy.PERSISTED_ATTRIBUTES + (
+        '_prev_exec_datetime',
+        '_previous_entry_signal',
+        '_is_first_run',
+        '_long_re_entry_allowed',
+        '_short_re_entry_allowed',
+    )
+
     def __init__(
             self,
             account: OandaAccount,
@@ -27,6 +33,7 @@ class HeikinAshiEwm2(Strategy):
             trade_multipliers: dict,
             wait_time_precedence: int = 1,
             equity_split: float = 4,
+            state_key: str = None,
     ):
         super().__init__(
             equity_split=equity_split,
@@ -36,6 +43,7 @@ class HeikinAshiEwm2(Strategy):
             entry_timeframe='D',
             sub_strategies_count=1,
             max_risk_pct=0.1,
+            state_key=state_key,
         )
         self.ewm_period = ewm_period
         self.trade_multipliers = trade_multipliers
@@ -50,6 +58,7 @@ class HeikinAshiEwm2(Strategy):
         self._long_re_entry_allowed = True
         self._short_re_entry_allowed = True
         self._prev_exec_datetime = None
+        self._is_first_run = True
 
     def _check_and_clear_pending_orders(self, ha_signal: str):
         if ha_signal != self._previous_entry_signal:
@@ -60,8 +69,7 @@ class HeikinAshiEwm2(Strategy):
                 self._send_mail_alert(source='clear_pending', additional_msg=str(exc))
 
     def _update_atr_value(self):
-        get_average_true_range_value(self._latest_data[self.entry_timeframe])
-        self._atr_value = self._latest_data[self.entry_timeframe]['ATR_14'].values[-1]
+        self._atr_value = self._get_atr_value(self.entry_timeframe)
 
     def _update_ssma_value(self):
         append_ssma(self._latest_data[self.entry_timeframe], periods=50)
@@ -195,29 +203,25 @@ class HeikinAshiEwm2(Strategy):
             logger.info(f'Failed place new pending order. {exc}', exc_info=True)
             self._send_mail_alert(source='place_order', additional_msg=str(exc))
 
-    def execute(self):
-        london_tz = pytz.timezone('Europe/London')
-        prev_exec = -1
-        is_first_run = True
-        while 1:
-            now = datetime.now().astimezone(london_tz)
-            if now.isoweekday() != 6:
-                if now.minute == 0 and (now.hour == 21 or now.hour == 22) and now.hour != prev_exec:
-                    time.sleep(8 + (self.wait_time_precedence / 5) + 0.06)
-                    self._update_latest_data()
-                    if self._latest_data:
-                        prev_exec = now.hour
-                        if self._prev_exec_datetime != self._latest_data[self.entry_timeframe].iloc[-1]['datetime']:
-                            self._update_current_indicators_and_signals()
-                            self._check_and_clear_pending_orders(self._heikin_ashi_signal)
-                            signals = self._get_signals()
-                            self._log_latest_values(now, signals)
-
-                            # New orders.
-                            for strategy, signal in signals.items():
-                                if signal and self._is_valid_new_signal(signal) and not is_first_run:
-                                    self._place_new_pending_order_if_units_available(strategy, signal)
-                                    self._reset_reentry_flag(signal)
-                            self._prev_exec_datetime = self._latest_data[self.entry_timeframe].iloc[-1]['datetime']
-                        self._previous_entry_signal = self._heikin_ashi_signal
-                        is_first_run = False
+    def _prepare_candle(self, close_time: datetime) -> bool:
+        self._wait_for_latest_candle(close_time)
+        self._update_latest_data()
+
+        return bool(self._latest_data) \
+            and self._prev_exec_datetime != self._latest_data[self.entry_timeframe].iloc[-1]['datetime']
+
+    def _act_on_signals(self, close_time: datetime, signals: Dict[str, str]):
+        self._check_and_clear_pending_orders(self._heikin_ashi_signal)
+        self._log_latest_values(self._get_london_time(close_time), signals)
+
+        # New orders.
+        for strategy, signal in signals.items():
+            if signal and self._is_valid_new_signal(signal) and not self._is_first_run:
+                self._place_new_pending_order_if_units_available(strategy, signal)
+                self._reset_reentry_flag(signal)
+        self._prev_exec_datetime = self._latest_data[self.entry_timeframe].iloc[-1]['datetime']
+        self._previous_entry_signal = self._heikin_ashi_signal
+        self._is_first_run = False
+
+    def _get_candle_close_stagger(self) -> float:
+        return self.wait_time_precedence / 5
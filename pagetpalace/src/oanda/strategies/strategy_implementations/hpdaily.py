@@ -1,13 +1,10 @@
 # Python standard.
-import pytz
 import sys
-import time
 from datetime import datetime
 from typing import Dict, Union
 
 # Local.
 from pagetpalace.src.indicators.indicators import (
-    get_average_true_range_value,
     append_ssma,
     get_hammer_pin_signal_v2,
     is_candle_range_greater_than_x,
@@ -23,6 +20,8 @@ from pagetpalace.tools.logger import *
 
 
 class HPDaily(Strategy):
+    PERSISTED_ATTRIBUTES = Strategy.PERSISTED_ATTRIBUTES + ('_prev_exec_datetime',)
+
     def __init__(
             self,
             account: OandaAccount,
@@ -33,6 +32,7 @@ class HPDaily(Strategy):
             spread_cap: float = None,
             wait_time_precedence: int = 1,
             equity_split: float = 6.5,
+            state_key: str = None,
     ):
         super().__init__(
             equity_split=equity_split,
@@ -42,6 +42,7 @@ class HPDaily(Strategy):
             entry_timeframe='D',
             sub_strategies_count=1,
             max_risk_pct=0.065,
+            state_key=state_key,
         )
         """     
             coefficients = {
@@ -84,8 +85,7 @@ class HPDaily(Strategy):
                >= self._calculate_boundary(bias, price, sma_value)
 
     def _update_strategy_atr_values(self):
-        get_average_true_range_value(self._latest_data[self.entry_timeframe])
-        self._strategy_atr_values = {self.entry_timeframe: self._latest_data[self.entry_timeframe].iloc[-1]['ATR_14']}
+        self._strategy_atr_values = {self.entry_timeframe: self._get_atr_value(self.entry_timeframe)}
 
     def _update_strategy_ssma_values(self):
         append_ssma(self._latest_data[self.entry_timeframe])
@@ -233,25 +233,22 @@ class HPDaily(Strategy):
             logger.info(f'Failed place new market order. {exc}', exc_info=True)
             self._send_mail_alert(source='place_order', additional_msg=str(exc))
 
-    def execute(self):
-        london_tz = pytz.timezone('Europe/London')
-        prev_exec = -1
-        while 1:
-            now = datetime.now().astimezone(london_tz)
-            if now.isoweekday() != 6:
-                if now.minute == 0 and (now.hour == 21 or now.hour == 22) and now.hour != prev_exec:
-                    time.sleep(8 + (self.wait_time_precedence / 10) + 0.05)
-                    self._update_latest_data()
-                    if self._latest_data:
-                        prev_exec = now.hour
-                        if self._prev_exec_datetime != self._latest_data[self.entry_timeframe].iloc[-1]['datetime']:
-                            self._update_current_indicators_and_signals()
-                            signals = self._get_signals()
-                            self._log_latest_values(now, signals)
-
-                            # New orders.
-                            if self._is_within_spread_cap():
-                                for strategy, signal in signals.items():
-                                    if signal:
-                                        self._place_market_order_if_units_available(strategy, signal)
-                            self._prev_exec_datetime = self._latest_data[self.entry_timeframe].iloc[-1]['datetime']
+    def _prepare_candle(self, close_time: datetime) -> bool:
+        self._wait_for_latest_candle(close_time)
+        self._update_latest_data()
+
+        return bool(self._latest_data) \
+            and self._prev_exec_datetime != self._latest_data[self.entry_timeframe].iloc[-1]['datetime']
+
+    def _act_on_signals(self, close_time: datetime, signals: Dict[str, str]):
+        self._log_latest_values(self._get_london_time(close_time), signals)
+
+        # New orders.
+        if self._is_within_spread_cap():
+            for strategy, signal in signals.items():
+                if signal:
+                    self._place_market_order_if_units_available(strategy, signal)
+        self._prev_exec_datetime = self._latest_data[self.entry_timeframe].iloc[-1]['datetime']
+
+    def _get_candle_close_stagger(self) -> float:
+        return self.wait_time_precedence / 10
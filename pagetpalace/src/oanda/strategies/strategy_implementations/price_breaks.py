@@ -1,6 +1,4 @@
 # Python standard.
-import pytz
-import time
 from datetime import datetime, timedelta
 from typing import Dict
 
@@ -10,14 +8,15 @@ from pagetpalace.src.constants.price import Price
 from pagetpalace.src.constants.data_point import DataPoint
 from pagetpalace.src.constants.direction import Direction
 from pagetpalace.src.indicators.indicators import (
-    get_average_true_range_value,
-    get_chaikin_money_flow_value,
+    chaikin_money_flow,
     calculate_local_high_and_low,
 )
 from pagetpalace.src.oanda.account import OandaAccount
 from pagetpalace.src.oanda.instruments.instruments import Instrument
 from pagetpalace.src.indicators.trading_session_validator import TradingSessionValidator
 from pagetpalace.src.oanda.strategies.strategy import Strategy
+from pagetpalace.src.scheduling.candle_close_scheduler import CandleCloseScheduler
+from pagetpalace.src.scheduling.clock import get_clock
 from pagetpalace.tools.logger import *
 
 
@@ -25,6 +24,15 @@ class PriceBreaks(Strategy):
     SESSION_TRADES_PER_DIRECTION = 1
     TIME_FRAME = TimeFrame.H1
     STRATEGY_LABEL = '1'
+    DYNAMIC_TP_POLL_SECONDS = 1
+    PERSISTED_ATTRIBUTES = Strategy.PERSISTED_ATTRIBUTES + (
+        '_local_extremas',
+        '_new_extrema_flags',
+        '_session_trade_counts',
+        '_prev_candle_datetime',
+        '_trading_session_validator',
+        '_dynamic_tp_targets',
+    )
 
     def __init__(
             self,
@@ -36,6 +44,7 @@ class PriceBreaks(Strategy):
             session_reset_look_backs: Dict[Direction, int],
             entry_offset_factors: Dict[Direction, float],
             max_candle_factors: Dict[Direction, float],
+            state_key: str = None,
     ):
         super().__init__(
             equity_split=equity_split,
@@ -44,6 +53,7 @@ class PriceBreaks(Strategy):
             time_frames=[self.TIME_FRAME],
             entry_timeframe=self.TIME_FRAME,
             max_risk_pct=0.05,
+            state_key=state_key,
         )
         self.equity_split = equity_split
         self.tp_multipliers = tp_multipliers
@@ -59,8 +69,7 @@ class PriceBreaks(Strategy):
         self._session_trade_counts = {k: self.SESSION_TRADES_PER_DIRECTION for k in [Direction.LONG, Direction.SHORT]}
         self._latest_candle = None
         self._prev_candle_datetime = None
-        self._trading_session_validator = TradingSessionValidator(datetime.now())
-        self._prev_exec = -1
+        self._trading_session_validator = TradingSessionValidator(get_clock().now().replace(tzinfo=None))
         self._dynamic_tp_targets = {}
         logger.info({k: v for k, v in self.__dict__.items()})
 
@@ -94,21 +103,20 @@ class PriceBreaks(Strategy):
             self._new_extrema_flags[Direction.SHORT][DataPoint.LOW] = True
 
     def _update_atr_value(self):
-        self._atr_value = round(get_average_true_range_value(self._latest_data[self.entry_timeframe]), 2)
+        self._atr_value = round(self._get_atr_value(self.entry_timeframe), 2)
 
     def _update_cmf_value(self):
-        self._cmf_value = round(get_chaikin_money_flow_value(self._latest_data[self.entry_timeframe]), 2)
+        self._cmf_value = round(float(self._get_cached_indicator(self.entry_timeframe, 'CMF', chaikin_money_flow)[-1]), 2)
 
     def _update_for_new_session(self):
         self._reset_local_extremas()
         self._reset_session_trades_count()
         self._reset_new_extrema_flags()
 
-    def _update_oanda_candlestick_data(self, now):
+    def _update_oanda_candlestick_data(self):
         self._update_latest_data()
         if self._latest_data:
             self._latest_candle = self._latest_data[self.entry_timeframe].iloc[-1]
-            self._prev_exec = now.hour
 
     def _update_dynamic_tp_targets(self):
         self._dynamic_tp_targets = {
@@ -120,15 +128,13 @@ class PriceBreaks(Strategy):
             in self.account.get_open_trades()['trades']
         }
 
-    def _update_strategy_reqs(self):
-        self._clear_pending_orders()
+    def _update_current_indicators_and_signals(self):
         self._trading_session_validator.date_time = self._get_latest_datetime() + timedelta(hours=1)
         self._update_atr_value()
         self._update_cmf_value()
         self._update_new_extrema_flags()
         if self._trading_session_validator.is_new_session():
             self._update_for_new_session()
-        self._update_dynamic_tp_targets()
 
     def _close_active_if_dynamic_tp_hit(self):
         to_delete = []
@@ -236,27 +242,31 @@ class PriceBreaks(Strategy):
         logger.info(f'signals: {signals}')
         logger.info(f'dynamic tp targets: {self._dynamic_tp_targets}')
 
-    def execute(self):
-        london_tz = pytz.timezone('Europe/London')
-        while 1:
-            now = datetime.now().astimezone(london_tz)
-            if self._should_run(now):
-                try:
-                    self._close_active_if_dynamic_tp_hit()
-                except Exception as exc:
-                    logger.error(f'Failed to run _close_active_if_dynamic_tp_hit - {exc}', exc_info=True)
-                if now.minute == 0 and now.hour != self._prev_exec:
-                    try:
-                        self._sync_pending_orders(self.account.get_pending_orders()['orders'])
-                    except Exception as exc:
-                        logger.error(f'Failed to sync pending orders. {exc}', exc_info=True)
-                    time.sleep(2)
-                    self._update_oanda_candlestick_data(now)
-                    if self._is_new_candle():
-                        self._update_strategy_reqs()
-                        signals = self._get_signals()
-                        self._log_latest(signals)
-                        for strategy, signal in signals.items():
-                            if signal:
-                                self._execute_and_act_on_new_order(signal)
-                        self._prev_candle_datetime = self._get_latest_datetime()
+    def _prepare_candle(self, close_time: datetime) -> bool:
+        self._wait_for_latest_candle(close_time)
+        try:
+            self._sync_pending_orders(self.account.get_pending_orders()['orders'])
+        except Exception as exc:
+            logger.error(f'Failed to sync pending orders. {exc}', exc_info=True)
+        self._update_oanda_candlestick_data()
+
+        return self._is_new_candle()
+
+    def _act_on_signals(self, close_time: datetime, signals: Dict[str, str]):
+        self._clear_pending_orders()
+        self._update_dynamic_tp_targets()
+        self._log_latest(signals)
+        for strategy, signal in signals.items():
+            if signal:
+                self._execute_and_act_on_new_order(signal)
+        self._prev_candle_datetime = self._get_latest_datetime()
+
+    def _poll_dynamic_tp_targets(self, tick_time: datetime):
+        if self._should_run(self._get_london_time(tick_time)):
+            try:
+                self._close_active_if_dynamic_tp_hit()
+            except Exception as exc:
+                logger.error(f'Failed to run _close_active_if_dynamic_tp_hit - {exc}', exc_info=True)
+
+    def _register_polling_jobs(self, scheduler: CandleCloseScheduler):
+        scheduler.register_interval(self._poll_dynamic_tp_targets, self.DYNAMIC_TP_POLL_SECONDS, lock=self._lock)
@@ -1,19 +1,25 @@
 # Python standard.
-import pytz
-import time
 from datetime import datetime
 from typing import Dict
 
 # Local.
-from pagetpalace.src.indicators.indicators import get_average_true_range_value, append_ssma
+from pagetpalace.src.indicators.indicators import append_ssma
 from pagetpalace.src.oanda.instruments.instruments import Instrument
 from pagetpalace.src.oanda.account import OandaAccount
 from pagetpalace.src.oanda.live_trade_monitor import LiveTradeMonitor
 from pagetpalace.src.oanda.strategies.ssl_multi import SSLMultiTimeFrame
+from pagetpalace.src.scheduling.candle_close_scheduler import CandleCloseScheduler
 from pagetpalace.tools.logger import *
 
 
 class SSLCurrency(SSLMultiTimeFrame):
+    MONITOR_INTERVAL_SECONDS = 1
+    PERSISTED_ATTRIBUTES = SSLMultiTimeFrame.PERSISTED_ATTRIBUTES + (
+        '_is_first_run',
+        '_live_trade_monitor.sl_adjusted',
+        '_live_trade_monitor.partially_closed',
+    )
+
     def __init__(
             self,
             account: OandaAccount,
@@ -21,6 +27,7 @@ class SSLCurrency(SSLMultiTimeFrame):
             trade_multipliers: dict,
             boundary_multipliers: dict,
             live_trade_monitor: LiveTradeMonitor,
+            state_key: str = None,
     ):
         super().__init__(
             equity_split=2,
@@ -31,11 +38,13 @@ class SSLCurrency(SSLMultiTimeFrame):
             sub_strategies_count=1,
             trade_multipliers=trade_multipliers,
             boundary_multipliers=boundary_multipliers,
+            state_key=state_key,
         )
+        self._live_trade_monitor = live_trade_monitor
+        self._is_first_run = True
 
     def _update_atr_values(self):
-        get_average_true_range_value(self._latest_data['M30'])
-        self._atr_values['M30'] = round(self._latest_data['M30'].iloc[-1]['ATR_14'], 5)
+        self._atr_values['M30'] = round(self._get_atr_value('M30'), 5)
 
     def _update_ssma_values(self):
         append_ssma(self._latest_data['M30'])
@@ -50,60 +59,59 @@ class SSLCurrency(SSLMultiTimeFrame):
 
         return signals
 
-    def execute(self):
-        london_tz = pytz.timezone('Europe/London')
-        prev_exec = -1
-        is_first_run = True
-        while 1:
-            now = datetime.now().astimezone(london_tz)
-            try:
-                self._sync_pending_orders(self.account.get_pending_orders()['orders'])
-            except Exception as exc:
-                logger.error(f'Failed to sync pending orders. {exc}', exc_info=True)
-            if now.minute % 30 == 0 and now.minute != prev_exec:
-                time.sleep(8)
-                self._update_latest_data()
-                if self._latest_data:
-                    last_30m_close = float(self._latest_data['M30']['midClose'].values[-1])
-                    self._update_current_indicators_and_signals()
-                    signals = self._get_signals()
-                    self._log_latest_values(now, signals)
-
-                    # Remove outdated pending orders depending on entry signals.
-                    self._check_and_clear_pending_orders()
-
-                    # New orders.
-                    for strategy, signal in signals.items():
-                        if signal:
-                            try:
-                                spread = float(self._latest_data['M30']['askOpen'].values[-1]) \
-                                         - float(self._latest_data['M30']['bidOpen'].values[-1])
-                                units = self._get_unit_size_of_trade(last_30m_close)
-                                is_within_valid_boundary = self._is_within_valid_boundary(signal, last_30m_close, 'M30')
-                                if units > 0 and spread <= 0.0004 and is_within_valid_boundary \
-                                        and self._has_new_entry_signal() and not is_first_run:
-                                    sl_pip_amount = self._atr_values[self.entry_timeframe] \
-                                                    * self.trade_multipliers[strategy][signal]['sl']
-                                    self._place_pending_order(
-                                        price_to_offset_from=last_30m_close,
-                                        entry_offset=self._atr_values[self.entry_timeframe] / 5,
-                                        worst_price_bound_offset=self._atr_values[self.entry_timeframe] / 2,
-                                        sl_pip_amount=sl_pip_amount,
-                                        tp_pip_amount=sl_pip_amount * self.trade_multipliers[strategy][signal]['tp'],
-                                        strategy=strategy,
-                                        signal=signal,
-                                        units=units,
-                                    )
-                            except Exception as exc:
-                                logger.info(f'Failed place new pending order. {exc}', exc_info=True)
-                    prev_exec = now.minute
-                    is_first_run = False
-                    self._update_previous_ssl_values()
-
-            # Monitor and adjust current trades, if any.
-            time.sleep(1)
-            self._live_trade_monitor.monitor_and_adjust_current_trades()
-
-            # Remove outdated entries in local lists.
-            if now.hour % 24 == 0:
-                self._live_trade_monitor.clean_lists()
+    def _prepare_candle(self, close_time: datetime) -> bool:
+        self._wait_for_latest_candle(close_time)
+        self._update_latest_data()
+
+        return bool(self._latest_data)
+
+    def _act_on_signals(self, close_time: datetime, signals: Dict[str, str]):
+        last_30m_close = float(self._latest_data['M30']['midClose'].values[-1])
+        self._log_latest_values(self._get_london_time(close_time), signals)
+
+        # Remove outdated pending orders depending on entry signals.
+        self._check_and_clear_pending_orders()
+
+        # New orders.
+        for strategy, signal in signals.items():
+            if signal:
+                try:
+                    spread = float(self._latest_data['M30']['askOpen'].values[-1]) \
+                             - float(self._latest_data['M30']['bidOpen'].values[-1])
+                    units = self._get_unit_size_of_trade(last_30m_close)
+                    is_within_valid_boundary = self._is_within_valid_boundary(signal, last_30m_close, 'M30')
+                    if units > 0 and spread <= 0.0004 and is_within_valid_boundary \
+                            and self._has_new_entry_signal() and not self._is_first_run:
+                        sl_pip_amount = self._atr_values[self.entry_timeframe] \
+                                        * self.trade_multipliers[strategy][signal]['sl']
+                        self._place_pending_order(
+                            price_to_offset_from=last_30m_close,
+                            entry_offset=self._atr_values[self.entry_timeframe] / 5,
+                            worst_price_bound_offset=self._atr_values[self.entry_timeframe] / 2,
+                            sl_pip_amount=sl_pip_amount,
+                            tp_pip_amount=sl_pip_amount * self.trade_multipliers[strategy][signal]['tp'],
+                            strategy=strategy,
+                            signal=signal,
+                            units=units,
+                        )
+                except Exception as exc:
+                    logger.info(f'Failed place new pending order. {exc}', exc_info=True)
+        self._is_first_run = False
+        self._update_previous_ssl_values()
+
+    def _monitor_open_trades(self, tick_time: datetime):
+        now = self._get_london_time(tick_time)
+        try:
+            self._sync_pending_orders(self.account.get_pending_orders()['orders'])
+        except Exception as exc:
+            logger.error(f'Failed to sync pending orders. {exc}', exc_info=True)
+
+        # Monitor and adjust current trades, if any.
+        self._monitor_and_adjust_current_trades()
+
+        # Remove outdated entries in local lists.
+        if now.hour % 24 == 0:
+            self._live_trade_monitor.clean_lists()
+
+    def _register_polling_jobs(self, scheduler: CandleCloseScheduler):
+        scheduler.register_interval(self._monitor_open_trades, self.MONITOR_INTERVAL_SECONDS, lock=self._lock)
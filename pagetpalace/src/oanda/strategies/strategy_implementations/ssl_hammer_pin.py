@@ -1,12 +1,9 @@
 # Python standard.
-import pytz
-import time
 from datetime import datetime
 from typing import Dict, Union
 
 # Local.
 from pagetpalace.src.indicators.indicators import (
-    get_average_true_range_value,
     append_ssma,
     get_hammer_pin_signal,
     is_candle_range_greater_than_x,
@@ -18,6 +15,9 @@ from pagetpalace.tools.logger import *
 
 
 class SSLHammerPin(SSLMultiTimeFrame):
+    PERSISTED_ATTRIBUTES = SSLMultiTimeFrame.PERSISTED_ATTRIBUTES + ('_prev_latest_candle_datetime',)
+    MAX_OPEN_TRADES = 2
+
     def __init__(
             self,
             account: OandaAccount,
@@ -32,6 +32,7 @@ class SSLHammerPin(SSLMultiTimeFrame):
             equity_split: float = 2.25,
             entry_ssma_period: int = 20,
             x_atr_coeffs: Dict[str, float] = None,
+            state_key: str = None,
     ):
         time_frames = ['D', 'H1']
         super().__init__(
@@ -44,6 +45,7 @@ class SSLHammerPin(SSLMultiTimeFrame):
             boundary_multipliers=boundary_multipliers,
             trade_multipliers=trade_multipliers,
             ssl_periods={tf: 10 for tf in time_frames} if not ssl_periods else ssl_periods,
+            state_key=state_key,
         )
         self.hammer_pin_coefficients = hammer_pin_coefficients
         self.trading_restriction = trading_restriction  # 'trading_hours' or 'spread_cap'.
@@ -64,8 +66,7 @@ class SSLHammerPin(SSLMultiTimeFrame):
 
     def _update_atr_values(self):
         for tf in self.time_frames:
-            get_average_true_range_value(self._latest_data[tf])
-            self._atr_values[tf] = round(self._latest_data[tf].iloc[-1]['ATR_14'], 5)
+            self._atr_values[tf] = round(self._get_atr_value(tf), 5)
 
     def _update_ssma_values(self):
         append_ssma(self._latest_data['H1'], periods=self.entry_ssma_period)
@@ -137,7 +138,7 @@ class SSLHammerPin(SSLMultiTimeFrame):
 
     def _place_new_pending_order_if_units_available(self, strategy: str, signal: str):
         entry_price = self._get_price_to_use_for_entry_offset(signal)
-        if self._is_instrument_below_num_of_trades_cap(2):
+        if self._is_instrument_below_num_of_trades_cap(self.MAX_OPEN_TRADES):
             try:
                 units = self._get_unit_size_of_trade(entry_price)
                 if units > 0:
@@ -159,34 +160,32 @@ class SSLHammerPin(SSLMultiTimeFrame):
                 logger.info(f'Failed place new pending order. {exc}', exc_info=True)
                 self._send_mail_alert(source='place_order', additional_msg=str(exc))
         else:
-            logger.info(f'Instrument has reached trade cap of 2, order not placed.')
+            logger.info(f'Instrument has reached trade cap of {self.MAX_OPEN_TRADES}, order not placed.')
             self._send_mail_alert(source='ins_trade_cap', additional_msg='trade not taken.')
 
-    def execute(self):
-        london_tz = pytz.timezone('Europe/London')
-        prev_exec = -1
-        while 1:
-            now = datetime.now().astimezone(london_tz)
-            if now.isoweekday() != 6:
-                try:
-                    self._sync_pending_orders(self.account.get_pending_orders()['orders'])
-                except Exception as exc:
-                    logger.error(f'Failed to sync pending orders. {exc}', exc_info=True)
-                if now.minute == 0 and now.hour != prev_exec:
-                    time.sleep(8 + (self._wait_time_precedence / 10))
-                    self._update_latest_data()
-                    if self._latest_data:
-                        prev_exec = now.hour
-                        if self._prev_latest_candle_datetime != self._latest_data['H1'].iloc[-1]['datetime']:
-                            self._check_and_clear_pending_orders()
-                            self._update_current_indicators_and_signals()
-                            signals = self._get_signals()
-                            self._log_latest_values(now, signals)
-
-                            # New orders.
-                            if self._is_within_trading_restriction(now):
-                                for strategy, signal in signals.items():
-                                    if signal:
-                                        self._place_new_pending_order_if_units_available(strategy, signal)
-                            self._update_previous_ssl_values()
-                            self._prev_latest_candle_datetime = self._latest_data['H1'].iloc[-1]['datetime']
+    def _prepare_candle(self, close_time: datetime) -> bool:
+        self._wait_for_latest_candle(close_time)
+        try:
+            self._sync_pending_orders(self.account.get_pending_orders()['orders'])
+        except Exception as exc:
+            logger.error(f'Failed to sync pending orders. {exc}', exc_info=True)
+        self._update_latest_data()
+
+        return bool(self._latest_data) \
+            and self._prev_latest_candle_datetime != self._latest_data['H1'].iloc[-1]['datetime']
+
+    def _act_on_signals(self, close_time: datetime, signals: Dict[str, str]):
+        now = self._get_london_time(close_time)
+        self._check_and_clear_pending_orders()
+        self._log_latest_values(now, signals)
+
+        # New orders.
+        if self._is_within_trading_restriction(now):
+            for strategy, signal in signals.items():
+                if signal:
+                    self._place_new_pending_order_if_units_available(strategy, signal)
+        self._update_previous_ssl_values()
+        self._prev_latest_candle_datetime = self._latest_data['H1'].iloc[-1]['datetime']
+
+    def _get_candle_close_stagger(self) -> float:
+        return self._wait_time_precedence / 10
@@ -1,6 +1,4 @@
 # Python standard.
-import pytz
-import time
 from datetime import datetime
 from typing import Dict
 
@@ -9,11 +7,19 @@ from pagetpalace.src.oanda.instruments.instruments import Instrument
 from pagetpalace.src.oanda.account import OandaAccount
 from pagetpalace.src.oanda.live_trade_monitor import LiveTradeMonitor
 from pagetpalace.src.oanda.strategies.ssl_multi import SSLMultiTimeFrame
-from pagetpalace.src.indicators.indicators import get_average_true_range_value, append_ssma
+from pagetpalace.src.scheduling.candle_close_scheduler import CandleCloseScheduler
+from pagetpalace.src.indicators.indicators import append_ssma
 from pagetpalace.tools.logger import *
 
 
 class SSLInvestment(SSLMultiTimeFrame):
+    MONITOR_INTERVAL_SECONDS = 1.1
+    PERSISTED_ATTRIBUTES = SSLMultiTimeFrame.PERSISTED_ATTRIBUTES + (
+        '_is_first_run',
+        '_live_trade_monitor.sl_adjusted',
+        '_live_trade_monitor.partially_closed',
+    )
+
     def __init__(
             self,
             account: OandaAccount,
@@ -21,6 +27,7 @@ class SSLInvestment(SSLMultiTimeFrame):
             trade_multipliers: dict,
             boundary_multipliers: dict,
             live_trade_monitor: LiveTradeMonitor,
+            state_key: str = None,
     ):
         super().__init__(
             equity_split=1.75,
@@ -31,12 +38,13 @@ class SSLInvestment(SSLMultiTimeFrame):
             sub_strategies_count=1,
             trade_multipliers=trade_multipliers,
             boundary_multipliers=boundary_multipliers,
+            state_key=state_key,
         )
         self._live_trade_monitor = live_trade_monitor
+        self._is_first_run = True
 
     def _update_atr_values(self):
-        get_average_true_range_value(self._latest_data['H1'])
-        self._atr_values['H1'] = round(self._latest_data['H1'].iloc[-1]['ATR_14'], 5)
+        self._atr_values['H1'] = round(self._get_atr_value('H1'), 5)
 
     def _update_ssma_values(self):
         append_ssma(self._latest_data['H1'])
@@ -68,41 +76,46 @@ class SSLInvestment(SSLMultiTimeFrame):
             logger.info(f'Failed place new pending order. {exc}', exc_info=True)
             self._send_mail_alert(source='place_order', additional_msg=str(exc))
 
-    def execute(self):
-        london_tz = pytz.timezone('Europe/London')
-        prev_exec = -1
-        is_first_run = True
-        while 1:
-            now = datetime.now().astimezone(london_tz)
-            if now.isoweekday() != 6:
-                try:
-                    self._sync_pending_orders(self.account.get_pending_orders()['orders'])
-                except Exception as exc:
-                    logger.error(f'Failed to sync pending orders. {exc}', exc_info=True)
-                if now.minute == 0 and now.hour != prev_exec:
-                    time.sleep(8.05)
-                    self._update_latest_data()
-                    if self._latest_data:
-                        self._update_current_indicators_and_signals()
-                        last_h1_close = float(self._latest_data['H1']['midClose'].values[-1])
-                        signals = self._get_signals(price=last_h1_close)
-                        self._log_latest_values(now, signals)
-
-                        # Remove outdated pending orders depending on entry signals.
-                        self._check_and_clear_pending_orders()
-
-                        # New orders.
-                        for strategy, signal in signals.items():
-                            if signal and self._has_new_entry_signal() and not is_first_run:
-                                self._place_new_pending_order_if_units_available(last_h1_close, strategy, signal)
-                    prev_exec = now.hour
-                    self._update_previous_ssl_values()
-                    is_first_run = False
-
-                # Monitor and adjust current trades, if any.
-                time.sleep(1.1)
-                self._live_trade_monitor.monitor_and_adjust_current_trades()
-
-                # Remove outdated entries in local lists.
-                if now.hour % 24 == 0:
-                    self._live_trade_monitor.clean_lists()
+    def _prepare_candle(self, close_time: datetime) -> bool:
+        self._wait_for_latest_candle(close_time)
+        self._update_latest_data()
+        if not self._latest_data:
+            self._update_previous_ssl_values()
+            self._is_first_run = False
+
+        return bool(self._latest_data)
+
+    def _evaluate_signals(self, **kwargs) -> Dict[str, str]:
+        return super()._evaluate_signals(price=float(self._latest_data['H1']['midClose'].values[-1]))
+
+    def _act_on_signals(self, close_time: datetime, signals: Dict[str, str]):
+        last_h1_close = float(self._latest_data['H1']['midClose'].values[-1])
+        self._log_latest_values(self._get_london_time(close_time), signals)
+
+        # Remove outdated pending orders depending on entry signals.
+        self._check_and_clear_pending_orders()
+
+        # New orders.
+        for strategy, signal in signals.items():
+            if signal and self._has_new_entry_signal() and not self._is_first_run:
+                self._place_new_pending_order_if_units_available(last_h1_close, strategy, signal)
+        self._update_previous_ssl_values()
+        self._is_first_run = False
+
+    def _monitor_open_trades(self, tick_time: datetime):
+        now = self._get_london_time(tick_time)
+        if now.isoweekday() != 6:
+            try:
+                self._sync_pending_orders(self.account.get_pending_orders()['orders'])
+            except Exception as exc:
+                logger.error(f'Failed to sync pending orders. {exc}', exc_info=True)
+
+            # Monitor and adjust current trades, if any.
+            self._monitor_and_adjust_current_trades()
+
+            # Remove outdated entries in local lists.
+            if now.hour % 24 == 0:
+                self._live_trade_monitor.clean_lists()
+
+    def _register_polling_jobs(self, scheduler: CandleCloseScheduler):
+        scheduler.register_interval(self._monitor_open_trades, self.MONITOR_INTERVAL_SECONDS, lock=self._lock)
@@ -0,0 +1,67 @@
+# Python standard.
+import os
+import pickle
+import tempfile
+
+# Local.
+from pagetpalace.src.scheduling.clock import get_clock
+from pagetpalace.tools.logger import *
+
+# Bump when the layout of saved state changes, older snapshots are then ignored instead of restored.
+STATE_VERSION = 1
+
+
+class StrategyStateStore:
+    """ One pickle per strategy in directory, holding the attributes listed in its PERSISTED_ATTRIBUTES.
+
+        Snapshots are written to a temporary file and moved into place, so a crash mid-write leaves the previous
+        snapshot intact.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def __repr__(self):
+        return f'StrategyStateStore(directory={self.directory})'
+
+    def get_path(self, strategy) -> str:
+        return os.path.join(self.directory, f'{strategy.get_state_key()}.pkl')
+
+    def save(self, strategy):
+        snapshot = {
+            'version': STATE_VERSION,
+            'key': strategy.get_state_key(),
+            'saved_at': get_clock().now(),
+            'state': strategy.get_persisted_state(),
+        }
+        handle, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.get_path(strategy))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def load(self, strategy) -> bool:
+        """ Restore the strategy's saved state, returns False if there's none or it can't be used. """
+        path = self.get_path(strategy)
+        if not os.path.exists(path):
+            return False
+        try:
+            with open(path, 'rb') as f:
+                snapshot = pickle.load(f)
+        except Exception as exc:
+            logger.error(f'Failed to read saved state {path}. {exc}', exc_info=True)
+            return False
+        if snapshot.get('version') != STATE_VERSION or snapshot.get('key') != strategy.get_state_key():
+            logger.warning(f'Ignoring saved state {path}, it was written by a different version.')
+            return False
+        strategy.restore_persisted_state(snapshot['state'])
+        logger.info(f'Restored {strategy.get_state_key()} from state saved at {snapshot["saved_at"]}.')
+
+        return True
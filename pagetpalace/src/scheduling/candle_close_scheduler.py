@@ -0,0 +1,361 @@
+# Python standard.
+import datetime
+import heapq
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+# Third-party.
+import pytz
+
+# Local.
+from pagetpalace.src.scheduling.clock import SimulationFinished, get_clock
+from pagetpalace.tools.logger import *
+
+GRANULARITY_SECONDS = {
+    'S5': 5,
+    'S10': 10,
+    'S15': 15,
+    'S30': 30,
+    'M1': 60,
+    'M2': 120,
+    'M4': 240,
+    'M5': 300,
+    'M10': 600,
+    'M15': 900,
+    'M30': 1800,
+    'H1': 3600,
+    'H2': 7200,
+    'H3': 10800,
+    'H4': 14400,
+    'H6': 21600,
+    'H8': 28800,
+    'H12': 43200,
+    'D': 86400,
+}
+
+# Same alignment OandaInstrumentData requests candles with.
+DEFAULT_DAILY_ALIGNMENT = 22
+DEFAULT_ALIGNMENT_TIMEZONE = 'Europe/London'
+
+# The market trades from 17:00 New York time on Sunday until 17:00 New York time on Friday.
+MARKET_TIMEZONE = pytz.timezone('America/New_York')
+MARKET_OPEN_HOUR = 17
+
+# Upper bound on a single sleep so wall clock adjustments are picked up, registering a job wakes the scheduler anyway.
+MAX_WAIT_SECONDS = 60.
+
+
+def _get_alignment_on(day: datetime.date, daily_alignment: int, tz) -> datetime.datetime:
+    return tz.localize(datetime.datetime(day.year, day.month, day.day, daily_alignment)).astimezone(pytz.utc)
+
+
+def _get_latest_alignment(moment: datetime.datetime, daily_alignment: int, tz) -> datetime.datetime:
+    day = moment.astimezone(tz).date()
+    alignment = _get_alignment_on(day, daily_alignment, tz)
+    if alignment > moment:
+        alignment = _get_alignment_on(day - datetime.timedelta(days=1), daily_alignment, tz)
+
+    return alignment
+
+
+def _get_following_close(moment: datetime.datetime,
+                         step: datetime.timedelta,
+                         daily_alignment: int,
+                         tz) -> datetime.datetime:
+    """ First candle close strictly after moment, candles are aligned on the most recent daily alignment. """
+    anchor = _get_latest_alignment(moment, daily_alignment, tz)
+    next_anchor = _get_alignment_on(anchor.astimezone(tz).date() + datetime.timedelta(days=1), daily_alignment, tz)
+    if step >= datetime.timedelta(days=1):
+        return next_anchor
+
+    return min(anchor + step * ((moment - anchor) // step + 1), next_anchor)
+
+
+def _get_next_market_open(moment: datetime.datetime) -> datetime.datetime:
+    local = moment.astimezone(MARKET_TIMEZONE)
+    day = local.date() + datetime.timedelta(days=(6 - local.weekday()) % 7)
+
+    return _get_alignment_on(day, MARKET_OPEN_HOUR, MARKET_TIMEZONE)
+
+
+def is_market_open(moment: datetime.datetime) -> bool:
+    local = moment.astimezone(MARKET_TIMEZONE)
+    if local.weekday() == 4:
+        return local.hour < MARKET_OPEN_HOUR
+    if local.weekday() == 5:
+        return False
+    if local.weekday() == 6:
+        return local.hour >= MARKET_OPEN_HOUR
+
+    return True
+
+
+def next_candle_close(granularity: str,
+                      after: datetime.datetime,
+                      daily_alignment: int = DEFAULT_DAILY_ALIGNMENT,
+                      alignment_timezone: str = DEFAULT_ALIGNMENT_TIMEZONE,
+                      skip_market_closed: bool = True) -> datetime.datetime:
+    """ UTC time of the first candle close strictly after `after`, naive datetimes are treated as UTC.
+
+        With skip_market_closed, closes of candles that would open while the market is shut are passed over.
+    """
+    if granularity not in GRANULARITY_SECONDS:
+        raise ValueError(f'Unsupported granularity: {granularity}.')
+    if after.tzinfo is None:
+        after = after.replace(tzinfo=pytz.utc)
+    tz = pytz.timezone(alignment_timezone)
+    step = datetime.timedelta(seconds=GRANULARITY_SECONDS[granularity])
+    close = _get_following_close(after.astimezone(pytz.utc), step, daily_alignment, tz)
+    while skip_market_closed and not is_market_open(close - step):
+        market_open = _get_next_market_open(close - step)
+        following = _get_following_close(market_open, step, daily_alignment, tz)
+        if following == close:
+            # The market opens part way through the candle, e.g. when New York and the alignment timezone change
+            # clocks on different dates.
+            break
+        close = following
+
+    return close
+
+
+def _get_name(callback: Callable) -> str:
+    return getattr(callback, '__qualname__', repr(callback))
+
+
+class ScheduledJob:
+    """ A callback and the rule for when it next fires. The callback receives the event time, i.e. the candle close
+        or the interval tick, the job becomes due `delay` seconds after it. Jobs given the same lock never run at the
+        same time, e.g. the candle close and polling callbacks of one strategy. is_polling marks the jobs registered
+        with an interval.
+    """
+
+    def __init__(self,
+                 name: str,
+                 callback: Callable[[datetime.datetime], None],
+                 get_next_event: Callable[[datetime.datetime], datetime.datetime],
+                 delay: float = 0.,
+                 lock: threading.Lock = None,
+                 is_polling: bool = False):
+        if delay < 0:
+            raise ValueError('delay must not be negative.')
+        self.name = name
+        self.callback = callback
+        self.delay = delay
+        self._delay = datetime.timedelta(seconds=delay)
+        self.lock = lock
+        self.is_polling = is_polling
+        self.event_time = None
+        self.due = None
+        self.is_running = False
+        self.is_cancelled = False
+        self.skipped_count = 0
+        self._get_next_event = get_next_event
+
+    def __repr__(self):
+        return f'ScheduledJob(name={self.name}, event_time={self.event_time}, due={self.due})'
+
+    def schedule_after(self, moment: datetime.datetime):
+        self.event_time = self._get_next_event(moment)
+        self.due = self.event_time + self._delay
+
+    def schedule_next(self, now: datetime.datetime):
+        """ Schedule the event after the one that's due. Don't replay every missed event if the scheduler fell
+            behind, only the one that's due.
+        """
+        self.schedule_after(max(self.event_time, now - self._delay))
+
+
+class CandleCloseScheduler:
+    """ Sleeps until the next registered candle close or interval tick is due, then dispatches the callbacks.
+
+        Callbacks run on a thread pool so many strategies can share one process, a job is never run concurrently
+        with itself, a tick that is due while the previous run is still going is skipped. max_workers=0 runs callbacks
+        inline on the scheduling thread.
+
+        On a simulated clock the scheduler waits for the running callbacks before moving time on, so a replay sees the
+        same order of events a live run would, and interval jobs don't tick more often than the clock's resolution.
+        Interval jobs run inline there, a poll per tick of a long replay is too quick to be worth handing to a thread.
+    """
+
+    def __init__(self, clock=None, max_workers: int = 4):
+        if max_workers < 0:
+            raise ValueError('max_workers must not be negative.')
+        self.clock = clock or get_clock()
+        self.max_workers = max_workers
+        self._jobs = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._executor = None
+        self._running_count = 0
+        self._idle = threading.Condition()
+
+    def __repr__(self):
+        return f'CandleCloseScheduler(jobs={len(self.jobs)}, max_workers={self.max_workers})'
+
+    @property
+    def jobs(self) -> List[ScheduledJob]:
+        with self._lock:
+            return [job for _, _, job in sorted(self._jobs) if not job.is_cancelled]
+
+    def _push(self, job: ScheduledJob):
+        with self._lock:
+            heapq.heappush(self._jobs, (job.due, next(self._sequence), job))
+        self._wakeup.set()
+
+    def _register(self, job: ScheduledJob) -> ScheduledJob:
+        job.schedule_after(self.clock.now())
+        self._push(job)
+        logger.info(f'Registered {job}')
+
+        return job
+
+    def register_candle_close(self,
+                              callback: Callable[[datetime.datetime], None],
+                              granularity: str,
+                              delay: float = 0.,
+                              name: str = None,
+                              lock: threading.Lock = None,
+                              daily_alignment: int = DEFAULT_DAILY_ALIGNMENT,
+                              alignment_timezone: str = DEFAULT_ALIGNMENT_TIMEZONE,
+                              skip_market_closed: bool = True) -> ScheduledJob:
+        if granularity not in GRANULARITY_SECONDS:
+            raise ValueError(f'Unsupported granularity: {granularity}.')
+
+        def get_next_event(moment: datetime.datetime) -> datetime.datetime:
+            return next_candle_close(granularity, moment, daily_alignment, alignment_timezone, skip_market_closed)
+
+        name = name or f'{_get_name(callback)}@{granularity}'
+
+        return self._register(ScheduledJob(name, callback, get_next_event, delay, lock))
+
+    def register_interval(self,
+                          callback: Callable[[datetime.datetime], None],
+                          seconds: float,
+                          delay: float = 0.,
+                          name: str = None,
+                          lock: threading.Lock = None) -> ScheduledJob:
+        if seconds <= 0:
+            raise ValueError('seconds must be positive.')
+        seconds = max(seconds, getattr(self.clock, 'resolution', 0.) or 0.)
+        interval = datetime.timedelta(seconds=seconds)
+
+        def get_next_event(moment: datetime.datetime) -> datetime.datetime:
+            return moment + interval
+
+        name = name or f'{_get_name(callback)}@{seconds}s'
+
+        return self._register(ScheduledJob(name, callback, get_next_event, delay, lock, is_polling=True))
+
+    def cancel(self, job: ScheduledJob):
+        job.is_cancelled = True
+
+    def _get_next_due(self) -> Optional[datetime.datetime]:
+        with self._lock:
+            while self._jobs and self._jobs[0][2].is_cancelled:
+                heapq.heappop(self._jobs)
+
+            return self._jobs[0][0] if self._jobs else None
+
+    def get_seconds_until_next_due(self) -> Optional[float]:
+        due = self._get_next_due()
+
+        return None if due is None else (due - self.clock.now()).total_seconds()
+
+    def _run_job(self, job: ScheduledJob, event_time: datetime.datetime):
+        try:
+            if job.lock is None:
+                job.callback(event_time)
+            else:
+                with job.lock:
+                    job.callback(event_time)
+        except SimulationFinished:
+            logger.info(f'{job.name} reached the end of the simulation at {event_time}.')
+            self.stop()
+        except Exception as exc:
+            logger.error(f'{job.name} failed for {event_time}. {exc}', exc_info=True)
+        finally:
+            job.is_running = False
+
+    def _run_submitted_job(self, job: ScheduledJob, event_time: datetime.datetime):
+        try:
+            self._run_job(job, event_time)
+        finally:
+            with self._idle:
+                self._running_count -= 1
+                self._idle.notify_all()
+
+    def _dispatch(self, job: ScheduledJob, event_time: datetime.datetime):
+        if job.is_running:
+            job.skipped_count += 1
+            logger.info(f'{job.name} is still running, skipped run for {event_time}.')
+            return
+        job.is_running = True
+        if self._executor is None or (job.is_polling and getattr(self.clock, 'is_simulated', False)):
+            self._run_job(job, event_time)
+            return
+        with self._idle:
+            self._running_count += 1
+        self._executor.submit(self._run_submitted_job, job, event_time)
+
+    def run_pending(self) -> int:
+        """ Dispatch every job that is due and reschedule it, returns the number of jobs dispatched. """
+        now = self.clock.now()
+        due_jobs = []
+        with self._lock:
+            while self._jobs and self._jobs[0][0] <= now:
+                job = self._jobs[0][2]
+                if job.is_cancelled:
+                    heapq.heappop(self._jobs)
+                    continue
+                due_jobs.append((job, job.event_time))
+                job.schedule_next(now)
+                heapq.heapreplace(self._jobs, (job.due, next(self._sequence), job))
+        for job, event_time in due_jobs:
+            self._dispatch(job, event_time)
+
+        return len(due_jobs)
+
+    def _wait_until_idle(self):
+        if not self._running_count:
+            return
+        with self._idle:
+            self._idle.wait_for(lambda: self._running_count == 0)
+
+    def run(self):
+        """ Block, dispatching jobs as they become due, until stop() is called. """
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers) if self.max_workers else None
+        is_simulated = getattr(self.clock, 'is_simulated', False)
+        try:
+            while not self._stop.is_set():
+                if self._wakeup.is_set():
+                    self._wakeup.clear()
+                self.run_pending()
+                if is_simulated:
+                    self._wait_until_idle()
+                    if self._stop.is_set():
+                        break
+
+                    # As clock.wait would, straight to the time rather than through the seconds until it.
+                    due = self._get_next_due()
+                    if due is not None and not self._wakeup.is_set():
+                        self.clock.advance_to(due)
+                        continue
+                seconds = self.get_seconds_until_next_due()
+                if seconds is None:
+                    seconds = MAX_WAIT_SECONDS
+                elif not is_simulated:
+                    seconds = min(seconds, MAX_WAIT_SECONDS)
+                self.clock.wait(self._wakeup, seconds)
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
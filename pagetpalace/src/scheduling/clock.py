@@ -0,0 +1,95 @@
+# Python standard.
+import datetime
+import threading
+import time
+from typing import Callable
+
+
+class SystemClock:
+    """ Wall clock used by the schedulers. Times are timezone aware and in UTC. """
+
+    @staticmethod
+    def now() -> datetime.datetime:
+        return datetime.datetime.now(datetime.timezone.utc)
+
+    @staticmethod
+    def sleep(seconds: float):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    @staticmethod
+    def wait(event: threading.Event, timeout: float) -> bool:
+        """ Block until the event is set or the timeout expires, returns whether the event was set. """
+        return event.wait(max(timeout, 0.))
+
+
+class SimulationFinished(Exception):
+    """ Raised by a SimulatedClock asked to move past its end, unwinds whatever loop was driving it. """
+
+
+class SimulatedClock:
+    """ A clock that only moves when something sleeps or waits on it, so a replay runs as fast as its callbacks.
+
+        Listeners are called with the previous and new time on every move, before the sleeper resumes, e.g. to feed
+        the prices recorded in between. resolution, in seconds, is the finest step anything observable happens at,
+        schedulers don't poll more often than that. Moving past end moves to end and raises SimulationFinished.
+    """
+
+    is_simulated = True
+
+    def __init__(self, start: datetime.datetime, end: datetime.datetime = None, resolution: float = 0.):
+        if start.tzinfo is None or (end is not None and end.tzinfo is None):
+            raise ValueError('start and end must be timezone aware.')
+        self.end = end
+        self.resolution = resolution
+        self._now = start
+        self._listeners = []
+        self._lock = threading.RLock()
+
+    def __repr__(self):
+        return f'SimulatedClock(now={self._now}, end={self.end})'
+
+    def now(self) -> datetime.datetime:
+        return self._now
+
+    def add_listener(self, listener: Callable[[datetime.datetime, datetime.datetime], None]):
+        self._listeners.append(listener)
+
+    def advance_to(self, moment: datetime.datetime):
+        with self._lock:
+            is_finished = self.end is not None and moment > self.end
+            if is_finished:
+                moment = self.end
+            if moment > self._now:
+                previous, self._now = self._now, moment
+                for listener in self._listeners:
+                    listener(previous, moment)
+            if is_finished:
+                raise SimulationFinished(f'Reached the end of the simulation, {self.end}.')
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            self.advance_to(self._now + datetime.timedelta(seconds=seconds))
+
+    def wait(self, event: threading.Event, timeout: float) -> bool:
+        """ Nothing else can set the event while simulated time passes, so this moves the full timeout. """
+        if not event.is_set():
+            self.sleep(timeout)
+
+        return event.is_set()
+
+
+_clock = SystemClock()
+
+
+def get_clock():
+    """ The clock used wherever one isn't passed in, the wall clock unless a replay has set another. """
+    return _clock
+
+
+def set_clock(clock):
+    """ Use clock process wide, returns the clock it replaces. """
+    global _clock
+    previous, _clock = _clock, clock
+
+    return previous
@@ -0,0 +1,165 @@
+# Python standard.
+import contextlib
+import datetime
+import functools
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Tuple
+
+# Local.
+from pagetpalace.src.scheduling.candle_close_scheduler import CandleCloseScheduler
+from pagetpalace.tools.logger import *
+from pagetpalace.tools.tracer import TRACER
+
+
+def _evaluate_in_worker(strategy_class: type, state: dict) -> Tuple[Dict[str, str], dict]:
+    """ Rebuild the strategy from its evaluation state without calling __init__, so no clients are created. """
+    strategy = strategy_class.__new__(strategy_class)
+    strategy.__dict__.update(state)
+    signals = strategy._evaluate_signals()
+
+    return signals, strategy.get_evaluation_state()
+
+
+def _evaluate_shard(shard: List[Tuple[type, dict]]) -> List[Tuple[Dict[str, str], dict]]:
+    """ Every strategy on one instrument is evaluated in the same worker so they share its indicator cache. """
+    results = []
+    for strategy_class, state in shard:
+        try:
+            results.append(_evaluate_in_worker(strategy_class, state))
+        except Exception as exc:
+            logger.error(f'Failed to evaluate {strategy_class.__name__}. {exc}', exc_info=True)
+            results.append(None)
+
+    return results
+
+
+class SignalOrchestrator:
+    """ Evaluates the signals of many strategies on a process pool at each candle close.
+
+        At a candle close the parent prepares every strategy on a thread pool, i.e. waits for the candle, syncs
+        pending orders and fetches candles through the shared session and candle data. Signal evaluation is sharded
+        by instrument across the worker processes, workers have no clients and never touch the account. Updated
+        state comes back to the parent, which acts on the signals one strategy at a time in stagger order, so each
+        order is submitted exactly once. max_workers=0 evaluates in the parent.
+    """
+
+    def __init__(self,
+                 strategies: Iterable = (),
+                 max_workers: int = None,
+                 io_workers: int = 16,
+                 mp_context=None,
+                 state_store=None):
+        if max_workers is not None and max_workers < 0:
+            raise ValueError('max_workers must not be negative.')
+        if io_workers < 1:
+            raise ValueError('io_workers must be at least 1.')
+        self.max_workers = (os.cpu_count() or 1) if max_workers is None else max_workers
+        self.io_workers = io_workers
+        self.mp_context = mp_context
+        self.state_store = state_store
+        self.strategies = []
+        self._process_pool = None
+        self._io_pool = None
+        for strategy in strategies:
+            self.add_strategy(strategy)
+
+    def __repr__(self):
+        return f'SignalOrchestrator(strategies={len(self.strategies)}, max_workers={self.max_workers})'
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+    def add_strategy(self, strategy):
+        if self.state_store is not None:
+            strategy.use_state_store(self.state_store)
+        self.strategies.append(strategy)
+
+    def get_granularities(self) -> List[str]:
+        return list(OrderedDict.fromkeys(strategy.entry_timeframe for strategy in self.strategies))
+
+    def start(self):
+        if self._io_pool is None:
+            self._io_pool = ThreadPoolExecutor(max_workers=self.io_workers)
+        if self._process_pool is None and self.max_workers:
+            self._process_pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=self.mp_context)
+
+    def shutdown(self):
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=True)
+            self._process_pool = None
+        if self._io_pool is not None:
+            self._io_pool.shutdown(wait=True)
+            self._io_pool = None
+
+    @staticmethod
+    def _prepare(strategy, close_time: datetime.datetime) -> bool:
+        try:
+            return strategy._prepare_candle(close_time)
+        except Exception as exc:
+            logger.error(f'Failed to prepare {strategy} for {close_time}. {exc}', exc_info=True)
+            return False
+
+    def _evaluate(self, strategies: list) -> list:
+        """ Results in the same order as strategies, None for any strategy that failed to evaluate. """
+        shards = OrderedDict()
+        for strategy in strategies:
+            shards.setdefault(strategy.instrument.symbol, []).append(strategy)
+        payloads = [[(type(s), s.get_evaluation_state()) for s in shard] for shard in shards.values()]
+        if self._process_pool is None:
+            shard_results = [_evaluate_shard(payload) for payload in payloads]
+        else:
+            shard_results = list(self._process_pool.map(_evaluate_shard, payloads))
+        results = {}
+        for shard, shard_result in zip(shards.values(), shard_results):
+            for strategy, result in zip(shard, shard_result):
+                results[id(strategy)] = result
+
+        return [results[id(strategy)] for strategy in strategies]
+
+    def on_candle_close(self, granularity: str, close_time: datetime.datetime):
+        strategies = [s for s in self.strategies if s.entry_timeframe == granularity]
+        self.start()
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(TRACER.span('orchestrator_candle_close', close_time=close_time.isoformat()))
+            # Hold every strategy's lock for the whole tick so its polling jobs don't run in between.
+            for strategy in strategies:
+                stack.enter_context(strategy._lock)
+            prepared = list(self._io_pool.map(functools.partial(self._prepare, close_time=close_time), strategies))
+            ready = [strategy for strategy, is_ready in zip(strategies, prepared) if is_ready]
+            if not ready:
+                return
+            with TRACER.span('orchestrator_evaluate', strategies=len(ready)):
+                results = self._evaluate(ready)
+            for strategy, result in sorted(zip(ready, results), key=lambda x: x[0]._get_candle_close_stagger()):
+                if result is None:
+                    continue
+                signals, state = result
+                strategy.merge_evaluation_state(state)
+                try:
+                    strategy._act_on_signals(close_time, signals)
+                except Exception as exc:
+                    logger.error(f'Failed to act on signals of {strategy}. {exc}', exc_info=True)
+                strategy.save_state()
+
+    def register(self, scheduler: CandleCloseScheduler):
+        for granularity in self.get_granularities():
+            scheduler.register_candle_close(
+                functools.partial(self.on_candle_close, granularity),
+                granularity,
+                name=f'SignalOrchestrator@{granularity}',
+            )
+        for strategy in self.strategies:
+            strategy._register_polling_jobs(scheduler)
+
+    def run(self, scheduler: CandleCloseScheduler = None):
+        """ Block until the scheduler is stopped, pools are shut down on the way out. """
+        scheduler = scheduler or CandleCloseScheduler()
+        self.register(scheduler)
+        with self:
+            scheduler.run()
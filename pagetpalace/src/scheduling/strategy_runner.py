@@ -0,0 +1,95 @@
+# Python standard.
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable
+
+# Local.
+from pagetpalace.src.oanda.market_data import CANDLE_DATA, SharedCandleData
+from pagetpalace.src.scheduling.candle_close_scheduler import MAX_WAIT_SECONDS, CandleCloseScheduler, ScheduledJob
+from pagetpalace.tools.logger import *
+
+
+class StrategyRunner(CandleCloseScheduler):
+    """ Hosts many strategies on one asyncio event loop instead of a process per strategy.
+
+        Strategies register with the runner exactly as they would with a CandleCloseScheduler. Each job is a task
+        that sleeps until it's due and hands the blocking callback to a shared thread pool. Every strategy added
+        shares the runner's candle data, and the pooled HTTP session is shared by every client in the process.
+    """
+
+    def __init__(self,
+                 strategies: Iterable = (),
+                 clock=None,
+                 max_workers: int = 8,
+                 market_data: SharedCandleData = None,
+                 state_store=None):
+        if max_workers < 1:
+            raise ValueError('max_workers must be at least 1, callbacks block and can not run on the event loop.')
+        super().__init__(clock=clock, max_workers=max_workers)
+        self.market_data = market_data or CANDLE_DATA
+        self.state_store = state_store
+        self.strategies = []
+        self._loop = None
+        self._stop_event = None
+        self._tasks = []
+        for strategy in strategies:
+            self.add_strategy(strategy)
+
+    def __repr__(self):
+        return f'StrategyRunner(strategies={len(self.strategies)}, jobs={len(self.jobs)})'
+
+    def add_strategy(self, strategy):
+        strategy.market_data = self.market_data
+        if self.state_store is not None:
+            strategy.use_state_store(self.state_store)
+        strategy.register(self)
+        self.strategies.append(strategy)
+
+    def _push(self, job: ScheduledJob):
+        super()._push(job)
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._start_job, job)
+
+    def _start_job(self, job: ScheduledJob):
+        self._tasks.append(self._loop.create_task(self._run_job_forever(job)))
+
+    async def _run_job_forever(self, job: ScheduledJob):
+        while not job.is_cancelled:
+            now = self.clock.now()
+            seconds = (job.due - now).total_seconds()
+            if seconds > 0:
+                await asyncio.sleep(min(seconds, MAX_WAIT_SECONDS))
+                continue
+            event_time = job.event_time
+            job.schedule_next(now)
+            job.is_running = True
+            await self._loop.run_in_executor(self._executor, self._run_job, job, event_time)
+
+    async def run_async(self):
+        """ Run every registered job until stop() is called. """
+        self._stop_event = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            for job in self.jobs:
+                self._start_job(job)
+            if not self._stop.is_set():
+                await self._stop_event.wait()
+        finally:
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            self._tasks = []
+            self._loop = None
+            await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown)
+            self._executor = None
+
+    def run(self):
+        self._stop.clear()
+        asyncio.run(self.run_async())
+
+    def stop(self):
+        self._stop.set()
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._stop_event.set)
@@ -2,3 +2,4 @@ from .aws_utils import *
 from .email_sender import EmailSender
 from .file_operations import *
 from .logger import *
+from .tracer import TRACER, Tracer, traced
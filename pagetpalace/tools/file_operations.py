@@ -9,7 +9,6 @@ def read_oanda_data(file_path: str) -> pd.DataFrame:
         index_col='datetime',
         parse_dates=['datetime'],
         engine='c',
-        infer_datetime_format=True,
         cache_dates=True,
     )
 
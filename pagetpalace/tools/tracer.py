@@ -0,0 +1,161 @@
+# Python standard.
+import contextlib
+import functools
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict
+
+# Third-party.
+import numpy as np
+
+# Setting this to a file path turns tracing on, spans are appended to it as JSON lines.
+TRACE_FILE_ENV_VAR = 'PAGETPALACE_TRACE_FILE'
+PERCENTILES = (50, 90, 99)
+
+
+class Tracer:
+    """ Times named spans and appends them to a JSON lines file, does nothing when path is None.
+
+        Spans nest per thread, a span inherits the tags of the span it's opened in, so tagging the candle close span
+        with the close time tags every stage under it. Each line holds the name, tags, start (unix seconds),
+        duration_ms, the parent span and pid/thread.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self._file = None
+        self._file_pid = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._ids = itertools.count(1)
+
+    def __repr__(self):
+        return f'Tracer(path={self.path})'
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def _get_stack(self) -> list:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+
+        return self._local.stack
+
+    def _write(self, record: dict):
+        line = json.dumps(record, default=str)
+        with self._lock:
+            if self._file is None or self._file_pid != os.getpid():
+                self._file = open(self.path, 'a', buffering=1)
+                self._file_pid = os.getpid()
+            self._file.write(line + '\n')
+
+    @contextlib.contextmanager
+    def span(self, name: str, **tags):
+        """ Yields a dict, anything added to it is written with the span. """
+        if not self.enabled:
+            yield {}
+            return
+        stack = self._get_stack()
+        parent_id, parent_tags = stack[-1] if stack else (None, {})
+        span_id = f'{os.getpid()}-{next(self._ids)}'
+        tags = {**parent_tags, **tags}
+        fields = {}
+        stack.append((span_id, tags))
+        start = time.time()
+        started = time.perf_counter()
+        error = None
+        try:
+            yield fields
+        except Exception as exc:
+            error = repr(exc)
+            raise
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            stack.pop()
+            try:
+                self._write({
+                    'name': name,
+                    'span_id': span_id,
+                    'parent_id': parent_id,
+                    'start': start,
+                    'duration_ms': round(duration_ms, 3),
+                    'tags': tags,
+                    'fields': fields,
+                    'error': error,
+                    'pid': os.getpid(),
+                    'thread': threading.current_thread().name,
+                })
+            except Exception:
+                pass
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+TRACER = Tracer(os.environ.get(TRACE_FILE_ENV_VAR))
+
+
+def _get_tags(obj) -> dict:
+    tags = {'strategy': type(obj).__name__}
+    instrument = getattr(obj, 'instrument', None)
+    if instrument is not None:
+        tags['instrument'] = getattr(instrument, 'symbol', str(instrument))
+
+    return tags
+
+
+def traced(name: str = None) -> Callable:
+    """ Trace a method, tagged with the class name and the symbol of its instrument attribute if it has one. """
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if not TRACER.enabled:
+                return func(self, *args, **kwargs)
+            with TRACER.span(span_name, **_get_tags(self)):
+                return func(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def summarise_trace_file(path: str) -> Dict[str, Dict[str, float]]:
+    """ Count, mean, percentiles and max of duration_ms per span name. """
+    durations = defaultdict(list)
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                durations[record['name']].append(record['duration_ms'])
+    summary = {}
+    for name, values in durations.items():
+        values = np.asarray(values, dtype=np.float64)
+        stats = {'count': int(values.size), 'mean': float(values.mean())}
+        for pct, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+            stats[f'p{pct}'] = float(value)
+        stats['max'] = float(values.max())
+        summary[name] = stats
+
+    return summary
+
+
+def print_summary(summary: Dict[str, Dict[str, float]]):
+    columns = ['count', 'mean'] + [f'p{pct}' for pct in PERCENTILES] + ['max']
+    print(f'{"span":<40}' + ''.join(f'{c:>12}' for c in columns))
+    for name, stats in sorted(summary.items(), key=lambda x: -x[1]['p50']):
+        print(f'{name:<40}' + ''.join(f'{stats[c]:>12.0f}' if c == 'count' else f'{stats[c]:>12.2f}' for c in columns))
+
+
+if __name__ == '__main__':
+    print_summary(summarise_trace_file(sys.argv[1] if len(sys.argv) > 1 else os.environ[TRACE_FILE_ENV_VAR]))
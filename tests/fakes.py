@@ -0,0 +1,76 @@
+# Python standard.
+import datetime
+import threading
+import time
+
+# Local.
+from pagetpalace.src.oanda.instrument import OandaInstrumentData
+
+START = datetime.datetime(2021, 1, 13, 10, tzinfo=datetime.timezone.utc)
+
+
+class FakeClock:
+    """ Only moves when told to, sleeping and waiting move it at once. """
+
+    def __init__(self, now: datetime.datetime = START):
+        self.current = now
+
+    def now(self) -> datetime.datetime:
+        return self.current
+
+    def advance(self, seconds: float):
+        self.current += datetime.timedelta(seconds=seconds)
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            self.advance(seconds)
+
+    def wait(self, event: threading.Event, timeout: float) -> bool:
+        self.sleep(timeout)
+
+        return event.is_set()
+
+
+class FakeInstrumentData:
+    """ Hourly candles up to the last one closed by clock, records the count of each request. """
+
+    def __init__(self, clock: FakeClock, delay: float = 0.):
+        self.clock = clock
+        self.delay = delay
+        self.counts = []
+
+    def get_complete_candlesticks(self, symbol, prices, granularity, count):
+        self.counts.append(count)
+        time.sleep(self.delay)
+        last_open = self.clock.now().replace(minute=0, second=0, microsecond=0) - datetime.timedelta(hours=1)
+        candles = []
+        for i in reversed(range(count)):
+            open_time = last_open - datetime.timedelta(hours=i)
+            candles.append({
+                'time': open_time.strftime('%Y-%m-%dT%H:%M:%S.000000000Z'),
+                'volume': 1,
+                'mid': {'o': i, 'h': i + 1, 'l': i - 1, 'c': i},
+            })
+
+        return candles
+
+    @staticmethod
+    def convert_to_df(candles, prices):
+        return OandaInstrumentData.convert_to_df(candles, prices)
+
+
+class FakePricing:
+    """ Answers pricing requests from asks, leaving out the symbols in missing. """
+
+    def __init__(self, asks: dict):
+        self.asks = asks
+        self.missing = set()
+        self.requests = []
+
+    def get_pricing_info(self, instruments: list, since: str = '', include_home_conversions: bool = False) -> dict:
+        self.requests.append(list(instruments))
+
+        return {'prices': [
+            {'type': 'PRICE', 'instrument': symbol, 'asks': [{'price': f'{self.asks[symbol]}'}]}
+            for symbol in instruments if symbol in self.asks and symbol not in self.missing
+        ]}
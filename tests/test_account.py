@@ -0,0 +1,72 @@
+# Python standard.
+import threading
+import time
+import unittest
+
+# Local.
+from pagetpalace.src.mixins.request_mixin import RateLimiter
+from pagetpalace.src.oanda.account import OandaAccount
+from pagetpalace.src.oanda.settings import DEMO_ACCOUNT_NUMBER, DEMO_ACCESS_TOKEN
+
+
+class SlowCancelAccount(OandaAccount):
+    """ Cancelling takes 0.1s, IDs starting with 'x' don't exist. """
+
+    def __init__(self):
+        super().__init__(DEMO_ACCESS_TOKEN, DEMO_ACCOUNT_NUMBER, 'DEMO_API')
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._counter_lock = threading.Lock()
+
+    def cancel_order(self, order_specifier: str) -> dict:
+        with self._counter_lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.1)
+        with self._counter_lock:
+            self.in_flight -= 1
+        if order_specifier.startswith('x'):
+            return {'errorCode': 'ORDER_DOESNT_EXIST', 'errorMessage': 'The order does not exist'}
+        if order_specifier == 'raise':
+            raise ConnectionError('connection reset')
+
+        return {'orderCancelTransaction': {'orderID': order_specifier, 'type': 'ORDER_CANCEL'}}
+
+
+class TestOandaAccount(unittest.TestCase):
+    def test_cancel_orders_runs_concurrently_and_reports_each_id(self):
+        account = SlowCancelAccount()
+        started = time.monotonic()
+        results = account.cancel_orders(['1', '2', 'x3', 'raise', '1'])
+        self.assertLess(time.monotonic() - started, 0.3)
+        self.assertEqual(account.max_in_flight, 4)
+        self.assertEqual(
+            {id_: account.is_order_cancelled(result) for id_, result in results.items()},
+            {'1': True, '2': True, 'x3': False, 'raise': False},
+        )
+        self.assertEqual(results['raise'], {'errorMessage': 'connection reset'})
+
+    def test_cancel_orders_with_no_ids(self):
+        self.assertEqual(SlowCancelAccount().cancel_orders([]), {})
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_burst_then_rate(self):
+        limiter = RateLimiter(rate=50, burst=5)
+        started = time.monotonic()
+        for _ in range(5):
+            limiter.acquire()
+        self.assertLess(time.monotonic() - started, 0.05)
+        for _ in range(5):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - started, 0.08)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            RateLimiter(rate=0)
+        with self.assertRaises(ValueError):
+            RateLimiter(burst=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+# Python standard.
+import gc
+import unittest
+import weakref
+
+# Local.
+from pagetpalace.src.oanda.account import OandaAccount
+from pagetpalace.src.oanda.account_snapshot import AccountSnapshot, get_account_snapshot
+from pagetpalace.src.oanda.paper_account import PaperAccount, PaperPricing
+from pagetpalace.src.oanda.settings import DEMO_ACCOUNT_NUMBER, DEMO_ACCESS_TOKEN
+from fakes import FakeClock
+
+
+class FakeAccount:
+    def __init__(self):
+        self.balance = 1000.
+
+    def get_full_account_details(self) -> dict:
+        return {'account': {'balance': str(self.balance), 'marginAvailable': str(self.balance), 'orders': []}}
+
+
+class TestAccountSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.account = FakeAccount()
+        self.snapshot = AccountSnapshot(self.account, max_age=5., clock=self.clock)
+
+    def test_reads_within_max_age_share_one_fetch(self):
+        self.assertEqual(self.snapshot.get_balance(), 1000.)
+        self.account.balance = 900.
+        self.clock.advance(4)
+        self.assertEqual(self.snapshot.get_balance(), 1000.)
+        self.assertEqual(self.snapshot.get_details()['marginAvailable'], '1000.0')
+        self.assertEqual(self.snapshot.fetches, 1)
+        self.clock.advance(2)
+        self.assertEqual(self.snapshot.get_balance(), 900.)
+        self.assertEqual(self.snapshot.fetches, 2)
+
+    def test_invalidate_forces_refresh(self):
+        self.snapshot.get_details()
+        self.account.balance = 500.
+        self.snapshot.invalidate()
+        self.assertTrue(self.snapshot.is_stale())
+        self.assertEqual(self.snapshot.get_balance(), 500.)
+        self.assertEqual(self.snapshot.fetches, 2)
+
+    def test_one_snapshot_per_account(self):
+        account = OandaAccount(DEMO_ACCESS_TOKEN, DEMO_ACCOUNT_NUMBER, 'DEMO_API')
+        self.assertIs(get_account_snapshot(account), get_account_snapshot(account))
+        first = PaperAccount(PaperPricing(), balance=1000., account_id='paper')
+        second = PaperAccount(PaperPricing(), balance=2000., account_id='paper')
+        self.assertEqual(get_account_snapshot(first).get_balance(), 1000.)
+        self.assertEqual(get_account_snapshot(second).get_balance(), 2000.)
+
+    def test_snapshots_are_freed_with_their_account(self):
+        account = PaperAccount(PaperPricing(), balance=1000.)
+        get_account_snapshot(account)
+        reference = weakref.ref(account)
+        del account
+        gc.collect()
+        self.assertIsNone(reference())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+# Python standard.
+import unittest
+
+# Third-party.
+import numpy as np
+import pandas as pd
+
+# Local.
+from pagetpalace.src.backtesting.analytics import (
+    ConversionRates,
+    add_account_pnl,
+    get_equity_curve,
+    get_exposure,
+    summarise,
+)
+from test_vectorized_backtester import make_candles
+
+
+def make_trades(count: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    entry_time = pd.Timestamp('2020-03-02') + pd.to_timedelta(np.sort(rng.integers(0, 24 * 60, count)), unit='h')
+
+    return pd.DataFrame({
+        'run': rng.integers(0, 3, count),
+        'instrument': rng.choice(['GBP_USD', 'EUR_GBP', 'GBP_JPY'], count),
+        'sub_strategy': rng.choice(['1', '2'], count),
+        'status': rng.choice(['FILLED', 'EXPIRED'], count, p=[0.8, 0.2]),
+        'entry_time': entry_time,
+        'exit_time': entry_time + pd.to_timedelta(rng.integers(1, 48, count), unit='h'),
+        'pnl': rng.normal(0, 0.002, count),
+        'r_multiple': rng.normal(0, 1, count),
+        'units': rng.integers(1000, 5000, count),
+    })
+
+
+class TestConversionRates(unittest.TestCase):
+    def test_rates_are_looked_up_as_of_each_moment(self):
+        times = pd.to_datetime(['2020-01-01', '2020-01-02', '2020-01-03']).to_numpy()
+        rates = ConversionRates({'USD': (times, [0.8, 0.75, 0.7])})
+        lookup = pd.to_datetime(
+            ['2019-12-31 00:00', '2020-01-01 00:00', '2020-01-02 12:00', '2020-01-05 00:00'],
+        ).to_numpy()
+        np.testing.assert_array_equal(rates.get('USD', lookup), [0.8, 0.8, 0.75, 0.7])
+        np.testing.assert_array_equal(rates.get('GBP', lookup), [1., 1., 1., 1.])
+        with self.assertRaises(ValueError):
+            rates.get('JPY', lookup)
+
+    def test_rates_from_candles_only_use_closed_candles(self):
+        hourly = make_candles('H1', '2020-03-02', 10, seed=1)
+        rates = ConversionRates.from_candles({'GBP_USD': hourly, 'EUR_GBP': hourly})
+        self.assertEqual(rates.get('USD', hourly.times[3:4])[0], 1. / hourly['midClose'][2])
+        self.assertEqual(rates.get('EUR', hourly.close_times[3:4])[0], hourly['midClose'][3])
+        with self.assertRaises(ValueError):
+            ConversionRates.from_candles({'EUR_USD': hourly})
+
+
+class TestAnalytics(unittest.TestCase):
+    def setUp(self):
+        self.trades = make_trades(3000, seed=2)
+        times = pd.date_range('2020-03-01', periods=200, freq='D').to_numpy()
+        self.rates = ConversionRates({'USD': (times, np.linspace(0.7, 0.8, 200)), 'JPY': (times, np.full(200, 0.007))})
+        self.trades = add_account_pnl(self.trades, self.rates)
+
+    def test_account_pnl_converts_the_quote_currency(self):
+        trade = self.trades.iloc[0]
+        currency = trade['instrument'].split('_')[1]
+        rate = self.rates.get(currency, np.array([trade['exit_time'].to_datetime64()]))[0]
+        self.assertAlmostEqual(trade['account_pnl'], trade['pnl'] * trade['units'] * rate)
+        eur_gbp = self.trades[self.trades['instrument'] == 'EUR_GBP']
+        np.testing.assert_allclose(eur_gbp['account_pnl'], eur_gbp['pnl'] * eur_gbp['units'])
+        with self.assertRaises(ValueError):
+            add_account_pnl(self.trades.drop(columns='instrument'), self.rates)
+
+    def test_grouped_equity_curves_match_each_group_on_its_own(self):
+        curves = get_equity_curve(self.trades, balance=1000., by='run')
+        self.assertEqual(len(curves), (self.trades['status'] == 'FILLED').sum())
+        for run, trades in self.trades.groupby('run'):
+            curve = get_equity_curve(trades, balance=1000.)
+            pd.testing.assert_frame_equal(
+                curves[curves['run'] == run].drop(columns='run').reset_index(drop=True),
+                curve,
+            )
+            filled = trades[trades['status'] == 'FILLED'].sort_values('exit_time', kind='stable')
+            equity, peak, drawdown = 1000., 1000., 0.
+            for pnl in filled['account_pnl']:
+                equity += pnl
+                peak = max(peak, equity)
+                drawdown = max(drawdown, peak - equity)
+            self.assertAlmostEqual(curve['equity'].iloc[-1], equity)
+            self.assertAlmostEqual(curve['drawdown'].max(), drawdown)
+
+    def test_exposure_counts_overlapping_trades_once(self):
+        start = pd.Timestamp('2020-01-01')
+        trades = pd.DataFrame({
+            'instrument': ['GBP_USD', 'GBP_USD', 'GBP_USD', 'EUR_GBP'],
+            'entry_time': start + pd.to_timedelta([0, 2, 6, 0], unit='h'),
+            'exit_time': start + pd.to_timedelta([4, 5, 10, 24], unit='h'),
+        })
+        self.assertAlmostEqual(get_exposure(trades.iloc[:3]), 9 / 10)
+        exposure = get_exposure(trades, by='instrument')
+        self.assertAlmostEqual(exposure['GBP_USD'], 9 / 10)
+        self.assertAlmostEqual(exposure['EUR_GBP'], 1.)
+
+    def test_summary_by_instrument_and_sub_strategy(self):
+        summary = summarise(self.trades, by=['instrument', 'sub_strategy'])
+        self.assertEqual(len(summary), 6)
+        filled = self.trades[self.trades['status'] == 'FILLED']
+        for (instrument, sub_strategy), trades in filled.groupby(['instrument', 'sub_strategy']):
+            row = summary.loc[(instrument, sub_strategy)]
+            pnl = trades['account_pnl']
+            self.assertEqual(row['trades'], len(trades))
+            self.assertAlmostEqual(row['total_pnl'], pnl.sum())
+            self.assertAlmostEqual(row['expectancy_r'], trades['r_multiple'].mean())
+            self.assertAlmostEqual(row['profit_factor'], pnl[pnl > 0].sum() / -pnl[pnl < 0].sum())
+            self.assertAlmostEqual(row['max_drawdown'], get_equity_curve(trades)['drawdown'].max())
+            self.assertAlmostEqual(row['exposure'], get_exposure(trades))
+        overall = summarise(self.trades)
+        self.assertEqual(overall['trades'], len(filled))
+        self.assertAlmostEqual(overall['total_pnl'], summary['total_pnl'].sum())
+        self.assertEqual(summarise(self.trades.iloc[:0])['trades'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
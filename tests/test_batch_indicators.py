@@ -0,0 +1,53 @@
+# Python standard.
+import unittest
+
+# Third-party.
+import numpy as np
+import pandas as pd
+
+# Local.
+from pagetpalace.src.indicators.batch_indicators import (
+    InstrumentPanel,
+    compute_batch_indicators,
+    get_latest_values,
+)
+from pagetpalace.src.indicators.indicators import append_ssma, get_average_true_range_value, ssl_channel
+
+
+class TestBatchIndicators(unittest.TestCase):
+    def setUp(self):
+        self.data = {
+            'IN50_USD': pd.read_csv('test_data/ha_ewm_2_long_signal.csv'),
+            'GBP_USD': pd.read_csv('test_data/hp_daily_long_signal.csv'),
+            'EUR_USD': pd.read_csv('test_data/hp_daily_short_signal.csv'),
+        }
+        self.panel = InstrumentPanel.from_dataframes(self.data)
+        self.indicators = compute_batch_indicators(self.panel, atr_periods=14, ssma_periods=50, ssl_periods=5)
+
+    def test_ragged_histories_are_right_aligned_and_masked(self):
+        self.assertEqual(self.panel.closes.shape, (3, 1001))
+        self.assertEqual(self.panel.mask.sum(axis=1).tolist(), [1001, 9, 6])
+        self.assertTrue(np.isnan(self.indicators['ATR_14'][1, :-9]).all())
+        self.assertTrue((self.indicators['HighLowValue_5_period'][2, :-6] == 0).all())
+
+    def test_matches_single_instrument_indicators(self):
+        for row, (symbol, df) in enumerate(self.data.items()):
+            expected = df.copy()
+            get_average_true_range_value(expected)
+            append_ssma(expected)
+            length = len(df)
+            np.testing.assert_allclose(self.indicators['ATR_14'][row, -length:], expected['ATR_14'].values)
+            np.testing.assert_allclose(self.indicators['SSMA_50'][row, -length:], expected['SSMA_50'].values)
+            np.testing.assert_array_equal(
+                self.indicators['HighLowValue_5_period'][row, -length:],
+                ssl_channel(df, periods=5),
+            )
+
+    def test_get_latest_values(self):
+        latest = get_latest_values(self.panel, self.indicators)
+        self.assertEqual(latest.index.tolist(), ['IN50_USD', 'GBP_USD', 'EUR_USD'])
+        self.assertAlmostEqual(latest.loc['GBP_USD', 'ATR_14'], self.indicators['ATR_14'][1, -1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+# Python standard.
+import datetime
+import unittest
+
+# Local.
+from pagetpalace.src.oanda.candle_availability import CandleAvailabilityDetector, parse_candle_time
+from fakes import FakeClock
+
+UTC = datetime.timezone.utc
+CLOSE = datetime.datetime(2021, 1, 13, 11, tzinfo=UTC)
+
+
+class DelayedCandlePricing:
+    """ The 10:00 H1 candle is marked complete `available_after` seconds after it closes. """
+
+    def __init__(self, clock: FakeClock, available_after: float):
+        self.clock = clock
+        self.available_after = available_after
+        self.polls = 0
+
+    def get_latest_candles(self, candle_specifications: str, units: int = 1) -> dict:
+        self.polls += 1
+        is_complete = self.clock.now() >= CLOSE + datetime.timedelta(seconds=self.available_after)
+        candles = [
+            {'time': str((CLOSE - datetime.timedelta(hours=1)).timestamp()), 'complete': is_complete},
+            {'time': str(CLOSE.timestamp()), 'complete': False},
+        ]
+
+        return {'latestCandles': [{'instrument': 'EUR_USD', 'granularity': 'H1', 'candles': candles}]}
+
+
+class TestCandleAvailabilityDetector(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock(CLOSE)
+        self.pricing = DelayedCandlePricing(self.clock, available_after=1.3)
+        self.detector = CandleAvailabilityDetector(pricing=self.pricing, clock=self.clock)
+
+    def test_parse_candle_time(self):
+        self.assertEqual(parse_candle_time('1610535600.000000000'), CLOSE)
+        self.assertEqual(parse_candle_time('2021-01-13T11:00:00.000000000Z'), CLOSE)
+
+    def test_waits_until_complete_and_records_delay(self):
+        delay = self.detector.wait_for_candle('EUR_USD', 'H1', CLOSE)
+        self.assertGreaterEqual(delay, 1.3)
+        self.assertLess(delay, 2.5)
+        self.assertEqual(self.detector.get_delay_stats()['EUR_USD:H1']['count'], 1)
+        self.assertAlmostEqual(self.detector.get_expected_delay('EUR_USD', 'H1'), delay)
+
+        # A second strategy waiting on the same candle doesn't poll again.
+        polls = self.pricing.polls
+        self.assertEqual(self.detector.wait_for_candle('EUR_USD', 'H1', CLOSE), 0.)
+        self.assertEqual(self.pricing.polls, polls)
+
+    def test_times_out(self):
+        self.pricing.available_after = 120
+        self.assertIsNone(self.detector.wait_for_candle('EUR_USD', 'H1', CLOSE))
+        self.assertEqual(self.clock.now(), CLOSE + datetime.timedelta(seconds=self.detector.timeout))
+        self.assertEqual(self.detector.get_delay_stats(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
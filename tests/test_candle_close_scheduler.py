@@ -0,0 +1,99 @@
+# Python standard.
+import datetime
+import threading
+import unittest
+
+# Local.
+from pagetpalace.src.scheduling.candle_close_scheduler import CandleCloseScheduler, is_market_open, next_candle_close
+from fakes import FakeClock
+
+UTC = datetime.timezone.utc
+
+
+class TestCandleCloseScheduler(unittest.TestCase):
+    def test_next_candle_close_daily_alignment(self):
+        # 22:00 London is 22:00 UTC in winter and 21:00 UTC in summer.
+        self.assertEqual(
+            next_candle_close('D', datetime.datetime(2021, 1, 13, 12, tzinfo=UTC)),
+            datetime.datetime(2021, 1, 13, 22, tzinfo=UTC),
+        )
+        self.assertEqual(
+            next_candle_close('D', datetime.datetime(2021, 7, 13, 21, tzinfo=UTC)),
+            datetime.datetime(2021, 7, 14, 21, tzinfo=UTC),
+        )
+
+    def test_next_candle_close_skips_weekend(self):
+        friday_after_close = datetime.datetime(2021, 1, 15, 22, 30, tzinfo=UTC)
+        self.assertFalse(is_market_open(friday_after_close))
+        self.assertEqual(next_candle_close('H1', friday_after_close), datetime.datetime(2021, 1, 17, 23, tzinfo=UTC))
+        self.assertEqual(next_candle_close('D', friday_after_close), datetime.datetime(2021, 1, 18, 22, tzinfo=UTC))
+        self.assertEqual(
+            next_candle_close('H1', friday_after_close, skip_market_closed=False),
+            datetime.datetime(2021, 1, 15, 23, tzinfo=UTC),
+        )
+
+        # New York is on summer time and London isn't, the market opens an hour before the Sunday candle closes.
+        self.assertEqual(
+            next_candle_close('D', datetime.datetime(2020, 3, 6, 22, tzinfo=UTC)),
+            datetime.datetime(2020, 3, 8, 22, tzinfo=UTC),
+        )
+
+    def test_next_candle_close_intraday(self):
+        self.assertEqual(
+            next_candle_close('M30', datetime.datetime(2021, 1, 13, 10, 30, tzinfo=UTC)),
+            datetime.datetime(2021, 1, 13, 11, tzinfo=UTC),
+        )
+        self.assertEqual(
+            next_candle_close('H4', datetime.datetime(2021, 7, 13, 23, tzinfo=UTC)),
+            datetime.datetime(2021, 7, 14, 1, tzinfo=UTC),
+        )
+        self.assertEqual(
+            next_candle_close('D', datetime.datetime(2021, 7, 13, 12, tzinfo=UTC), 17, 'America/New_York'),
+            datetime.datetime(2021, 7, 13, 21, tzinfo=UTC),
+        )
+        with self.assertRaises(ValueError):
+            next_candle_close('H5', datetime.datetime(2021, 7, 13, tzinfo=UTC))
+
+    def test_run_pending_dispatches_due_jobs_once(self):
+        clock = FakeClock(datetime.datetime(2021, 1, 13, 10, 59, tzinfo=UTC))
+        scheduler = CandleCloseScheduler(clock=clock, max_workers=0)
+        closes, ticks = [], []
+        job = scheduler.register_candle_close(closes.append, 'H1', delay=8)
+        scheduler.register_interval(ticks.append, 30)
+        self.assertEqual(job.due, datetime.datetime(2021, 1, 13, 11, 0, 8, tzinfo=UTC))
+        self.assertEqual(scheduler.get_seconds_until_next_due(), 30)
+        clock.sleep(60)
+        self.assertEqual(scheduler.run_pending(), 1)
+        clock.sleep(10)
+        self.assertEqual(scheduler.run_pending(), 1)
+        self.assertEqual(scheduler.run_pending(), 0)
+        self.assertEqual(closes, [datetime.datetime(2021, 1, 13, 11, tzinfo=UTC)])
+        self.assertEqual(ticks, [datetime.datetime(2021, 1, 13, 10, 59, 30, tzinfo=UTC)])
+        self.assertEqual(job.event_time, datetime.datetime(2021, 1, 13, 12, tzinfo=UTC))
+
+    def test_running_job_is_not_dispatched_again(self):
+        clock = FakeClock(datetime.datetime(2021, 1, 13, 10, tzinfo=UTC))
+        scheduler = CandleCloseScheduler(clock=clock, max_workers=0)
+        job = scheduler.register_interval(lambda now: None, 1)
+        job.is_running = True
+        clock.sleep(1)
+        scheduler.run_pending()
+        self.assertEqual(job.skipped_count, 1)
+
+    def test_run_stops(self):
+        clock = FakeClock(datetime.datetime(2021, 1, 13, 10, tzinfo=UTC))
+        scheduler = CandleCloseScheduler(clock=clock, max_workers=2)
+        ticks = []
+
+        def tick(now):
+            ticks.append(now)
+            if len(ticks) == 3:
+                scheduler.stop()
+
+        scheduler.register_interval(tick, 5, lock=threading.Lock())
+        scheduler.run()
+        self.assertGreaterEqual(len(ticks), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+# Python standard.
+import datetime
+import unittest
+
+# Local.
+from pagetpalace.src.currency_calculations.exchange_rates import ExchangeRateService, get_conversion_symbols
+from pagetpalace.src.currency_calculations.unit_conversions import UnitConversions
+from pagetpalace.src.oanda.instruments.instruments import CurrencyPairs
+from fakes import FakeClock, FakePricing
+
+
+class TestExchangeRateService(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.symbols = get_conversion_symbols()
+        self.pricing = FakePricing({symbol: 1.5 for symbol in self.symbols})
+        self.pricing.asks.update({'GBP_AUD': 1.792, 'GBP_JPY': 145.022})
+        self.service = ExchangeRateService(self.pricing, self.clock)
+
+    def test_stale_rates_are_requested_together_until_they_age(self):
+        self.assertIn('GBP_USD', self.symbols)
+        self.assertEqual(self.service.get_rates(['GBP_AUD', 'GBP_JPY']), {'GBP_AUD': 1.792, 'GBP_JPY': 145.022})
+        self.assertEqual(self.pricing.requests, [sorted(self.symbols)])
+        self.assertEqual(self.service.get_rate('GBP_USD'), 1.5)
+        self.assertEqual(self.service.get_updated_at('GBP_USD'), self.clock.current)
+        self.clock.current += datetime.timedelta(seconds=5)
+        self.service.get_rate('GBP_AUD')
+        self.assertEqual(len(self.pricing.requests), 1)
+        self.clock.current += datetime.timedelta(seconds=1)
+        self.pricing.asks['GBP_AUD'] = 1.8
+        self.assertEqual(self.service.get_rate('GBP_AUD'), 1.8)
+        self.assertEqual(len(self.pricing.requests), 2)
+
+    def test_streamed_prices_keep_rates_fresh(self):
+        self.service.on_price({'type': 'HEARTBEAT', 'time': '1610532000.000000000'})
+        self.service.on_price({'type': 'PRICE', 'instrument': 'EUR_USD', 'asks': [{'price': '1.21'}]})
+        for symbol in ('GBP_AUD', 'GBP_JPY'):
+            self.service.on_price({'type': 'PRICE', 'instrument': symbol, 'asks': [{'price': '2.5'}]})
+        self.assertEqual(self.service.get_rates(['GBP_AUD', 'GBP_JPY']), {'GBP_AUD': 2.5, 'GBP_JPY': 2.5})
+        self.assertEqual(self.pricing.requests, [])
+        self.assertIsNone(self.service.get_updated_at('EUR_USD'))
+
+    def test_missing_prices_are_retried_then_raise(self):
+        self.pricing.missing = {'GBP_JPY'}
+        with self.assertRaises(Exception):
+            self.service.get_rate('GBP_JPY')
+        self.assertEqual(len(self.pricing.requests), 5)
+        self.assertEqual(self.pricing.requests[1], ['GBP_JPY'])
+        self.assertEqual(self.service.get_rate('GBP_AUD'), 1.792)
+        self.assertEqual(len(self.pricing.requests), 5)
+
+    def test_unit_conversions_share_the_service(self):
+        conversions = UnitConversions(CurrencyPairs.AUD_JPY, 80.893, exchange_rate_service=self.service)
+        expected = UnitConversions(CurrencyPairs.AUD_JPY, 80.893, exchange_rates={'units': 1.792, 'p2p': 145.022})
+        self.assertEqual(conversions.calculate_units(1150), expected.calculate_units(1150))
+        units = conversions.calculate_units(1150)
+        self.assertEqual(conversions.calculate_pound_to_pip_ratio(units), expected.calculate_pound_to_pip_ratio(units))
+        UnitConversions(CurrencyPairs.AUD_USD, 0.77, exchange_rate_service=self.service)
+        UnitConversions(CurrencyPairs.GBP_USD, 1.38, exchange_rate_service=self.service)
+        self.assertEqual(len(self.pricing.requests), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,6 +7,7 @@ import pandas as pd
 # Local.
 from pagetpalace.src.oanda.instruments.instruments import CurrencyPairs
 from pagetpalace.src.oanda.account import OandaAccount
+from pagetpalace.src.oanda.id_registry import IdRegistry
 from pagetpalace.src.oanda.strategies.strategy_implementations.hpdaily import HPDaily
 from pagetpalace.src.oanda.settings import DEMO_ACCOUNT_NUMBER, DEMO_ACCESS_TOKEN
 
@@ -43,6 +44,22 @@ class TestHPDaily(unittest.TestCase):
         self.hp_daily._strategy_atr_values = {'D': 0.01000}
         self.assertEqual(self.hp_daily._get_stop_loss_pip_amount('long'), 0.029390000000000013)
 
+    def test_clear_pending_orders_keeps_ids_that_failed_to_cancel(self):
+        class Account:
+            @staticmethod
+            def cancel_orders(ids):
+                return {id_: {} if id_ == '2' else {'orderCancelTransaction': {}} for id_ in ids}
+
+            is_order_cancelled = staticmethod(OandaAccount.is_order_cancelled)
+
+        self.hp_daily.account = Account()
+        self.hp_daily._pending_orders = IdRegistry(['1', '2'])
+        for key, id_ in [('1', '1'), ('1', '2'), ('2', '3')]:
+            self.hp_daily._pending_orders.add(key, id_)
+        self.hp_daily._send_mail_alert = lambda **kwargs: None
+        self.hp_daily._clear_pending_orders()
+        self.assertEqual(self.hp_daily._pending_orders.to_dict(), {'1': ['2'], '2': []})
+
     def test_place_market_order_correctly(self):
         self.hp_daily._latest_data = {'D': pd.read_csv('test_data/hp_daily_place_order.csv')}
         self.hp_daily._strategy_atr_values = {'D': 0.01000}
@@ -0,0 +1,78 @@
+# Python standard.
+import unittest
+
+# Local.
+from pagetpalace.src.dependent_orders.trade_adjustment_params import StopLossMoveParams
+from pagetpalace.src.oanda.account import OandaAccount
+from pagetpalace.src.oanda.id_registry import IdRegistry
+from pagetpalace.src.oanda.live_trade_monitor import LiveTradeMonitor
+from pagetpalace.src.oanda.settings import DEMO_ACCOUNT_NUMBER, DEMO_ACCESS_TOKEN
+
+
+class TestIdRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = IdRegistry(['1', '2'])
+        self.registry.add('1', '10')
+        self.registry.add('1', '11')
+        self.registry.add('2', '11')
+        self.registry.add('2', '12')
+
+    def test_membership(self):
+        self.assertIn('11', self.registry)
+        self.assertNotIn('13', self.registry)
+        self.assertTrue(self.registry.contains('2', '12'))
+        self.assertFalse(self.registry.contains('1', '12'))
+        self.assertEqual(len(self.registry), 3)
+
+    def test_reconcile_removes_every_id_not_live(self):
+        removed = self.registry.reconcile(['11', '99'])
+        self.assertEqual(removed, {'10', '12'})
+        self.assertEqual(self.registry.to_dict(), {'1': ['11'], '2': ['11']})
+
+    def test_remove_and_discard(self):
+        self.assertEqual(self.registry.remove_ids(['11', '13']), {'11'})
+        self.registry.discard('1', '10')
+        self.assertEqual(self.registry.to_dict(), {'1': [], '2': ['12']})
+        self.assertEqual(self.registry.get_all_ids(), {'12'})
+
+    def test_version_changes_only_when_ids_change(self):
+        version = self.registry.version
+        self.registry.add('1', '10')
+        self.registry.discard('1', '12')
+        self.assertEqual(self.registry.remove_ids(['13']), set())
+        self.registry.reconcile(['10', '11', '12'])
+        self.assertEqual(self.registry.version, version)
+        self.registry.add('1', '12')
+        self.assertNotEqual(self.registry.version, version)
+        version = self.registry.version
+        self.registry.discard('1', '12')
+        self.assertNotEqual(self.registry.version, version)
+        version = self.registry.version
+        self.registry.reconcile(['10'])
+        self.assertNotEqual(self.registry.version, version)
+
+    def test_reconcile_thousands_of_ids(self):
+        registry = IdRegistry()
+        for i in range(20000):
+            registry.add(str(i % 4), str(i))
+        removed = registry.reconcile(str(i) for i in range(0, 20000, 2))
+        self.assertEqual(len(removed), 10000)
+        self.assertEqual(len(registry.get_ids('0')), 5000)
+        self.assertEqual(registry.get_ids('1'), set())
+
+
+class TestLiveTradeMonitorHistory(unittest.TestCase):
+    def test_clean_local_lists_keeps_open_trades_only(self):
+        monitor = LiveTradeMonitor(
+            OandaAccount(DEMO_ACCESS_TOKEN, DEMO_ACCOUNT_NUMBER, 'DEMO_API'),
+            stop_loss_move_params=[StopLossMoveParams('GBP_USD', {1: {'check': 0.3, 'move': 0.1}})],
+        )
+        monitor.sl_adjusted.add(('GBP_USD', 1), '1')
+        monitor.sl_adjusted.add(('GBP_USD', 1), '2')
+        monitor._clean_local_lists({'2'})
+        self.assertEqual(monitor.sl_adjusted.to_dict(), {('GBP_USD', 1): ['2']})
+        self.assertEqual(monitor.partially_closed.to_dict(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+# Python standard.
+import unittest
+
+# Third-party.
+import numpy as np
+import pandas as pd
+
+# Local.
+from pagetpalace.src.indicators.indicators import average_true_range
+from pagetpalace.src.indicators.indicator_cache import IndicatorCache
+
+
+class TestIndicatorCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = IndicatorCache(max_size=2)
+        self.data = pd.read_csv('test_data/hp_daily_long_signal.csv')
+
+    def test_returns_cached_array_for_unchanged_series(self):
+        first = self.cache.get_or_compute('GBP_USD', 'D', self.data, 'ATR', average_true_range, periods=14)
+        second = self.cache.get_or_compute('GBP_USD', 'D', self.data, 'ATR', average_true_range, periods=14)
+        self.assertIs(first, second)
+        self.assertEqual(self.cache.get_stats()['hits'], 1)
+        self.assertEqual(self.cache.get_stats()['misses'], 1)
+        self.assertFalse(first.flags.writeable)
+
+    def test_callers_array_left_writeable(self):
+        values = np.arange(len(self.data), dtype=float)
+        cached = self.cache.get_or_compute('GBP_USD', 'D', self.data, 'range', lambda data: values)
+        self.assertIsNot(cached, values)
+        self.assertTrue(values.flags.writeable)
+        values[0] = -1.
+        self.assertEqual(cached[0], 0.)
+
+    def test_new_candle_or_params_miss(self):
+        self.cache.get_or_compute('GBP_USD', 'D', self.data.iloc[:-1], 'ATR', average_true_range, periods=14)
+        self.cache.get_or_compute('GBP_USD', 'D', self.data, 'ATR', average_true_range, periods=14)
+        self.cache.get_or_compute('GBP_USD', 'D', self.data, 'ATR', average_true_range, periods=5)
+        self.assertEqual(self.cache.get_stats()['misses'], 3)
+
+    def test_least_recently_used_entry_evicted(self):
+        self.cache.get_or_compute('GBP_USD', 'D', self.data, 'ATR', average_true_range, periods=14)
+        self.cache.get_or_compute('EUR_USD', 'D', self.data, 'ATR', average_true_range, periods=14)
+        self.cache.get_or_compute('GBP_USD', 'D', self.data, 'ATR', average_true_range, periods=14)
+        self.cache.get_or_compute('XAU_USD', 'D', self.data, 'ATR', average_true_range, periods=14)
+        self.assertEqual(len(self.cache), 2)
+        self.cache.get_or_compute('EUR_USD', 'D', self.data, 'ATR', average_true_range, periods=14)
+        self.assertEqual(self.cache.get_stats(), {'hits': 1, 'misses': 4, 'size': 2, 'hit_rate': 0.2})
+
+    def test_invalid_max_size(self):
+        with self.assertRaises(ValueError):
+            IndicatorCache(max_size=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
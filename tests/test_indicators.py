@@ -1,13 +1,66 @@
 import unittest
 
+# Third-party.
+import numpy as np
+import pandas as pd
+
+# Local.
+from pagetpalace.src.indicators.indicators import (
+    average_true_range,
+    chaikin_money_flow,
+    get_average_true_range_value,
+    get_chaikin_money_flow_value,
+)
+
 
 class TestIndicators(unittest.TestCase):
     def setUp(self) -> None:
-        pass
+        self.df = pd.read_csv('test_data/ha_ewm_2_long_signal.csv')
+        self.df.loc[3, ['midHigh', 'midLow', 'midClose']] = self.df.loc[3, 'midOpen']
 
     def test_something(self):
         self.assertEqual(True, False)
 
+    def test_average_true_range_does_not_modify_input(self):
+        before = self.df.copy()
+        atr = average_true_range(self.df)
+        pd.testing.assert_frame_equal(self.df, before)
+        high_low = self.df['midHigh'] - self.df['midLow']
+        high_close = (self.df['midHigh'] - self.df['midClose'].shift()).abs()
+        low_close = (self.df['midLow'] - self.df['midClose'].shift()).abs()
+        expected = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1).ewm(alpha=1 / 14).mean()
+        np.testing.assert_allclose(atr, expected.values)
+
+    def test_chaikin_money_flow_does_not_modify_input(self):
+        before = self.df.copy()
+        cmf = chaikin_money_flow(self.df)
+        pd.testing.assert_frame_equal(self.df, before)
+        mfv = ((self.df['midClose'] - self.df['midLow']) - (self.df['midHigh'] - self.df['midClose'])) \
+            / (self.df['midHigh'] - self.df['midLow'])
+        mfv = mfv.fillna(0.) * self.df['volume']
+        expected = mfv.rolling(20, min_periods=0).sum() / self.df['volume'].rolling(20, min_periods=0).sum()
+        self.assertEqual(cmf.dtype, np.float64)
+        np.testing.assert_allclose(cmf, expected.values, atol=1e-12)
+
+    def test_chaikin_money_flow_skips_missing_volume(self):
+        self.df['volume'] = self.df['volume'].astype(object)
+        self.df.loc[5, 'volume'] = None
+        self.df.loc[8, 'volume'] = 'n/a'
+        cmf = chaikin_money_flow(self.df)
+        volumes = pd.to_numeric(self.df['volume'], errors='coerce')
+        mfv = ((self.df['midClose'] - self.df['midLow']) - (self.df['midHigh'] - self.df['midClose'])) \
+            / (self.df['midHigh'] - self.df['midLow'])
+        mfv = mfv.fillna(0.) * volumes
+        expected = mfv.rolling(20, min_periods=0).sum() / volumes.rolling(20, min_periods=0).sum()
+        self.assertFalse(np.isnan(cmf[9:]).any())
+        np.testing.assert_allclose(cmf, expected.values, atol=1e-12)
+
+    def test_value_functions_return_latest(self):
+        self.assertAlmostEqual(get_average_true_range_value(self.df), average_true_range(self.df)[-1])
+        self.assertAlmostEqual(get_chaikin_money_flow_value(self.df), chaikin_money_flow(self.df)[-1])
+        self.assertIn('ATR_14', self.df.columns)
+        self.assertIn('CMF', self.df.columns)
+
     def tearDown(self) -> None:
         pass
 
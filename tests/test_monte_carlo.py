@@ -0,0 +1,116 @@
+# Python standard.
+import unittest
+
+# Third-party.
+import numpy as np
+import pandas as pd
+
+# Local.
+from pagetpalace.src.backtesting.monte_carlo import MonteCarlo, get_risk_fractions
+from pagetpalace.src.currency_calculations.risk_manager import RiskManager
+from pagetpalace.src.currency_calculations.unit_conversions import UnitConversions
+from pagetpalace.src.oanda.instruments.instruments import CurrencyPairs
+
+
+class TestRiskFractions(unittest.TestCase):
+    def test_matches_live_sizing(self):
+        balance, equity_split = 10000., 2.25
+        trades = pd.DataFrame({
+            'entry_price': [1.3, 1.3, 1.25],
+            'stop_loss': [1.299, 1.28, 1.26],
+            'entry_time': pd.to_datetime(['2021-01-04 09:00', '2021-01-04 12:00', '2021-01-05 09:00']),
+            'exit_time': pd.to_datetime(['2021-01-04 12:00', '2021-01-04 15:00', '2021-01-05 12:00']),
+        })
+        fractions = get_risk_fractions(trades, CurrencyPairs.GBP_USD, equity_split, max_risk_pct=0.05)
+        risk_manager = RiskManager(CurrencyPairs.GBP_USD, 0.05)
+        for fraction, trade in zip(fractions, trades.itertuples()):
+            stop_loss_amount = abs(trade.entry_price - trade.stop_loss)
+            conversions = UnitConversions(CurrencyPairs.GBP_USD, trade.entry_price)
+            units = conversions.calculate_unit_size_of_trade(
+                {'balance': balance, 'marginAvailable': balance, 'orders': []},
+                equity_split,
+            )
+            units = risk_manager.calculate_unit_size_within_max_risk(
+                balance, units, trade.entry_price, stop_loss_amount,
+            )
+            risk = units * stop_loss_amount / trade.entry_price
+            self.assertAlmostEqual(fraction, risk / balance, places=4)
+        self.assertEqual(fractions[1], 0.05)
+        trades['status'] = ['FILLED', 'FILLED', 'EXPIRED']
+        trades['r_multiple'] = [2., -1., np.nan]
+        monte_carlo = MonteCarlo.from_trades(trades, CurrencyPairs.GBP_USD, equity_split, max_risk_pct=0.05)
+        np.testing.assert_allclose(monte_carlo.returns, [2 * fractions[0], -0.05])
+
+    def test_margin_held_by_open_trades_is_not_available(self):
+        balance, equity_split = 10000., 1.5
+        trades = pd.DataFrame({
+            'entry_price': [1.3, 1.3, 1.3, 1.3, 1.3],
+            'stop_loss': [1.299, 1.298, 1.299, 1.299, 1.297],
+            'entry_time': pd.to_datetime(['2021-01-04 01:00', '2021-01-04 00:00', '2021-01-04 03:00',
+                                          '2021-01-04 04:00', '2021-01-04 08:00']),
+            'exit_time': pd.to_datetime(['2021-01-04 03:00', '2021-01-04 05:00', '2021-01-04 06:00',
+                                         '2021-01-04 07:00', '2021-01-04 09:00']),
+        })
+        fractions = get_risk_fractions(trades, CurrencyPairs.GBP_USD, equity_split, balance=balance)
+        risk_manager = RiskManager(CurrencyPairs.GBP_USD, 0.05)
+        open_units = {}
+        for i in trades.sort_values('entry_time').index:
+            trade = trades.loc[i]
+            open_units = {j: units for j, units in open_units.items() if trades.loc[j, 'exit_time'] > trade.entry_time}
+            conversions = UnitConversions(CurrencyPairs.GBP_USD, trade.entry_price)
+            margin_used = sum(conversions._convert_units_to_gbp(units) for units in open_units.values())
+            units = conversions.calculate_unit_size_of_trade(
+                {'balance': balance, 'marginAvailable': balance - margin_used, 'orders': []},
+                equity_split,
+            )
+            stop_loss_amount = abs(trade.entry_price - trade.stop_loss)
+            units = risk_manager.calculate_unit_size_within_max_risk(
+                balance, units, trade.entry_price, stop_loss_amount,
+            )
+            open_units[i] = units
+            self.assertAlmostEqual(fractions[i], units * stop_loss_amount / trade.entry_price / balance, places=4)
+        self.assertEqual(fractions[3], 0.)
+        self.assertLess(fractions[0], fractions[4] / 3)
+
+        ignored = get_risk_fractions(trades, CurrencyPairs.GBP_USD, equity_split, include_open_margin=False)
+        self.assertTrue((ignored >= fractions).all())
+        np.testing.assert_allclose(ignored[[1, 4]], fractions[[1, 4]])
+        self.assertGreater(ignored[3], 0.)
+
+
+class TestMonteCarlo(unittest.TestCase):
+    def setUp(self):
+        self.returns = np.random.default_rng(1).normal(0.002, 0.01, 300)
+
+    def test_results_are_reproducible_for_a_seed(self):
+        results = MonteCarlo(self.returns, paths=2500, seed=7, max_workers=0).run()
+        self.assertEqual(len(results), 2500)
+        pd.testing.assert_frame_equal(MonteCarlo(self.returns, paths=2500, seed=7, max_workers=0).run(), results)
+        pd.testing.assert_frame_equal(MonteCarlo(self.returns, paths=2500, seed=7, max_workers=2).run(), results)
+        different = MonteCarlo(self.returns, paths=2500, seed=8, max_workers=0).run()
+        self.assertFalse(np.array_equal(different['final_return'], results['final_return']))
+
+    def test_shuffles_only_change_the_order_of_returns(self):
+        results = MonteCarlo(self.returns, paths=500, method='shuffle', seed=1, max_workers=0).run()
+        np.testing.assert_allclose(results['final_return'], np.prod(1 + self.returns) - 1)
+        self.assertGreater(results['max_drawdown_pct'].std(), 0)
+        halved_then_doubled = MonteCarlo([-0.5, 1.], paths=4000, method='shuffle', seed=1, max_workers=0).run()
+        is_ruined = halved_then_doubled['is_ruined']
+        np.testing.assert_allclose(halved_then_doubled['max_drawdown_pct'], 0.5)
+        np.testing.assert_allclose(halved_then_doubled['lowest_equity'], np.where(is_ruined, 0.5, 1.))
+        self.assertAlmostEqual(MonteCarlo.summarise(halved_then_doubled)['risk_of_ruin'], 0.5, delta=0.05)
+
+    def test_bootstrap_paths_compound_the_returns(self):
+        results = MonteCarlo(self.returns, paths=4000, trades_per_path=100, seed=3, max_workers=0).run()
+        expected = np.mean(np.log1p(self.returns)) * 100
+        self.assertAlmostEqual(np.log1p(results['final_return']).mean(), expected, delta=0.01)
+        self.assertTrue((results['lowest_equity'] <= 1).all())
+        summary = MonteCarlo.summarise(results)
+        self.assertLess(summary['max_drawdown_pct_p5'], summary['max_drawdown_pct_p95'])
+        self.assertEqual(summary['risk_of_ruin'], 0)
+        with self.assertRaises(ValueError):
+            MonteCarlo(self.returns, trades_per_path=301, method='shuffle')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+# Python standard.
+import datetime
+import unittest
+
+# Third-party.
+import pandas as pd
+
+# Local.
+from pagetpalace.src.oanda.instruments.instruments import CurrencyPairs
+from pagetpalace.src.oanda.account import OandaAccount
+from pagetpalace.src.oanda.strategies.strategy_implementations.hpdaily import HPDaily
+from pagetpalace.src.oanda.settings import DEMO_ACCOUNT_NUMBER, DEMO_ACCESS_TOKEN
+from pagetpalace.src.scheduling.orchestrator import SignalOrchestrator, _evaluate_in_worker
+
+
+class RecordingHPDaily(HPDaily):
+    """ Candles come from test_data and orders are recorded instead of placed. """
+
+    def __init__(self, csv_path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.csv_path = csv_path
+        self.acted = []
+
+    def _prepare_candle(self, close_time: datetime.datetime) -> bool:
+        self._latest_data = {'D': pd.read_csv(self.csv_path)}
+        return True
+
+    def _act_on_signals(self, close_time: datetime.datetime, signals: dict):
+        self.acted.append((close_time, signals))
+
+
+class TestSignalOrchestrator(unittest.TestCase):
+    def setUp(self):
+        self.close_time = datetime.datetime(2021, 1, 13, 22, tzinfo=datetime.timezone.utc)
+        self.strategies = [
+            self._build_strategy(CurrencyPairs.GBP_USD, 'test_data/hp_daily_long_signal.csv'),
+            self._build_strategy(CurrencyPairs.EUR_USD, 'test_data/hp_daily_short_signal.csv'),
+        ]
+
+    @staticmethod
+    def _build_strategy(instrument, csv_path: str) -> RecordingHPDaily:
+        return RecordingHPDaily(
+            csv_path=csv_path,
+            account=OandaAccount(DEMO_ACCESS_TOKEN, DEMO_ACCOUNT_NUMBER, 'DEMO_API'),
+            instrument=instrument,
+            boundary_multipliers={'D': {'long': {'below': 1}, 'short': {'above': 2}}},
+            trade_multipliers={'1': {'long': {'tp': 3, 'sl': 1.5}, 'short': {'tp': 1.5, 'sl': 1.5}}},
+            coefficients={
+                'hp_coeffs': {'long': {'body': 3, 'shadow': 1.5}, 'short': {'body': 1.25, 'shadow': 2}},
+                'streak_look_back': {'long': 1, 'short': 2},
+                'price_movement_lb': {'long': 1, 'short': 2},
+                'x_atr': {'long': 1, 'short': 1},
+            },
+        )
+
+    def _get_expected_signals(self) -> list:
+        expected = []
+        for strategy in self.strategies:
+            strategy._prepare_candle(self.close_time)
+            expected.append(strategy._evaluate_signals())
+
+        return expected
+
+    def test_evaluate_in_worker_leaves_clients_behind(self):
+        strategy = self.strategies[0]
+        strategy._prepare_candle(self.close_time)
+        signals, state = _evaluate_in_worker(type(strategy), strategy.get_evaluation_state())
+        self.assertNotIn('account', state)
+        self.assertNotIn('_lock', state)
+        self.assertIn('D', state['_strategy_atr_values'])
+        self.assertEqual(signals, strategy._evaluate_signals())
+
+    def test_on_candle_close_acts_once_per_strategy_with_worker_results(self):
+        expected = self._get_expected_signals()
+        for max_workers in (0, 2):
+            for strategy in self.strategies:
+                strategy.acted = []
+                strategy._strategy_atr_values = {}
+            with SignalOrchestrator(self.strategies, max_workers=max_workers, io_workers=2) as orchestrator:
+                orchestrator.on_candle_close('D', self.close_time)
+            for strategy, signals in zip(self.strategies, expected):
+                self.assertEqual(strategy.acted, [(self.close_time, signals)])
+                self.assertIn('D', strategy._strategy_atr_values)
+
+    def test_register_adds_one_job_per_granularity(self):
+        class Scheduler:
+            def __init__(self):
+                self.registered = []
+
+            def register_candle_close(self, callback, granularity, name=None, **kwargs):
+                self.registered.append(granularity)
+
+        scheduler = Scheduler()
+        SignalOrchestrator(self.strategies, max_workers=0).register(scheduler)
+        self.assertEqual(scheduler.registered, ['D'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+# Python standard.
+import datetime
+import unittest
+
+# Local.
+from pagetpalace.src.dependent_orders.trade_adjustment_params import PartialClosureParams, StopLossMoveParams
+from pagetpalace.src.oanda.live_trade_monitor import LiveTradeMonitor
+from pagetpalace.src.oanda.orders import Orders
+from pagetpalace.src.oanda.paper_account import PaperAccount, PaperPricing, PaperTradeMonitor
+from fakes import FakeClock
+
+
+class TestPaperAccount(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.pricing = PaperPricing(clock=self.clock)
+        self.account = PaperAccount(self.pricing, balance=10000.)
+
+    def _quote(self, bid: float, ask: float):
+        self.clock.current += datetime.timedelta(seconds=1)
+        self.pricing.update_price('GBP_USD', bid, ask)
+
+    def _place_stop(self, entry: float, price_bound: float, units: int = 1000) -> dict:
+        return self.account.create_order(Orders.create_stop_order(
+            entry=entry,
+            price_bound=price_bound,
+            stop_loss_price=entry - 0.005 if units > 0 else entry + 0.005,
+            take_profit_price=entry + 0.01 if units > 0 else entry - 0.01,
+            instrument='GBP_USD',
+            units=units,
+        ))
+
+    def test_stop_order_fills_when_triggered_and_closes_at_take_profit(self):
+        self._quote(1.2990, 1.2992)
+        order = self._place_stop(1.3, 1.301)
+        self.assertEqual(self.account.get_pending_orders()['orders'][0]['id'], order['orderCreateTransaction']['id'])
+        self._quote(1.2994, 1.2996)
+        self.assertEqual(self.account.get_open_trades()['trades'], [])
+        self._quote(1.3001, 1.3003)
+        trade = self.account.get_open_trades()['trades'][0]
+        self.assertEqual((trade['price'], trade['currentUnits']), ('1.3003', '1000'))
+        self.assertEqual(trade['takeProfitOrder']['price'], '1.31')
+        self._quote(1.3105, 1.3107)
+        self.assertEqual(self.account.get_open_trades()['trades'], [])
+        self.assertGreater(float(self.account.get_summary()['account']['balance']), 10000.)
+
+    def test_stop_order_beyond_price_bound_is_cancelled(self):
+        self._quote(1.2990, 1.2992)
+        self._place_stop(1.3, 1.3005)
+        self._quote(1.3010, 1.3012)
+        self.assertEqual(self.account.get_open_trades()['trades'], [])
+        self.assertEqual(self.account.get_pending_orders()['orders'], [])
+
+    def test_short_stop_loss(self):
+        self._quote(1.3010, 1.3012)
+        self._place_stop(1.3, None, units=-1000)
+        self._quote(1.2998, 1.3000)
+        self.assertEqual(self.account.get_open_trades()['trades'][0]['currentUnits'], '-1000')
+        self._quote(1.3050, 1.3052)
+        self.assertEqual(self.account.get_open_trades()['trades'], [])
+        self.assertLess(float(self.account.get_summary()['account']['balance']), 10000.)
+
+    def test_market_order_halted_without_price_then_filled(self):
+        order = Orders.create_market_order(1.29, 1.31, 'GBP_USD', 1000)
+        self.assertEqual(self.account.create_order(order)['orderCancelTransaction']['reason'], 'MARKET_HALTED')
+        self._quote(1.3, 1.3002)
+        fill = self.account.create_order(order)['orderFillTransaction']
+        self.assertEqual(fill['price'], '1.3002')
+        details = self.account.get_full_account_details()['account']
+        self.assertGreater(float(details['marginUsed']), 0.)
+        self.assertEqual(details['openTradeCount'], 1)
+
+    def test_insufficient_margin(self):
+        self._quote(1.3, 1.3002)
+        order = Orders.create_market_order(1.29, 1.31, 'GBP_USD', 10000000)
+        self.assertEqual(self.account.create_order(order)['orderCancelTransaction']['reason'], 'INSUFFICIENT_MARGIN')
+
+    def test_partial_close_and_cancel(self):
+        self._quote(1.3, 1.3002)
+        response = self.account.create_order(Orders.create_market_order(1.29, 1.31, 'GBP_USD', 1000))
+        trade_id = response['orderFillTransaction']['tradeOpened']['tradeID']
+        response = self.account.close_trade(trade_id, '400')
+        self.assertEqual(response['orderFillTransaction']['tradeReduced']['units'], '-400')
+        self.assertEqual(self.account.get_open_trades()['trades'][0]['currentUnits'], '600')
+        self.assertEqual(self.account.cancel_order('999')['errorCode'], 'ORDER_DOESNT_EXIST')
+        order_id = self._place_stop(1.35, None)['orderCreateTransaction']['id']
+        self.assertTrue(self.account.is_order_cancelled(self.account.cancel_order(order_id)))
+
+    def test_live_trade_monitor_runs_against_paper_account(self):
+        self._quote(1.3, 1.3002)
+        self.account.create_order(Orders.create_market_order(1.2952, 1.3102, 'GBP_USD', 1000))
+        monitor = LiveTradeMonitor(
+            self.account,
+            stop_loss_move_params=[StopLossMoveParams('GBP_USD', {1: {'check': 0.5, 'move': 0.1}})],
+            partial_closure_params=[PartialClosureParams('GBP_USD', {1: {'check': 0.3, 'close': 0.5}})],
+        )
+        self._quote(1.3060, 1.3062)
+        monitor.monitor_and_adjust_current_trades()
+        trade = self.account.get_open_trades()['trades'][0]
+        self.assertEqual(trade['currentUnits'], '500')
+        self.assertEqual(trade['stopLossOrder']['price'], '1.3012')
+
+    def test_paper_trade_monitor_checks_again_once_the_trade_changes(self):
+        self._quote(1.3, 1.3002)
+        self.account.create_order(Orders.create_market_order(1.2952, 1.3102, 'GBP_USD', 1000))
+        monitor = PaperTradeMonitor(
+            self.account,
+            stop_loss_move_params=[StopLossMoveParams('GBP_USD', {
+                1: {'check': 0.3, 'move': 0.1},
+                2: {'check': 0.6, 'move': 0.3},
+            })],
+        )
+        stop_losses = []
+        for bid in [1.3020, 1.3035, 1.3040, 1.3065]:
+            self._quote(bid, bid + 0.0002)
+            monitor.monitor_and_adjust_current_trades()
+            stop_losses.append(self.account.get_open_trades()['trades'][0]['stopLossOrder']['price'])
+        self.assertEqual(stop_losses, ['1.2952', '1.3012', '1.3012', '1.3032'])
+
+    def test_open_trades_listed_without_pl_until_a_trade_changes(self):
+        self._quote(1.3, 1.3002)
+        version = self.account.version
+        response = self.account.create_order(Orders.create_market_order(1.29, 1.31, 'GBP_USD', 1000))
+        self.assertNotEqual(self.account.version, version)
+        listed = self.account.list_open_trades()
+        self.assertEqual(
+            listed,
+            [{k: v for k, v in t.items() if k not in ('unrealizedPL', 'marginUsed')}
+             for t in self.account.get_open_trades()['trades']],
+        )
+        self._quote(1.3001, 1.3003)
+        self.assertIs(self.account.list_open_trades(), listed)
+        self.account.close_trade(response['orderFillTransaction']['tradeOpened']['tradeID'], '400')
+        self.assertEqual(self.account.list_open_trades()[0]['currentUnits'], '600')
+
+
+if __name__ == '__main__':
+    unittest.main()
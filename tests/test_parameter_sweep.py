@@ -0,0 +1,94 @@
+# Python standard.
+import os
+import tempfile
+import unittest
+
+# Third-party.
+import numpy as np
+import pandas as pd
+
+# Local.
+from pagetpalace.src.backtesting.parameter_sweep import (
+    METRIC_COLUMNS,
+    ParameterSweep,
+    Uniform,
+    expand_grid,
+    sample_space,
+    summarise_trades,
+)
+from pagetpalace.src.backtesting.shared_candles import SharedCandles, attach_candles
+from pagetpalace.src.backtesting.vectorized_backtester import VectorizedBacktester
+from pagetpalace.src.oanda.account import OandaAccount
+from pagetpalace.src.oanda.instruments.instruments import CurrencyPairs
+from pagetpalace.src.oanda.strategies.strategy_implementations.ssl_hammer_pin import SSLHammerPin
+from test_vectorized_backtester import make_candles
+
+
+def get_space(tp) -> dict:
+    return {
+        'instrument': CurrencyPairs.GBP_USD,
+        'boundary_multipliers': {'reverse': {'H1': {'long': {'above': 0, 'below': 0}, 'short': {'below': 0}}}},
+        'trade_multipliers': {'1': {'long': {'sl': [1, 2], 'tp': tp}, 'short': {'sl': 1, 'tp': 2}}},
+        'hammer_pin_coefficients': {'long': {'body': 1, 'head_tail': 1}, 'short': {'body': 1, 'head_tail': 1}},
+        'trading_restriction': 'spread_cap',
+        'spread_cap': 0.001,
+    }
+
+
+class TestParameterSpace(unittest.TestCase):
+    def test_expand_grid(self):
+        parameter_sets = list(expand_grid(get_space([2, 3, 4])))
+        self.assertEqual(len(parameter_sets), 6)
+        long_multipliers = [p['trade_multipliers']['1']['long'] for p in parameter_sets]
+        self.assertEqual(
+            [(m['sl'], m['tp']) for m in long_multipliers],
+            [(1, 2), (1, 3), (1, 4), (2, 2), (2, 3), (2, 4)],
+        )
+        self.assertEqual(parameter_sets[0]['boundary_multipliers'], get_space(2)['boundary_multipliers'])
+        with self.assertRaises(ValueError):
+            list(expand_grid(get_space(Uniform(1, 3))))
+
+    def test_sample_space_is_seeded(self):
+        samples = list(sample_space(get_space(Uniform(1, 3)), 20, seed=7))
+        self.assertEqual(samples, list(sample_space(get_space(Uniform(1, 3)), 20, seed=7)))
+        tps = [p['trade_multipliers']['1']['long']['tp'] for p in samples]
+        self.assertTrue(all(1 <= tp <= 3 for tp in tps))
+        self.assertEqual({p['trade_multipliers']['1']['long']['sl'] for p in samples}, {1, 2})
+
+
+class TestParameterSweep(unittest.TestCase):
+    def setUp(self):
+        self.candles = {
+            'D': make_candles('D', '2020-01-01 22:00', 80, seed=4),
+            'H1': make_candles('H1', '2020-02-25', 600, seed=5),
+        }
+
+    def test_shared_candles_attach_without_copying(self):
+        with SharedCandles(self.candles) as shared:
+            attached, blocks = attach_candles(shared.spec)
+            for granularity, candles in self.candles.items():
+                np.testing.assert_array_equal(attached[granularity].times, candles.times)
+                np.testing.assert_array_equal(attached[granularity]['bidLow'], candles['bidLow'])
+                self.assertFalse(attached[granularity]['bidLow'].flags.writeable)
+            del attached
+            for block in blocks:
+                block.close()
+
+    def test_pool_matches_in_process_backtests(self):
+        space = get_space([2, 3])
+        with tempfile.TemporaryDirectory() as directory:
+            results_path = os.path.join(directory, 'results.csv')
+            results = ParameterSweep(SSLHammerPin, self.candles, space, max_workers=2).run(results_path=results_path)
+            self.assertEqual(len(pd.read_csv(results_path)), 4)
+        in_process = ParameterSweep(SSLHammerPin, self.candles, space, max_workers=0).run()
+        pd.testing.assert_frame_equal(results, in_process)
+        self.assertEqual(list(results['trade_multipliers.1.long.tp']), [2, 3, 2, 3])
+        self.assertTrue(results['error'].isna().all())
+        strategy = SSLHammerPin(account=OandaAccount('', 'backtest', 'DEMO_API'), **list(expand_grid(space))[3])
+        expected = summarise_trades(VectorizedBacktester(strategy, self.candles).run())
+        self.assertGreater(expected['trades'], 0)
+        self.assertEqual(results.loc[3, METRIC_COLUMNS].to_dict(), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,378 @@
+# Python standard.
+import datetime
+import itertools
+import os
+import tempfile
+import threading
+import unittest
+
+# Third-party.
+import numpy as np
+import pandas as pd
+import pytz
+
+# Local.
+from pagetpalace.src.backtesting.candles import DATETIME_FORMAT, CandleArrays, iter_candle_chunks
+from pagetpalace.src.backtesting.replay import ReplayEngine, ReplayPricing
+from pagetpalace.src.backtesting.vectorized_backtester import VectorizedBacktester
+from pagetpalace.src.dependent_orders.trade_adjustment_params import PartialClosureParams, StopLossMoveParams
+from pagetpalace.src.currency_calculations.exchange_rates import (
+    ExchangeRateService,
+    get_exchange_rates,
+    set_exchange_rates,
+)
+from pagetpalace.src.oanda.instruments.instruments import CurrencyPairs
+from pagetpalace.src.oanda.live_trade_monitor import LiveTradeMonitor
+from pagetpalace.src.oanda.orders import Orders
+from pagetpalace.src.oanda.paper_account import PaperAccount, PaperTradeMonitor
+from pagetpalace.src.oanda.strategies.strategy_implementations.hpdaily import HPDaily
+from pagetpalace.src.oanda.strategies.strategy_implementations.ssl_investment import SSLInvestment
+from pagetpalace.src.scheduling.candle_close_scheduler import CandleCloseScheduler
+from pagetpalace.src.scheduling.clock import SimulatedClock, SimulationFinished, get_clock
+from fakes import FakePricing
+from test_vectorized_backtester import make_candles
+
+UTC = datetime.timezone.utc
+
+
+def make_daily_candles(start: str, count: int, seed: int) -> CandleArrays:
+    """ Daily candles opening Sunday to Thursday at 22:00 UTC, as Oanda's are in winter. """
+    rng = np.random.default_rng(seed)
+    times = pd.date_range(start, periods=count, freq='D')
+    times = times[times.dayofweek.isin([0, 1, 2, 3, 6])].to_numpy()
+    count = len(times)
+    mid = 1.3 + np.cumsum(rng.normal(0, 0.002, count))
+    open_ = np.round(mid + rng.normal(0, 0.0005, count), 5)
+    close = np.round(mid + rng.normal(0, 0.002, count), 5)
+    prices = {
+        'midOpen': open_,
+        'midHigh': np.round(np.maximum(open_, close) + np.abs(rng.normal(0, 0.002, count)), 5),
+        'midLow': np.round(np.minimum(open_, close) - np.abs(rng.normal(0, 0.002, count)), 5),
+        'midClose': close,
+    }
+    for side, offset in (('ask', 0.0001), ('bid', -0.0001)):
+        for data_point in ('Open', 'High', 'Low', 'Close'):
+            prices[f'{side}{data_point}'] = np.round(prices[f'mid{data_point}'] + offset, 5)
+
+    return CandleArrays('D', times, prices)
+
+
+def make_tick_candles(start: str, count: int, seed: int, price: float) -> CandleArrays:
+    """ S5 candles of a random walk, a pip of spread. """
+    rng = np.random.default_rng(seed)
+    times = pd.date_range(start, periods=count, freq='5s').to_numpy()
+    close = np.round(price + np.cumsum(rng.normal(0, 0.00008, count)), 5)
+    open_ = np.round(np.concatenate(([price], close[:-1])), 5)
+    high = np.round(np.maximum(open_, close) + np.abs(rng.normal(0, 0.00004, count)), 5)
+    low = np.round(np.minimum(open_, close) - np.abs(rng.normal(0, 0.00004, count)), 5)
+    prices = {}
+    for side, offset in (('bid', -0.00005), ('ask', 0.00005)):
+        for data_point, values in (('Open', open_), ('High', high), ('Low', low), ('Close', close)):
+            prices[f'{side}{data_point}'] = np.round(values + offset, 5)
+
+    return CandleArrays('S5', times, prices)
+
+
+def trade_replayed_ticks(ticks: dict, chunk_size: int = None, is_searched_ahead: bool = False) -> PaperAccount:
+    """ The same orders placed on a replay of ticks, every quote replayed or, with chunk_size, streamed in chunks and
+        searched ahead for fills if is_searched_ahead.
+    """
+    start = datetime.datetime(2021, 1, 13, 10, tzinfo=UTC)
+    clock = SimulatedClock(start, start + datetime.timedelta(days=1))
+    if chunk_size is None:
+        pricing = ReplayPricing({symbol: {'S5': candles} for symbol, candles in ticks.items()}, clock)
+        account = PaperAccount(pricing)
+    else:
+        streams = {symbol: iter_candle_chunks(candles, chunk_size=chunk_size) for symbol, candles in ticks.items()}
+        pricing = ReplayPricing({}, clock, streams)
+        account = PaperAccount(pricing)
+        pricing.find_first_fill = account.find_first_fill
+        if is_searched_ahead:
+            pricing.fill_version = lambda: account.version
+    rng = np.random.default_rng(5)
+    symbols = list(ticks)
+    for _ in range(150):
+        clock.sleep(int(rng.integers(30, 600)))
+        symbol = symbols[rng.integers(len(symbols))]
+        quote = pricing.get_quote(symbol)
+        direction = rng.choice([1, -1])
+        stop_loss, take_profit = (round(quote.mid - direction * d, 5) for d in rng.uniform(0.001, 0.003, 2) * [1, -1])
+        if rng.random() < 0.5:
+            account.create_order(Orders.create_market_order(stop_loss, take_profit, symbol, int(direction * 1000)))
+        else:
+            entry = round(quote.mid + direction * rng.uniform(0.0002, 0.002), 5)
+            account.create_order(Orders.create_stop_order(
+                entry,
+                None,
+                round(entry - direction * 0.002, 5),
+                round(entry + direction * 0.003, 5),
+                symbol,
+                int(direction * 1000),
+            ))
+        open_trades = account.get_open_trades()['trades']
+        if open_trades and rng.random() < 0.3:
+            trade = open_trades[0]
+            account.update_stop_loss(trade['id'], round(float(trade['price']), 5))
+
+    return account
+
+
+def monitor_replayed_ticks(ticks: CandleArrays, monitor_class: type) -> list:
+    """ Trades opened every half hour of a replay of ticks and polled by a monitor_class every S5 candle, the open
+        trades' units and stop losses after every poll that changed them.
+    """
+    start = datetime.datetime(2021, 1, 13, 10, tzinfo=UTC)
+    hourly = make_candles('H1', '2021-01-13 09:00', 24, seed=3)
+    engine = ReplayEngine({'GBP_USD': {'H1': hourly}}, start, start + datetime.timedelta(hours=12), ticks={
+        'GBP_USD': ticks,
+    })
+    monitor = monitor_class(
+        engine.account,
+        stop_loss_move_params=[StopLossMoveParams('GBP_USD', {
+            1: {'check': 0.2, 'move': 0.05},
+            2: {'check': 0.5, 'move': 0.3},
+        })],
+        partial_closure_params=[PartialClosureParams('GBP_USD', {1: {'check': 0.4, 'close': 0.5}})],
+    )
+    changes, previous = [], []
+    try:
+        for poll in itertools.count():
+            if poll % 360 == 0:
+                quote = engine.pricing.get_quote('GBP_USD')
+                direction = 1 if poll % 720 else -1
+                engine.account.create_order(Orders.create_market_order(
+                    round(quote.mid - direction * 0.0015, 5),
+                    round(quote.mid + direction * 0.002, 5),
+                    'GBP_USD',
+                    direction * 1001,
+                ))
+            engine.clock.sleep(5)
+            monitor.monitor_and_adjust_current_trades()
+            trades = [
+                (t['id'], t['currentUnits'], t['stopLossOrder']['price'])
+                for t in engine.account.get_open_trades()['trades']
+            ]
+            if trades != previous:
+                changes.append((engine.clock.now(), trades))
+                previous = trades
+    except SimulationFinished:
+        pass
+
+    return changes
+
+
+class RecordingHPDaily(HPDaily):
+    """ Records the clock and the last candle it was given on every evaluation. """
+
+    def _evaluate_signals(self, **kwargs):
+        self.evaluations.append((get_clock().now(), self._latest_data[self.entry_timeframe].iloc[-1]['datetime']))
+
+        return super()._evaluate_signals(**kwargs)
+
+
+class TestSimulatedClock(unittest.TestCase):
+    def test_sleep_moves_time_and_notifies_listeners(self):
+        start = datetime.datetime(2021, 1, 13, tzinfo=UTC)
+        clock = SimulatedClock(start, start + datetime.timedelta(hours=1))
+        moves = []
+        clock.add_listener(lambda previous, now: moves.append((previous.minute, now.minute)))
+        clock.sleep(60)
+        clock.sleep(0)
+        self.assertTrue(clock.wait(threading.Event(), 60) is False)
+        event = threading.Event()
+        event.set()
+        self.assertTrue(clock.wait(event, 60))
+        self.assertEqual(moves, [(0, 1), (1, 2)])
+        with self.assertRaises(SimulationFinished):
+            clock.sleep(3600)
+        self.assertEqual(clock.now(), datetime.datetime(2021, 1, 13, 1, tzinfo=UTC))
+        with self.assertRaises(ValueError):
+            SimulatedClock(datetime.datetime(2021, 1, 13))
+
+    def test_scheduler_runs_on_simulated_time(self):
+        clock = SimulatedClock(
+            datetime.datetime(2021, 1, 13, 10, tzinfo=UTC),
+            datetime.datetime(2021, 1, 13, 14, 30, tzinfo=UTC),
+            resolution=900,
+        )
+        scheduler = CandleCloseScheduler(clock=clock, max_workers=2)
+        closes, ticks = [], []
+
+        def on_close(close_time):
+            clock.sleep(5)
+            closes.append((close_time, clock.now()))
+
+        scheduler.register_candle_close(on_close, 'H1')
+        scheduler.register_interval(ticks.append, 1)
+        with self.assertRaises(SimulationFinished):
+            scheduler.run()
+        self.assertEqual([close.hour for close, _ in closes], [11, 12, 13, 14])
+        self.assertTrue(all(now == close + datetime.timedelta(seconds=5) for close, now in closes))
+        self.assertEqual(len(ticks), 18)
+
+    def test_interval_jobs_run_inline_on_simulated_time(self):
+        clock = SimulatedClock(
+            datetime.datetime(2021, 1, 13, 10, tzinfo=UTC),
+            datetime.datetime(2021, 1, 13, 12, tzinfo=UTC),
+            resolution=300,
+        )
+        scheduler = CandleCloseScheduler(clock=clock, max_workers=2)
+        close_threads, tick_threads = set(), set()
+        scheduler.register_candle_close(lambda close_time: close_threads.add(threading.get_ident()), 'H1')
+        scheduler.register_interval(lambda tick_time: tick_threads.add(threading.get_ident()), 300)
+        with self.assertRaises(SimulationFinished):
+            scheduler.run()
+        self.assertEqual(tick_threads, {threading.get_ident()})
+        self.assertNotIn(threading.get_ident(), close_threads)
+
+
+HPDAILY_PARAMETERS = {
+    'boundary_multipliers': {'D': {'long': {'below': 0.5, 'above': 0.5}, 'short': {'above': 0.5}}},
+    'trade_multipliers': {'1': {'long': {'tp': 3, 'sl': 1.5}, 'short': {'tp': 1.5, 'sl': 1.5}}},
+    'coefficients': {
+        'hp_coeffs': {'long': {'body': 1, 'shadow': 1}, 'short': {'body': 1, 'shadow': 1}},
+        'streak_look_back': {'long': 1, 'short': 1},
+        'price_movement_lb': {'long': 1, 'short': 2},
+        'x_atr': {'long': 0.5, 'short': 0.5},
+    },
+}
+
+
+class TestReplayEngine(unittest.TestCase):
+    def test_hpdaily_replays_through_execute(self):
+        daily = make_daily_candles('2019-10-01 22:00', 200, seed=1)
+        start = pytz.utc.localize(pd.Timestamp(daily.close_times[HPDaily.CANDLE_COUNT - 1]).to_pydatetime())
+        engine = ReplayEngine({'GBP_USD': {'D': daily}}, start, datetime.datetime(2020, 3, 1, tzinfo=UTC))
+        parameters = {'instrument': CurrencyPairs.GBP_USD, **HPDAILY_PARAMETERS}
+        strategy = RecordingHPDaily(account=engine.account, **parameters)
+        strategy.evaluations = []
+        account = engine.run(strategy)
+        self.assertIsNot(get_clock(), engine.clock)
+        # Every candle after the start is evaluated once, when it's the latest complete candle.
+        evaluated = pd.DatetimeIndex(daily.times[HPDaily.CANDLE_COUNT:daily.search(engine.clock.now())])
+        self.assertEqual([o for _, o in strategy.evaluations], list(evaluated.strftime(DATETIME_FORMAT)))
+        for now, last_open in strategy.evaluations:
+            self.assertEqual(daily.search(now) - 1, daily.search(pytz.utc.localize(pd.Timestamp(last_open))))
+
+        # Margin runs out before every signal is traded, every trade filled at an open is one the backtester finds.
+        # Orders halted at the Friday close are placed as stop orders instead, those fill wherever they're touched.
+        expected = VectorizedBacktester(HPDaily(account=engine.account, **parameters), {'D': daily}).run()
+        expected = set(zip(pd.DatetimeIndex(expected['entry_time']).tz_localize(UTC), expected['entry_price']))
+        open_times = set(pd.DatetimeIndex(daily.times).tz_localize(UTC))
+        opened = [
+            (datetime.datetime.fromtimestamp(float(trade['openTime']), UTC), float(trade['price']))
+            for trade in account.get_trades()['trades']
+        ]
+        at_open = [trade for trade in opened if trade[0] in open_times]
+        self.assertGreater(len(at_open), 0)
+        for trade in at_open:
+            self.assertIn(trade, expected)
+
+    def test_trades_are_sized_at_replayed_exchange_rates(self):
+        history = {
+            symbol: {'D': make_daily_candles('2019-10-01 22:00', 200, seed=seed)}
+            for seed, symbol in enumerate(['EUR_USD', 'EUR_GBP', 'GBP_USD'], 1)
+        }
+        daily = history['EUR_USD']['D']
+        start = pytz.utc.localize(pd.Timestamp(daily.close_times[HPDaily.CANDLE_COUNT - 1]).to_pydatetime())
+        engine = ReplayEngine(history, start, datetime.datetime(2020, 3, 1, tzinfo=UTC))
+        live_pricing = FakePricing({})
+        live = ExchangeRateService(live_pricing)
+        previous = set_exchange_rates(live)
+        try:
+            strategy = HPDaily(account=engine.account, instrument=CurrencyPairs.EUR_USD, **HPDAILY_PARAMETERS)
+            account = engine.run(strategy)
+            self.assertIs(get_exchange_rates(), live)
+        finally:
+            set_exchange_rates(previous)
+        self.assertGreater(len(account.get_trades()['trades']), 0)
+        self.assertEqual(live_pricing.requests, [])
+        self.assertGreater(engine.exchange_rates.fetches, 0)
+        for symbol in ('EUR_GBP', 'GBP_USD'):
+            candles = history[symbol]['D']
+            asks = np.concatenate([candles[f'ask{data_point}'] for data_point in ('Open', 'High', 'Low', 'Close')])
+            self.assertIn(engine.exchange_rates.get_rate(symbol), asks)
+        self.assertEqual(live_pricing.requests, [])
+
+
+class TestTickReplay(unittest.TestCase):
+    def setUp(self):
+        self.ticks = {
+            'GBP_USD': make_tick_candles('2021-01-13 09:00', 17000, seed=1, price=1.36),
+            'EUR_USD': make_tick_candles('2021-01-13 09:00', 17000, seed=2, price=1.21),
+        }
+
+    def test_streamed_chunks_trade_as_every_quote_replayed(self):
+        expected = trade_replayed_ticks(self.ticks)
+        streamed = trade_replayed_ticks(self.ticks, chunk_size=997)
+        trades = expected.get_trades()['trades']
+        self.assertGreater(len([t for t in trades if t['state'] == 'CLOSED']), 20)
+        self.assertEqual(streamed.get_trades()['trades'], trades)
+        self.assertEqual(
+            [{**order, 'accountID': None} for order in streamed.get_pending_orders()['orders']],
+            [{**order, 'accountID': None} for order in expected.get_pending_orders()['orders']],
+        )
+        self.assertEqual(streamed.get_summary()['account']['balance'], expected.get_summary()['account']['balance'])
+
+    def test_fills_searched_ahead_trade_as_every_quote_replayed(self):
+        expected = trade_replayed_ticks(self.ticks)
+        searched = trade_replayed_ticks(self.ticks, chunk_size=20000, is_searched_ahead=True)
+        self.assertEqual(searched.get_trades()['trades'], expected.get_trades()['trades'])
+        self.assertEqual(searched.get_summary()['account']['balance'], expected.get_summary()['account']['balance'])
+
+    def test_paper_trade_monitor_adjusts_as_live_trade_monitor(self):
+        ticks = make_tick_candles('2021-01-13 09:00', 10000, seed=4, price=1.36)
+        expected = monitor_replayed_ticks(ticks, LiveTradeMonitor)
+        self.assertGreater(len({trade for _, trades in expected for trade in trades}), 40)
+        self.assertEqual(monitor_replayed_ticks(ticks, PaperTradeMonitor), expected)
+
+    def test_attach_replaces_the_live_trade_monitor(self):
+        start = datetime.datetime(2021, 1, 13, 10, tzinfo=UTC)
+        engine = ReplayEngine({'GBP_USD': {'H1': make_candles('H1', '2021-01-13 09:00', 24, seed=3)}}, start)
+        monitor = LiveTradeMonitor(
+            engine.account,
+            stop_loss_move_params=[StopLossMoveParams('GBP_USD', {1: {'check': 0.5, 'move': 0.1}})],
+        )
+        strategy = SSLInvestment(
+            account=engine.account,
+            instrument=CurrencyPairs.GBP_USD,
+            trade_multipliers={'1': {'long': {'sl': 2, 'tp': 2}}},
+            boundary_multipliers={'continuation': {'H1': {'long': {'above': 2, 'below': 1}}}},
+            live_trade_monitor=monitor,
+        )
+        engine.attach(strategy)
+        self.assertIsInstance(strategy._live_trade_monitor, PaperTradeMonitor)
+        self.assertIs(strategy._live_trade_monitor.sl_adjusted, monitor.sl_adjusted)
+        self.assertEqual(strategy._live_trade_monitor.stop_loss_move_params, monitor.stop_loss_move_params)
+
+    def test_s5_candles_stream_from_csv_a_chunk_at_a_time(self):
+        ticks = self.ticks['GBP_USD']
+        hourly = make_candles('H1', '2021-01-13 09:00', 24, seed=3)
+        start = datetime.datetime(2021, 1, 13, 10, tzinfo=UTC)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'GBP_USD_S5.csv')
+            ticks.to_dataframe().to_csv(path, index=False)
+            read = []
+            chunks = (read.append(len(chunk)) or chunk for chunk in iter_candle_chunks(path, 'S5', chunk_size=500))
+            engine = ReplayEngine({'GBP_USD': {'H1': hourly}}, start, ticks={'GBP_USD': chunks})
+            self.assertEqual(engine.clock.resolution, 5)
+            engine.clock.advance_to(start + datetime.timedelta(seconds=5 * 281))
+        self.assertEqual(read, [500] * 3)
+
+        # The candles either side of a chunk boundary.
+        latest = engine.pricing.get_latest_candles('GBP_USD:S5:AB', units=3)['latestCandles'][0]['candles']
+        self.assertEqual([float(candle['bid']['h']) for candle in latest], list(ticks['bidHigh'][998:1001]))
+        self.assertEqual(
+            engine.pricing.get_latest_candle_prices('GBP_USD', 'S5', ('askLow', 'bidHigh')),
+            (float(latest[-1]['ask']['l']), float(latest[-1]['bid']['h'])),
+        )
+        quote = engine.pricing.get_quote('GBP_USD')
+        self.assertEqual((quote.bid, quote.ask), (ticks['bidOpen'][1001], ticks['askOpen'][1001]))
+        hourly_latest = engine.pricing.get_latest_candles('GBP_USD:H1:M')['latestCandles'][0]['candles']
+        self.assertEqual(float(hourly_latest[-1]['mid']['c']), hourly['midClose'][0])
+        hourly_close = engine.pricing.get_latest_candle_prices('GBP_USD', 'H1', ('midClose',))
+        self.assertEqual(hourly_close, (hourly['midClose'][0],))
+
+
+if __name__ == '__main__':
+    unittest.main()
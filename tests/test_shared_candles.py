@@ -0,0 +1,95 @@
+# Python standard.
+import os
+import pickle
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+# Third-party.
+import numpy as np
+
+# Local.
+from pagetpalace.src.backtesting import shared_candles
+from pagetpalace.src.backtesting.shared_candles import MarketDataHandle, SharedMarketDataset
+from test_vectorized_backtester import make_candles
+
+
+def get_bid_low_sums(handle: MarketDataHandle, symbol: str) -> dict:
+    history = handle.attach([symbol])
+    is_reused = handle.attach([symbol])[symbol]['H1'] is history[symbol]['H1']
+
+    return {
+        'sums': {granularity: float(candles['bidLow'].sum()) for granularity, candles in history[symbol].items()},
+        'is_writeable': history[symbol]['H1']['bidLow'].flags.writeable,
+        'is_reused': is_reused,
+    }
+
+
+class TestSharedMarketDataset(unittest.TestCase):
+    def setUp(self):
+        self.history = {
+            symbol: {
+                'D': make_candles('D', '2020-01-01 22:00', 80, seed=seed),
+                'H1': make_candles('H1', '2020-02-25', 2000, seed=seed + 1),
+            }
+            for symbol, seed in (('GBP_USD', 1), ('EUR_GBP', 3))
+        }
+
+    def test_csvs_load_once_and_attach_read_only(self):
+        with tempfile.TemporaryDirectory() as directory:
+            paths = {}
+            for symbol, time_frames in self.history.items():
+                for granularity, candles in time_frames.items():
+                    path = os.path.join(directory, f'{symbol}_{granularity}.csv')
+                    candles.to_dataframe().to_csv(path, index=False)
+                    paths.setdefault(symbol, {})[granularity] = path
+            with SharedMarketDataset.from_csv(paths) as dataset:
+                handle = pickle.loads(pickle.dumps(dataset.handle))
+                self.assertLess(len(pickle.dumps(handle)), dataset.nbytes / 100)
+                attached = handle.attach()
+                self.assertIs(handle.attach(['EUR_GBP'])['EUR_GBP']['D'], attached['EUR_GBP']['D'])
+                for symbol, time_frames in self.history.items():
+                    for granularity, candles in time_frames.items():
+                        np.testing.assert_array_equal(attached[symbol][granularity].times, candles.times)
+                        np.testing.assert_array_equal(attached[symbol][granularity]['askHigh'], candles['askHigh'])
+                        self.assertFalse(attached[symbol][granularity]['askHigh'].flags.writeable)
+
+    def test_detach_and_close_release_attachments(self):
+        with SharedMarketDataset(self.history) as dataset:
+            handle = pickle.loads(pickle.dumps(dataset.handle))
+            first = handle.attach(['GBP_USD'])['GBP_USD']['H1']
+            handle.detach(['GBP_USD'])
+            self.assertEqual(len(shared_candles._attached), 0)
+            self.assertIsNot(handle.attach(['GBP_USD'])['GBP_USD']['H1'], first)
+            np.testing.assert_array_equal(first['bidLow'], self.history['GBP_USD']['H1']['bidLow'])
+            handle.attach()
+            self.assertEqual(len(shared_candles._attached), 2)
+        self.assertEqual(len(shared_candles._attached), 0)
+
+    def test_workers_read_the_shared_blocks(self):
+        with SharedMarketDataset(self.history) as dataset:
+            block_name, n, columns = dataset.handle.spec['GBP_USD']['H1']
+            block = shared_memory.SharedMemory(name=block_name)
+            prices = np.ndarray((len(columns), n), dtype=np.float64, buffer=block.buf, offset=8 * n)
+            prices[columns.index('bidLow'), 0] += 1.
+            del prices
+            block.close()
+            with ProcessPoolExecutor(max_workers=2) as executor:
+                results = dict(zip(self.history, executor.map(
+                    get_bid_low_sums,
+                    [dataset.handle] * len(self.history),
+                    list(self.history),
+                )))
+        for symbol, time_frames in self.history.items():
+            expected = {granularity: float(candles['bidLow'].sum()) for granularity, candles in time_frames.items()}
+            if symbol == 'GBP_USD':
+                expected['H1'] += 1.
+            for granularity, total in expected.items():
+                self.assertAlmostEqual(results[symbol]['sums'][granularity], total, places=6)
+            self.assertFalse(results[symbol]['is_writeable'])
+            self.assertTrue(results[symbol]['is_reused'])
+
+
+if __name__ == '__main__':
+    unittest.main()
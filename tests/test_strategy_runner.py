@@ -0,0 +1,65 @@
+# Python standard.
+import datetime
+import threading
+import unittest
+
+# Local.
+from pagetpalace.src.oanda.market_data import SharedCandleData
+from pagetpalace.src.scheduling.strategy_runner import StrategyRunner
+from fakes import FakeClock, FakeInstrumentData
+
+
+class CountingStrategy:
+    def __init__(self, runner_stop_after: int):
+        self.ticks = []
+        self.market_data = None
+        self._stop_after = runner_stop_after
+        self.runner = None
+
+    def _on_tick(self, now):
+        self.ticks.append(now)
+        if len(self.ticks) == self._stop_after:
+            self.runner.stop()
+
+    def register(self, scheduler):
+        self.runner = scheduler
+        scheduler.register_interval(self._on_tick, 0.02)
+
+
+class TestStrategyRunner(unittest.TestCase):
+    def test_runs_strategies_on_one_loop_until_stopped(self):
+        market_data = SharedCandleData(instrument_data=FakeInstrumentData(FakeClock()))
+        strategies = [CountingStrategy(runner_stop_after=5), CountingStrategy(runner_stop_after=10 ** 6)]
+        runner = StrategyRunner(strategies, max_workers=2, market_data=market_data)
+        runner.run()
+        self.assertGreaterEqual(len(strategies[0].ticks), 5)
+        self.assertGreater(len(strategies[1].ticks), 0)
+        self.assertTrue(all(strategy.market_data is market_data for strategy in strategies))
+
+    def test_shared_candle_data_fetches_once_per_candle(self):
+        clock = FakeClock(datetime.datetime(2021, 1, 13, 11, 0, 10, tzinfo=datetime.timezone.utc))
+        instrument_data = FakeInstrumentData(clock, delay=0.05)
+        market_data = SharedCandleData(instrument_data=instrument_data, clock=clock)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(market_data.get_candles('EUR_USD', 'H1', 50, 'M')))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(instrument_data.counts), 1)
+        self.assertEqual(len({id(df) for df in results}), 4)
+        results[0]['ATR_14'] = 1.
+        self.assertNotIn('ATR_14', market_data.get_candles('EUR_USD', 'H1', 50, 'M').columns)
+        self.assertEqual(len(instrument_data.counts), 1)
+
+        # The 11:00 candle should have closed by 12:00, so the cached 10:00 candle is stale.
+        clock.current = datetime.datetime(2021, 1, 13, 12, 0, 10, tzinfo=datetime.timezone.utc)
+        market_data.get_candles('EUR_USD', 'H1', 50, 'M')
+        self.assertEqual(len(instrument_data.counts), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+# Python standard.
+import datetime
+import os
+import pickle
+import tempfile
+import unittest
+
+# Third-party.
+import pandas as pd
+
+# Local.
+from pagetpalace.src.dependent_orders.trade_adjustment_params import PartialClosureParams, StopLossMoveParams
+from pagetpalace.src.oanda.instruments.instruments import CurrencyPairs
+from pagetpalace.src.oanda.account import OandaAccount
+from pagetpalace.src.oanda.live_trade_monitor import LiveTradeMonitor
+from pagetpalace.src.oanda.market_data import SharedCandleData
+from pagetpalace.src.oanda.orders import Orders
+from pagetpalace.src.oanda.paper_account import PaperAccount, PaperPricing
+from pagetpalace.src.oanda.strategies.strategy_implementations.hpdaily import HPDaily
+from pagetpalace.src.oanda.strategies.strategy_implementations.ssl_currency import SSLCurrency
+from pagetpalace.src.oanda.strategies.strategy_state import StrategyStateStore
+from pagetpalace.src.oanda.settings import DEMO_ACCOUNT_NUMBER, DEMO_ACCESS_TOKEN
+from fakes import FakeClock, FakeInstrumentData
+
+
+class TestStrategyStateStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = StrategyStateStore(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    @staticmethod
+    def _build_strategy(account_id: str = DEMO_ACCOUNT_NUMBER, state_key: str = None) -> HPDaily:
+        return HPDaily(
+            account=OandaAccount(DEMO_ACCESS_TOKEN, account_id, 'DEMO_API'),
+            instrument=CurrencyPairs.GBP_USD,
+            boundary_multipliers={'D': {'long': {'below': 1}, 'short': {'above': 2}}},
+            trade_multipliers={'1': {'long': {'tp': 3, 'sl': 1.5}, 'short': {'tp': 1.5, 'sl': 1.5}}},
+            coefficients={
+                'hp_coeffs': {'long': {'body': 3, 'shadow': 1.5}, 'short': {'body': 1.25, 'shadow': 2}},
+                'streak_look_back': {'long': 1, 'short': 2},
+                'price_movement_lb': {'long': 1, 'short': 2},
+                'x_atr': {'long': 1, 'short': 1},
+            },
+            state_key=state_key,
+        )
+
+    def test_save_and_restore(self):
+        strategy = self._build_strategy()
+        strategy._prev_exec_datetime = datetime.datetime(2021, 1, 13, 22, tzinfo=datetime.timezone.utc)
+        strategy._pending_orders.add('1', '101')
+        strategy._latest_data = {'D': pd.read_csv('test_data/hp_daily_long_signal.csv')}
+        strategy.state_store = self.store
+        strategy.save_state()
+        self.assertEqual(os.listdir(self.directory.name), [f'HPDaily_{DEMO_ACCOUNT_NUMBER}_GBP_USD_D.pkl'])
+
+        restored = self._build_strategy()
+        restored.market_data = SharedCandleData(instrument_data=FakeInstrumentData(FakeClock(datetime.datetime.now())))
+        self.assertTrue(restored.use_state_store(self.store))
+        self.assertEqual(restored._prev_exec_datetime, strategy._prev_exec_datetime)
+        self.assertTrue(restored._pending_orders.contains('1', '101'))
+        pd.testing.assert_frame_equal(restored._latest_data['D'], strategy._latest_data['D'])
+        self.assertEqual(len(restored.market_data._entries), 1)
+
+    def test_copies_on_other_accounts_or_with_a_state_key_keep_their_own_state(self):
+        strategies = [
+            self._build_strategy(),
+            self._build_strategy('101-004-0000000-002'),
+            self._build_strategy(state_key='HPDaily_GBP_USD_D_wide_stops'),
+        ]
+        for i, strategy in enumerate(strategies):
+            strategy._pending_orders.add('1', str(i))
+            strategy.state_store = self.store
+            strategy.save_state()
+        self.assertEqual(len(os.listdir(self.directory.name)), 3)
+        restored = self._build_strategy('101-004-0000000-002')
+        restored.use_state_store(self.store)
+        self.assertEqual(restored._pending_orders.get_all_ids(), {'1'})
+
+    def test_missing_or_mismatched_state_is_ignored(self):
+        strategy = self._build_strategy()
+        self.assertFalse(self.store.load(strategy))
+        with open(self.store.get_path(strategy), 'wb') as f:
+            pickle.dump({'version': 0, 'key': strategy.get_state_key(), 'state': {}}, f)
+        strategy._prev_exec_datetime = None
+        self.assertFalse(self.store.load(strategy))
+        self.assertIsNone(strategy._prev_exec_datetime)
+
+    def test_trades_adjusted_between_candle_closes_are_not_adjusted_again_after_a_restart(self):
+        clock = FakeClock(datetime.datetime(2021, 1, 13, 10, 30, tzinfo=datetime.timezone.utc))
+        pricing = PaperPricing(clock=clock)
+        account = PaperAccount(pricing, balance=10000.)
+        pricing.update_price('GBP_USD', 1.3, 1.3002)
+        account.create_order(Orders.create_market_order(1.2952, 1.3102, 'GBP_USD', 1000))
+
+        def build_strategy() -> SSLCurrency:
+            strategy = SSLCurrency(
+                account=account,
+                instrument=CurrencyPairs.GBP_USD,
+                trade_multipliers={'1': {'long': {'sl': 2, 'tp': 2}, 'short': {'sl': 2, 'tp': 2}}},
+                boundary_multipliers={},
+                live_trade_monitor=LiveTradeMonitor(
+                    account,
+                    stop_loss_move_params=[StopLossMoveParams('GBP_USD', {1: {'check': 0.5, 'move': 0.1}})],
+                    partial_closure_params=[PartialClosureParams('GBP_USD', {1: {'check': 0.3, 'close': 0.5}})],
+                ),
+            )
+            strategy.use_state_store(self.store)
+
+            return strategy
+
+        strategy = build_strategy()
+        clock.current += datetime.timedelta(seconds=1)
+        pricing.update_price('GBP_USD', 1.3060, 1.3062)
+        strategy._monitor_open_trades(clock.now())
+        self.assertEqual(account.get_open_trades()['trades'][0]['currentUnits'], '500')
+
+        # Restarted before the next candle close, the trade has already been handled.
+        restarted = build_strategy()
+        restarted._monitor_open_trades(clock.now())
+        trade = account.get_open_trades()['trades'][0]
+        self.assertEqual(trade['currentUnits'], '500')
+        self.assertEqual(trade['stopLossOrder']['price'], '1.3012')
+        self.assertTrue(restarted._live_trade_monitor.partially_closed.contains(('GBP_USD', 1), trade['id']))
+
+
+class TestIncrementalCandles(unittest.TestCase):
+    def test_only_missed_candles_are_requested(self):
+        clock = FakeClock(datetime.datetime(2021, 1, 13, 11, 0, 10, tzinfo=datetime.timezone.utc))
+        instrument_data = FakeInstrumentData(clock)
+        market_data = SharedCandleData(instrument_data=instrument_data, clock=clock)
+        first = market_data.get_candles('EUR_USD', 'H1', 50, 'M')
+        self.assertEqual(len(first), 50)
+
+        # Three more candles have closed, they're fetched with one candle of overlap.
+        clock.current = datetime.datetime(2021, 1, 13, 14, 0, 10, tzinfo=datetime.timezone.utc)
+        latest = market_data.get_candles('EUR_USD', 'H1', 50, 'M')
+        self.assertEqual(instrument_data.counts, [50, 4])
+        self.assertEqual(len(latest), 50)
+        self.assertEqual(latest['datetime'].values[-1], '2021-01-13 13:00:00')
+        self.assertEqual(latest['datetime'].values[0], '2021-01-11 12:00:00')
+        self.assertFalse(latest['datetime'].duplicated().any())
+
+
+if __name__ == '__main__':
+    unittest.main()
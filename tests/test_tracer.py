@@ -0,0 +1,84 @@
+# Python standard.
+import json
+import os
+import tempfile
+import unittest
+
+# Local.
+from pagetpalace.tools import tracer
+from pagetpalace.tools.tracer import Tracer, summarise_trace_file, traced
+
+
+class Traced:
+    class Instrument:
+        symbol = 'GBP_USD'
+
+    instrument = Instrument()
+
+    @traced('work')
+    def work(self, value: int) -> int:
+        return value * 2
+
+
+class TestTracer(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(handle)
+        self.tracer = Tracer(self.path)
+
+    def tearDown(self):
+        self.tracer.close()
+        os.remove(self.path)
+
+    def _read(self) -> list:
+        self.tracer.close()
+        with open(self.path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_nested_spans_inherit_tags(self):
+        with self.tracer.span('candle_close', close_time='2021-01-13T10:00:00') as span:
+            span['lag_ms'] = 5
+            with self.tracer.span('update_latest_data', instrument='GBP_USD'):
+                pass
+        inner, outer = self._read()
+        self.assertEqual(inner['name'], 'update_latest_data')
+        self.assertEqual(inner['parent_id'], outer['span_id'])
+        self.assertEqual(inner['tags'], {'close_time': '2021-01-13T10:00:00', 'instrument': 'GBP_USD'})
+        self.assertEqual(outer['fields'], {'lag_ms': 5})
+        self.assertIsNone(outer['parent_id'])
+
+    def test_errors_are_recorded_and_raised(self):
+        with self.assertRaises(KeyError):
+            with self.tracer.span('create_order'):
+                raise KeyError('orderCreateTransaction')
+        self.assertIn('KeyError', self._read()[0]['error'])
+
+    def test_disabled_tracer_writes_nothing(self):
+        with Tracer().span('create_order') as span:
+            span['filled'] = True
+        self.assertEqual(self._read(), [])
+
+    def test_traced_tags_strategy_and_instrument(self):
+        original = tracer.TRACER
+        tracer.TRACER = self.tracer
+        try:
+            self.assertEqual(Traced().work(2), 4)
+        finally:
+            tracer.TRACER = original
+        record = self._read()[0]
+        self.assertEqual(record['name'], 'work')
+        self.assertEqual(record['tags'], {'strategy': 'Traced', 'instrument': 'GBP_USD'})
+
+    def test_summarise_trace_file(self):
+        with open(self.path, 'w') as f:
+            for i in range(1, 101):
+                f.write(json.dumps({'name': 'create_order', 'duration_ms': float(i)}) + '\n')
+        summary = summarise_trace_file(self.path)['create_order']
+        self.assertEqual(summary['count'], 100)
+        self.assertAlmostEqual(summary['p50'], 50.5)
+        self.assertAlmostEqual(summary['p99'], 99.01)
+        self.assertEqual(summary['max'], 100.)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+# Python standard.
+import unittest
+
+# Third-party.
+import numpy as np
+import pandas as pd
+
+# Local.
+from pagetpalace.src.backtesting.fills import simulate_orders
+from pagetpalace.src.backtesting.trade_monitor import SimulatedTradeMonitor
+from pagetpalace.src.dependent_orders.target_calculations import round_prices
+from pagetpalace.src.dependent_orders.trade_adjustment_params import PartialClosureParams, StopLossMoveParams
+from pagetpalace.src.oanda.instruments.instruments import CurrencyPairs
+from pagetpalace.src.oanda.live_trade_monitor import LiveTradeMonitor
+from test_vectorized_backtester import make_bars, make_candles, make_order
+
+STOP_LOSS_MOVES = {1: {'check': 0.3, 'move': 0.05}, 2: {'check': 0.6, 'move': 0.4}}
+PARTIAL_CLOSURES = {1: {'check': 0.5, 'close': 0.5}, 2: {'check': 0.55, 'close': 0.4}, 3: {'check': 0.8, 'close': 0.5}}
+
+
+class FakeAccount:
+    """ Holds one trade for LiveTradeMonitor and records what it does to it. """
+
+    def __init__(self, trade: dict):
+        self.trade = trade
+
+    def get_open_trades(self) -> dict:
+        return {'trades': [dict(self.trade)]}
+
+    def update_stop_loss(self, trade_specifier: str, price: float):
+        self.trade['stopLossOrder'] = {'price': str(price)}
+
+    def close_trade(self, trade_specifier: str, close_amount: str):
+        units = float(self.trade['currentUnits'])
+        if float(close_amount) > abs(units):
+            raise ValueError('Oanda rejects closing more units than are open.')
+        self.trade['currentUnits'] = str(units - np.sign(units) * float(close_amount))
+        self.trade['closures'] = self.trade.get('closures', 0) + 1
+
+
+class LatestCandlePricing:
+    def __init__(self):
+        self.candle = None
+
+    def get_latest_candles(self, instrument_ids: str) -> dict:
+        return {'latestCandles': [{'candles': [self.candle]}]}
+
+
+def poll_live_monitor(trade: pd.Series, candles, units: int) -> dict:
+    """ Polls LiveTradeMonitor once per candle, after checking the stop at the candle's open. """
+    is_long = trade['direction'] == 1
+    take_profit = trade['take_profit']
+    account = FakeAccount({
+        'id': '1',
+        'instrument': 'GBP_USD',
+        'price': str(trade['entry_price']),
+        'currentUnits': str(units if is_long else -units),
+        'takeProfitOrder': {'price': str(trade['take_profit'])},
+        'stopLossOrder': {'price': str(trade['stop_loss'])},
+    })
+    pricing = LatestCandlePricing()
+    monitor = LiveTradeMonitor(
+        account,
+        [StopLossMoveParams('GBP_USD', STOP_LOSS_MOVES)],
+        [PartialClosureParams('GBP_USD', PARTIAL_CLOSURES)],
+        pricing=pricing,
+    )
+    for bar in range(trade['entry_bar'], len(candles)):
+        stop = float(account.trade['stopLossOrder']['price'])
+        if (candles['bidLow'][bar] <= stop) if is_long else (candles['askHigh'][bar] >= stop):
+            return {'exit_bar': bar, 'exit_reason': 'STOP_LOSS_ORDER', 'final_stop_loss': stop, **account.trade}
+        pricing.candle = {'ask': {'l': candles['askLow'][bar]}, 'bid': {'h': candles['bidHigh'][bar]}}
+        monitor.monitor_and_adjust_current_trades()
+        if (candles['bidHigh'][bar] >= take_profit) if is_long else (candles['askLow'][bar] <= take_profit):
+            return {'exit_bar': bar, 'exit_reason': 'TAKE_PROFIT_ORDER', 'final_stop_loss': stop, **account.trade}
+    stop = float(account.trade['stopLossOrder']['price'])
+
+    return {'exit_bar': len(candles) - 1, 'exit_reason': 'END_OF_DATA', 'final_stop_loss': stop, **account.trade}
+
+
+class TestSimulatedTradeMonitor(unittest.TestCase):
+    def setUp(self):
+        self.monitor = SimulatedTradeMonitor(
+            [StopLossMoveParams('GBP_USD', STOP_LOSS_MOVES)],
+            [PartialClosureParams('GBP_USD', PARTIAL_CLOSURES)],
+        )
+
+    def test_matches_live_trade_monitor_polled_every_candle(self):
+        candles = make_candles('H1', '2020-02-25', 800, seed=9)
+        rng = np.random.default_rng(3)
+        signal_bars = np.sort(rng.choice(700, 60, replace=False))
+        orders = pd.DataFrame([
+            make_order(int(bar), direction, 'MARKET', np.nan, np.nan, np.nan)
+            for bar, direction in zip(signal_bars, rng.choice([1, -1], len(signal_bars)))
+        ])
+        close = candles['midClose'][orders['signal_bar']]
+        orders['stop_loss'] = np.round(close - orders['direction'] * 0.004, 5)
+        orders['take_profit'] = np.round(close + orders['direction'] * 0.008, 5)
+        trades = simulate_orders(orders, candles)
+        trades['units'] = 7
+        managed = self.monitor.run(trades, candles, CurrencyPairs.GBP_USD)
+        self.assertGreater(managed['stop_moves'].sum(), 0)
+        self.assertGreater(managed['partial_closures'].sum(), 0)
+        self.assertFalse((managed['exit_bar'] == trades['exit_bar']).all())
+        for i, trade in trades.iterrows():
+            live = poll_live_monitor(trade, candles, 7)
+            row = managed.loc[i]
+            self.assertEqual(row['exit_bar'], live['exit_bar'], i)
+            self.assertEqual(row['exit_reason'], live['exit_reason'], i)
+            self.assertEqual(row['final_stop_loss'], live['final_stop_loss'], i)
+            self.assertEqual(row['partial_closures'], live.get('closures', 0), i)
+            self.assertEqual(row['remaining_units'], abs(float(live['currentUnits'])), i)
+
+    def test_pnl_includes_partial_closures(self):
+        candles = make_bars([
+            (100, 101, 99, 100),
+            (100, 102, 99.5, 101),
+            (101, 105, 100.5, 104.5),  # Reaches 30% of the way to take profit, the stop loss moves to 102.
+            (104.5, 107, 104, 106.5),  # Half of the trade closes at 106.
+            (106.5, 106.5, 101, 101.5),  # Stopped out at 102.
+        ])
+        trades = simulate_orders(pd.DataFrame([make_order(0, 1, 'MARKET', 101, 96, 111)]), candles)
+        self.assertEqual(trades['exit_reason'].iloc[0], 'END_OF_DATA')
+        monitor = SimulatedTradeMonitor(
+            [StopLossMoveParams('GBP_USD', {1: {'check': 0.3, 'move': 0.1}})],
+            [PartialClosureParams('GBP_USD', {1: {'check': 0.5, 'close': 0.5}})],
+        )
+        fractions = monitor.run(trades, candles, CurrencyPairs.GBP_USD)
+        managed = monitor.run(trades.assign(units=10), candles, CurrencyPairs.GBP_USD)
+        self.assertEqual(list(managed[['exit_bar', 'exit_reason', 'exit_price']].iloc[0]), [4, 'STOP_LOSS_ORDER', 102.])
+        self.assertEqual(managed['remaining_units'].iloc[0], 5)
+        self.assertEqual(fractions['remaining_units'].iloc[0], 0.5)
+        self.assertEqual(managed['pnl'].iloc[0], (5 * 5 + 5 * 1) / 10)
+        self.assertEqual(fractions['pnl'].iloc[0], managed['pnl'].iloc[0])
+        self.assertAlmostEqual(managed['r_multiple'].iloc[0], 0.6)
+        unmanaged = SimulatedTradeMonitor().run(trades, candles, CurrencyPairs.GBP_USD)
+        pd.testing.assert_frame_equal(unmanaged, trades)
+
+    def test_prices_rounded_as_round_rounds_them(self):
+        rng = np.random.default_rng(5)
+        entry = np.round(rng.uniform(0.5, 2, 100000), 5)
+        take_profit = np.round(entry + rng.uniform(-0.02, 0.02, entry.size), 5)
+        halves = (np.arange(100000, 200000) + 0.5) / 10 ** 5
+        edges = np.array([0.125, -0.125, 2.675, -0.0, 1e300, np.inf, -np.inf])
+        for prices in [entry + (take_profit - entry) * 0.55, halves, edges]:
+            for precision in [5, 3, 0]:
+                expected = [round(price, precision) for price in prices.tolist()]
+                np.testing.assert_array_equal(round_prices(prices, precision), expected)
+        # Scaling by 10 ** 5 takes these onto a half, np.round then goes the other way from round.
+        self.assertTrue((np.round(halves, 5) != round_prices(halves, 5)).any())
+
+
+if __name__ == '__main__':
+    unittest.main()
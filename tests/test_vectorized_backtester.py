@@ -0,0 +1,340 @@
+# Python standard.
+import datetime
+import unittest
+
+# Third-party.
+import numpy as np
+import pandas as pd
+
+# Local.
+from pagetpalace.src.backtesting.candles import CandleArrays
+from pagetpalace.src.backtesting.fills import simulate_orders
+from pagetpalace.src.backtesting.vectorized_backtester import VectorizedBacktester, apply_open_trades_cap
+from pagetpalace.src.backtesting.vectorized_signals import (
+    get_heikin_ashi_ewm_1_orders,
+    get_heikin_ashi_ewm_1_signals,
+    get_hpdaily_signals,
+    get_order_generator,
+    get_ssl_currency_orders,
+    get_ssl_currency_signals,
+    get_ssl_hammer_pin_signals,
+    get_ssl_investment_orders,
+    get_ssl_investment_signals,
+)
+from pagetpalace.src.indicators.indicator_cache import INDICATOR_CACHE
+from pagetpalace.src.oanda.instruments.instruments import CurrencyPairs
+from pagetpalace.src.oanda.account import OandaAccount
+from pagetpalace.src.oanda.strategies.strategy_implementations.heikin_ashi_ewm_1 import HeikinAshiEwm1
+from pagetpalace.src.oanda.strategies.strategy_implementations.heikin_ashi_ewm_2 import HeikinAshiEwm2
+from pagetpalace.src.oanda.strategies.strategy_implementations.hpdaily import HPDaily
+from pagetpalace.src.oanda.strategies.strategy_implementations.ssl_currency import SSLCurrency
+from pagetpalace.src.oanda.strategies.strategy_implementations.ssl_hammer_pin import SSLHammerPin
+from pagetpalace.src.oanda.strategies.strategy_implementations.ssl_investment import SSLInvestment
+from pagetpalace.src.oanda.settings import DEMO_ACCOUNT_NUMBER, DEMO_ACCESS_TOKEN
+
+SIGNAL_VALUES = {'long': 1, 'short': -1, '': 0, None: 0}
+FREQUENCIES = {'M30': '30min', 'H1': 'h', 'H4': '4h', 'D': 'D', 'W': '7D'}
+
+
+def make_candles(granularity: str, start: str, count: int, seed: int, spread: float = 0.0001) -> CandleArrays:
+    rng = np.random.default_rng(seed)
+    times = pd.date_range(start, periods=count, freq=FREQUENCIES[granularity]).to_numpy()
+    mid = 1.3 + np.cumsum(rng.normal(0, 0.002, count))
+    open_ = np.round(mid + rng.normal(0, 0.0005, count), 5)
+    close = np.round(mid + rng.normal(0, 0.002, count), 5)
+    prices = {
+        'midOpen': open_,
+        'midHigh': np.round(np.maximum(open_, close) + np.abs(rng.normal(0, 0.002, count)), 5),
+        'midLow': np.round(np.minimum(open_, close) - np.abs(rng.normal(0, 0.002, count)), 5),
+        'midClose': close,
+    }
+    for side, offset in (('ask', spread), ('bid', -spread)):
+        for data_point in ('Open', 'High', 'Low', 'Close'):
+            prices[f'{side}{data_point}'] = np.round(prices[f'mid{data_point}'] + offset, 5)
+
+    return CandleArrays(granularity, times, prices)
+
+
+def make_bars(rows: list) -> CandleArrays:
+    """ rows of (bid open, bid high, bid low, bid close), the ask is 1 higher. """
+    bid = np.array(rows, dtype=np.float64)
+    prices = {}
+    for i, data_point in enumerate(('Open', 'High', 'Low', 'Close')):
+        prices[f'bid{data_point}'] = bid[:, i]
+        prices[f'ask{data_point}'] = bid[:, i] + 1
+
+    return CandleArrays('H1', pd.date_range('2021-01-04', periods=len(rows), freq='h').to_numpy(), prices)
+
+
+def make_sub_bars(start: str, rows: list) -> CandleArrays:
+    """ rows as in make_bars, 15 minutes apart from start. """
+    bars = make_bars(rows)
+
+    return CandleArrays('S5', pd.date_range(start, periods=len(rows), freq='15min').to_numpy(), bars.prices)
+
+
+def make_order(signal_bar: int, direction: int, order_type: str, entry: float, sl: float, tp: float) -> dict:
+    return {
+        'signal_bar': signal_bar,
+        'direction': direction,
+        'order_type': order_type,
+        'entry': entry,
+        'price_bound': np.nan,
+        'stop_loss': sl,
+        'take_profit': tp,
+        'valid_bars': 1,
+    }
+
+
+def replay_live_orders(strategy, candles: dict):
+    """ Evaluates and acts on every entry candle with a full window of every time frame, as the live strategy does.
+
+        Returns the signal at each candle, the candle and keyword arguments of each pending order placed and the
+        candles pending orders were cleared at.
+    """
+    entry_candles = candles[strategy.entry_timeframe]
+    window = strategy.CANDLE_COUNT
+    signals, placed, cleared = {}, [], []
+    strategy._get_unit_size_of_trade = lambda price: 1
+    strategy._is_instrument_below_num_of_trades_cap = lambda cap: True
+    strategy._send_mail_alert = lambda *args, **kwargs: None
+    for i in range(window - 1, len(entry_candles)):
+        close_time = pd.Timestamp(entry_candles.close_times[i]).to_pydatetime().replace(tzinfo=datetime.timezone.utc)
+        counts = {time_frame: candles[time_frame].search(close_time) for time_frame in strategy.time_frames}
+        if min(counts.values()) < window:
+            continue
+        strategy._latest_data = {
+            time_frame: candles[time_frame].to_dataframe(count - window, count) for time_frame, count in counts.items()
+        }
+        strategy._place_pending_order = lambda bar=i, **kwargs: placed.append((bar, kwargs))
+        strategy._clear_pending_orders = lambda bar=i: cleared.append(bar)
+        signals[i] = strategy._evaluate_signals()
+        strategy._act_on_signals(close_time, signals[i])
+
+    return {i: SIGNAL_VALUES[signal['1']] for i, signal in signals.items()}, placed, cleared
+
+
+class TestVectorizedSignals(unittest.TestCase):
+    """ The vectorized rules give the signal the live strategy gives for every window of candles. """
+
+    def setUp(self):
+        self.account = OandaAccount(DEMO_ACCESS_TOKEN, DEMO_ACCOUNT_NUMBER, 'DEMO_API')
+        # Live strategies cache indicators by candle times, which every test's made up candles share.
+        INDICATOR_CACHE.clear()
+
+    def test_hpdaily_matches_live_signals(self):
+        strategy = HPDaily(
+            account=self.account,
+            instrument=CurrencyPairs.GBP_USD,
+            boundary_multipliers={'D': {'long': {'below': 0.5, 'above': 0.5}, 'short': {'above': 0.5}}},
+            trade_multipliers={'1': {'long': {'tp': 3, 'sl': 1.5}, 'short': {'tp': 1.5, 'sl': 1.5}}},
+            coefficients={
+                'hp_coeffs': {'long': {'body': 1, 'shadow': 1}, 'short': {'body': 1, 'shadow': 1}},
+                'streak_look_back': {'long': 1, 'short': 1},
+                'price_movement_lb': {'long': 1, 'short': 2},
+                'x_atr': {'long': 0.5, 'short': 0.5},
+            },
+        )
+        daily = make_candles('D', '2020-01-01 22:00', 200, seed=1)
+        signals = get_hpdaily_signals(strategy, {'D': daily}, strategy.CANDLE_COUNT)
+        self.assertTrue(signals.any())
+        for i in range(strategy.CANDLE_COUNT - 1, len(daily)):
+            strategy._latest_data = {'D': daily.to_dataframe(i - strategy.CANDLE_COUNT + 1, i + 1)}
+            self.assertEqual(SIGNAL_VALUES[strategy._evaluate_signals()['1']], signals[i], i)
+
+    def test_ssl_hammer_pin_matches_live_signals(self):
+        strategy = SSLHammerPin(
+            account=self.account,
+            instrument=CurrencyPairs.GBP_USD,
+            boundary_multipliers={'reverse': {'H1': {'long': {'above': 0, 'below': 0}, 'short': {'below': 0}}}},
+            trade_multipliers={'1': {'long': {'sl': 1, 'tp': 2}, 'short': {'sl': 1, 'tp': 2}}},
+            hammer_pin_coefficients={'long': {'body': 1, 'head_tail': 1}, 'short': {'body': 1, 'head_tail': 1}},
+            trading_restriction='trading_hours',
+        )
+        daily = make_candles('D', '2020-01-01 22:00', 80, seed=2)
+        hourly = make_candles('H1', '2020-02-25', 300, seed=3)
+        signals = get_ssl_hammer_pin_signals(strategy, {'D': daily, 'H1': hourly}, strategy.CANDLE_COUNT)
+        self.assertTrue(signals.any())
+        for i in range(strategy.CANDLE_COUNT - 1, len(hourly)):
+            daily_count = daily.search(pd.Timestamp(hourly.close_times[i]).to_pydatetime())
+            strategy._latest_data = {
+                'D': daily.to_dataframe(daily_count - strategy.CANDLE_COUNT, daily_count),
+                'H1': hourly.to_dataframe(i - strategy.CANDLE_COUNT + 1, i + 1),
+            }
+            self.assertEqual(SIGNAL_VALUES[strategy._evaluate_signals()['1']], signals[i], i)
+
+    def assert_matches_live_orders(self, strategy, candles: dict, get_signals, get_orders):
+        live_signals, placed, cleared = replay_live_orders(strategy, candles)
+        signals = get_signals(strategy, candles, strategy.CANDLE_COUNT)
+        self.assertTrue(signals.any())
+        self.assertEqual({i: signals[i] for i in live_signals}, live_signals)
+        self.assertFalse(np.delete(signals, list(live_signals)).any())
+        orders = get_orders(strategy, candles, strategy.CANDLE_COUNT)
+        self.assertGreater(len(placed), 1)
+        self.assertEqual(list(orders['signal_bar']), [bar for bar, _ in placed])
+        for (bar, kwargs), order in zip(placed, orders.itertuples()):
+            self.assertEqual(SIGNAL_VALUES[kwargs['signal']], order.direction, bar)
+            offset = order.direction * kwargs['entry_offset']
+            self.assertAlmostEqual(order.entry, round(kwargs['price_to_offset_from'] + offset, 5), places=9, msg=bar)
+            self.assertAlmostEqual(
+                order.stop_loss, round(order.entry - order.direction * kwargs['sl_pip_amount'], 5), places=9, msg=bar,
+            )
+            clears = [clear for clear in cleared if clear > bar]
+            if clears:
+                self.assertEqual(order.valid_bars, clears[0] - bar, bar)
+            else:
+                self.assertTrue(np.isnan(order.valid_bars), bar)
+
+    def test_ssl_investment_matches_live_orders(self):
+        strategy = SSLInvestment(
+            account=self.account,
+            instrument=CurrencyPairs.GBP_USD,
+            trade_multipliers={'1': {'long': {'sl': 2, 'tp': 2}}},
+            boundary_multipliers={'continuation': {'H1': {'long': {'above': 2, 'below': 1}}}},
+            live_trade_monitor=None,
+        )
+        candles = {
+            'D': make_candles('D', '2020-01-01 22:00', 80, seed=2),
+            'H1': make_candles('H1', '2020-02-25', 300, seed=3),
+        }
+        self.assert_matches_live_orders(strategy, candles, get_ssl_investment_signals, get_ssl_investment_orders)
+
+    def test_ssl_currency_matches_live_orders(self):
+        strategy = SSLCurrency(
+            account=self.account,
+            instrument=CurrencyPairs.GBP_USD,
+            trade_multipliers={'1': {'long': {'sl': 2, 'tp': 2}, 'short': {'sl': 1, 'tp': 3}}},
+            boundary_multipliers={'continuation': {'M30': {'long': {'above': 3, 'below': 3}, 'short': {'above': 3}}}},
+            live_trade_monitor=None,
+        )
+        candles = {
+            'W': make_candles('W', '2019-01-04 22:00', 70, seed=2),
+            'D': make_candles('D', '2020-01-01 22:00', 90, seed=3),
+            'H4': make_candles('H4', '2020-03-10', 200, seed=4),
+            'M30': make_candles('M30', '2020-03-25', 200, seed=5),
+        }
+        self.assert_matches_live_orders(strategy, candles, get_ssl_currency_signals, get_ssl_currency_orders)
+
+    def test_heikin_ashi_ewm_1_matches_live_orders(self):
+        strategy = HeikinAshiEwm1(
+            account=self.account,
+            instrument=CurrencyPairs.GBP_USD,
+            ssma_period=20,
+            ewm_period=10,
+            boundary_multipliers={'D': {'long': {'above': 2, 'below': 2}, 'short': {'above': 2}}},
+            trade_multipliers={'1': {'long': {'sl': 1, 'tp': 2}, 'short': {'sl': 1, 'tp': 2}}},
+        )
+        candles = {'D': make_candles('D', '2020-01-01 22:00', 300, seed=1)}
+        self.assert_matches_live_orders(strategy, candles, get_heikin_ashi_ewm_1_signals, get_heikin_ashi_ewm_1_orders)
+
+    def test_stateful_strategies_have_no_order_generator(self):
+        strategy = HeikinAshiEwm2(
+            account=self.account,
+            instrument=CurrencyPairs.GBP_USD,
+            ewm_period=10,
+            boundary_multipliers={},
+            trade_multipliers={'1': {'long': {'sl': 1, 'tp': 2}}},
+        )
+        with self.assertRaises(TypeError):
+            get_order_generator(strategy)
+
+    def test_run_keeps_ssl_hammer_pin_under_trade_cap(self):
+        strategy = SSLHammerPin(
+            account=self.account,
+            instrument=CurrencyPairs.GBP_USD,
+            boundary_multipliers={'reverse': {'H1': {'long': {'above': 0, 'below': 0}, 'short': {'below': 0}}}},
+            trade_multipliers={'1': {'long': {'sl': 3, 'tp': 3}, 'short': {'sl': 3, 'tp': 3}}},
+            hammer_pin_coefficients={'long': {'body': 1, 'head_tail': 1}, 'short': {'body': 1, 'head_tail': 1}},
+            trading_restriction='spread_cap',
+            spread_cap=0.001,
+        )
+        candles = {
+            'D': make_candles('D', '2020-01-01 22:00', 120, seed=4),
+            'H1': make_candles('H1', '2020-02-25', 1500, seed=5),
+        }
+        trades = VectorizedBacktester(strategy, candles).run()
+        filled = trades[trades['status'] == 'FILLED']
+        self.assertGreater(len(filled), 0)
+        for signal_bar in trades['signal_bar']:
+            is_open = (filled['entry_bar'] <= signal_bar) & (filled['exit_bar'] > signal_bar)
+            self.assertLessEqual(is_open.sum(), SSLHammerPin.MAX_OPEN_TRADES)
+
+
+class TestFills(unittest.TestCase):
+    def test_market_and_stop_orders_fill_on_the_right_side(self):
+        candles = make_bars([
+            (100, 101, 99, 100),
+            (100, 104, 99, 103),
+            (103, 110, 102, 109),
+            (109, 110, 95, 96),
+            (96, 97, 90, 91),
+        ])
+        orders = pd.DataFrame([
+            make_order(0, 1, 'MARKET', 101, 95, 108),  # Fills at the ask open, takes profit on the bid.
+            make_order(0, -1, 'STOP', 98.5, 104, 97),  # Bid low never reaches the entry, expires.
+            make_order(2, -1, 'STOP', 100, 105, 92),  # Triggered and stopped in the same bar, stop loss first.
+            make_order(3, 1, 'STOP', 95, 85, 150),  # Gaps through the entry, open at the end.
+        ])
+        trades = simulate_orders(orders, candles)
+        self.assertEqual(list(trades['status']), ['FILLED', 'EXPIRED', 'FILLED', 'FILLED'])
+        self.assertEqual(list(trades['entry_price'].fillna(0)), [101., 0., 100., 97.])
+        self.assertEqual(
+            list(trades['exit_reason'].fillna('')),
+            ['TAKE_PROFIT_ORDER', '', 'STOP_LOSS_ORDER', 'END_OF_DATA'],
+        )
+        self.assertEqual(list(trades['exit_bar']), [2, -1, 3, 4])
+        self.assertEqual(trades['exit_price'].iloc[0], 108.)
+        self.assertEqual(trades['exit_price'].iloc[3], 91.)
+        self.assertAlmostEqual(trades['r_multiple'].iloc[2], -1.)
+
+    def test_sub_bars_order_triggers_and_exits_within_a_bar(self):
+        candles = make_bars([
+            (100, 101, 99, 100),
+            (100, 106, 94, 95),
+            (98, 99, 97, 98),
+            (98, 98, 92, 92.5),
+        ])
+        sub_candles = make_sub_bars('2021-01-04 01:00', [
+            (100, 100.5, 94, 97.5),  # Reaches the stop losses before the entries trigger.
+            (97.5, 103, 97.5, 102.5),
+            (102.5, 106, 102, 105),
+            (105, 105, 95, 95),
+        ])
+        orders = pd.DataFrame([
+            make_order(0, 1, 'STOP', 103, 97, 105.5),  # Takes profit before it is stopped.
+            make_order(0, 1, 'STOP', 103, 94.5, 107),  # Only stopped out two bars later.
+            {**make_order(1, 1, 'STOP', 96, 90, 110), 'price_bound': 96.5},  # Gaps beyond its priceBound.
+            {**make_order(0, -1, 'STOP', 93, 99.5, 80), 'valid_bars': np.nan},  # GTC, triggered in the last bar.
+            make_order(0, -1, 'STOP', 93, 99.5, 80),  # Cleared after a bar.
+        ])
+        trades = simulate_orders(orders, candles)
+        self.assertEqual(list(trades['status']), ['FILLED', 'FILLED', 'CANCELLED', 'FILLED', 'EXPIRED'])
+        self.assertEqual(list(trades['exit_reason'][:2]), ['STOP_LOSS_ORDER', 'STOP_LOSS_ORDER'])
+        self.assertEqual(list(trades['exit_bar']), [1, 1, -1, 3, -1])
+
+        trades = simulate_orders(orders, candles, sub_candles=sub_candles)
+        self.assertEqual(list(trades['status']), ['FILLED', 'FILLED', 'CANCELLED', 'FILLED', 'EXPIRED'])
+        self.assertEqual(list(trades['entry_price'].fillna(0)), [103., 103., 0., 93., 0.])
+        self.assertEqual(
+            list(trades['exit_reason'].fillna('')),
+            ['TAKE_PROFIT_ORDER', 'STOP_LOSS_ORDER', '', 'END_OF_DATA', ''],
+        )
+        self.assertEqual(list(trades['exit_bar']), [1, 3, -1, 3, -1])
+        self.assertEqual(list(trades['exit_price'][:2]), [105.5, 94.5])
+        self.assertEqual(trades['entry_time'].iloc[0], pd.Timestamp('2021-01-04 01:15'))
+        self.assertEqual(trades['exit_time'].iloc[0], pd.Timestamp('2021-01-04 01:30'))
+        self.assertEqual(trades['exit_time'].iloc[1], pd.Timestamp('2021-01-04 03:00'))
+
+    def test_trade_cap_counts_trades_open_at_the_signal(self):
+        trades = pd.DataFrame({
+            'signal_bar': [0, 1, 2, 5],
+            'status': ['FILLED', 'FILLED', 'FILLED', 'FILLED'],
+            'entry_bar': [1, 2, 3, 6],
+            'exit_bar': [4, 3, 4, 7],
+        })
+        self.assertEqual(list(apply_open_trades_cap(trades, 1)['signal_bar']), [0, 5])
+        self.assertEqual(list(apply_open_trades_cap(trades, 2)['signal_bar']), [0, 1, 5])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+# Python standard.
+import unittest
+
+# Third-party.
+import numpy as np
+import pandas as pd
+
+# Local.
+from pagetpalace.src.backtesting.parameter_sweep import expand_grid, get_trades, summarise_trades
+from pagetpalace.src.backtesting.walk_forward import (
+    WalkForward,
+    get_closed_window_trades,
+    get_walk_forward_windows,
+    get_window_trades,
+)
+from pagetpalace.src.oanda.strategies.strategy_implementations.ssl_hammer_pin import SSLHammerPin
+from test_parameter_sweep import get_space
+from test_vectorized_backtester import make_candles
+
+
+class TestWalkForwardWindows(unittest.TestCase):
+    def test_windows_roll_forward(self):
+        self.assertEqual(
+            get_walk_forward_windows(100, 40, 20),
+            [((0, 40), (40, 60)), ((20, 60), (60, 80)), ((40, 80), (80, 100))],
+        )
+        self.assertEqual(get_walk_forward_windows(100, 40, 20, step=50), [((0, 40), (40, 60))])
+        self.assertEqual(get_walk_forward_windows(50, 40, 20), [])
+        with self.assertRaises(ValueError):
+            get_walk_forward_windows(100, 40, 0)
+
+
+class TestWalkForward(unittest.TestCase):
+    def setUp(self):
+        self.candles = {
+            'D': make_candles('D', '2020-01-01 22:00', 120, seed=4),
+            'H1': make_candles('H1', '2020-02-25', 1500, seed=5),
+        }
+        self.space = get_space([2, 3, 4])
+
+    def test_best_in_sample_parameters_are_evaluated_out_of_sample(self):
+        walk_forward = WalkForward(SSLHammerPin, self.candles, self.space, 400, 200, max_workers=0)
+        folds, oos_trades = walk_forward.run()
+        self.assertEqual(list(folds['fold']), list(range(5)))
+        self.assertEqual(list(folds['out_of_sample_start']), [400, 600, 800, 1000, 1200])
+        parameter_sets = list(expand_grid(self.space))
+        trades = [
+            get_trades(SSLHammerPin, self.candles, parameters).sort_values('signal_bar', kind='stable')
+            for parameters in parameter_sets
+        ]
+        held_past_split = 0
+        for fold in folds.rename(columns=lambda name: name.replace('.', '_')).itertuples():
+            in_sample_bars = (fold.in_sample_start, fold.in_sample_stop)
+            for run_trades in trades:
+                closed = get_closed_window_trades(run_trades, in_sample_bars)
+                self.assertTrue((closed[closed['status'] == 'FILLED']['exit_bar'] < fold.in_sample_stop).all())
+                held_past_split += len(get_window_trades(run_trades, in_sample_bars)) - len(closed)
+            in_sample = [
+                summarise_trades(get_closed_window_trades(run_trades, in_sample_bars)) for run_trades in trades
+            ]
+            totals = [summary['total_r'] if summary['trades'] else -np.inf for summary in in_sample]
+            self.assertEqual(fold.run, int(np.argmax(totals)))
+            self.assertEqual(fold.in_sample_total_r, max(totals))
+            expected = get_window_trades(trades[fold.run], (fold.out_of_sample_start, fold.out_of_sample_stop))
+            actual = oos_trades[oos_trades['fold'] == fold.fold].drop(columns='fold')
+            pd.testing.assert_frame_equal(actual.reset_index(drop=True), expected.reset_index(drop=True))
+            self.assertEqual(fold.oos_trades, summarise_trades(expected)['trades'])
+            long_multipliers = parameter_sets[fold.run]['trade_multipliers']['1']['long']
+            self.assertEqual((fold.trade_multipliers_1_long_sl, fold.trade_multipliers_1_long_tp), (
+                long_multipliers['sl'], long_multipliers['tp'],
+            ))
+        self.assertGreater(held_past_split, 0)
+
+    def test_indicators_are_computed_once_for_every_fold_and_parameter_set(self):
+        WalkForward(SSLHammerPin, self.candles, self.space, 400, 200, max_workers=0).run()
+        hourly, daily = self.candles['H1'], self.candles['D']
+        self.assertEqual(hourly.misses, 2)
+        self.assertEqual(daily.misses, 1)
+        self.assertEqual(hourly.hits, 2 * (len(list(expand_grid(self.space))) - 1) + len(list(expand_grid(self.space))))
+
+    def test_pool_matches_in_process(self):
+        in_process = WalkForward(SSLHammerPin, self.candles, self.space, 400, 200, max_workers=0).run()
+        pooled = WalkForward(SSLHammerPin, self.candles, self.space, 400, 200, max_workers=2).run()
+        pd.testing.assert_frame_equal(pooled[0], in_process[0])
+        pd.testing.assert_frame_equal(pooled[1], in_process[1])
+
+
+if __name__ == '__main__':
+    unittest.main()